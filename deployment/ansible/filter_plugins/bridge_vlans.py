@@ -0,0 +1,22 @@
+# bridge_vlans.py - Ansible filter exposing the per-bridge VLAN membership builder
+#
+# Usage: bridge_membership: "{{ site_config | bridge_membership }}"
+
+import sys
+from pathlib import Path
+
+_SCRIPTS_DIR = Path(__file__).resolve().parents[3] / 'deployment' / 'scripts'
+if str(_SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(_SCRIPTS_DIR))
+
+from vlan_membership import bridge_membership  # noqa: E402
+
+
+def bridge_vlan_membership(site_config):
+    """{bridge: {ports, vlans, vlan_aware, vids, camera}} from the site's bridge and interface VLANs"""
+    return bridge_membership(dict(site_config or {}))
+
+
+class FilterModule(object):
+    def filters(self):
+        return {'bridge_membership': bridge_vlan_membership}
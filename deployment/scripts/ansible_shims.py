@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# ansible_shims.py - Minimal Ansible filters and lookups for rendering Ansible templates outside Ansible
+
+import json
+import os
+import re
+
+import yaml
+
+def regex_replace(value, pattern, replacement='', ignorecase=False, multiline=False):
+    """Ansible's regex_replace filter"""
+    flags = (re.IGNORECASE if ignorecase else 0) | (re.MULTILINE if multiline else 0)
+    return re.sub(pattern, replacement, str(value), flags=flags)
+
+def regex_search(value, pattern, ignorecase=False, multiline=False):
+    """Ansible's regex_search filter (without group arguments)"""
+    flags = (re.IGNORECASE if ignorecase else 0) | (re.MULTILINE if multiline else 0)
+    match = re.search(pattern, str(value), flags=flags)
+    return match.group(0) if match else None
+
+def to_bool(value):
+    """Ansible's bool filter"""
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in ('yes', 'on', '1', 'true', 't', 'y')
+
+def lookup(plugin, *terms, **kwargs):
+    """Subset of Ansible's lookup(): 'env' and 'file'"""
+    if plugin == 'env':
+        return ','.join(os.environ.get(str(term), kwargs.get('default', '')) for term in terms)
+    if plugin == 'file':
+        contents = []
+        for term in terms:
+            with open(os.path.expanduser(str(term)), 'r') as f:
+                contents.append(f.read().rstrip('\n'))
+        return ','.join(contents)
+    raise ValueError(f"lookup plugin '{plugin}' is not supported outside Ansible")
+
+FILTERS = {
+    'regex_replace': regex_replace,
+    'regex_search': regex_search,
+    'bool': to_bool,
+    'to_json': json.dumps,
+    'to_nice_json': lambda value: json.dumps(value, indent=4, sort_keys=True),
+    'from_json': json.loads,
+    'to_yaml': lambda value: yaml.safe_dump(value, default_flow_style=None),
+    'to_nice_yaml': lambda value: yaml.safe_dump(value, default_flow_style=False, indent=4),
+    'from_yaml': yaml.safe_load,
+}
+
+def install(env):
+    """Register the shims on a Jinja2 environment"""
+    env.filters.update(FILTERS)
+    env.globals['lookup'] = lookup
+    return env
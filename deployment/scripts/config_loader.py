@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+# config_loader.py - Shared YAML config loader using libyaml with a parsed-document cache
+
+import os
+import threading
+from pathlib import Path
+
+import yaml
+
+# libyaml's C parser is several times faster; fall back to the pure-Python loader
+Loader = getattr(yaml, 'CSafeLoader', yaml.SafeLoader)
+Dumper = getattr(yaml, 'CSafeDumper', yaml.SafeDumper)
+
+def _readonly(self, *args, **kwargs):
+    raise TypeError(f"'{type(self).__name__}' is read-only; use mutable_copy() to modify loaded config")
+
+class FrozenDict(dict):
+    """Read-only dict returned for loaded YAML mappings
+
+    Still a real dict, so isinstance checks, JSON encoding and Jinja2 work
+    unchanged; only the mutating methods are blocked.
+    """
+
+    __setitem__ = __delitem__ = __ior__ = _readonly
+    clear = pop = popitem = setdefault = update = _readonly
+
+    def __reduce__(self):
+        return (type(self), (dict(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+class FrozenList(list):
+    """Read-only list returned for loaded YAML sequences"""
+
+    __setitem__ = __delitem__ = __iadd__ = __imul__ = _readonly
+    append = extend = insert = pop = remove = clear = sort = reverse = _readonly
+
+    def __reduce__(self):
+        return (type(self), (list(self),))
+
+    def __copy__(self):
+        return self
+
+    def __deepcopy__(self, memo):
+        return self
+
+for _dumper in {yaml.SafeDumper, Dumper}:
+    _dumper.add_representer(FrozenDict, _dumper.represent_dict)
+    _dumper.add_representer(FrozenList, _dumper.represent_list)
+
+def freeze(value):
+    """Recursively wrap parsed YAML data in FrozenDict/FrozenList"""
+    if isinstance(value, (FrozenDict, FrozenList)):
+        return value
+    if isinstance(value, dict):
+        return FrozenDict((key, freeze(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return FrozenList(freeze(item) for item in value)
+    return value
+
+def mutable_copy(value):
+    """Plain, modifiable deep copy of loaded config data"""
+    if isinstance(value, dict):
+        return {key: mutable_copy(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [mutable_copy(item) for item in value]
+    return value
+
+def parse_yaml(stream):
+    """Parse a YAML string or file object with the fastest available safe loader"""
+    return yaml.load(stream, Loader=Loader)
+
+class ConfigCache:
+    """Parsed YAML documents keyed by path, valid while (mtime, size) is unchanged"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def load(self, path):
+        path = Path(path).resolve()
+        stat = os.stat(path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry[1]
+
+        with open(path, 'r') as f:
+            data = freeze(parse_yaml(f))
+
+        with self._lock:
+            self._entries[path] = (signature, data)
+            self.misses += 1
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses}
+
+_cache = ConfigCache()
+
+def load_config(path):
+    """Load a YAML file as read-only data, reusing the parse while the file is unchanged
+
+    Raises OSError and yaml.YAMLError like yaml.safe_load on an open file.
+    """
+    return _cache.load(path)
+
+def clear_cache():
+    _cache.clear()
+
+def cache_stats():
+    return _cache.stats()
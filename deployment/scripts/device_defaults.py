@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+# device_defaults.py - Compiled registry of device-type defaults from config/devices_templates
+
+import os
+import re
+import sys
+import json
+import argparse
+import tempfile
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
+from typing import Any, Mapping, Optional, Tuple
+
+import jinja2
+
+from config_loader import freeze, mutable_copy, parse_yaml
+from incremental import content_hash, template_dependencies
+from template_cache import default_cache_dir
+
+DEVICE_TEMPLATES_DIR = Path(__file__).resolve().parent.parent.parent / 'config' / 'devices_templates'
+TEMPLATE_SUFFIX = '.yml.j2'
+CACHE_FILE_NAME = 'device-defaults.json'
+CACHE_VERSION = 1
+
+# Templates are rendered with the repo's placeholder prefix, as in config/site_template.yml
+PLACEHOLDER_PREFIX = '10.x'
+
+_REFERENCES_TEMPLATES = re.compile(r'{%-?\s*(include|import|from|extends)\b')
+
+@dataclass(frozen=True)
+class PortDefault:
+    port: int
+    protocol: str = 'tcp'
+    description: str = ''
+
+@dataclass(frozen=True)
+class DeviceTypeDefaults:
+    """Defaults a device type's template produces when no options are given"""
+    type: str
+    description: str
+    vlan: Optional[int]
+    ip_suffix: Optional[int]
+    ports: Tuple[PortDefault, ...]
+    allow_internet: bool
+    allow_local_network: bool
+    needs_dhcp_reservation: bool
+    allow_from_vlans: Tuple[int, ...]
+    attributes: Mapping[str, Any]     # every other key the template sets, frozen
+
+    @classmethod
+    def from_rendered(cls, device_type, data):
+        data = dict(data or {})
+        typed = {
+            'type': data.pop('type', device_type),
+            'description': data.pop('description', ''),
+            'vlan': data.pop('vlan', None),
+            'ip_suffix': data.pop('ip_suffix', None),
+            'ports': tuple(
+                PortDefault(int(port['port']), port.get('protocol', 'tcp'), port.get('description', ''))
+                for port in data.pop('ports', None) or ()
+            ),
+            'allow_internet': bool(data.pop('allow_internet', False)),
+            'allow_local_network': bool(data.pop('allow_local_network', False)),
+            'needs_dhcp_reservation': bool(data.pop('needs_dhcp_reservation', False)),
+            'allow_from_vlans': tuple(data.pop('allow_from_vlans', None) or ()),
+        }
+        return cls(attributes=freeze(data), **typed)
+
+    def port_dicts(self):
+        """Default ports in the site/device-map format"""
+        return [{'port': port.port, 'protocol': port.protocol, 'description': port.description}
+                for port in self.ports]
+
+    def to_dict(self):
+        data = {field.name: mutable_copy(getattr(self, field.name)) for field in fields(self)}
+        data['ports'] = [asdict(port) for port in self.ports]
+        data['allow_from_vlans'] = list(self.allow_from_vlans)
+        return data
+
+class DeviceTypeRegistry:
+    """Defaults of every device type, keyed by type name
+
+    Each template is rendered once with no options and parsed into a frozen
+    DeviceTypeDefaults. Results are cached on disk keyed by a hash of the
+    template source (plus anything it includes) and the Jinja2 version, so
+    later runs only read the cache; edited templates are re-parsed
+    automatically.
+    """
+
+    def __init__(self, template_dir=DEVICE_TEMPLATES_DIR, cache_file=None, use_cache=True):
+        self.template_dir = Path(template_dir)
+        self.cache_file = Path(cache_file) if cache_file else default_cache_dir() / CACHE_FILE_NAME
+        self.use_cache = use_cache
+        self.compiled = 0
+        self._env = None
+        self._defaults = {}
+        self._load()
+
+    @property
+    def env(self):
+        if self._env is None:
+            self._env = jinja2.Environment(
+                loader=jinja2.FileSystemLoader(str(self.template_dir)),
+                trim_blocks=True,
+                lstrip_blocks=True
+            )
+        return self._env
+
+    def _template_hash(self, template_file):
+        source = template_file.read_text()
+        if not _REFERENCES_TEMPLATES.search(source):
+            return content_hash([jinja2.__version__, source])
+        # Rare: the template pulls in others, so their sources are part of the key
+        return content_hash([jinja2.__version__, template_dependencies(self.env, template_file.name)])
+
+    def _read_cache(self):
+        if not self.use_cache:
+            return {}
+        try:
+            with open(self.cache_file, 'r') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if data.get('version') != CACHE_VERSION:
+            return {}
+        return data.get('templates', {}).get(str(self.template_dir), {})
+
+    def _write_cache(self, entries):
+        try:
+            data = {}
+            try:
+                with open(self.cache_file, 'r') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                pass
+            if data.get('version') != CACHE_VERSION:
+                data = {'version': CACHE_VERSION, 'templates': {}}
+            data['templates'][str(self.template_dir)] = entries
+
+            self.cache_file.parent.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_file.parent, suffix='.tmp')
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.cache_file)
+        except OSError as e:
+            print(f"Warning: could not write device defaults cache: {e}", file=sys.stderr)
+
+    def _load(self):
+        cached = self._read_cache()
+        entries = {}
+        for template_file in sorted(self.template_dir.glob(f"*{TEMPLATE_SUFFIX}")):
+            device_type = template_file.name[:-len(TEMPLATE_SUFFIX)]
+            digest = self._template_hash(template_file)
+
+            entry = cached.get(device_type)
+            if entry is None or entry.get('hash') != digest:
+                rendered = self.env.get_template(template_file.name).render(network_prefix=PLACEHOLDER_PREFIX)
+                entry = {'hash': digest, 'defaults': parse_yaml(rendered) or {}}
+                self.compiled += 1
+            entries[device_type] = entry
+            self._defaults[device_type] = DeviceTypeDefaults.from_rendered(device_type, entry['defaults'])
+
+        if self.use_cache and (self.compiled or set(entries) != set(cached)):
+            self._write_cache(entries)
+
+    def get(self, device_type):
+        return self._defaults.get(device_type)
+
+    def __getitem__(self, device_type):
+        return self._defaults[device_type]
+
+    def __contains__(self, device_type):
+        return device_type in self._defaults
+
+    def types(self):
+        return sorted(self._defaults)
+
+_registries = {}
+
+def get_registry(template_dir=DEVICE_TEMPLATES_DIR):
+    """Process-wide registry for a template directory"""
+    key = str(Path(template_dir).resolve())
+    if key not in _registries:
+        _registries[key] = DeviceTypeRegistry(template_dir)
+    return _registries[key]
+
+def main():
+    parser = argparse.ArgumentParser(description='Show device-type defaults compiled from the device templates')
+    parser.add_argument('types', nargs='*', help='Device types to show (default: all)')
+    parser.add_argument('-t', '--template-dir', default=str(DEVICE_TEMPLATES_DIR),
+                        help='Directory containing the device templates')
+    parser.add_argument('--clear-cache', action='store_true', help='Remove the compiled defaults cache and exit')
+    args = parser.parse_args()
+
+    if args.clear_cache:
+        cache_file = default_cache_dir() / CACHE_FILE_NAME
+        if cache_file.exists():
+            cache_file.unlink()
+        print(f"Removed {cache_file}")
+        sys.exit(0)
+
+    registry = DeviceTypeRegistry(args.template_dir)
+    unknown = [device_type for device_type in args.types if device_type not in registry]
+    if unknown:
+        print(f"Error: unknown device type(s): {', '.join(unknown)} (known: {', '.join(registry.types())})")
+        sys.exit(1)
+
+    types = args.types or registry.types()
+    json.dump({device_type: registry[device_type].to_dict() for device_type in types}, sys.stdout, indent=2)
+    print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+# device_map.py - Build the merged site device map used for firewall rule generation
+
+import sys
+import json
+import argparse
+from pathlib import Path
+
+import yaml
+
+from render_template import TemplateRenderer, load_yaml_config, open_bytecode_cache
+from config_loader import parse_yaml
+from incremental import content_hash
+from device_defaults import DEVICE_TEMPLATES_DIR, get_registry
+
+DEFAULT_DEVICE_TYPE = 'generic_server'
+
+# Site device keys that never influence a device type's default ports
+NON_PORT_KEYS = frozenset((
+    'type', 'ip_address', 'vlan_id', 'mac_address', 'config_file',
+    'override_ports', 'additional_ports', 'ports',
+))
+
+def normalize_port(port):
+    """Accept a bare port number or a port mapping; default protocol is tcp"""
+    if isinstance(port, dict):
+        entry = dict(port)
+        entry['port'] = int(entry['port'])
+        entry.setdefault('protocol', 'tcp')
+        return entry
+    return {'port': int(port), 'protocol': 'tcp'}
+
+def merge_ports(*port_lists):
+    """Concatenate port lists, keeping one entry per (port, protocol); later lists win"""
+    merged = {}
+    for ports in port_lists:
+        for port in ports or ():
+            entry = normalize_port(port)
+            key = (entry['port'], entry['protocol'])
+            merged[key] = dict(merged.get(key, {}), **entry)
+    return list(merged.values())
+
+class DefaultPorts:
+    """Default ports of each device type, taken from config/devices_templates
+
+    Devices without options use the compiled defaults registry and need no
+    rendering at all. Otherwise the type's template is rendered once per
+    distinct set of device options (e.g. ``rtsp_port`` or ``ssh_enabled``).
+    """
+
+    def __init__(self, template_dir=DEVICE_TEMPLATES_DIR, network_prefix=None):
+        self.template_dir = Path(template_dir)
+        self.network_prefix = network_prefix
+        self.registry = get_registry(self.template_dir)
+        self._renderer = None
+        self._cache = {}
+
+    @property
+    def renderer(self):
+        if self._renderer is None:
+            self._renderer = TemplateRenderer(str(self.template_dir), open_bytecode_cache())
+        return self._renderer
+
+    def ports(self, device_type, options=None):
+        options = {key: value for key, value in (options or {}).items() if key not in NON_PORT_KEYS}
+        if not options:
+            defaults = self.registry.get(device_type)
+            return defaults.port_dicts() if defaults else []
+
+        key = (device_type, content_hash(options))
+        if key not in self._cache:
+            self._cache[key] = self._render_ports(device_type, options)
+        return [dict(port) for port in self._cache[key]]
+
+    def _render_ports(self, device_type, options):
+        template_name = f"{device_type}.yml.j2"
+        if not (self.template_dir / template_name).exists():
+            return ()
+        context = dict(options, network_prefix=self.network_prefix)
+        rendered = parse_yaml(self.renderer.render(template_name, context)) or {}
+        return tuple(normalize_port(port) for port in rendered.get('ports') or ())
+
+def build_device_map(site_config, template_dir=None):
+    """Merged device map for a site
+
+    Accepts either ``site_config`` or a whole site file (with a top-level
+    ``site`` key). Each device gets its type's default ports unless
+    ``override_ports`` is set, in which case those replace the defaults;
+    ``additional_ports`` are appended to the defaults.
+    """
+    site = site_config.get('site', site_config) if site_config else {}
+    defaults = DefaultPorts(template_dir or DEVICE_TEMPLATES_DIR, site.get('network_prefix'))
+
+    device_map = {}
+    for device_name, attrs in (site.get('devices') or {}).items():
+        device_type = attrs.get('type') or DEFAULT_DEVICE_TYPE
+        if 'override_ports' in attrs:
+            ports = merge_ports(attrs['override_ports'])
+        else:
+            ports = merge_ports(defaults.ports(device_type, attrs), attrs.get('additional_ports'))
+
+        entry = {
+            'ip_address': attrs.get('ip_address'),
+            'vlan_id': attrs.get('vlan_id'),
+            'type': device_type,
+            'ports': ports,
+        }
+        if attrs.get('mac_address'):
+            entry['mac_address'] = attrs['mac_address']
+        device_map[device_name] = entry
+
+    return device_map
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the merged device map of a site')
+    parser.add_argument('site_file', help='Site YAML configuration file')
+    parser.add_argument('-t', '--template-dir', default=str(DEVICE_TEMPLATES_DIR),
+                        help='Directory containing the device templates')
+    parser.add_argument('--yaml', action='store_true', help='Output YAML instead of JSON')
+    args = parser.parse_args()
+
+    device_map = build_device_map(load_yaml_config(args.site_file) or {}, args.template_dir)
+    if args.yaml:
+        yaml.safe_dump(device_map, sys.stdout, default_flow_style=False, sort_keys=False)
+    else:
+        json.dump(device_map, sys.stdout, indent=2)
+        print()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+# incremental.py - Dependency tracking and content-hash manifest for incremental rendering
+
+import functools
+import hashlib
+import json
+import os
+import tempfile
+from pathlib import Path
+
+from jinja2 import meta
+
+MANIFEST_NAME = '.render-manifest.json'
+MANIFEST_VERSION = 1
+
+# Hash recorded for a key that was looked up but did not exist
+MISSING = 'missing'
+
+_ABSENT = object()
+
+def content_hash(value):
+    """Stable hash of YAML/JSON-like data"""
+    data = json.dumps(value, sort_keys=True, default=str, separators=(',', ':'))
+    return hashlib.sha256(data.encode('utf-8')).hexdigest()
+
+def plain(value):
+    """Unwrap tracked data, recording a dependency on the whole value"""
+    if isinstance(value, TrackedDict):
+        value._tracker.value(value._path, value._raw)
+        return value._raw
+    if isinstance(value, (list, tuple)):
+        return type(value)(plain(item) for item in value)
+    return value
+
+class DependencyTracker:
+    """Records every piece of the template context a render actually read
+
+    Dependencies are keyed by ('value', *path), ('keys', *path) or
+    ('lookup', plugin, *terms) and map to the hash of what was read.
+    """
+
+    def __init__(self):
+        self.deps = {}
+
+    def value(self, path, value):
+        self.deps[('value',) + tuple(path)] = content_hash(value)
+
+    def missing(self, path):
+        self.deps[('value',) + tuple(path)] = MISSING
+
+    def keys(self, path, mapping):
+        self.deps[('keys',) + tuple(path)] = content_hash(sorted(map(str, mapping)))
+
+    def lookup(self, plugin, terms, result):
+        self.deps[('lookup', plugin) + tuple(map(str, terms))] = content_hash(result)
+
+class TrackedDict(dict):
+    """Mapping that reports each key read (or iteration) to a DependencyTracker
+
+    Nested mappings are wrapped on access, so a template that only reads
+    ``device.vlan_id`` depends on that one value rather than on the whole
+    device entry.
+    """
+
+    def __init__(self, data, path, tracker):
+        super().__init__(data)
+        self._raw = data
+        self._path = tuple(path)
+        self._tracker = tracker
+
+    def _child(self, key):
+        value = dict.__getitem__(self, key)
+        path = self._path + (key,)
+        if isinstance(value, dict):
+            return TrackedDict(value, path, self._tracker)
+        self._tracker.value(path, value)
+        return value
+
+    def __getitem__(self, key):
+        try:
+            return self._child(key)
+        except KeyError:
+            self._tracker.missing(self._path + (key,))
+            raise
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key):
+        if dict.__contains__(self, key):
+            self._child(key)
+            return True
+        self._tracker.missing(self._path + (key,))
+        return False
+
+    def __iter__(self):
+        self._tracker.keys(self._path, self._raw)
+        return dict.__iter__(self)
+
+    def __len__(self):
+        self._tracker.keys(self._path, self._raw)
+        return dict.__len__(self)
+
+    def keys(self):
+        self._tracker.keys(self._path, self._raw)
+        return dict.keys(self)
+
+    def items(self):
+        self._tracker.keys(self._path, self._raw)
+        return [(key, self._child(key)) for key in dict.keys(self)]
+
+    def values(self):
+        return [value for _, value in self.items()]
+
+    def copy(self):
+        return dict(plain(self))
+
+    def __eq__(self, other):
+        return plain(self) == plain(other)
+
+    def __ne__(self, other):
+        return not self == other
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(plain(self))
+
+    __str__ = __repr__
+
+_active_tracker = None
+
+def _touching(func):
+    """Wrap a filter so tracked arguments are unwrapped (and fully depended on)"""
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return func(*[plain(arg) for arg in args],
+                    **{key: plain(value) for key, value in kwargs.items()})
+    return wrapper
+
+def install_tracking(env):
+    """Make an environment's filters and lookup() report their inputs"""
+    for name, func in list(env.filters.items()):
+        env.filters[name] = _touching(func)
+
+    lookup = env.globals.get('lookup')
+    if lookup is not None:
+        def tracked_lookup(plugin, *terms, **kwargs):
+            terms = [plain(term) for term in terms]
+            result = lookup(plugin, *terms, **kwargs)
+            if _active_tracker is not None:
+                _active_tracker.lookup(plugin, terms, result)
+            return result
+        env.globals['lookup'] = tracked_lookup
+    return env
+
+def template_dependencies(env, template_name):
+    """Hash of the template and everything it includes, imports or extends"""
+    hashes = {}
+    pending = [template_name]
+    while pending:
+        name = pending.pop()
+        if name in hashes:
+            continue
+        source, _, _ = env.loader.get_source(env, name)
+        hashes[name] = content_hash(source)
+        for reference in meta.find_referenced_templates(env.parse(source)):
+            if reference is None:
+                # Dynamic include: any template in the directory may be used
+                pending.extend(env.list_templates())
+            else:
+                pending.append(reference)
+    return hashes
+
+def render_tracked(env, template_name, context):
+    """Render a template, returning (output, dependencies)"""
+    global _active_tracker
+
+    tracker = DependencyTracker()
+    tracked = {}
+    for name, value in context.items():
+        if isinstance(value, dict):
+            tracked[name] = TrackedDict(value, (name,), tracker)
+        else:
+            tracker.value((name,), value)
+            tracked[name] = value
+
+    _active_tracker = tracker
+    try:
+        output = env.get_template(template_name).render(**tracked)
+    finally:
+        _active_tracker = None
+
+    deps = [list(key) + [digest] for key, digest in tracker.deps.items()]
+    deps.extend(['template', name, digest]
+                for name, digest in template_dependencies(env, template_name).items())
+    return output, deps
+
+def resolve(context, path):
+    """Value at a key path in plain context data, or _ABSENT"""
+    value = context
+    for key in path:
+        if not isinstance(value, dict) or key not in value:
+            return _ABSENT
+        value = value[key]
+    return value
+
+class Manifest:
+    """Content-hash manifest of rendered outputs and the inputs each one read
+
+    Stored as JSON in the output root. An output is current when its job
+    definition, its file on disk and every recorded input hash are unchanged.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.path = self.root / MANIFEST_NAME
+        self.outputs = {}
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if data.get('version') == MANIFEST_VERSION:
+                self.outputs = data.get('outputs', {})
+        except (OSError, ValueError):
+            pass
+
+    def key(self, output):
+        return os.path.relpath(output, self.root)
+
+    def is_current(self, output, job_key, context, template_dir, lookup=None):
+        entry = self.outputs.get(self.key(output))
+        if entry is None or entry['job'] != job_key:
+            return False
+
+        try:
+            with open(output, 'r') as f:
+                if content_hash(f.read()) != entry['output']:
+                    return False
+        except OSError:
+            return False
+
+        for dep in entry['deps']:
+            kind, args, digest = dep[0], dep[1:-1], dep[-1]
+            if kind == 'value':
+                value = resolve(context, args)
+                current = MISSING if value is _ABSENT else content_hash(value)
+            elif kind == 'keys':
+                mapping = resolve(context, args)
+                current = content_hash(sorted(map(str, mapping))) if isinstance(mapping, dict) else MISSING
+            elif kind == 'lookup':
+                try:
+                    current = content_hash(lookup(*args)) if lookup else MISSING
+                except (OSError, ValueError):
+                    current = MISSING
+            elif kind == 'template':
+                try:
+                    current = content_hash((Path(template_dir) / args[0]).read_text())
+                except OSError:
+                    current = MISSING
+            else:
+                return False
+            if current != digest:
+                return False
+        return True
+
+    def record(self, output, job_key, output_hash, deps):
+        self.outputs[self.key(output)] = {'job': job_key, 'output': output_hash, 'deps': deps}
+
+    def forget(self, output):
+        self.outputs.pop(self.key(output), None)
+
+    def entries_under(self, directory):
+        """Outputs recorded below a directory of the output root"""
+        prefix = self.key(directory) + os.sep
+        return [str(self.root / key) for key in self.outputs if key.startswith(prefix)]
+
+    def save(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, prefix=f"{MANIFEST_NAME}.", suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            json.dump({'version': MANIFEST_VERSION, 'outputs': self.outputs}, f, sort_keys=True)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+# network_conflicts.py - Detect overlapping subnets and duplicate IP/MAC addresses across sites
+
+import sys
+import json
+import heapq
+import bisect
+import socket
+import argparse
+import ipaddress
+from collections import defaultdict, namedtuple
+
+import yaml
+
+from config_loader import load_config
+from site_schema import format_path, yaml_lines
+
+Location = namedtuple('Location', 'file site path')
+Conflict = namedtuple('Conflict', 'kind message locations')
+
+# Subnet of one VLAN as an integer interval [start, end]
+Subnet = namedtuple('Subnet', 'version start end network vlan location')
+
+def _network(value):
+    """IPv4/IPv6 network for a subnet string, or None for placeholders and invalid values"""
+    try:
+        return ipaddress.ip_network(str(value), strict=False)
+    except ValueError:
+        return None
+
+def _address(value):
+    """(version, integer) key for an IP address string, or None
+
+    IPv4 goes through inet_pton, which is much faster than ipaddress for the
+    thousands of device addresses a large multi-site tree has.
+    """
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, value), 'big')
+    except (OSError, TypeError):
+        pass
+    try:
+        address = ipaddress.ip_address(str(value))
+    except ValueError:
+        return None
+    return address.version, int(address)
+
+def _format_address(key):
+    return str(ipaddress.ip_address(key[1]) if key[0] == 6 else ipaddress.IPv4Address(key[1]))
+
+def _location(ref):
+    (site_file, site_name, base), path = ref
+    return Location(site_file, site_name, base + path)
+
+def _interval(subnet):
+    return subnet.version, subnet.start, subnet.end
+
+def _contains(subnet, address):
+    return address[0] == subnet.version and subnet.start <= address[1] <= subnet.end
+
+class SiteIndex:
+    """Sorted subnet intervals and hash indexes of addresses for a set of sites
+
+    Subnets are kept as integer intervals sorted by start address, so
+    overlaps are found with a single sweep and an address's VLAN with a
+    binary search. IPs and MACs are indexed by value, so duplicates cost
+    one dict insert each instead of a pairwise comparison.
+    """
+
+    def __init__(self):
+        self.subnets = []
+        self.ips = defaultdict(list)
+        self.macs = defaultdict(list)
+        self.conflicts = []
+
+    def add_site(self, site_file, config):
+        site = config.get('site', config) if isinstance(config, dict) else None
+        if not isinstance(site, dict):
+            return
+        # Index entries are (owner, path) pairs; Locations are only built for conflicts
+        owner = (site_file, site.get('name') or site_file, ('site',) if site is not config else ())
+        ips, macs = self.ips, self.macs
+
+        site_subnets = []
+        vlans = {}
+        network_config = (site.get('hardware') or {}).get('network') or {}
+        for index, vlan in enumerate(network_config.get('vlans') or ()):
+            network = _network(vlan.get('subnet'))
+            if network is None:
+                continue
+            subnet = Subnet(network.version, int(network.network_address), int(network.broadcast_address),
+                            network, vlan.get('id'), (owner, ('hardware', 'network', 'vlans', index, 'subnet')))
+            site_subnets.append(subnet)
+            vlans[vlan.get('id')] = subnet
+
+            gateway = _address(vlan.get('gateway'))
+            if gateway is not None:
+                ref = (owner, ('hardware', 'network', 'vlans', index, 'gateway'))
+                ips[gateway].append(ref)
+                if not _contains(subnet, gateway):
+                    self.conflict('outside-subnet', f"gateway {_format_address(gateway)} is outside VLAN "
+                                  f"{subnet.vlan} subnet {network}", ref, subnet.location)
+
+        self.subnets.extend(site_subnets)
+        site_subnets.sort(key=_interval)
+        starts = [_interval(subnet) for subnet in site_subnets]
+
+        host = _address((site.get('proxmox') or {}).get('host'))
+        if host is not None:
+            ips[host].append((owner, ('proxmox', 'host')))
+
+        devices = site.get('devices')
+        if not devices and site is not config and config.get('devices'):
+            devices, owner = config['devices'], owner[:2] + ((),)
+        for name, device in (devices or {}).items():
+            if not isinstance(device, dict):
+                continue
+            mac = device.get('mac_address')
+            if isinstance(mac, str) and mac:
+                macs[mac.lower().replace('-', ':')].append((owner, ('devices', name, 'mac_address')))
+
+            ip = _address(device.get('ip_address'))
+            if ip is None:
+                continue
+            ref = (owner, ('devices', name, 'ip_address'))
+            ips[ip].append(ref)
+
+            vlan_id = device.get('vlan_id')
+            if vlan_id is not None:
+                subnet = vlans.get(vlan_id)
+                if subnet is None:
+                    self.conflict('unknown-vlan', f"device {name} uses VLAN {vlan_id}, which the site does not define",
+                                  (owner, ('devices', name, 'vlan_id')))
+                    continue
+            else:
+                # Binary search for the subnet starting at or below the address
+                position = bisect.bisect_right(starts, (ip[0], ip[1], float('inf'))) - 1
+                subnet = site_subnets[position] if position >= 0 else None
+                if subnet is None or not _contains(subnet, ip):
+                    self.conflict('outside-subnet', f"device {name} address {_format_address(ip)} is not inside "
+                                  "any VLAN subnet", ref)
+                    continue
+
+            if not _contains(subnet, ip):
+                self.conflict('outside-subnet', f"device {name} address {_format_address(ip)} is outside VLAN "
+                              f"{subnet.vlan} subnet {subnet.network}", ref, subnet.location)
+            elif subnet.end - subnet.start > 1 and ip[1] in (subnet.start, subnet.end):
+                self.conflict('outside-subnet', f"device {name} address {_format_address(ip)} is the network "
+                              f"or broadcast address of {subnet.network}", ref)
+
+    def conflict(self, kind, message, *refs):
+        self.conflicts.append(Conflict(kind, message, tuple(_location(ref) for ref in refs)))
+
+    def overlapping_subnets(self):
+        """Every pair of overlapping subnets, by sweeping intervals in start order"""
+        active = []     # heap of ((version, end), position) of intervals still open
+        ordered = sorted(self.subnets, key=lambda subnet: (subnet.version, subnet.start, -subnet.end))
+        for position, subnet in enumerate(ordered):
+            while active and active[0][0] < (subnet.version, subnet.start):
+                heapq.heappop(active)
+            for _, other_position in active:
+                yield ordered[other_position], subnet
+            heapq.heappush(active, ((subnet.version, subnet.end), position))
+
+    def find_conflicts(self):
+        conflicts = list(self.conflicts)
+
+        for first, second in self.overlapping_subnets():
+            first_location, second_location = _location(first.location), _location(second.location)
+            same_site = first_location.file == second_location.file
+            scope = 'within site' if same_site else 'across sites'
+            conflicts.append(Conflict(
+                'subnet-overlap',
+                f"{first.network} ({first_location.site} VLAN {first.vlan}) overlaps {second.network} "
+                f"({second_location.site} VLAN {second.vlan}) {scope}",
+                (first_location, second_location)))
+
+        for ip, refs in self.ips.items():
+            if len(refs) > 1:
+                conflicts.append(Conflict('duplicate-ip', f"{_format_address(ip)} is assigned {len(refs)} times",
+                                          tuple(_location(ref) for ref in refs)))
+
+        for mac, refs in self.macs.items():
+            if len(refs) > 1:
+                conflicts.append(Conflict('duplicate-mac', f"{mac} is assigned {len(refs)} times",
+                                          tuple(_location(ref) for ref in refs)))
+
+        return conflicts
+
+def find_conflicts(sites):
+    """Conflicts across an iterable of (site_file, parsed config) pairs"""
+    index = SiteIndex()
+    for site_file, config in sites:
+        index.add_site(site_file, config)
+    return index.find_conflicts()
+
+def check_files(site_files):
+    """Conflicts across site files; files that fail to load are skipped (see site_schema)"""
+    sites = []
+    for site_file in site_files:
+        try:
+            sites.append((site_file, load_config(site_file)))
+        except (OSError, yaml.YAMLError):
+            continue
+    return find_conflicts(sites)
+
+def conflict_lines(conflicts):
+    """{(file, path): line} for every location of the given conflicts"""
+    paths = defaultdict(set)
+    for conflict in conflicts:
+        for location in conflict.locations:
+            paths[location.file].add(location.path)
+
+    lines = {}
+    for site_file, key_paths in paths.items():
+        key_paths = sorted(key_paths, key=str)
+        try:
+            found = yaml_lines(site_file, key_paths)
+        except (OSError, yaml.YAMLError):
+            found = [None] * len(key_paths)
+        lines.update(((site_file, key_path), line) for key_path, line in zip(key_paths, found))
+    return lines
+
+def conflicts_as_dicts(conflicts):
+    lines = conflict_lines(conflicts)
+    return [
+        {
+            'kind': conflict.kind,
+            'message': conflict.message,
+            'locations': [{'file': location.file, 'site': location.site, 'path': format_path(location.path),
+                           'line': lines.get((location.file, location.path))}
+                          for location in conflict.locations],
+        }
+        for conflict in conflicts
+    ]
+
+def format_conflicts(conflicts):
+    lines = []
+    for conflict in conflicts_as_dicts(conflicts):
+        lines.append(f"{conflict['kind']}: {conflict['message']}")
+        for location in conflict['locations']:
+            place = f"{location['file']}:{location['line']}" if location['line'] else location['file']
+            lines.append(f"    {place}: {location['path']}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Find overlapping subnets and duplicate addresses across sites')
+    parser.add_argument('site_files', nargs='+', help='Site YAML configuration files')
+    parser.add_argument('--json', action='store_true', help='Output conflicts as JSON')
+    args = parser.parse_args()
+
+    conflicts = check_files(args.site_files)
+    if args.json:
+        json.dump(conflicts_as_dicts(conflicts), sys.stdout, indent=2)
+        print()
+    elif conflicts:
+        print(format_conflicts(conflicts))
+    else:
+        print(f"No conflicts across {len(args.site_files)} site(s)")
+
+    sys.exit(1 if conflicts else 0)
+
+if __name__ == "__main__":
+    main()
@@ -3,49 +3,458 @@
 
 import os
 import sys
+import json
 import yaml
 import jinja2
 import argparse
+import tempfile
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 
+import ansible_shims
+import incremental
+from config_loader import load_config
+from template_cache import TemplateBytecodeCache, format_stats
+
+ANSIBLE_DIR = Path(__file__).resolve().parent.parent / 'ansible'
+
 def load_yaml_config(config_file):
-    """Load YAML configuration from file"""
-    with open(config_file, 'r') as f:
-        try:
-            config = yaml.safe_load(f)
-            return config
-        except yaml.YAMLError as e:
-            print(f"Error parsing YAML file: {e}")
-            sys.exit(1)
+    """Load YAML configuration from file (read-only, cached while the file is unchanged)"""
+    try:
+        return load_config(config_file)
+    except yaml.YAMLError as e:
+        print(f"Error parsing YAML file: {e}")
+        sys.exit(1)
+
+def open_bytecode_cache(cache_dir=None):
+    """Open the persistent bytecode cache, or return None if it is unusable"""
+    try:
+        return TemplateBytecodeCache(cache_dir)
+    except OSError as e:
+        print(f"Warning: template cache disabled: {e}", file=sys.stderr)
+        return None
+
+class TemplateRenderer:
+    """Jinja2 environment shared by every template rendered in one process.
+
+    Compiled templates are cached by the environment, so rendering many devices
+    that use the same template only compiles it once. With a bytecode cache the
+    compiled code is also reused across processes and runs.
+    """
 
-def render_template(template_file, config_data):
+    def __init__(self, template_dir, bytecode_cache=None, ansible=False, track=False):
+        self.template_dir = template_dir
+        self.bytecode_cache = bytecode_cache
+        if ansible:
+            # Same settings as Ansible's template module, plus its common filters
+            options = dict(trim_blocks=True, lstrip_blocks=False, keep_trailing_newline=True,
+                           undefined=jinja2.StrictUndefined)
+        else:
+            options = dict(trim_blocks=True, lstrip_blocks=True)
+        self.env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(template_dir),
+            bytecode_cache=bytecode_cache,
+            **options
+        )
+        if ansible:
+            ansible_shims.install(self.env)
+        if track:
+            incremental.install_tracking(self.env)
+
+    def render(self, template_name, context):
+        """Render a template by name; raises jinja2 TemplateError on failure"""
+        return self.env.get_template(template_name).render(**context)
+
+    def render_tracked(self, template_name, context):
+        """Render a template, also returning the inputs it read (see incremental.py)"""
+        return incremental.render_tracked(self.env, template_name, context)
+
+def render_template(template_file, config_data, bytecode_cache=None):
     """Render a Jinja2 template with the provided configuration data"""
-    # Setup Jinja2 environment
     template_dir = os.path.dirname(template_file)
     template_name = os.path.basename(template_file)
 
-    env = jinja2.Environment(
-        loader=jinja2.FileSystemLoader(template_dir),
-        trim_blocks=True,
-        lstrip_blocks=True
-    )
-
     try:
-        template = env.get_template(template_name)
-        return template.render(**config_data)
+        return TemplateRenderer(template_dir, bytecode_cache).render(template_name, config_data)
     except jinja2.exceptions.TemplateError as e:
         print(f"Error rendering template: {e}")
         sys.exit(1)
 
+def device_context(site, device_name, device):
+    """Build the template context for a device entry from a site's devices map"""
+    context = {
+        'site_config': site,
+        'site_name': site.get('name'),
+        'network_prefix': site.get('network_prefix'),
+        'domain': site.get('domain'),
+        'device_name': device_name,
+    }
+    context.update(device)
+
+    # Site entries use vlan_id/ip_address; the device templates expect vlan/ip_suffix
+    if 'vlan' not in device and 'vlan_id' in device:
+        context['vlan'] = device['vlan_id']
+    if 'ip_suffix' not in device and device.get('ip_address'):
+        context['ip_suffix'] = str(device['ip_address']).rsplit('.', 1)[-1]
+
+    # Bare port numbers are accepted in the site file; templates expect mappings
+    if isinstance(device.get('additional_ports'), list):
+        context['additional_ports'] = [
+            port if isinstance(port, dict) else {'port': port}
+            for port in device['additional_ports']
+        ]
+
+    return context
+
+def site_device_jobs(site_config):
+    """Yield (device_name, template_name, context) for every device of a site"""
+    site = site_config.get('site', site_config)
+    devices = site.get('devices') or site_config.get('devices') or {}
+
+    for device_name, device in devices.items():
+        template_name = device.get('template') or f"{device.get('type', 'custom')}.yml.j2"
+        yield device_name, template_name, device_context(site, device_name, device)
+
+def directory_device_jobs(devices_dir):
+    """Yield (device_name, template_name, context) for each device config in a directory"""
+    for config_file in sorted(Path(devices_dir).glob('*.yml')):
+        config_data = load_yaml_config(config_file) or {}
+        template_name = config_data.get('template')
+        if not template_name:
+            print(f"Skipping {config_file}: no 'template' key specified")
+            continue
+        yield config_file.stem, template_name, config_data
+
+def write_atomic(path, content, mode=0o644):
+    """Write a file via a temporary file and rename so readers never see partial output"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            f.write(content)
+        os.chmod(tmp_path, mode)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+def render_batch(renderer, jobs, output_dir):
+    """Render all device jobs into output_dir, returning (rendered, failures)"""
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+
+    rendered = 0
+    failures = []
+    for device_name, template_name, context in jobs:
+        try:
+            output = renderer.render(template_name, context)
+        except jinja2.exceptions.TemplateError as e:
+            failures.append((device_name, f"{template_name}: {e}"))
+            continue
+
+        try:
+            write_atomic(output_dir / f"{device_name}.yml", output)
+        except OSError as e:
+            failures.append((device_name, f"{template_name}: {e}"))
+            continue
+        rendered += 1
+
+    return rendered, failures
+
+# One output file of the site pipeline; must stay picklable for the process pool
+RenderJob = namedtuple('RenderJob', 'template_dir template_name output context ansible mode')
+
+def site_artifact_jobs(site_file, output_root, device_template_dir,
+                       ansible_template_dir=ANSIBLE_DIR / 'templates', validated_images=None):
+    """Plan every artifact of one site as RenderJobs
+
+    Outputs go to <output_root>/<site>/: devices/<device>.yml, dhcp/dhcpd.conf,
+    dhcp/dhcp_reservations.conf, dhcp/subnets/subnet-<vlan>.conf and
+    terraform/<site>.tfvars (only when validated image data is available).
+    """
+    site_config = load_yaml_config(site_file) or {}
+    site = site_config.get('site', site_config)
+    site_name = site.get('name') or Path(site_file).stem
+    site_dir = Path(output_root) / site_name
+    network_prefix = site.get('network_prefix')
+    devices = site.get('devices') or site_config.get('devices') or {}
+    device_template_dir = str(device_template_dir)
+    ansible_template_dir = str(ansible_template_dir)
+
+    jobs = [
+        RenderJob(device_template_dir, template_name, str(site_dir / 'devices' / f"{device_name}.yml"),
+                  context, False, 0o644)
+        for device_name, template_name, context in site_device_jobs(site_config)
+    ]
+
+    # Variables the playbooks provide when rendering these templates
+    ansible_context = {
+        'site_config': site,
+        'network_prefix': network_prefix,
+        'domain_name': site.get('domain'),
+        'location_prefix': site_name,
+        'inventory_hostname': (site.get('proxmox') or {}).get('host', site_name),
+    }
+
+    jobs.append(RenderJob(ansible_template_dir, 'dhcpd.conf.j2', str(site_dir / 'dhcp' / 'dhcpd.conf'),
+                          ansible_context, True, 0o644))
+
+    if devices:
+        jobs.append(RenderJob(ansible_template_dir, 'dhcp_reservations.conf.j2',
+                              str(site_dir / 'dhcp' / 'dhcp_reservations.conf'),
+                              dict(ansible_context, devices=devices), True, 0o644))
+
+    vlans = ((site.get('hardware') or {}).get('network') or {}).get('vlans') or []
+    for vlan in vlans:
+        if not vlan.get('dhcp', True):
+            continue
+        item = {
+            'description': vlan.get('name', ''),
+            'dhcp_start': f"{network_prefix}.{vlan['id']}.100",
+            'dhcp_end': f"{network_prefix}.{vlan['id']}.200",
+        }
+        item.update(vlan)
+        jobs.append(RenderJob(ansible_template_dir, 'subnet.conf.j2',
+                              str(site_dir / 'dhcp' / 'subnets' / f"subnet-{vlan['id']}.conf"),
+                              dict(ansible_context, item=item), True, 0o644))
+
+    if validated_images is not None:
+        # Contains API secrets, hence the restrictive mode (as in the playbook)
+        jobs.append(RenderJob(ansible_template_dir, 'terraform.tfvars.j2',
+                              str(site_dir / 'terraform' / f"{site_name}.tfvars"),
+                              dict(ansible_context, validated_images=validated_images), True, 0o600))
+
+    return jobs
+
+def job_key(job):
+    """Hash of everything defining a job except its context"""
+    return incremental.content_hash([job.template_dir, job.template_name, job.ansible, job.mode])
+
+_worker_cache = None
+_worker_track = False
+_worker_renderers = {}
+
+def _init_worker(cache_dir, use_cache, track=False):
+    global _worker_cache, _worker_track
+    _worker_cache = open_bytecode_cache(cache_dir) if use_cache else None
+    _worker_track = track
+    _worker_renderers.clear()
+
+def _render_job(job):
+    """Render and write one RenderJob
+
+    Returns (output, error, cache_hits, cache_misses, output_hash, deps); the
+    last two are only set when tracking dependencies for incremental builds.
+    """
+    hits, misses = (_worker_cache.hits, _worker_cache.misses) if _worker_cache else (0, 0)
+    output_hash = deps = error = None
+    try:
+        renderer = _worker_renderers.get((job.template_dir, job.ansible))
+        if renderer is None:
+            renderer = TemplateRenderer(job.template_dir, _worker_cache, ansible=job.ansible,
+                                        track=_worker_track)
+            _worker_renderers[(job.template_dir, job.ansible)] = renderer
+
+        if _worker_track:
+            content, deps = renderer.render_tracked(job.template_name, job.context)
+            output_hash = incremental.content_hash(content)
+        else:
+            content = renderer.render(job.template_name, job.context)
+        write_atomic(job.output, content, job.mode)
+    except (jinja2.exceptions.TemplateError, OSError, ValueError) as e:
+        error = f"{job.template_name}: {e}"
+    except Exception as e:
+        # Anything else raised by a template or filter must not take down the
+        # pool (and with it every other site's results); report it per job
+        error = f"{job.template_name}: {type(e).__name__}: {e}"
+    if _worker_cache:
+        hits, misses = _worker_cache.hits - hits, _worker_cache.misses - misses
+    return job.output, error, hits, misses, output_hash, deps
+
+def render_jobs(jobs, workers=None, cache_dir=None, use_cache=True, manifest=None):
+    """Render RenderJobs across a process pool
+
+    Returns (rendered, failures, cache_hits, cache_misses) where failures is a
+    list of (output, error). Each worker keeps one environment per template
+    directory and shares the persistent bytecode cache. With a manifest, the
+    inputs each output read are tracked and recorded in it.
+    """
+    workers = max(1, min(workers or os.cpu_count() or 1, len(jobs) or 1))
+    track = manifest is not None
+    keys = {job.output: job_key(job) for job in jobs}
+
+    if workers == 1:
+        _init_worker(cache_dir, use_cache, track)
+        results = map(_render_job, jobs)
+        pool = None
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                   initargs=(cache_dir, use_cache, track))
+        results = pool.map(_render_job, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+
+    rendered = cache_hits = cache_misses = 0
+    failures = []
+    try:
+        for output, error, hits, misses, output_hash, deps in results:
+            cache_hits += hits
+            cache_misses += misses
+            if error:
+                failures.append((output, error))
+                if track:
+                    manifest.forget(output)
+            else:
+                rendered += 1
+                if track:
+                    manifest.record(output, keys[output], output_hash, deps)
+    finally:
+        if pool:
+            pool.shutdown()
+
+    return rendered, failures, cache_hits, cache_misses
+
+def outdated_jobs(jobs, manifest):
+    """Split jobs into (outdated, up_to_date_count) using the manifest"""
+    outdated = [
+        job for job in jobs
+        if not manifest.is_current(job.output, job_key(job), job.context, job.template_dir,
+                                   ansible_shims.lookup if job.ansible else None)
+    ]
+    return outdated, len(jobs) - len(outdated)
+
+def prune_outputs(jobs, manifest):
+    """Delete recorded outputs of the rendered sites that are no longer produced"""
+    planned = {str(Path(job.output)) for job in jobs}
+    site_dirs = {manifest.root / manifest.key(job.output).split(os.sep)[0] for job in jobs}
+
+    removed = 0
+    for site_dir in site_dirs:
+        for output in manifest.entries_under(site_dir):
+            if str(Path(output)) in planned:
+                continue
+            try:
+                os.remove(output)
+            except FileNotFoundError:
+                pass
+            manifest.forget(output)
+            removed += 1
+    return removed
+
+def load_validated_images(path):
+    """Validated image data for terraform.tfvars, or None if it has not been generated yet"""
+    if not path or not os.path.exists(path):
+        return None
+    with open(path, 'r') as f:
+        return json.load(f)
+
 def main():
     parser = argparse.ArgumentParser(description='Render Jinja2 device templates with YAML configuration')
-    parser.add_argument('config_file', help='YAML configuration file')
-    parser.add_argument('-o', '--output', help='Output file (default is stdout)')
+    parser.add_argument('config_file', nargs='?', help='YAML configuration file')
+    parser.add_argument('-o', '--output',
+                        help='Output file (default is stdout); output directory in batch mode')
     parser.add_argument('-t', '--template-dir', default='templates/devices',
                         help='Directory containing Jinja2 templates (default: templates/devices)')
+    batch = parser.add_mutually_exclusive_group()
+    batch.add_argument('--site', metavar='SITE_YAML',
+                       help="Batch mode: render every entry in the site's devices map")
+    batch.add_argument('--devices-dir', metavar='DIR',
+                       help="Batch mode: render every device config (*.yml with a 'template' key) in DIR")
+    batch.add_argument('--sites', nargs='+', metavar='SITE_YAML',
+                       help='Render all artifacts (devices, DHCP, Terraform) of each site in parallel')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='Worker processes for --sites (default: number of CPUs)')
+    parser.add_argument('--incremental', action='store_true',
+                        help='With --sites, only re-render outputs whose inputs changed since the last run')
+    parser.add_argument('--ansible-templates', default=str(ANSIBLE_DIR / 'templates'),
+                        help='Directory containing the Ansible templates (for --sites)')
+    parser.add_argument('--validated-images', default=str(ANSIBLE_DIR / 'group_vars' / 'validated_images.json'),
+                        help='Validated image data for terraform.tfvars (for --sites; skipped if missing)')
+    parser.add_argument('--cache-dir',
+                        help='Bytecode cache directory (default: $TEMPLATE_CACHE_DIR or ~/.cache/proxmox-firewall/jinja2)')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Compile templates without the persistent bytecode cache')
+    parser.add_argument('--cache-stats', action='store_true',
+                        help='Print template cache statistics after rendering (or on their own)')
+    parser.add_argument('--clear-cache', action='store_true',
+                        help='Remove all cached template bytecode and exit')
 
     args = parser.parse_args()
 
+    if args.clear_cache:
+        removed = TemplateBytecodeCache(args.cache_dir).clear()
+        print(f"Removed {removed} cached template(s)")
+        sys.exit(0)
+
+    cache = None if args.no_cache else open_bytecode_cache(args.cache_dir)
+
+    if args.cache_stats and not (args.config_file or args.site or args.devices_dir or args.sites):
+        if cache is None:
+            parser.error('--cache-stats cannot be combined with --no-cache')
+        print(format_stats(cache.stats()))
+        sys.exit(0)
+
+    if args.sites:
+        if args.config_file:
+            parser.error('config_file cannot be combined with --sites')
+        if not args.output:
+            parser.error('--sites requires -o/--output as the output directory')
+
+        validated_images = load_validated_images(args.validated_images)
+        if validated_images is None:
+            print(f"Note: {args.validated_images} not found; skipping terraform.tfvars")
+
+        jobs = []
+        for site_file in args.sites:
+            jobs.extend(site_artifact_jobs(site_file, args.output, args.template_dir,
+                                           args.ansible_templates, validated_images))
+
+        manifest = incremental.Manifest(args.output) if args.incremental else None
+        skipped = removed = 0
+        if manifest is not None:
+            removed = prune_outputs(jobs, manifest)
+            jobs, skipped = outdated_jobs(jobs, manifest)
+
+        rendered, failures, hits, misses = render_jobs(jobs, args.jobs, args.cache_dir,
+                                                       cache is not None, manifest)
+        if manifest is not None:
+            manifest.save()
+
+        for output, error in failures:
+            print(f"Error rendering {output}: {error}")
+        print(f"Rendered {rendered} artifact(s) for {len(args.sites)} site(s) to {args.output}")
+        if manifest is not None:
+            print(f"Skipped {skipped} up-to-date artifact(s), removed {removed} stale artifact(s)")
+        if args.cache_stats and cache is not None:
+            cache.hits, cache.misses = hits, misses
+            print(format_stats(cache.stats()))
+        sys.exit(1 if failures else 0)
+
+    if args.site or args.devices_dir:
+        if args.config_file:
+            parser.error('config_file cannot be combined with --site or --devices-dir')
+        if not args.output:
+            parser.error('batch mode requires -o/--output as the output directory')
+
+        if args.site:
+            jobs = site_device_jobs(load_yaml_config(args.site) or {})
+        else:
+            jobs = directory_device_jobs(args.devices_dir)
+
+        rendered, failures = render_batch(TemplateRenderer(args.template_dir, cache), jobs, args.output)
+        for device_name, error in failures:
+            print(f"Error rendering {device_name}: {error}")
+        print(f"Rendered {rendered} device(s) to {args.output}")
+        if args.cache_stats and cache is not None:
+            print(format_stats(cache.stats()))
+        sys.exit(1 if failures else 0)
+
+    if not args.config_file:
+        parser.error('config_file is required unless --site, --devices-dir or --sites is given')
+
     # Load the configuration
     config_data = load_yaml_config(args.config_file)
 
@@ -62,7 +471,7 @@ def main():
         sys.exit(1)
 
     # Render the template
-    rendered_output = render_template(template_file, config_data)
+    rendered_output = render_template(template_file, config_data, cache)
 
     # Write output
     if args.output:
@@ -74,5 +483,8 @@ def main():
     else:
         print(rendered_output)
 
+    if args.cache_stats and cache is not None:
+        print(format_stats(cache.stats()), file=sys.stderr)
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,443 @@
+#!/usr/bin/env python3
+# site_schema.py - Site configuration schema with a compiled validator reporting YAML line numbers
+
+import sys
+import json
+import re
+import argparse
+from collections import namedtuple
+
+import yaml
+
+from config_loader import Loader, load_config
+
+# JSON-Schema subset: type, required, properties, additionalProperties, items,
+# enum, pattern, minimum, maximum. Two extensions: 'message' replaces the
+# default pattern error, and 'networkPrefix' requires the value to lie inside
+# the site's network_prefix. "10.x" placeholders (see config/site_template.yml)
+# are accepted wherever an octet is expected.
+OCTET = r'(?:\d{1,3}|x)'
+IPV4 = rf'{OCTET}(?:\.{OCTET}){{3}}'
+
+_ip = {'type': 'string', 'pattern': rf'^{IPV4}$', 'message': 'is not an IPv4 address',
+       'networkPrefix': True}
+_cidr = {'type': 'string', 'pattern': rf'^{IPV4}/\d{{1,2}}$', 'message': 'is not a CIDR subnet',
+         'networkPrefix': True}
+_vlan_id = {'type': 'integer', 'minimum': 1, 'maximum': 4094}
+_size = {'type': 'string', 'pattern': r'^\d+(?:[kmgt]b?)$', 'message': 'is not a size like "8gb"'}
+_port = {
+    'type': ['integer', 'object'],
+    'minimum': 1, 'maximum': 65535,
+    'required': ['port'],
+    'properties': {
+        'port': {'type': 'integer', 'minimum': 1, 'maximum': 65535},
+        'protocol': {'type': 'string', 'enum': ['tcp', 'udp']},
+        'description': {'type': 'string'},
+    },
+}
+_ports = {'type': ['array', 'null'], 'items': _port}
+
+SITE_SCHEMA = {
+    'type': 'object',
+    'required': ['site'],
+    'properties': {
+        'site': {
+            'type': 'object',
+            'required': ['name', 'display_name', 'network_prefix', 'domain', 'proxmox'],
+            'properties': {
+                'name': {'type': 'string', 'pattern': r'^[a-z0-9][a-z0-9_-]*$',
+                         'message': 'must be lowercase letters, digits, "-" or "_"'},
+                'display_name': {'type': 'string'},
+                # Quoted: an unquoted 10.10 would load as the float 10.1
+                'network_prefix': {'type': 'string', 'pattern': r'^\d{1,3}\.(?:\d{1,3}|x)$',
+                                   'message': 'must be the first two octets, e.g. "10.1" (or "10.x")'},
+                'domain': {'type': 'string'},
+                'hardware': {
+                    'type': 'object',
+                    'properties': {
+                        'cpu': {
+                            'type': 'object',
+                            'properties': {
+                                'type': {'type': 'string'},
+                                'cores': {'type': 'integer', 'minimum': 1},
+                                'threads': {'type': 'integer', 'minimum': 1},
+                            },
+                        },
+                        'memory': {
+                            'type': 'object',
+                            'properties': {
+                                'total': _size,
+                                'vm_allocation': {'type': 'object', 'additionalProperties': _size},
+                            },
+                        },
+                        'storage': {
+                            'type': 'object',
+                            'properties': {
+                                'type': {'type': 'string', 'enum': ['ssd', 'nvme', 'hdd']},
+                                'size': _size,
+                                'allocation': {'type': 'object', 'additionalProperties': _size},
+                            },
+                        },
+                        'network': {
+                            'type': 'object',
+                            'properties': {
+                                'interfaces': {
+                                    'type': 'array',
+                                    'items': {
+                                        'type': 'object',
+                                        'required': ['name'],
+                                        'properties': {
+                                            'name': {'type': 'string'},
+                                            'vlan': {'type': ['array', 'null'], 'items': _vlan_id},
+                                        },
+                                    },
+                                },
+                                'vlans': {
+                                    'type': 'array',
+                                    'items': {
+                                        'type': 'object',
+                                        'required': ['id', 'name', 'subnet'],
+                                        'properties': {
+                                            'id': _vlan_id,
+                                            'name': {'type': 'string'},
+                                            'subnet': _cidr,
+                                            'dhcp': {'type': 'boolean'},
+                                            'gateway': _ip,
+                                        },
+                                    },
+                                },
+                                'bridges': {
+                                    'type': 'array',
+                                    'items': {
+                                        'type': 'object',
+                                        'required': ['name'],
+                                        'properties': {
+                                            'name': {'type': 'string'},
+                                            'interface': {'type': 'string'},
+                                            'vlans': {'type': 'array', 'items': _vlan_id},
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+                'proxmox': {
+                    'type': 'object',
+                    'required': ['host'],
+                    'properties': {
+                        'host': {'type': 'string'},
+                        'node_name': {'type': 'string'},
+                        'storage_pool': {'type': 'string'},
+                        'template_storage': {'type': 'string'},
+                    },
+                },
+                'vm_templates': {
+                    'type': 'object',
+                    'additionalProperties': {
+                        'type': 'object',
+                        'required': ['enabled', 'cores', 'memory'],
+                        'properties': {
+                            'enabled': {'type': 'boolean'},
+                            'template_id': {'type': 'integer', 'minimum': 100},
+                            'cores': {'type': 'integer', 'minimum': 1},
+                            'memory': {'type': 'integer', 'minimum': 1},
+                            'disk_size': {'type': 'string'},
+                            'start_on_deploy': {'type': 'boolean'},
+                            'network': {
+                                'type': 'array',
+                                'items': {
+                                    'type': 'object',
+                                    'required': ['bridge'],
+                                    'properties': {
+                                        'bridge': {'type': 'string'},
+                                        'vlan': _vlan_id,
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+                'security': {
+                    'type': 'object',
+                    'properties': {
+                        'firewall': {
+                            'type': 'object',
+                            'properties': {
+                                'default_policy': {'type': 'string', 'enum': ['allow', 'deny']},
+                                'rules': {
+                                    'type': 'array',
+                                    'items': {
+                                        'type': 'object',
+                                        'required': ['source', 'destination', 'action'],
+                                        'properties': {
+                                            'action': {'type': 'string', 'enum': ['allow', 'deny']},
+                                        },
+                                    },
+                                },
+                            },
+                        },
+                    },
+                },
+                'monitoring': {'type': 'object'},
+                'backup': {'type': 'object'},
+                'devices': {
+                    'type': ['object', 'null'],
+                    'additionalProperties': {
+                        'type': 'object',
+                        'properties': {
+                            'type': {'type': 'string'},
+                            'ip_address': _ip,
+                            'vlan_id': _vlan_id,
+                            'mac_address': {'type': 'string',
+                                            'pattern': r'^[0-9A-Fa-f]{2}(?::[0-9A-Fa-f]{2}){5}$',
+                                            'message': 'is not a MAC address like "52:54:00:12:34:56"'},
+                            'ports': _ports,
+                            'override_ports': _ports,
+                            'additional_ports': _ports,
+                        },
+                    },
+                },
+                'credentials': {'type': 'object', 'additionalProperties': {'type': 'string'}},
+            },
+        },
+    },
+}
+
+_TYPE_CHECKS = {
+    'object': 'isinstance({v}, dict)',
+    'array': 'isinstance({v}, list)',
+    'string': 'isinstance({v}, str)',
+    'integer': '(isinstance({v}, int) and not isinstance({v}, bool))',
+    'number': '(isinstance({v}, (int, float)) and not isinstance({v}, bool))',
+    'boolean': 'isinstance({v}, bool)',
+    'null': '{v} is None',
+}
+
+_YAML_TYPE_NAMES = {
+    dict: 'mapping', list: 'sequence', str: 'string', int: 'integer',
+    float: 'number', bool: 'boolean', type(None): 'null',
+}
+
+_MISSING = object()
+
+ValidationError = namedtuple('ValidationError', 'path message line')
+
+def format_path(path):
+    """Dotted path with sequence indexes, e.g. site.hardware.network.vlans[2].subnet"""
+    text = ''
+    for key in path:
+        text += f"[{key}]" if isinstance(key, int) else (f".{key}" if text else str(key))
+    return text or '<document>'
+
+def _yaml_type(value):
+    return _YAML_TYPE_NAMES.get(type(value), type(value).__name__)
+
+def _network_prefix(data):
+    site = data.get('site', data) if isinstance(data, dict) else None
+    prefix = site.get('network_prefix') if isinstance(site, dict) else None
+    return prefix if isinstance(prefix, str) else None
+
+class _SchemaCompiler:
+    """Generates straight-line Python for a schema, in the spirit of fastjsonschema
+
+    The schema is walked once; the resulting function has no interpretive
+    overhead, so validating a site costs only the checks themselves.
+    """
+
+    def __init__(self):
+        self.lines = []
+        self.constants = {}
+        self.names = 0
+
+    def name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def constant(self, value):
+        name = self.name('_c')
+        self.constants[name] = value
+        return name
+
+    def emit(self, indent, text):
+        self.lines.append('    ' * indent + text)
+
+    def error(self, indent, path, message):
+        self.emit(indent, f"errors.append(({path}, {message}))")
+
+    def node(self, schema, var, path, indent):
+        types = schema.get('type')
+        if types:
+            types = [types] if isinstance(types, str) else types
+            condition = ' or '.join(_TYPE_CHECKS[t].format(v=var) for t in types)
+            expected = ' or '.join(t for t in types)
+            self.emit(indent, f"if not ({condition}):")
+            self.error(indent + 1, path, f"'must be {expected}, got ' + _yaml_type({var})")
+            self.emit(indent, "else:")
+            indent += 1
+        self.emit(indent, "pass")
+
+        if 'enum' in schema:
+            choices = self.constant(tuple(schema['enum']))
+            self.emit(indent, f"if {var} not in {choices}:")
+            self.error(indent + 1, path, f"repr({var}) + ' is not one of ' + {repr(', '.join(map(str, schema['enum'])))}")
+
+        if 'pattern' in schema or schema.get('networkPrefix'):
+            self.emit(indent, f"if isinstance({var}, str):")
+            if 'pattern' in schema:
+                regex = self.constant(re.compile(schema['pattern']))
+                message = schema.get('message', f"does not match {schema['pattern']}")
+                self.emit(indent + 1, f"if not {regex}.search({var}):")
+                self.error(indent + 2, path, f"repr({var}) + ' ' + {message!r}")
+            if schema.get('networkPrefix'):
+                self.emit(indent + 1, f"if prefix is not None and not {var}.startswith(prefix + '.'):")
+                self.error(indent + 2, path, f"repr({var}) + ' is outside network_prefix ' + repr(prefix)")
+
+        if 'minimum' in schema or 'maximum' in schema:
+            self.emit(indent, f"if {_TYPE_CHECKS['number'].format(v=var)}:")
+            if 'minimum' in schema:
+                self.emit(indent + 1, f"if {var} < {schema['minimum']!r}:")
+                self.error(indent + 2, path, f"str({var}) + ' is less than {schema['minimum']}'")
+            if 'maximum' in schema:
+                self.emit(indent + 1, f"if {var} > {schema['maximum']!r}:")
+                self.error(indent + 2, path, f"str({var}) + ' is greater than {schema['maximum']}'")
+
+        if any(key in schema for key in ('required', 'properties', 'additionalProperties')):
+            self.emit(indent, f"if isinstance({var}, dict):")
+            self.mapping(schema, var, path, indent + 1)
+
+        if 'items' in schema:
+            index, item = self.name('i'), self.name('v')
+            self.emit(indent, f"if isinstance({var}, list):")
+            self.emit(indent + 1, f"for {index}, {item} in enumerate({var}):")
+            self.node(schema['items'], item, f"{path} + ({index},)", indent + 2)
+
+    def mapping(self, schema, var, path, indent):
+        self.emit(indent, "pass")
+        for key in schema.get('required', ()):
+            self.emit(indent, f"if {key!r} not in {var}:")
+            self.error(indent + 1, path, repr(f"missing required key '{key}'"))
+
+        properties = schema.get('properties', {})
+        for key, subschema in properties.items():
+            value = self.name('v')
+            self.emit(indent, f"{value} = {var}.get({key!r}, _MISSING)")
+            self.emit(indent, f"if {value} is not _MISSING:")
+            self.node(subschema, value, f"{path} + ({key!r},)", indent + 1)
+
+        additional = schema.get('additionalProperties', True)
+        if additional is not True:
+            key, value = self.name('k'), self.name('v')
+            known = self.constant(frozenset(properties))
+            self.emit(indent, f"for {key}, {value} in {var}.items():")
+            self.emit(indent + 1, f"if {key} in {known}:")
+            self.emit(indent + 2, "continue")
+            if additional is False:
+                self.error(indent + 1, f"{path} + ({key},)", "'unknown key'")
+            else:
+                self.node(additional, value, f"{path} + ({key},)", indent + 1)
+
+    def compile(self, schema, name):
+        self.emit(0, f"def {name}(data):")
+        self.emit(1, "errors = []")
+        self.emit(1, "prefix = _network_prefix(data)")
+        self.node(schema, 'data', '()', 1)
+        self.emit(1, "return errors")
+        source = '\n'.join(self.lines) + '\n'
+
+        namespace = dict(self.constants, _MISSING=_MISSING, _yaml_type=_yaml_type,
+                         _network_prefix=_network_prefix)
+        exec(compile(source, f"<schema {name}>", 'exec'), namespace)
+        function = namespace[name]
+        function.source = source
+        return function
+
+def compile_schema(schema, name='validate'):
+    """Compile a schema into a function returning a list of (path, message) errors"""
+    return _SchemaCompiler().compile(schema, name)
+
+_site_validator = None
+
+def validate_site(config):
+    """(path, message) errors for parsed site configuration data"""
+    global _site_validator
+    if _site_validator is None:
+        _site_validator = compile_schema(SITE_SCHEMA, 'validate_site')
+    return _site_validator(config)
+
+def _line_of(root, path):
+    """Line of the YAML node at a path (or of its deepest existing ancestor)"""
+    node = root
+    line = node.start_mark.line + 1
+    for key in path:
+        if isinstance(node, yaml.MappingNode):
+            for key_node, value_node in node.value:
+                if key_node.value == str(key):
+                    line, node = key_node.start_mark.line + 1, value_node
+                    break
+            else:
+                break
+        elif isinstance(node, yaml.SequenceNode) and isinstance(key, int) and key < len(node.value):
+            node = node.value[key]
+            line = node.start_mark.line + 1
+        else:
+            break
+    return line
+
+def yaml_lines(path, key_paths):
+    """YAML line numbers for key paths in a file (None if it has no document)"""
+    with open(path, 'r') as f:
+        root = yaml.compose(f, Loader=Loader)
+    return [_line_of(root, key_path) if root else None for key_path in key_paths]
+
+def validate_file(path):
+    """ValidationErrors for a site file, with YAML line numbers
+
+    Valid files cost one (cached) parse and one validator call; the file is
+    only composed again for line numbers when there are errors to report.
+    """
+    try:
+        config = load_config(path)
+    except yaml.YAMLError as e:
+        mark = getattr(e, 'problem_mark', None)
+        return [ValidationError((), f"invalid YAML: {getattr(e, 'problem', None) or e}",
+                                mark.line + 1 if mark else None)]
+
+    errors = validate_site(config)
+    if not errors:
+        return []
+
+    lines = yaml_lines(path, [error_path for error_path, _ in errors])
+    return [ValidationError(error_path, message, line)
+            for (error_path, message), line in zip(errors, lines)]
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate site configuration files against the site schema')
+    parser.add_argument('site_files', nargs='+', help='Site YAML configuration files')
+    parser.add_argument('--json', action='store_true', help='Output errors as JSON')
+    args = parser.parse_args()
+
+    results = {}
+    for site_file in args.site_files:
+        try:
+            results[site_file] = validate_file(site_file)
+        except OSError as e:
+            results[site_file] = [ValidationError((), str(e), None)]
+
+    if args.json:
+        json.dump({site_file: [{'path': format_path(error.path), 'line': error.line, 'message': error.message}
+                               for error in errors]
+                   for site_file, errors in results.items()}, sys.stdout, indent=2)
+        print()
+    else:
+        for site_file, errors in results.items():
+            for error in errors:
+                location = f"{site_file}:{error.line}" if error.line else site_file
+                print(f"{location}: {format_path(error.path)}: {error.message}")
+            if not errors:
+                print(f"{site_file}: valid")
+
+    sys.exit(1 if any(results.values()) else 0)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# template_cache.py - Persistent Jinja2 bytecode cache for device and Ansible templates
+
+import hashlib
+import os
+import tempfile
+from pathlib import Path
+
+import jinja2
+from jinja2.bccache import Bucket, BytecodeCache
+
+CACHE_DIR_ENV = 'TEMPLATE_CACHE_DIR'
+CACHE_SUFFIX = '.jinja-bc'
+
+# Environment settings that change the generated code for the same template source
+_ENV_OPTIONS = (
+    'block_start_string', 'block_end_string', 'variable_start_string',
+    'variable_end_string', 'comment_start_string', 'comment_end_string',
+    'line_statement_prefix', 'line_comment_prefix', 'trim_blocks',
+    'lstrip_blocks', 'newline_sequence', 'keep_trailing_newline', 'autoescape',
+)
+
+def default_cache_dir():
+    """Cache location: $TEMPLATE_CACHE_DIR, else the user's XDG cache directory"""
+    if os.environ.get(CACHE_DIR_ENV):
+        return Path(os.environ[CACHE_DIR_ENV])
+    base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return Path(base) / 'proxmox-firewall' / 'jinja2'
+
+class TemplateBytecodeCache(BytecodeCache):
+    """File-system bytecode cache keyed by template content and Jinja version.
+
+    Unlike jinja2.FileSystemBytecodeCache, which keys entries by template name
+    only, the key here covers the template source, the Jinja version and the
+    environment's syntax options. An edited template, a Jinja upgrade or a
+    renderer with different whitespace settings therefore never picks up stale
+    code, and no explicit invalidation is needed when templates change.
+    Entries are written with atomic renames so concurrent renderers can share
+    one directory.
+    """
+
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory else default_cache_dir()
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+
+    def get_bucket(self, environment, name, filename, source):
+        checksum = self.get_source_checksum(source)
+        options = '|'.join(repr(getattr(environment, option, None)) for option in _ENV_OPTIONS)
+        key = hashlib.sha256(
+            '\0'.join((jinja2.__version__, name or '', options, checksum)).encode('utf-8')
+        ).hexdigest()
+
+        bucket = Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def _path(self, bucket):
+        return self.directory / f"{bucket.key}{CACHE_SUFFIX}"
+
+    def load_bytecode(self, bucket):
+        try:
+            with open(self._path(bucket), 'rb') as f:
+                bucket.load_bytecode(f)
+        except OSError:
+            pass
+
+        if bucket.code is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+    def dump_bytecode(self, bucket):
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                bucket.write_bytecode(f)
+            os.replace(tmp_path, self._path(bucket))
+            self.stores += 1
+        except OSError:
+            # A cache that cannot be written only costs a recompile next time
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def clear(self):
+        """Remove every cached entry, returning the number of files removed"""
+        removed = 0
+        for path in self.directory.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                path.unlink()
+                removed += 1
+            except OSError:
+                pass
+        return removed
+
+    def stats(self):
+        """Hit/miss counters for this process plus on-disk usage"""
+        entries = list(self.directory.glob(f"*{CACHE_SUFFIX}"))
+        lookups = self.hits + self.misses
+        return {
+            'directory': str(self.directory),
+            'entries': len(entries),
+            'size_bytes': sum(path.stat().st_size for path in entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+        }
+
+def format_stats(stats):
+    """One-line human-readable summary of TemplateBytecodeCache.stats()"""
+    return (f"Template cache {stats['directory']}: {stats['entries']} entries, "
+            f"{stats['size_bytes'] / 1024:.1f} KiB; this run {stats['hits']} hits, "
+            f"{stats['misses']} misses ({stats['hit_rate']:.0%} hit rate)")
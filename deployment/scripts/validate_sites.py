@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+# validate_sites.py - Validate many site configurations in parallel and summarize the results
+
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import yaml
+
+from config_loader import load_config
+from site_schema import format_path, validate_file
+from network_conflicts import check_files, conflicts_as_dicts
+from vlan_membership import check_files as check_trunks
+
+_defined_vars = frozenset()
+
+def default_sites_dir():
+    config_root = os.environ.get('PROXMOX_FW_CONFIG_ROOT') or 'config'
+    return Path(config_root) / 'sites'
+
+def read_env_names(env_file):
+    """Variable names assigned in a .env file"""
+    names = set()
+    try:
+        with open(env_file, 'r') as f:
+            for line in f:
+                line = line.strip()
+                if line.startswith('export '):
+                    line = line[len('export '):]
+                if line and not line.startswith('#') and '=' in line:
+                    names.add(line.split('=', 1)[0].strip())
+    except OSError:
+        pass
+    return names
+
+def collect_site_files(paths):
+    """Site YAML files from a mix of files and directories, in a stable order"""
+    files = []
+    for path in paths:
+        path = Path(path)
+        if path.is_dir():
+            files.extend(sorted(path.glob('*.yml')))
+        else:
+            files.append(path)
+    return list(dict.fromkeys(str(path) for path in files))
+
+def credential_warnings(config, defined):
+    """Credentials that name an environment variable not defined in .env or the environment"""
+    site = config.get('site') if isinstance(config, dict) else None
+    credentials = site.get('credentials') if isinstance(site, dict) else None
+    if not isinstance(credentials, dict):
+        return []
+
+    missing = [
+        value for key, value in credentials.items()
+        if (key.endswith('_secret') or key.endswith('_key'))
+        and isinstance(value, str) and value.isupper()
+        and value not in defined and value not in os.environ
+    ]
+    return [f"credential variable {name} is not set" for name in missing]
+
+def _init_worker(defined_vars):
+    global _defined_vars
+    _defined_vars = frozenset(defined_vars)
+
+def validate_site_file(site_file):
+    """Validation result for one site file, as JSON-compatible data"""
+    start = time.perf_counter()
+    result = {'file': site_file, 'site': Path(site_file).stem, 'errors': [], 'warnings': []}
+    try:
+        errors = validate_file(site_file)
+    except OSError as e:
+        errors = None
+        result['errors'].append({'path': '<document>', 'line': None, 'message': str(e)})
+
+    if errors is not None:
+        result['errors'].extend({'path': format_path(error.path), 'line': error.line, 'message': error.message}
+                                for error in errors)
+        try:
+            config = load_config(site_file)
+        except (OSError, yaml.YAMLError):
+            config = None
+        site = config.get('site') if isinstance(config, dict) else None
+        if isinstance(site, dict) and isinstance(site.get('name'), str):
+            result['site'] = site['name']
+        result['warnings'] = credential_warnings(config, _defined_vars)
+
+    result['valid'] = not result['errors']
+    result['seconds'] = round(time.perf_counter() - start, 6)
+    return result
+
+def validate_sites(site_files, workers=None, defined_vars=()):
+    """Validate site files across a process pool, returning results in input order"""
+    workers = max(1, min(workers or os.cpu_count() or 1, len(site_files) or 1))
+    if workers == 1:
+        _init_worker(defined_vars)
+        return [validate_site_file(site_file) for site_file in site_files]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(frozenset(defined_vars),)) as pool:
+        return list(pool.map(validate_site_file, site_files,
+                             chunksize=max(1, len(site_files) // (workers * 4))))
+
+def build_report(results, seconds, conflicts=()):
+    failed = [result for result in results if not result['valid']]
+    return {
+        'summary': {
+            'sites': len(results),
+            'passed': len(results) - len(failed),
+            'failed': len(failed),
+            'errors': sum(len(result['errors']) for result in results),
+            'warnings': sum(len(result['warnings']) for result in results),
+            'conflicts': len(conflicts),
+            'seconds': round(seconds, 3),
+        },
+        'results': results,
+        'conflicts': conflicts_as_dicts(conflicts),
+    }
+
+def format_report(report):
+    lines = []
+    for result in report['results']:
+        mark = '✓' if result['valid'] else '✗'
+        lines.append(f"{mark} {result['site']} ({result['file']})")
+        for error in result['errors']:
+            location = f"{result['file']}:{error['line']}" if error['line'] else result['file']
+            lines.append(f"    error: {location}: {error['path']}: {error['message']}")
+        for warning in result['warnings']:
+            lines.append(f"    warning: {warning}")
+
+    for conflict in report['conflicts']:
+        lines.append(f"✗ {conflict['kind']}: {conflict['message']}")
+        for location in conflict['locations']:
+            place = f"{location['file']}:{location['line']}" if location['line'] else location['file']
+            lines.append(f"    {place}: {location['path']}")
+
+    summary = report['summary']
+    lines.append('')
+    lines.append(f"{summary['sites']} site(s): {summary['passed']} passed, {summary['failed']} failed, "
+                 f"{summary['errors']} error(s), {summary['warnings']} warning(s), "
+                 f"{summary['conflicts']} network conflict(s) in {summary['seconds']}s")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate all site configurations in parallel')
+    parser.add_argument('paths', nargs='*',
+                        help='Site YAML files or directories (default: $PROXMOX_FW_CONFIG_ROOT/sites)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count(),
+                        help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--env-file', default='.env', help='.env file holding credential variables')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    parser.add_argument('--report', help='Also write the JSON report to this file')
+    args = parser.parse_args()
+
+    site_files = collect_site_files(args.paths or [default_sites_dir()])
+    if not site_files:
+        print("Error: no site configurations found")
+        sys.exit(1)
+
+    start = time.perf_counter()
+    results = validate_sites(site_files, args.jobs, read_env_names(args.env_file))
+    valid_files = [result['file'] for result in results if result['valid']]
+    conflicts = check_files(valid_files) + check_trunks(valid_files)
+    report = build_report(results, time.perf_counter() - start, conflicts)
+
+    if args.report:
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+
+    summary = report['summary']
+    sys.exit(1 if summary['failed'] or summary['conflicts'] else 0)
+
+if __name__ == "__main__":
+    main()
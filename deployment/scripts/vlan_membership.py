@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# vlan_membership.py - Per-bridge VLAN membership bitmaps and bridge/VLAN trunk validation
+
+import sys
+import json
+import argparse
+from collections import namedtuple
+
+import yaml
+
+from config_loader import load_config
+from network_conflicts import Conflict, Location, conflicts_as_dicts, format_conflicts
+
+VLAN_IDS = 4096
+EMPTY = bytes(VLAN_IDS // 8)
+
+# A bridge's VLAN membership is a 4096-bit bitmap; camera marks the dedicated camera bridge
+Bridge = namedtuple('Bridge', 'name interface bitmap camera index')
+
+def _vlan_ids(value):
+    """Valid VLAN ids in a scalar or list value; None, bools and out-of-range ids are ignored"""
+    if value is None:
+        return []
+    values = value if isinstance(value, (list, tuple, set)) else [value]
+    return [vlan for vlan in values if isinstance(vlan, int) and not isinstance(vlan, bool) and 0 < vlan < VLAN_IDS]
+
+def vlan_bitmap(vlans):
+    """512-byte membership bitmap with bit v set for each VLAN id v"""
+    bits = bytearray(EMPTY)
+    for vlan in _vlan_ids(vlans):
+        bits[vlan >> 3] |= 1 << (vlan & 7)
+    return bytes(bits)
+
+def has_vlan(bitmap, vlan):
+    """Whether a bitmap contains a VLAN: one byte lookup and a shift"""
+    return 0 <= vlan < VLAN_IDS and bool(bitmap[vlan >> 3] >> (vlan & 7) & 1)
+
+def bitmap_vlans(bitmap):
+    """Sorted VLAN ids set in a bitmap"""
+    return [(position << 3) | bit for position, byte in enumerate(bitmap) if byte
+            for bit in range(8) if byte >> bit & 1]
+
+def _combine(first, second, operation):
+    value = operation(int.from_bytes(first, 'little'), int.from_bytes(second, 'little'))
+    return (value & ((1 << VLAN_IDS) - 1)).to_bytes(VLAN_IDS // 8, 'little')
+
+def union(first, second):
+    return _combine(first, second, lambda a, b: a | b)
+
+def difference(first, second):
+    return _combine(first, second, lambda a, b: a & ~b)
+
+def intersection(first, second):
+    return _combine(first, second, lambda a, b: a & b)
+
+def format_vids(vlans):
+    """bridge-vids value for sorted VLAN ids, collapsing consecutive ids into ranges"""
+    parts = []
+    for vlan in vlans:
+        if parts and parts[-1][1] == vlan - 1:
+            parts[-1][1] = vlan
+        else:
+            parts.append([vlan, vlan])
+    return ' '.join(str(start) if start == end else f"{start}-{end}" for start, end in parts)
+
+class TrunkIndex:
+    """Precomputed VLAN membership of one site's bridges, uplinks and VM NICs
+
+    Every bridge, uplink interface and the site's defined and camera VLANs
+    become 4096-bit bitmaps once, so each VM NIC check is a single bit test
+    and each orphan/leak check a single bitwise operation per bridge.
+    """
+
+    def __init__(self, site_file, config):
+        site = config.get('site', config) if isinstance(config, dict) else None
+        site = site if isinstance(site, dict) else {}
+        self.site_file = site_file
+        self.site_name = site.get('name') or site_file
+        self.base = ('site',) if isinstance(config, dict) and site is config.get('site') else ()
+        self.config = site
+        network_config = (site.get('hardware') or {}).get('network') or {}
+
+        self.defined = {}
+        camera_vlans = []
+        for index, vlan in enumerate(network_config.get('vlans') or ()):
+            if not isinstance(vlan, dict) or not _vlan_ids(vlan.get('id')):
+                continue
+            self.defined.setdefault(vlan['id'], index)
+            if 'camera' in str(vlan.get('name') or '').lower():
+                camera_vlans.append(vlan['id'])
+
+        self.interfaces = {}
+        named_camera_vlans = bool(camera_vlans)
+        for index, interface in enumerate(network_config.get('interfaces') or ()):
+            if not isinstance(interface, dict) or not interface.get('name'):
+                continue
+            trunk = interface.get('vlan')
+            self.interfaces[interface['name']] = (
+                vlan_bitmap(trunk) if trunk is not None else None, interface.get('role'), index)
+            # Without a VLAN named for cameras, the camera uplink's VLANs are the camera VLANs
+            if interface.get('role') == 'cameras' and not named_camera_vlans:
+                camera_vlans.extend(_vlan_ids(trunk))
+
+        self.bridges = {}
+        for index, bridge in enumerate(network_config.get('bridges') or ()):
+            if not isinstance(bridge, dict) or not bridge.get('name'):
+                continue
+            uplink = self.interfaces.get(bridge.get('interface'))
+            camera = ((uplink is not None and uplink[1] == 'cameras')
+                      or 'camera' in str(bridge.get('description') or '').lower())
+            self.bridges[bridge['name']] = Bridge(bridge['name'], bridge.get('interface'),
+                                                  vlan_bitmap(bridge.get('vlans')), camera, index)
+
+        self.defined_bitmap = vlan_bitmap(list(self.defined))
+        self.camera_bitmap = vlan_bitmap(camera_vlans)
+        self.trunked = EMPTY
+        for bridge in self.bridges.values():
+            self.trunked = union(self.trunked, bridge.bitmap)
+
+    def location(self, *path):
+        return Location(self.site_file, self.site_name, self.base + path)
+
+    def bridge_location(self, bridge, *path):
+        return self.location('hardware', 'network', 'bridges', bridge.index, *path)
+
+    def vm_nics(self):
+        """(template name, NIC index, NIC) for every VM template network entry"""
+        for name, template in (self.config.get('vm_templates') or {}).items():
+            if not isinstance(template, dict):
+                continue
+            for index, nic in enumerate(template.get('network') or ()):
+                if isinstance(nic, dict):
+                    yield name, index, nic
+
+    def find_conflicts(self):
+        conflicts = []
+        # Without a dedicated camera bridge, camera VLANs may share a trunk
+        camera_bridge = any(bridge.camera for bridge in self.bridges.values())
+
+        for bridge in self.bridges.values():
+            uplink = self.interfaces.get(bridge.interface)
+            if uplink is not None and uplink[0] is not None:
+                for vlan in bitmap_vlans(difference(bridge.bitmap, uplink[0])):
+                    conflicts.append(Conflict(
+                        'uplink-vlan', f"bridge {bridge.name} trunks VLAN {vlan}, which its uplink "
+                        f"{bridge.interface} does not carry",
+                        (self.bridge_location(bridge, 'vlans'),
+                         self.location('hardware', 'network', 'interfaces', uplink[2], 'vlan'))))
+
+            for vlan in bitmap_vlans(difference(bridge.bitmap, self.defined_bitmap)):
+                conflicts.append(Conflict('orphan-vlan', f"bridge {bridge.name} trunks VLAN {vlan}, which the "
+                                          "site does not define", (self.bridge_location(bridge, 'vlans'),)))
+
+            if not camera_bridge:
+                leaked = EMPTY
+            elif bridge.camera:
+                leaked = difference(bridge.bitmap, self.camera_bitmap)
+                message = "camera bridge {} also trunks non-camera VLAN {}"
+            else:
+                leaked = intersection(bridge.bitmap, self.camera_bitmap)
+                message = "bridge {} trunks camera VLAN {} outside the camera bridge"
+            for vlan in bitmap_vlans(leaked):
+                conflicts.append(Conflict('camera-leak', message.format(bridge.name, vlan),
+                                          (self.bridge_location(bridge, 'vlans'),)))
+
+        for vlan in bitmap_vlans(difference(self.defined_bitmap, self.trunked)):
+            conflicts.append(Conflict('orphan-vlan', f"VLAN {vlan} is not trunked by any bridge",
+                                      (self.location('hardware', 'network', 'vlans', self.defined[vlan], 'id'),)))
+
+        for name, index, nic in self.vm_nics():
+            path = ('vm_templates', name, 'network', index)
+            bridge = self.bridges.get(nic.get('bridge'))
+            if bridge is None:
+                conflicts.append(Conflict('unknown-bridge', f"VM {name} NIC {index} uses bridge "
+                                          f"{nic.get('bridge')}, which the site does not define",
+                                          (self.location(*path, 'bridge'),)))
+                continue
+            for vlan in _vlan_ids(nic.get('vlan')):
+                if has_vlan(bridge.bitmap, vlan):
+                    continue
+                if bridge.bitmap == EMPTY:
+                    message = f"VM {name} NIC {index} is tagged VLAN {vlan} on {bridge.name}, which is not VLAN-aware"
+                else:
+                    message = f"VM {name} NIC {index} uses VLAN {vlan}, which bridge {bridge.name} does not trunk"
+                conflicts.append(Conflict('untrunked-vlan', message,
+                                          (self.location(*path, 'vlan'), self.bridge_location(bridge, 'vlans'))))
+
+        return conflicts
+
+    def membership(self):
+        """{bridge: settings} for the proxmox_network role's bridge configuration"""
+        result = {}
+        for bridge in self.bridges.values():
+            vlans = bitmap_vlans(bridge.bitmap)
+            result[bridge.name] = {
+                'ports': bridge.interface,
+                'vlans': vlans,
+                'vlan_aware': bool(vlans),
+                'vids': format_vids(vlans),
+                'camera': bridge.camera,
+            }
+        return result
+
+def bridge_membership(config):
+    """Per-bridge VLAN membership of a parsed site configuration"""
+    return TrunkIndex('<site>', config).membership()
+
+def find_conflicts(sites):
+    """Trunk problems across an iterable of (site_file, parsed config) pairs"""
+    conflicts = []
+    for site_file, config in sites:
+        conflicts.extend(TrunkIndex(site_file, config).find_conflicts())
+    return conflicts
+
+def check_files(site_files):
+    """Trunk problems in site files; files that fail to load are skipped (see site_schema)"""
+    sites = []
+    for site_file in site_files:
+        try:
+            sites.append((site_file, load_config(site_file)))
+        except (OSError, yaml.YAMLError):
+            continue
+    return find_conflicts(sites)
+
+def main():
+    parser = argparse.ArgumentParser(description='Validate bridge VLAN trunks, VM NIC VLANs and camera isolation')
+    parser.add_argument('site_files', nargs='+', help='Site YAML configuration files')
+    parser.add_argument('--json', action='store_true', help='Output problems as JSON')
+    parser.add_argument('--membership', action='store_true',
+                        help='Print the per-bridge VLAN membership used by the proxmox_network role')
+    args = parser.parse_args()
+
+    if args.membership:
+        sites = {site_file: bridge_membership(load_config(site_file)) for site_file in args.site_files}
+        if args.json:
+            json.dump(sites, sys.stdout, indent=2)
+            print()
+        else:
+            print(yaml.safe_dump(sites, default_flow_style=None, sort_keys=False), end='')
+        return
+
+    conflicts = check_files(args.site_files)
+    if args.json:
+        json.dump(conflicts_as_dicts(conflicts), sys.stdout, indent=2)
+        print()
+    elif conflicts:
+        print(format_conflicts(conflicts))
+    else:
+        print(f"No trunk problems in {len(args.site_files)} site(s)")
+
+    sys.exit(1 if conflicts else 0)
+
+if __name__ == "__main__":
+    main()
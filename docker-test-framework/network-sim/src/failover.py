@@ -0,0 +1,447 @@
+"""
+Multi-WAN failover simulation
+
+Injects link loss on a WAN bridge or interface and replays what the
+firewall's gateway monitoring would do about it: dpinger-style probes are
+sent every `interval`, a probe unanswered for `loss_interval` counts as
+lost, and a gateway is marked down once the loss over the last
+`time_period` reaches `loss_high` (and up again once it falls to
+`loss_low`). After `reconfigure` seconds the gateway group's route moves to
+the highest-priority gateway still marked up.
+
+Sessions to the internet arrive as a Poisson process and stay on the
+gateway that was active when they started. A session is dropped when the
+link under it fails while it is open (its NAT state is lost) or when it
+starts on a gateway whose link is already down (blackholed until the
+route switches). Recovery time is measured from link loss to the first
+moment new sessions leave through a working link.
+
+Which WAN gateways exist, and whether the firewall reaches the internet
+through each of them alone, comes from the topology.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import namedtuple
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import yaml
+
+from .flows import link_bps
+from .topology import FIREWALL_VM, WAN_ROLES, Topology, TopologyError
+
+# tier: lower is preferred; usable: the firewall reaches the internet through this gateway alone
+Gateway = namedtuple('Gateway', 'name interface bridges role tier capacity_bps usable')
+Outage = namedtuple('Outage', 'target start end')
+
+PROBE_ADDRESS = '1.1.1.1'
+
+@dataclass
+class GatewayMonitor:
+    """Gateway monitoring and switchover settings
+
+    Defaults follow dpinger as OPNsense runs it; `interval` can be taken
+    from the site's `wan_trigger_interval` (milliseconds).
+    """
+    interval: float = 1.0           # seconds between probes
+    loss_interval: float = 2.0      # a probe unanswered this long is lost
+    time_period: float = 60.0       # window the loss is averaged over
+    loss_high: float = 0.20         # marked down at this loss
+    loss_low: float = 0.10          # marked up again at or below this loss
+    reconfigure: float = 1.0        # seconds to switch routes and reload the filter after an alarm
+    kill_states: bool = False       # kill sessions on the old gateway when the route switches
+
+    @classmethod
+    def from_site(cls, config: Dict[str, Any], **overrides) -> 'GatewayMonitor':
+        site = config.get('site', config) if isinstance(config, dict) else {}
+        values = {}
+        trigger_interval = (site or {}).get('wan_trigger_interval')
+        if trigger_interval:
+            values['interval'] = float(trigger_interval) / 1000
+        values.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**values)
+
+    def validate(self):
+        if self.interval <= 0 or self.loss_interval <= 0 or self.time_period <= self.loss_interval:
+            raise ValueError("interval and loss_interval must be positive and time_period above loss_interval")
+        if not 0 <= self.loss_low <= self.loss_high <= 1:
+            raise ValueError("loss thresholds must satisfy 0 <= loss_low <= loss_high <= 1")
+
+@dataclass
+class SessionLoad:
+    """Internet-bound sessions offered through the gateway group"""
+    sessions_per_second: float = 50.0
+    mean_duration: float = 60.0
+    baseline_loss: float = 0.0      # probe loss on a healthy link
+    seed: int = 0
+
+def wan_gateways(topology: Topology) -> List[Gateway]:
+    """WAN gateways of a site in priority order (wan before wan_backup)
+
+    Each gateway is checked for a path from the LAN to the internet with
+    every other WAN interface disabled, which is the route the firewall
+    would be left with after failing over to it.
+    """
+    uplinks = [node for node in topology.nodes if node.kind == 'uplink']
+    uplinks.sort(key=lambda node: (WAN_ROLES.index(node.attrs['role']) if node.attrs.get('role') in WAN_ROLES
+                                   else len(WAN_ROLES), node.id))
+    source = _lan_address(topology)
+    previous = {topology.nodes[node].name for node in topology.disabled}
+
+    gateways = []
+    for tier, uplink in enumerate(uplinks):
+        interface = uplink.attrs.get('interface')
+        others = [other.attrs.get('interface') for other in uplinks if other is not uplink]
+        usable = False
+        if source is not None:
+            topology.set_disabled(previous | {name for name in others if name in topology.index})
+            try:
+                path = topology.path(source, PROBE_ADDRESS)
+            except TopologyError:
+                path = None
+            usable = path is not None and uplink.name in path.routers
+        bridges = tuple(node.name for node in topology.nodes
+                        if node.kind == 'bridge' and node.attrs.get('interface') == interface)
+        speed = topology.node(interface).attrs.get('speed') if interface in topology.index else None
+        gateways.append(Gateway(uplink.name, interface, bridges, uplink.attrs.get('role'), tier,
+                                link_bps(speed), usable))
+    topology.set_disabled(previous)
+    return gateways
+
+def _lan_address(topology: Topology) -> Optional[str]:
+    """A host address in the first VLAN routed by the firewall"""
+    firewall = topology.index.get(FIREWALL_VM)
+    routed = {topology.state_domain[leg] for leg in topology.routers.get(firewall, ())
+              if leg in topology.state_domain}
+    for vlan_id in sorted(topology.vlans):
+        subnet = topology.vlans[vlan_id]['subnet']
+        domain = topology.vlan_domain(vlan_id)
+        if subnet is not None and domain is not None and domain.id in routed and subnet.num_addresses > 2:
+            return str(subnet.network_address + 2)
+    return None
+
+def _gateway_for(gateways: Sequence[Gateway], target: str) -> int:
+    for index, gateway in enumerate(gateways):
+        if target in (gateway.name, gateway.interface) or target in gateway.bridges:
+            return index
+    raise TopologyError(f"{target} is not a WAN gateway, interface or bridge")
+
+def _link_up(outages: Sequence[Tuple[float, float]], times: np.ndarray) -> np.ndarray:
+    up = np.ones(len(times), dtype=bool)
+    for start, end in outages:
+        up &= ~((times >= start) & (times < end))
+    return up
+
+def monitor_gateway(monitor: GatewayMonitor, outages: Sequence[Tuple[float, float]], horizon: float,
+                    baseline_loss: float = 0.0, rng: Optional[np.random.Generator] = None
+                    ) -> List[Tuple[float, bool]]:
+    """(time, marked up) alarm transitions of one gateway's monitor over [0, horizon)
+
+    Probes start one time period before 0 so the window is full when the
+    simulation begins. A lost probe is known `loss_interval` after it was
+    sent; the loss is re-evaluated at each of those instants.
+    """
+    rng = rng or np.random.default_rng()
+    phase = rng.uniform(0, monitor.interval)
+    sent = np.arange(phase - monitor.time_period, horizon, monitor.interval)
+    lost = ~_link_up(outages, sent)
+    if baseline_loss:
+        lost |= rng.random(len(sent)) < baseline_loss
+
+    decided = sent + monitor.loss_interval
+    lost_before = np.concatenate(([0], np.cumsum(lost)))
+    # Window of probes sent in (decided - time_period, decided - loss_interval]
+    first = np.searchsorted(sent, decided - monitor.time_period, side='right')
+    last = np.arange(len(sent)) + 1
+    count = np.maximum(last - first, 1)
+    loss = (lost_before[last] - lost_before[first]) / count
+
+    # Hysteresis: down at loss_high, up at loss_low, otherwise keep the last mark
+    marks = np.where(loss >= monitor.loss_high, 0, np.where(loss <= monitor.loss_low, 1, -1))
+    marks[0] = 1 if marks[0] < 0 else marks[0]
+    latest = np.maximum.accumulate(np.where(marks >= 0, np.arange(len(marks)), 0))
+    state = marks[latest].astype(bool)
+
+    # State at time 0 from the probes decided before it, then every change up to the horizon
+    initial = state[max(0, np.searchsorted(decided, 0, side='right') - 1)]
+    changes = np.flatnonzero(state[1:] != state[:-1]) + 1
+    transitions = [(float(decided[index]), bool(state[index])) for index in changes if 0 < decided[index] < horizon]
+    if not initial:
+        transitions.insert(0, (0.0, False))
+    return transitions
+
+def active_routes(gateways: Sequence[Gateway], alarms: Sequence[List[Tuple[float, bool]]],
+                  reconfigure: float) -> List[Tuple[float, int]]:
+    """(time, gateway index) route changes of the gateway group, starting at time 0
+
+    The route follows the highest-priority usable gateway marked up, or the
+    first usable gateway when all are marked down (the default route is
+    left in place).
+    """
+    usable = [index for index, gateway in enumerate(gateways) if gateway.usable]
+    if not usable:
+        return []
+    events = sorted((time + (reconfigure if time > 0 else 0.0), index, up)
+                    for index, transitions in enumerate(alarms) for time, up in transitions)
+    marked = {index: True for index in usable}
+    routes = [(0.0, usable[0])]
+    for event_time, index, up in events:
+        if index not in marked:
+            continue
+        marked[index] = up
+        chosen = next((candidate for candidate in usable if marked[candidate]), usable[0])
+        if chosen != routes[-1][1]:
+            if routes[-1][0] == event_time:
+                routes[-1] = (event_time, chosen)
+            else:
+                routes.append((event_time, chosen))
+    return routes
+
+class FailoverSimulation:
+    """Link loss, gateway monitoring and route switchover for one site's WAN gateways"""
+
+    def __init__(self, topology: Topology, monitor: Optional[GatewayMonitor] = None,
+                 load: Optional[SessionLoad] = None):
+        self.topology = topology
+        self.monitor = monitor or GatewayMonitor()
+        self.monitor.validate()
+        self.load = load or SessionLoad()
+        self.gateways = wan_gateways(topology)
+
+    def run(self, outages: Iterable[Outage], horizon: Optional[float] = None) -> Dict[str, Any]:
+        """Simulate the outages and report detection, recovery and dropped sessions per outage"""
+        start_clock = time.perf_counter()
+        outages = sorted((Outage(*outage) for outage in outages), key=lambda outage: outage.start)
+        if horizon is None:
+            horizon = max([outage.end for outage in outages] + [0.0]) + 2 * self.monitor.time_period
+        by_gateway: List[List[Tuple[float, float]]] = [[] for _ in self.gateways]
+        targets = []
+        for outage in outages:
+            if not 0 <= outage.start < outage.end:
+                raise ValueError(f"outage of {outage.target} must start at or after 0 and end after it starts")
+            index = _gateway_for(self.gateways, outage.target)
+            by_gateway[index].append((outage.start, outage.end))
+            targets.append(index)
+
+        rng = np.random.default_rng(self.load.seed)
+        alarms = [monitor_gateway(self.monitor, by_gateway[index], horizon, self.load.baseline_loss, rng)
+                  for index in range(len(self.gateways))]
+        routes = active_routes(self.gateways, alarms, self.monitor.reconfigure)
+        if not routes:
+            raise TopologyError("the firewall reaches the internet through none of the WAN gateways")
+        route_times = np.array([route[0] for route in routes])
+        route_gateways = np.array([route[1] for route in routes])
+
+        # Sessions and the gateway each one is pinned to
+        count = rng.poisson(self.load.sessions_per_second * horizon)
+        starts = np.sort(rng.uniform(0, horizon, count))
+        ends = starts + rng.exponential(self.load.mean_duration, count)
+        gateway = route_gateways[np.searchsorted(route_times, starts, side='right') - 1]
+        blackholed = np.zeros(count, dtype=bool)
+        cut = np.zeros(count, dtype=bool)
+        for index, windows in enumerate(by_gateway):
+            on_gateway = gateway == index
+            for start, end in windows:
+                blackholed |= on_gateway & (starts >= start) & (starts < end)
+                cut |= on_gateway & (starts < start) & (ends > start)
+        killed = np.zeros(count, dtype=bool)
+        if self.monitor.kill_states:
+            for (switch, _), old in zip(routes[1:], route_gateways[:-1]):
+                killed |= (gateway == old) & (starts < switch) & (ends > switch)
+        dropped = blackholed | cut | killed
+
+        results = []
+        for outage, index in zip(outages, targets):
+            start, end = outage.start, outage.end
+            on_gateway = gateway == index
+            detected = next((when for when, up in alarms[index] if not up and start <= when < end), None)
+            recovered = self._recovered(routes, by_gateway, start)
+            failback = self._failback(routes, index, start, end)
+            result = {
+                'target': outage.target,
+                'gateway': self.gateways[index].name,
+                'start': start,
+                'end': end,
+                'detected_after': _round(detected - start) if detected is not None else None,
+                'recovered_after': _round(recovered - start) if recovered is not None else None,
+                'failed_over_to': self._route_at(routes, recovered)
+                if recovered is not None and recovered < end else None,
+                'failback_after': _round(failback - end) if failback is not None else None,
+                'sessions_cut': int((on_gateway & (starts < start) & (ends > start)).sum()),
+                'sessions_blackholed': int((on_gateway & (starts >= start) & (starts < end)).sum()),
+            }
+            result['sessions_dropped'] = result['sessions_cut'] + result['sessions_blackholed']
+            results.append(result)
+
+        # Down alarms whose averaging window saw no link loss on that gateway
+        false_alarms = 0
+        for index, transitions in enumerate(alarms):
+            for when, up in transitions:
+                window = (when - self.monitor.time_period - self.monitor.loss_interval, when)
+                if not up and not any(begin < window[1] and end > window[0] for begin, end in by_gateway[index]):
+                    false_alarms += 1
+        return {
+            'site': self.topology.name,
+            'gateways': [dict(gateway._asdict(), bridges=list(gateway.bridges)) for gateway in self.gateways],
+            'monitor': asdict(self.monitor),
+            'load': asdict(self.load),
+            'horizon': horizon,
+            'outages': results,
+            'routes': [{'time': _round(when), 'gateway': self.gateways[index].name} for when, index in routes],
+            'sessions': int(count),
+            'sessions_dropped': int(dropped.sum()),
+            'sessions_killed': int(killed.sum()),
+            'false_alarms': false_alarms,
+            'seconds': round(time.perf_counter() - start_clock, 6),
+        }
+
+    def _route_at(self, routes, when: float) -> str:
+        index = max(position for position, (change, _) in enumerate(routes) if change <= when)
+        return self.gateways[routes[index][1]].name
+
+    @staticmethod
+    def _recovered(routes, by_gateway, start: float) -> Optional[float]:
+        """First time at or after `start` that the route points at a gateway whose link is up"""
+        candidates = [start] + [change for change, _ in routes if change > start]
+        for position, moment in enumerate(candidates):
+            index = max(i for i, (change, _) in enumerate(routes) if change <= moment)
+            gateway = routes[index][1]
+            down = next((end for begin, end in by_gateway[gateway] if begin <= moment < end), None)
+            if down is None:
+                return moment
+            # The link under the current route may come back before the route changes again
+            following = candidates[position + 1] if position + 1 < len(candidates) else float('inf')
+            if down < following:
+                return down
+        return None
+
+    @staticmethod
+    def _failback(routes, index: int, start: float, end: float) -> Optional[float]:
+        """When the route returns to a gateway it left during an outage (None if it never left or returned)"""
+        if not any(start <= change < end and gateway != index for change, gateway in routes):
+            return None
+        return next((change for change, gateway in routes if change >= end and gateway == index), None)
+
+def _round(value: float) -> float:
+    return round(float(value), 3)
+
+def sweep(topology: Topology, target: str, start: float, duration: float, intervals: Sequence[float],
+          time_periods: Sequence[float], load: Optional[SessionLoad] = None, runs: int = 5,
+          **monitor_options) -> List[Dict[str, Any]]:
+    """Mean recovery time, dropped sessions and false alarms for each interval/time-period pair
+
+    Each combination is simulated `runs` times with different seeds, since
+    the probe phase relative to the link loss moves detection by up to one
+    interval.
+    """
+    load = load or SessionLoad()
+    rows = []
+    for interval in intervals:
+        for time_period in time_periods:
+            monitor = GatewayMonitor(interval=interval, time_period=time_period, **monitor_options)
+            reports = [FailoverSimulation(topology, monitor, SessionLoad(**{**asdict(load), 'seed': load.seed + run}))
+                       .run([Outage(target, start, start + duration)]) for run in range(runs)]
+            outcomes = [report['outages'][0] for report in reports]
+            recovered = [outcome['recovered_after'] for outcome in outcomes if outcome['recovered_after'] is not None]
+            detected = [outcome['detected_after'] for outcome in outcomes if outcome['detected_after'] is not None]
+            rows.append({
+                'interval': interval,
+                'time_period': time_period,
+                'detected_after': _round(np.mean(detected)) if detected else None,
+                'recovered_after': _round(np.mean(recovered)) if recovered else None,
+                'recovered_max': _round(max(recovered)) if recovered else None,
+                'sessions_dropped': _round(np.mean([outcome['sessions_dropped'] for outcome in outcomes])),
+                'false_alarms': _round(np.mean([report['false_alarms'] for report in reports])),
+                'probes_per_minute': _round(60 / interval),
+            })
+    return rows
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = []
+    for gateway in report['gateways']:
+        state = '' if gateway['usable'] else ' (unusable: no firewall path)'
+        lines.append(f"gateway tier {gateway['tier'] + 1}: {gateway['name']} on {gateway['interface']} "
+                     f"[{', '.join(gateway['bridges'])}]{state}")
+    lines.append('')
+    for outage in report['outages']:
+        lines.append(f"{outage['target']} down {outage['start']:g}s-{outage['end']:g}s:")
+        detected = f"{outage['detected_after']:.1f}s" if outage['detected_after'] is not None else 'not detected'
+        recovered = f"{outage['recovered_after']:.1f}s" if outage['recovered_after'] is not None else 'never'
+        lines.append(f"    detected after {detected}, recovered after {recovered}"
+                     + (f" via {outage['failed_over_to']}" if outage['failed_over_to'] else ''))
+        if outage['failback_after'] is not None:
+            lines.append(f"    failed back {outage['failback_after']:.1f}s after the link returned")
+        lines.append(f"    sessions dropped: {outage['sessions_dropped']} ({outage['sessions_cut']} cut, "
+                     f"{outage['sessions_blackholed']} blackholed)")
+    lines.append(f"{report['sessions']} sessions, {report['sessions_dropped']} dropped, "
+                 f"{report['false_alarms']} false alarm(s) in {report['seconds']}s")
+    return '\n'.join(lines)
+
+def format_sweep(rows: List[Dict[str, Any]]) -> str:
+    lines = [f"{'interval':>9} {'period':>7} {'detect':>8} {'recover':>8} {'worst':>7} {'dropped':>8} "
+             f"{'false':>6}"]
+    for row in rows:
+        cells = [row['detected_after'], row['recovered_after'], row['recovered_max']]
+        detect, recover, worst = (f"{cell:.1f}s" if cell is not None else '-' for cell in cells)
+        lines.append(f"{row['interval']:>8g}s {row['time_period']:>6g}s {detect:>8} {recover:>8} {worst:>7} "
+                     f"{row['sessions_dropped']:>8.1f} {row['false_alarms']:>6.1f}")
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Simulate WAN link loss and gateway-group failover for a site')
+    parser.add_argument('site_config', help='Site YAML configuration file')
+    parser.add_argument('--fail', default='vmbr0', help='WAN bridge, interface or uplink to take down')
+    parser.add_argument('--at', type=float, default=60.0, help='Seconds into the simulation the link fails')
+    parser.add_argument('--for', dest='duration', type=float, default=300.0, help='Seconds the link stays down')
+    parser.add_argument('--interval', type=float, nargs='+', help='Probe interval(s) in seconds')
+    parser.add_argument('--time-period', type=float, nargs='+', help='Loss averaging period(s) in seconds')
+    parser.add_argument('--loss-interval', type=float, default=GatewayMonitor.loss_interval)
+    parser.add_argument('--loss-high', type=float, default=GatewayMonitor.loss_high)
+    parser.add_argument('--loss-low', type=float, default=GatewayMonitor.loss_low)
+    parser.add_argument('--reconfigure', type=float, default=GatewayMonitor.reconfigure)
+    parser.add_argument('--kill-states', action='store_true', help='Kill sessions on the old gateway on switchover')
+    parser.add_argument('--sessions-per-second', type=float, default=SessionLoad.sessions_per_second)
+    parser.add_argument('--mean-duration', type=float, default=SessionLoad.mean_duration)
+    parser.add_argument('--baseline-loss', type=float, default=SessionLoad.baseline_loss,
+                        help='Probe loss on a healthy link (raises false alarms for short periods)')
+    parser.add_argument('--runs', type=int, default=5, help='Seeds per combination when sweeping')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.site_config, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    topology = Topology.from_site(config)
+    site_monitor = GatewayMonitor.from_site(config)
+    options = {'loss_interval': args.loss_interval, 'loss_high': args.loss_high, 'loss_low': args.loss_low,
+               'reconfigure': args.reconfigure, 'kill_states': args.kill_states}
+    load = SessionLoad(args.sessions_per_second, args.mean_duration, args.baseline_loss, args.seed)
+    intervals = args.interval or [site_monitor.interval]
+    time_periods = args.time_period or [site_monitor.time_period]
+
+    try:
+        if len(intervals) > 1 or len(time_periods) > 1:
+            result = sweep(topology, args.fail, args.at, args.duration, intervals, time_periods, load,
+                           args.runs, **options)
+            text = format_sweep(result)
+        else:
+            monitor = GatewayMonitor(interval=intervals[0], time_period=time_periods[0], **options)
+            result = FailoverSimulation(topology, monitor, load).run(
+                [Outage(args.fail, args.at, args.at + args.duration)])
+            text = format_report(result)
+    except (TopologyError, ValueError) as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    if args.json:
+        json.dump(result, sys.stdout, indent=2)
+        print()
+    else:
+        print(text)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+"""
+Synthetic traffic flow simulator
+
+Generates batches of flows (camera RTSP streams to the NVR, IoT cloud
+calls, guest internet, IoT lateral probes) as NumPy structured arrays and
+pushes them through the topology and firewall policy. Each distinct
+(source domain, destination domain) pair is routed once per batch; load is
+then accumulated per L2 domain with bincount and rolled up into per-bridge
+and per-VLAN throughput, policy drops and capacity drops.
+
+The firewall capacity model is a planning estimate: packet rate per core is
+an assumption to be replaced by measured figures when they exist.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import namedtuple
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import yaml
+
+from .policy import PROTOCOLS, FirewallPolicy
+from .topology import FIREWALL_VM, INTERNET, Topology
+
+FLOW_DTYPE = np.dtype([
+    ('src', np.uint32),
+    ('dst', np.uint32),
+    ('protocol', np.uint8),
+    ('port', np.uint16),
+    ('kind', np.uint8),         # index into PROFILES
+    ('bps', np.float64),        # offered bits per second
+    ('pps', np.float64),        # offered packets per second
+])
+
+Profile = namedtuple('Profile', 'name protocol port bps packet_bytes')
+
+PROFILES = [
+    # 4K H.264 main stream; H.265 cameras need roughly half
+    Profile('camera_rtsp', 'tcp', 554, 16e6, 1400),
+    Profile('iot_cloud', 'tcp', 443, 50e3, 400),
+    Profile('guest_internet', 'tcp', 443, 8e6, 1200),
+    Profile('iot_lateral', 'tcp', 445, 10e3, 100),
+]
+PROFILE_INDEX = {profile.name: index for index, profile in enumerate(PROFILES)}
+
+# Public destinations are drawn from 1.0.0.0 - 9.255.255.255
+PUBLIC_FIRST, PUBLIC_LAST = 0x01000000, 0x09FFFFFF
+
+@dataclass
+class Scenario:
+    """Traffic mix to generate, by VLAN name"""
+    cameras: int = 20
+    camera_bps: float = 16e6
+    nvr: Optional[str] = None           # NVR address; default host .100 of the cameras VLAN
+    iot_devices: int = 30
+    iot_sessions: int = 4               # concurrent cloud sessions per IoT device
+    guest_clients: int = 10
+    guest_sessions: int = 8
+    iot_lateral: int = 30               # blocked IoT -> main VLAN probes
+    seed: int = 0
+
+@dataclass
+class FirewallModel:
+    """Forwarding capacity of the firewall VM
+
+    Defaults approximate pf on one Intel N100 core with virtio NICs for
+    established-state traffic; every rule adds a small per-packet cost.
+    """
+    cores: int = 4
+    pps_per_core: float = 250_000
+    rule_cost: float = 0.002
+
+    @classmethod
+    def from_site(cls, config: Dict[str, Any], **overrides) -> 'FirewallModel':
+        site = config.get('site', config) if isinstance(config, dict) else {}
+        vm = ((site or {}).get('vm_templates') or {}).get(FIREWALL_VM) or {}
+        values = {'cores': vm['cores']} if vm.get('cores') else {}
+        values.update({key: value for key, value in overrides.items() if value is not None})
+        return cls(**values)
+
+    def capacity_pps(self, rules: int) -> float:
+        return self.cores * self.pps_per_core / (1 + self.rule_cost * rules)
+
+def link_bps(speed: Any) -> Optional[float]:
+    """Bits per second for an interface type such as '2.5gbe', '10gbe' or '100mbe'"""
+    match = re.match(r'([\d.]+)\s*([gm])', str(speed or '').lower())
+    if not match:
+        return None
+    return float(match.group(1)) * (1e9 if match.group(2) == 'g' else 1e6)
+
+def _ipv4(address: str) -> int:
+    octets = [int(octet) for octet in str(address).split('.')]
+    if len(octets) != 4:
+        raise ValueError(f"not an IPv4 address: {address}")
+    return (octets[0] << 24) | (octets[1] << 16) | (octets[2] << 8) | octets[3]
+
+def _vlan_hosts(topology: Topology, name: str, count: int, offset: int = 20) -> Optional[np.ndarray]:
+    """`count` host addresses in the VLAN called `name`, or None if the site lacks it"""
+    for vlan in topology.vlans.values():
+        subnet = vlan['subnet']
+        if vlan['name'] == name and subnet is not None and subnet.version == 4:
+            size = max(1, subnet.num_addresses - offset - 1)
+            return (int(subnet.network_address) + offset + np.arange(count) % size).astype(np.uint32)
+    return None
+
+def _flows(src, dst, profile: str, bps: Optional[float] = None) -> np.ndarray:
+    kind = PROFILE_INDEX[profile]
+    profile = PROFILES[kind]
+    flows = np.zeros(len(src), dtype=FLOW_DTYPE)
+    flows['src'] = src
+    flows['dst'] = dst
+    flows['protocol'] = PROTOCOLS[profile.protocol]
+    flows['port'] = profile.port
+    flows['kind'] = kind
+    flows['bps'] = bps or profile.bps
+    flows['pps'] = flows['bps'] / (8 * profile.packet_bytes)
+    return flows
+
+def generate_flows(topology: Topology, scenario: Scenario) -> np.ndarray:
+    """Flow array for a scenario; classes whose VLAN the site lacks are left out"""
+    rng = np.random.default_rng(scenario.seed)
+    batches = []
+
+    cameras = _vlan_hosts(topology, 'cameras', scenario.cameras)
+    if cameras is not None and scenario.cameras:
+        nvr = _ipv4(scenario.nvr) if scenario.nvr else int(_vlan_hosts(topology, 'cameras', 1, offset=100)[0])
+        batches.append(_flows(cameras, np.full(len(cameras), nvr, dtype=np.uint32), 'camera_rtsp',
+                              scenario.camera_bps))
+
+    iot = _vlan_hosts(topology, 'iot', scenario.iot_devices)
+    if iot is not None and scenario.iot_devices:
+        src = np.repeat(iot, scenario.iot_sessions)
+        batches.append(_flows(src, rng.integers(PUBLIC_FIRST, PUBLIC_LAST, len(src), dtype=np.uint32),
+                              'iot_cloud'))
+        main = _vlan_hosts(topology, 'main', max(1, scenario.iot_lateral))
+        if main is not None and scenario.iot_lateral:
+            batches.append(_flows(rng.choice(iot, scenario.iot_lateral), main, 'iot_lateral'))
+
+    guests = _vlan_hosts(topology, 'guest', scenario.guest_clients)
+    if guests is not None and scenario.guest_clients:
+        src = np.repeat(guests, scenario.guest_sessions)
+        batches.append(_flows(src, rng.integers(PUBLIC_FIRST, PUBLIC_LAST, len(src), dtype=np.uint32),
+                              'guest_internet'))
+
+    return np.concatenate(batches) if batches else np.zeros(0, dtype=FLOW_DTYPE)
+
+class FlowSimulator:
+    """Pushes flow batches through a topology and firewall policy, accumulating load per domain"""
+
+    def __init__(self, topology: Topology, policy: FirewallPolicy, firewall: Optional[FirewallModel] = None):
+        self.topology = topology
+        self.policy = policy
+        self.firewall = firewall or FirewallModel()
+
+        # Sorted, non-overlapping IPv4 subnet intervals -> domain id; anything else is the internet
+        table = []
+        for vlan_id, vlan in topology.vlans.items():
+            domain = topology.vlan_domain(vlan_id)
+            if domain is not None and vlan['subnet'] is not None and vlan['subnet'].version == 4:
+                table.append((int(vlan['subnet'].network_address), int(vlan['subnet'].broadcast_address),
+                              domain.id))
+        table.sort()
+        self._starts = np.array([row[0] for row in table], dtype=np.uint32)
+        self._ends = np.array([row[1] for row in table], dtype=np.uint32)
+        self._domain_ids = np.array([row[2] for row in table], dtype=np.int64)
+        self._internet = topology.domain_of(INTERNET).id
+        self._firewall = topology.index.get(FIREWALL_VM)
+        self._routes: Dict[int, Any] = {}
+        self.reset()
+
+    def reset(self):
+        count = len(self.topology.domains)
+        self.domain_bps = np.zeros(count)
+        self.domain_pps = np.zeros(count)
+        self.domain_flows = np.zeros(count, dtype=np.int64)
+        self.blocked_bps = np.zeros(count)
+        self.blocked_flows = np.zeros(count, dtype=np.int64)
+        self.unreachable_flows = 0
+        self.firewall_bps = 0.0
+        self.firewall_pps = 0.0
+        self.kind_stats = np.zeros((len(PROFILES), 4))   # flows, offered bps, delivered bps, blocked flows
+        self.flows = 0
+        self.intervals = 0
+        self.seconds = 0.0
+
+    def lookup(self, addresses: np.ndarray) -> np.ndarray:
+        """Domain id for each address"""
+        position = np.searchsorted(self._starts, addresses, side='right') - 1
+        clipped = np.maximum(position, 0)
+        inside = (position >= 0) & (addresses <= self._ends[clipped]) if len(self._starts) else \
+            np.zeros(len(addresses), dtype=bool)
+        return np.where(inside, self._domain_ids[clipped] if len(self._starts) else 0, self._internet)
+
+    def route(self, source: int, target: int):
+        """(domains traversed, crosses the firewall) for a domain pair, or None if unreachable"""
+        key = source * len(self.topology.domains) + target
+        if key not in self._routes:
+            hops = self.topology.domain_path(source, target)
+            if hops is None:
+                self._routes[key] = None
+            else:
+                routers = {hop[0] for hop in hops[1::2]}
+                self._routes[key] = (np.array(hops[0::2], dtype=np.int64), self._firewall in routers)
+        return self._routes[key]
+
+    def run(self, flows: np.ndarray, intervals: int = 1, batch_size: int = 65536) -> 'FlowSimulator':
+        """Accumulate flows offered over `intervals` intervals; rates are reported per interval"""
+        start = time.perf_counter()
+        for offset in range(0, len(flows), batch_size):
+            self._run_batch(flows[offset:offset + batch_size])
+        self.flows += len(flows)
+        self.intervals += intervals
+        self.seconds += time.perf_counter() - start
+        return self
+
+    def _run_batch(self, flows: np.ndarray):
+        count = len(self.topology.domains)
+        src_domain = self.lookup(flows['src'])
+        dst_domain = self.lookup(flows['dst'])
+        pairs, inverse = np.unique(src_domain * count + dst_domain, return_inverse=True)
+        inverse = inverse.reshape(-1)
+
+        routes = [self.route(int(pair) // count, int(pair) % count) for pair in pairs]
+        reachable = np.array([route is not None for route in routes])[inverse]
+        crosses = np.array([route is not None and route[1] for route in routes])[inverse]
+
+        allowed = reachable.copy()
+        if crosses.any():
+            allowed[crosses] = self.policy.evaluate(flows['src'][crosses], flows['dst'][crosses],
+                                                    flows['protocol'][crosses], flows['port'][crosses])
+        blocked = reachable & ~allowed
+
+        bps, pps = flows['bps'], flows['pps']
+        pair_bps = np.bincount(inverse, weights=bps * allowed, minlength=len(pairs))
+        pair_pps = np.bincount(inverse, weights=pps * allowed, minlength=len(pairs))
+        pair_flows = np.bincount(inverse, weights=allowed, minlength=len(pairs))
+        for index, route in enumerate(routes):
+            if route is not None and pair_flows[index]:
+                domains = route[0]
+                self.domain_bps[domains] += pair_bps[index]
+                self.domain_pps[domains] += pair_pps[index]
+                self.domain_flows[domains] += int(pair_flows[index])
+
+        # Blocked flows are dropped at the firewall and charged to their source segment
+        self.blocked_bps += np.bincount(src_domain[blocked], weights=bps[blocked], minlength=count)
+        self.blocked_flows += np.bincount(src_domain[blocked], minlength=count)
+        self.unreachable_flows += int((~reachable).sum())
+
+        forwarded = crosses & allowed
+        self.firewall_bps += float(bps[forwarded].sum())
+        self.firewall_pps += float(pps[forwarded].sum())
+
+        kinds = flows['kind']
+        self.kind_stats[:, 0] += np.bincount(kinds, minlength=len(PROFILES))
+        self.kind_stats[:, 1] += np.bincount(kinds, weights=bps, minlength=len(PROFILES))
+        self.kind_stats[:, 2] += np.bincount(kinds, weights=bps * allowed, minlength=len(PROFILES))
+        self.kind_stats[:, 3] += np.bincount(kinds, weights=blocked, minlength=len(PROFILES))
+
+    def report(self) -> Dict[str, Any]:
+        """Per-bridge, per-VLAN, per-class and firewall load per interval as JSON-compatible data"""
+        topology = self.topology
+        scale = 1 / max(1, self.intervals)
+        bridges: Dict[str, Dict[str, Any]] = {}
+        for domain_id, names in topology.domain_bridges().items():
+            for name in names:
+                entry = bridges.setdefault(name, {'bps': 0.0, 'pps': 0.0, 'flows': 0, 'blocked_flows': 0,
+                                                  'blocked_bps': 0.0})
+                entry['bps'] += float(self.domain_bps[domain_id]) * scale
+                entry['pps'] += float(self.domain_pps[domain_id]) * scale
+                entry['flows'] += round(self.domain_flows[domain_id] * scale)
+                entry['blocked_flows'] += round(self.blocked_flows[domain_id] * scale)
+                entry['blocked_bps'] += float(self.blocked_bps[domain_id]) * scale
+        for name, entry in bridges.items():
+            node = topology.node(name)
+            interface = node.attrs.get('interface')
+            capacity = link_bps(topology.node(interface).attrs.get('speed')) \
+                if interface in topology.index else None
+            entry['capacity_bps'] = capacity
+            entry['utilization'] = round(entry['bps'] / capacity, 4) if capacity else None
+            entry['dropped_bps'] = max(0.0, entry['bps'] - capacity) if capacity else 0.0
+
+        vlans: Dict[str, Dict[str, Any]] = {}
+        for domain in topology.domains:
+            if domain.vlan is None:
+                continue
+            entry = vlans.setdefault(str(domain.vlan), {
+                'name': topology.vlans.get(domain.vlan, {}).get('name'), 'bps': 0.0, 'pps': 0.0,
+                'flows': 0, 'blocked_flows': 0, 'blocked_bps': 0.0})
+            entry['bps'] += float(self.domain_bps[domain.id]) * scale
+            entry['pps'] += float(self.domain_pps[domain.id]) * scale
+            entry['flows'] += round(self.domain_flows[domain.id] * scale)
+            entry['blocked_flows'] += round(self.blocked_flows[domain.id] * scale)
+            entry['blocked_bps'] += float(self.blocked_bps[domain.id]) * scale
+
+        classes = {
+            profile.name: {'flows': round(row[0] * scale), 'offered_bps': row[1] * scale,
+                           'delivered_bps': row[2] * scale, 'blocked_flows': round(row[3] * scale)}
+            for profile, row in zip(PROFILES, self.kind_stats) if row[0]
+        }
+
+        capacity = self.firewall.capacity_pps(len(self.policy))
+        firewall_pps = self.firewall_pps * scale
+        utilization = firewall_pps / capacity if capacity else 0.0
+        return {
+            'flows': self.flows,
+            'intervals': self.intervals,
+            'unreachable_flows': self.unreachable_flows,
+            'bridges': bridges,
+            'vlans': vlans,
+            'classes': classes,
+            'firewall': {
+                'bps': self.firewall_bps * scale,
+                'pps': firewall_pps,
+                'rules': len(self.policy),
+                'model': asdict(self.firewall),
+                'capacity_pps': capacity,
+                'utilization': round(utilization, 4),
+                'dropped_pps': max(0.0, firewall_pps - capacity),
+                'keeps_up': utilization <= 1.0 and all(entry['dropped_bps'] == 0 for entry in bridges.values()),
+            },
+            'seconds': round(self.seconds, 6),
+            'flows_per_second': round(self.flows / self.seconds) if self.seconds else None,
+        }
+
+def simulate(topology: Topology, policy: FirewallPolicy, scenario: Optional[Scenario] = None,
+             firewall: Optional[FirewallModel] = None, repeat: int = 1) -> Dict[str, Any]:
+    """Generate a scenario's flows and run them through the topology
+
+    `repeat` replays the flow set as that many intervals in one pass, which
+    measures simulator throughput without changing the reported load.
+    """
+    flows = generate_flows(topology, scenario or Scenario())
+    simulator = FlowSimulator(topology, policy, firewall)
+    if repeat > 1:
+        flows = np.tile(flows, repeat)
+    return simulator.run(flows, intervals=max(1, repeat)).report()
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'bridge':<12} {'Mbps':>10} {'kpps':>9} {'util':>7} {'flows':>8} {'blocked':>8}"]
+    for name, entry in sorted(report['bridges'].items()):
+        utilization = f"{entry['utilization']:.1%}" if entry['utilization'] is not None else '-'
+        lines.append(f"{name:<12} {entry['bps'] / 1e6:>10.1f} {entry['pps'] / 1e3:>9.1f} {utilization:>7} "
+                     f"{entry['flows']:>8} {entry['blocked_flows']:>8}")
+    lines.append('')
+    lines.append(f"{'vlan':<12} {'Mbps':>10} {'kpps':>9} {'flows':>8} {'blocked':>8}")
+    for vlan, entry in sorted(report['vlans'].items(), key=lambda item: int(item[0])):
+        lines.append(f"{vlan + ' ' + str(entry['name']):<12} {entry['bps'] / 1e6:>10.1f} "
+                     f"{entry['pps'] / 1e3:>9.1f} {entry['flows']:>8} {entry['blocked_flows']:>8}")
+    lines.append('')
+    firewall = report['firewall']
+    verdict = 'keeps up' if firewall['keeps_up'] else 'OVERLOADED'
+    lines.append(f"firewall: {firewall['bps'] / 1e6:.1f} Mbps, {firewall['pps'] / 1e3:.1f} kpps of "
+                 f"{firewall['capacity_pps'] / 1e3:.0f} kpps ({firewall['utilization']:.1%}, "
+                 f"{firewall['rules']} rules) - {verdict}")
+    lines.append(f"{report['flows']} flows simulated in {report['seconds']}s")
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Simulate site traffic through the topology and firewall')
+    parser.add_argument('site_config', help='Site YAML configuration file')
+    parser.add_argument('--cameras', type=int, default=Scenario.cameras)
+    parser.add_argument('--camera-mbps', type=float, default=Scenario.camera_bps / 1e6)
+    parser.add_argument('--nvr', help='NVR address (default: host .100 of the cameras VLAN)')
+    parser.add_argument('--iot-devices', type=int, default=Scenario.iot_devices)
+    parser.add_argument('--guest-clients', type=int, default=Scenario.guest_clients)
+    parser.add_argument('--pps-per-core', type=float, help='Firewall packets per second per core')
+    parser.add_argument('--repeat', type=int, default=1, help='Replay the flow set as this many intervals')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.site_config, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    topology = Topology.from_site(config)
+    scenario = Scenario(cameras=args.cameras, camera_bps=args.camera_mbps * 1e6, nvr=args.nvr,
+                        iot_devices=args.iot_devices, guest_clients=args.guest_clients)
+    report = simulate(topology, FirewallPolicy.from_site(config), scenario,
+                      FirewallModel.from_site(config, pps_per_core=args.pps_per_core), args.repeat)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+    sys.exit(0 if report['firewall']['keeps_up'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,376 @@
+"""
+Exhaustive VLAN isolation analysis
+
+Proves or refutes reachability properties between a site's zones (its
+VLANs and the internet), such as "iot can never reach main" or "guest only
+reaches the internet", for every address, protocol and port rather than
+for sampled flows.
+
+The topology decides how a zone pair is connected: switched in one L2
+domain, routed without passing the firewall, through the firewall, or not
+at all. Only firewall-routed pairs are subject to the policy. For those the
+packet space (source address x destination address x protocol x port) is
+split at every rule boundary into cells that no rule can tell apart, so
+evaluating one representative per cell with the compiled policy decides
+the whole cell exactly.
+"""
+
+import argparse
+import ipaddress
+import json
+import re
+import sys
+import time
+from collections import deque, namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+import yaml
+
+from .policy import ANY_PROTOCOL, MAX_ADDRESS, PROTOCOLS, FirewallPolicy
+from .topology import FIREWALL_VM, INTERNET, Topology
+
+Zone = namedtuple('Zone', 'name vlan domain intervals')
+# via: 'switched', 'routed' (no firewall on some path), 'firewall' or None (no path)
+Reach = namedtuple('Reach', 'source destination via allowed services witness rules')
+Result = namedtuple('Result', 'assertion holds reaches')
+
+PORT_PROTOCOLS = (PROTOCOLS['tcp'], PROTOCOLS['udp'])
+OTHER_PROTOCOL = 255            # stands for every protocol no rule names
+MAX_CELLS = 1 << 22             # cells evaluated per policy batch
+
+class IsolationError(ValueError):
+    """Raised for unknown zones or malformed assertions"""
+
+def _protocol_name(number: int) -> str:
+    names = {value: name for name, value in PROTOCOLS.items() if value != ANY_PROTOCOL}
+    return names.get(number, 'other')
+
+def _segments(intervals: Sequence[Tuple[int, int]], cuts: Iterable[int]) -> np.ndarray:
+    """Split intervals at cut points; (n, 2) array of [first, last] segments"""
+    segments = []
+    cuts = sorted(set(cuts))
+    for first, last in intervals:
+        inner = cuts[np.searchsorted(cuts, first, side='right'):np.searchsorted(cuts, last, side='right')] \
+            if cuts else []
+        start = first
+        for cut in inner:
+            segments.append((start, cut - 1))
+            start = cut
+        segments.append((start, last))
+    return np.array(segments, dtype=np.int64).reshape(-1, 2)
+
+def _cuts(first: np.ndarray, last: np.ndarray) -> List[int]:
+    """Boundaries where a rule interval starts or ends"""
+    return [int(value) for value in np.concatenate([first, last.astype(np.int64) + 1])]
+
+def _touches(first: np.ndarray, last: np.ndarray, negated: np.ndarray,
+             intervals: Sequence[Tuple[int, int]]) -> np.ndarray:
+    """Per rule: whether its (possibly negated) address interval overlaps ``intervals``"""
+    overlaps = np.zeros(len(first), dtype=bool)
+    total = sum(high - low + 1 for low, high in intervals)
+    covered = np.zeros(len(first), dtype=np.int64)
+    for low, high in intervals:
+        overlap = np.minimum(last.astype(np.int64), high) - np.maximum(first.astype(np.int64), low) + 1
+        overlaps |= overlap > 0
+        covered += np.maximum(overlap, 0)
+    covers = covered == total
+    return np.where(negated, ~covers, overlaps)
+
+def _merge(ranges: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted(ranges):
+        if merged and first <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], last))
+        else:
+            merged.append((first, last))
+    return merged
+
+def _format_ranges(ranges: List[Tuple[int, int]], kind: str = 'port') -> List[str]:
+    if kind == 'port':
+        if ranges == [(0, 65535)]:
+            return ['any']
+        return [str(first) if first == last else f"{first}-{last}" for first, last in ranges]
+    return [str(ipaddress.IPv4Address(first)) if first == last else
+            f"{ipaddress.IPv4Address(first)}-{ipaddress.IPv4Address(last)}" for first, last in ranges]
+
+def allowed_space(policy: FirewallPolicy, sources: Sequence[Tuple[int, int]],
+                  destinations: Sequence[Tuple[int, int]]) -> Dict[str, Any]:
+    """Exactly which part of sources x destinations x protocol x port the policy allows
+
+    Returns ``services`` (protocol name -> allowed port ranges, ``['any']``
+    for protocols without ports), ``rules`` (names of the rules allowing
+    traffic), ``witness`` (one allowed packet, or None) and ``cells`` (how
+    many cells were evaluated).
+    """
+    # Only rules that can match some packet of this pair split the space
+    relevant = np.flatnonzero(_touches(policy.src_first, policy.src_last, policy.src_negated, sources) &
+                              _touches(policy.dst_first, policy.dst_last, policy.dst_negated, destinations))
+    src = _segments(sources, _cuts(policy.src_first[relevant], policy.src_last[relevant]))
+    dst = _segments(destinations, _cuts(policy.dst_first[relevant], policy.dst_last[relevant]))
+    ports = _segments([(0, 65535)], _cuts(policy.port_first[relevant], policy.port_last[relevant]))
+    named = sorted({int(protocol) for protocol in policy.protocol[relevant] if protocol != ANY_PROTOCOL} |
+                   {value for value in PROTOCOLS.values() if value != ANY_PROTOCOL})
+    # protocols with ports take every port segment; the rest are evaluated at port 0
+    combos = [(protocol, segment) for protocol in named if protocol in PORT_PROTOCOLS for segment in ports]
+    combos += [(protocol, np.array([0, 0])) for protocol in named + [OTHER_PROTOCOL] if protocol not in PORT_PROTOCOLS]
+    combo_protocol = np.array([protocol for protocol, _ in combos], dtype=np.int64)
+    combo_ports = np.array([segment for _, segment in combos], dtype=np.int64).reshape(-1, 2)
+
+    services: Dict[str, List[Tuple[int, int]]] = {}
+    rules = set()
+    witness = None
+    cells = len(src) * len(dst) * len(combos)
+    if not cells:
+        return {'services': {}, 'rules': [], 'witness': None, 'cells': 0}
+
+    # Evaluate in batches of source segments so memory stays bounded
+    per_source = len(dst) * len(combos)
+    step = max(1, MAX_CELLS // per_source)
+    allowed_combos = np.zeros(len(combos), dtype=bool)
+    for start in range(0, len(src), step):
+        block = src[start:start + step]
+        s, d, c = np.meshgrid(np.arange(len(block)), np.arange(len(dst)), np.arange(len(combos)), indexing='ij')
+        s, d, c = s.ravel(), d.ravel(), c.ravel()
+        protocol = combo_protocol[c]
+        matched = policy.match(block[s, 0].astype(np.uint32), dst[d, 0].astype(np.uint32),
+                               protocol.astype(np.uint8), combo_ports[c, 0].astype(np.uint16), relevant)
+        allowed = np.full(len(matched), policy.default_allow)
+        hit = matched >= 0
+        allowed[hit] = policy.allow[matched[hit]]
+        if not allowed.any():
+            continue
+        allowed_combos[np.unique(c[allowed])] = True
+        rules.update(policy.rule_name(int(index)) for index in np.unique(matched[allowed]))
+        if witness is None:
+            first = int(np.flatnonzero(allowed)[0])
+            witness = {
+                'source': str(ipaddress.IPv4Address(int(block[s[first], 0]))),
+                'destination': str(ipaddress.IPv4Address(int(dst[d[first], 0]))),
+                'protocol': _protocol_name(int(protocol[first])),
+                'port': int(combo_ports[c[first], 0]) if protocol[first] in PORT_PROTOCOLS else None,
+                'rule': policy.rule_name(int(matched[first])),
+            }
+
+    for index in np.flatnonzero(allowed_combos):
+        name = _protocol_name(int(combo_protocol[index]))
+        services.setdefault(name, []).append(tuple(int(value) for value in combo_ports[index]))
+    return {
+        'services': {name: _format_ranges(_merge(ranges)) if name in ('tcp', 'udp') else ['any']
+                     for name, ranges in sorted(services.items())},
+        'rules': sorted(rules),
+        'witness': witness,
+        'cells': cells,
+    }
+
+class IsolationAnalysis:
+    """Reachability between the zones of a topology under a firewall policy"""
+
+    def __init__(self, topology: Topology, policy: FirewallPolicy):
+        self.topology = topology
+        self.policy = policy
+        self.zones: Dict[str, Zone] = {}
+        local = []
+        for vlan_id, vlan in sorted(topology.vlans.items()):
+            domain = topology.vlan_domain(vlan_id)
+            subnet = vlan.get('subnet')
+            if domain is None or subnet is None or subnet.version != 4:
+                continue
+            interval = (int(subnet.network_address), int(subnet.broadcast_address))
+            local.append(interval)
+            self.zones[vlan.get('name') or str(vlan_id)] = Zone(vlan.get('name') or str(vlan_id), vlan_id,
+                                                                 domain.id, (interval,))
+        # the internet is every address outside the site's VLAN subnets
+        outside, start = [], 0
+        for first, last in _merge(local):
+            if first > start:
+                outside.append((start, first - 1))
+            start = last + 1
+        if start <= MAX_ADDRESS:
+            outside.append((start, MAX_ADDRESS))
+        self.zones[INTERNET] = Zone(INTERNET, None, topology.domain_of(INTERNET).id, tuple(outside))
+        self._reach: Dict[Tuple[str, str], Reach] = {}
+
+    def zone(self, name: Any) -> Zone:
+        """Zone by VLAN name, VLAN id, or internet/wan"""
+        text = str(name).strip().lower()
+        if text in ('wan', INTERNET):
+            return self.zones[INTERNET]
+        for zone in self.zones.values():
+            if zone.name.lower() == text or (zone.vlan is not None and str(zone.vlan) == text):
+                return zone
+        raise IsolationError(f"unknown zone: {name} (known: {', '.join(self.zones)})")
+
+    def _connection(self, source: int, target: int) -> Optional[str]:
+        """How two L2 domains connect: switched, routed around the firewall, through it, or None"""
+        if source == target:
+            return 'switched'
+        firewall = self.topology.index.get(FIREWALL_VM)
+        if self._connected(source, target, avoid=firewall):
+            return 'routed'
+        if firewall is not None and self._connected(source, target):
+            return 'firewall'
+        return None
+
+    def _connected(self, source: int, target: int, avoid: Optional[int] = None) -> bool:
+        """Whether any routed path joins two domains, optionally without router ``avoid``"""
+        topology = self.topology
+        legs_by_domain: Dict[int, List[int]] = {}
+        for router, legs in topology.routers.items():
+            if router in topology.disabled or router == avoid:
+                continue
+            for leg in legs:
+                if leg in topology.state_domain:
+                    legs_by_domain.setdefault(topology.state_domain[leg], []).append(router)
+        seen = {source}
+        queue = deque([source])
+        while queue:
+            domain = queue.popleft()
+            if domain == target:
+                return True
+            for router in legs_by_domain.get(domain, ()):
+                for leg in topology.routers[router]:
+                    following = topology.state_domain.get(leg)
+                    if following is not None and following not in seen:
+                        seen.add(following)
+                        queue.append(following)
+        return False
+
+    def reach(self, source: Any, destination: Any) -> Reach:
+        """What traffic from one zone can reach another, for all addresses, protocols and ports"""
+        src, dst = self.zone(source), self.zone(destination)
+        key = (src.name, dst.name)
+        if key not in self._reach:
+            via = self._connection(src.domain, dst.domain)
+            if via == 'firewall':
+                space = allowed_space(self.policy, src.intervals, dst.intervals)
+                reach = Reach(src.name, dst.name, via, bool(space['services']), space['services'],
+                              space['witness'], space['rules'])
+            elif via is None:
+                reach = Reach(src.name, dst.name, None, False, {}, None, [])
+            else:
+                witness = {'source': str(ipaddress.IPv4Address(src.intervals[0][0])),
+                           'destination': str(ipaddress.IPv4Address(dst.intervals[0][0])),
+                           'protocol': 'any', 'port': None, 'rule': None}
+                reach = Reach(src.name, dst.name, via, True, {'any': ['any']}, witness, [])
+            self._reach[key] = reach
+        return self._reach[key]
+
+    def matrix(self) -> Dict[str, Dict[str, Reach]]:
+        """Reach for every ordered pair of distinct zones"""
+        return {source: {destination: self.reach(source, destination)
+                         for destination in self.zones if destination != source}
+                for source in self.zones}
+
+    def isolated(self, source: Any, destination: Any) -> Result:
+        """``source`` can never reach ``destination``"""
+        reach = self.reach(source, destination)
+        return Result(f"{reach.source} !-> {reach.destination}", not reach.allowed, [reach])
+
+    def reachable(self, source: Any, destination: Any) -> Result:
+        """``source`` can reach ``destination`` with at least one packet"""
+        reach = self.reach(source, destination)
+        return Result(f"{reach.source} -> {reach.destination}", reach.allowed, [reach])
+
+    def only_reaches(self, source: Any, destinations: Iterable[Any]) -> Result:
+        """``source`` reaches no zone outside ``destinations``; the result lists the violations"""
+        src = self.zone(source)
+        permitted = {self.zone(name).name for name in destinations}
+        violations = [self.reach(src.name, name) for name in self.zones
+                      if name != src.name and name not in permitted]
+        violations = [reach for reach in violations if reach.allowed]
+        return Result(f"{src.name} -> only {', '.join(sorted(permitted))}", not violations, violations)
+
+    def check(self, assertion: str) -> Result:
+        """Evaluate ``A !-> B``, ``A -> B`` or ``A -> only B, C``"""
+        match = re.fullmatch(r'\s*(\S+)\s*(!->|->)\s*(only\s+)?(.+?)\s*', assertion)
+        if not match:
+            raise IsolationError(f"invalid assertion: {assertion!r} (expected 'A !-> B', 'A -> B' "
+                                 f"or 'A -> only B, C')")
+        source, arrow, only, targets = match.groups()
+        if only:
+            if arrow == '!->':
+                raise IsolationError(f"'only' cannot be negated: {assertion!r}")
+            return self.only_reaches(source, [name.strip() for name in targets.split(',') if name.strip()])
+        return self.isolated(source, targets) if arrow == '!->' else self.reachable(source, targets)
+
+def reach_to_dict(reach: Reach) -> Dict[str, Any]:
+    return reach._asdict()
+
+def result_to_dict(result: Result) -> Dict[str, Any]:
+    return {'assertion': result.assertion, 'holds': result.holds,
+            'reaches': [reach_to_dict(reach) for reach in result.reaches]}
+
+def format_matrix(analysis: IsolationAnalysis) -> str:
+    names = list(analysis.zones)
+    width = max(len(name) for name in names) + 2
+    lines = [' ' * width + ''.join(f"{name:>{width}}" for name in names)]
+    symbols = {'switched': 'L2', 'routed': 'open', None: '-'}
+    for source in names:
+        row = f"{source:<{width}}"
+        for destination in names:
+            if source == destination:
+                cell = '.'
+            else:
+                reach = analysis.reach(source, destination)
+                cell = symbols.get(reach.via, 'fw') if reach.via != 'firewall' else \
+                    ('allow' if reach.allowed else 'deny')
+            row += f"{cell:>{width}}"
+        lines.append(row)
+    return '\n'.join(lines)
+
+def format_result(result: Result) -> str:
+    lines = [f"{'HOLDS' if result.holds else 'FAILS'}  {result.assertion}"]
+    for reach in result.reaches:
+        if not reach.allowed:
+            lines.append(f"    {reach.source} -> {reach.destination}: "
+                         + ('no path' if reach.via is None else 'denied for every packet'))
+        else:
+            services = '; '.join(f"{name} {','.join(ports)}" for name, ports in reach.services.items())
+            lines.append(f"    {reach.source} -> {reach.destination} via {reach.via}: {services}")
+            if reach.witness:
+                witness = reach.witness
+                port = f":{witness['port']}" if witness['port'] is not None else ''
+                lines.append(f"      e.g. {witness['source']} -> {witness['destination']}{port}/{witness['protocol']}"
+                             + (f" by rule '{witness['rule']}'" if witness['rule'] else ''))
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Prove or refute VLAN isolation for a site')
+    parser.add_argument('--site', required=True, help='Site YAML configuration file')
+    parser.add_argument('--assert', dest='assertions', action='append', default=[],
+                        help="'A !-> B', 'A -> B' or 'A -> only B, C' (zone names, VLAN ids or internet)")
+    parser.add_argument('--json', action='store_true', help='Print results as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.site, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    start = time.perf_counter()
+    analysis = IsolationAnalysis(Topology.from_site(config), FirewallPolicy.from_site(config))
+    try:
+        results = [analysis.check(assertion) for assertion in args.assertions]
+    except IsolationError as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+    if not results:
+        analysis.matrix()
+    seconds = time.perf_counter() - start
+
+    if args.json:
+        payload = {'results': [result_to_dict(result) for result in results]} if results else \
+            {'matrix': {source: {destination: reach_to_dict(reach) for destination, reach in row.items()}
+                        for source, row in analysis.matrix().items()}}
+        payload['seconds'] = round(seconds, 4)
+        json.dump(payload, sys.stdout, indent=2)
+        print()
+    elif results:
+        for result in results:
+            print(format_result(result))
+        print(f"\n{len(results)} assertions in {seconds:.3f}s")
+    else:
+        print(format_matrix(analysis))
+        print(f"\n{len(analysis.zones)} zones in {seconds:.3f}s")
+    sys.exit(0 if all(result.holds for result in results) else 1)
+
+if __name__ == "__main__":
+    main()
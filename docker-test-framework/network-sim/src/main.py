@@ -5,10 +5,22 @@ Simulates network interfaces, bridges, and VLANs for testing
 """
 
 import os
-from fastapi import FastAPI
+from typing import Any, Dict, Optional
+from fastapi import FastAPI, HTTPException
 import uvicorn
 import structlog
 
+import yaml
+
+from .failover import FailoverSimulation, GatewayMonitor, Outage, SessionLoad
+from .flows import FirewallModel, Scenario, simulate
+from .isolation import IsolationAnalysis, IsolationError, reach_to_dict, result_to_dict
+from .pcap import CaptureError, PcapReplay
+from .policy import FirewallPolicy, PolicyError, policy_from_config
+from .qos import ShaperSimulation, load_classes, site_shaping
+from .topology import Topology, TopologyError, build_topology
+from .zeek import retention_settings, simulate_sizing
+
 logger = structlog.get_logger(__name__)
 
 # Configuration
@@ -17,9 +29,31 @@ class Settings:
         self.port = int(os.getenv("NETWORK_SIM_PORT", "8080"))
         self.host = os.getenv("NETWORK_SIM_HOST", "0.0.0.0")
         self.debug = os.getenv("NETWORK_SIM_DEBUG", "false").lower() == "true"
+        self.site_config = os.getenv("NETWORK_SIM_SITE_CONFIG", "/etc/network-sim/site.yml")
 
 settings = Settings()
 
+# Topology, firewall policy and firewall capacity model currently being simulated
+topology: Optional[Topology] = None
+policy = FirewallPolicy([], default_policy="allow")
+firewall_model = FirewallModel()
+retention = {"zeek_keep_days": 7, "retention_days": 30}
+gateway_monitor = GatewayMonitor()
+traffic_shaping: Optional[Dict[str, Any]] = None
+
+def load_simulation(config: Dict[str, Any]):
+    """Replace the simulated topology and policy; legacy topologies have no rules and allow all"""
+    global topology, policy, firewall_model, gateway_monitor, traffic_shaping
+    new_topology = build_topology(config)
+    if isinstance(config, dict) and "site" in config:
+        new_policy = FirewallPolicy.from_site(config)
+    else:
+        new_policy = FirewallPolicy([], default_policy="allow")
+    topology, policy, firewall_model = new_topology, new_policy, FirewallModel.from_site(config)
+    retention.update(retention_settings(config))
+    gateway_monitor = GatewayMonitor.from_site(config)
+    traffic_shaping = site_shaping(config)
+
 # Create FastAPI app
 app = FastAPI(
     title="Network Topology Simulator",
@@ -32,7 +66,14 @@ app = FastAPI(
 async def startup_event():
     """Initialize network simulation"""
     logger.info("Starting Network Topology Simulator")
-    # Initialize default network topology here
+    if os.path.exists(settings.site_config):
+        try:
+            with open(settings.site_config, "r") as f:
+                load_simulation(yaml.safe_load(f) or {})
+            logger.info("Loaded site topology", path=settings.site_config, nodes=len(topology.nodes),
+                        domains=len(topology.domains))
+        except (OSError, ValueError, KeyError, yaml.YAMLError) as e:
+            logger.error("Failed to load site topology", path=settings.site_config, error=str(e))
     logger.info("Network simulation started")
 
 @app.get("/")
@@ -49,6 +90,168 @@ async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "service": "network-sim"}
 
+def get_topology() -> Topology:
+    if topology is None:
+        raise HTTPException(status_code=404, detail="No topology loaded")
+    return topology
+
+@app.get("/topology")
+async def get_topology_graph():
+    """Nodes, links, L2 domains and routers of the loaded topology"""
+    return get_topology().to_dict()
+
+@app.post("/topology", status_code=201)
+async def create_topology(config: Dict[str, Any]):
+    """Load a topology from a site configuration or the legacy {networks, devices} format"""
+    try:
+        load_simulation(config)
+    except (TopologyError, PolicyError, ValueError, KeyError, TypeError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid topology: {e}")
+    logger.info("Loaded topology", site=topology.name, nodes=len(topology.nodes), domains=len(topology.domains))
+    return {"site": topology.name, "nodes": len(topology.nodes), "domains": len(topology.domains)}
+
+@app.get("/topology/domains")
+async def get_domains():
+    """L2 broadcast domains of the loaded topology"""
+    return get_topology().to_dict()["domains"]
+
+@app.get("/topology/path")
+async def get_path(source: str, destination: str):
+    """Shortest routed path between two addresses or node names"""
+    current = get_topology()
+    try:
+        path = current.path(source, destination)
+    except (TopologyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if path is None:
+        return {"source": source, "destination": destination, "reachable": False}
+    return {"source": source, "destination": destination, "reachable": True, "nodes": list(path.nodes),
+            "domains": list(path.domains), "routers": list(path.routers)}
+
+@app.post("/simulate/flows")
+async def simulate_flows(request: Dict[str, Any]):
+    """Run synthetic traffic through the topology and firewall policy
+
+    The body holds Scenario fields (cameras, camera_bps, nvr, ...) plus
+    optional firewall model overrides (cores, pps_per_core, rule_cost) and
+    ``repeat``.
+    """
+    current = get_topology()
+    request = dict(request)
+    overrides = {key: request.pop(key) for key in ("cores", "pps_per_core", "rule_cost") if key in request}
+    try:
+        repeat = int(request.pop("repeat", 1))
+        scenario = Scenario(**request)
+        model = FirewallModel(**{**firewall_model.__dict__, **overrides})
+        return simulate(current, policy, scenario, model, repeat)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid simulation request: {e}")
+
+@app.post("/simulate/failover")
+async def simulate_failover(request: Dict[str, Any]):
+    """Take WAN links down and measure gateway-group detection, recovery and dropped sessions
+
+    The body holds ``outages`` (a list of {target, start, end} with a WAN
+    bridge, interface or uplink as target), optional GatewayMonitor
+    overrides (interval, loss_interval, time_period, loss_high, loss_low,
+    reconfigure, kill_states), SessionLoad fields and ``horizon``.
+    """
+    current = get_topology()
+    request = dict(request)
+    outages = request.pop("outages", None)
+    if not isinstance(outages, list) or not outages:
+        raise HTTPException(status_code=400, detail="outages must be a non-empty list")
+    monitor_fields = GatewayMonitor.__dataclass_fields__
+    overrides = {key: request.pop(key) for key in list(request) if key in monitor_fields}
+    try:
+        horizon = request.pop("horizon", None)
+        monitor = GatewayMonitor(**{**gateway_monitor.__dict__, **overrides})
+        simulation = FailoverSimulation(current, monitor, SessionLoad(**request))
+        return simulation.run([Outage(outage["target"], float(outage["start"]), float(outage["end"]))
+                               for outage in outages], float(horizon) if horizon is not None else None)
+    except (TopologyError, TypeError, ValueError, KeyError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid failover request: {e}")
+
+@app.post("/simulate/qos")
+async def simulate_qos(request: Dict[str, Any]):
+    """Simulate per-class token-bucket and fair-queue shaping on one site link
+
+    The body may set ``link`` (interface or bridge, default eth0),
+    ``scheduler`` (wfq or fifo), ``seconds``, ``slot``, ``seed`` and
+    ``classes``, which are merged onto the defaults instead of the site's
+    ``security.traffic_shaping`` classes.
+    """
+    current = get_topology()
+    shaping = {"classes": request["classes"]} if request.get("classes") is not None else traffic_shaping
+    try:
+        simulation = ShaperSimulation(current, str(request.get("link", "eth0")), load_classes(shaping),
+                                      str(request.get("scheduler", "wfq")), float(request.get("slot", 0.001)))
+        return simulation.run(float(request.get("seconds", 10.0)), int(request.get("seed", 0)))
+    except (TopologyError, TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid QoS request: {e}")
+
+@app.post("/replay/pcap")
+async def replay_pcap(request: Dict[str, Any]):
+    """Replay capture files on this host against the firewall policy
+
+    The body holds ``path`` (or ``paths``), an optional ``proposed`` rule
+    set to compare against and an optional ``max_flows`` flow table size.
+    """
+    current = get_topology()
+    paths = request["paths"] if request.get("paths") is not None else [request.get("path")]
+    if not isinstance(paths, list) or not paths or not all(isinstance(path, str) for path in paths):
+        raise HTTPException(status_code=400, detail="path must be a string or paths a non-empty list of strings")
+    try:
+        proposed = policy_from_config(request["proposed"]) if request.get("proposed") is not None else None
+        replay = PcapReplay(current, policy, proposed, int(request.get("max_flows", 262144)))
+        for path in paths:
+            replay.replay(path)
+    except FileNotFoundError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except (OSError, CaptureError, PolicyError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return replay.report()
+
+@app.post("/zeek/sizing")
+async def zeek_sizing(request: Dict[str, Any]):
+    """Generate Zeek logs in memory and size storage and Logstash for the site's retention
+
+    The body may set ``seconds`` (default 60), ``rates`` ({conn, dns, notice}
+    records per second), ``seed`` and sizing overrides such as
+    ``retention_days`` or ``logstash_eps_per_worker``.
+    """
+    options = dict(retention)
+    request = dict(request)
+    try:
+        seconds = int(request.pop("seconds", 60))
+        rates = {log: float(rate) for log, rate in (request.pop("rates", None) or {}).items()}
+        seed = int(request.pop("seed", 0))
+        options.update(request)
+        return simulate_sizing(topology, seconds, rates, seed, **options)
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"Invalid sizing request: {e}")
+
+@app.get("/isolation")
+async def isolation_matrix():
+    """Exhaustive reachability between every pair of zones (VLANs and the internet)"""
+    analysis = IsolationAnalysis(get_topology(), policy)
+    return {source: {destination: reach_to_dict(reach) for destination, reach in row.items()}
+            for source, row in analysis.matrix().items()}
+
+@app.post("/isolation/check")
+async def isolation_check(request: Dict[str, Any]):
+    """Prove or refute isolation assertions such as ``iot !-> main`` or ``guest -> only internet``"""
+    assertions = request.get("assertions")
+    if not isinstance(assertions, list) or not all(isinstance(item, str) for item in assertions):
+        raise HTTPException(status_code=400, detail="assertions must be a list of strings")
+    analysis = IsolationAnalysis(get_topology(), policy)
+    try:
+        results = [analysis.check(assertion) for assertion in assertions]
+    except IsolationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"holds": all(result.holds for result in results),
+            "results": [result_to_dict(result) for result in results]}
+
 if __name__ == "__main__":
     uvicorn.run(
         "src.main:app",
@@ -0,0 +1,478 @@
+"""
+Packet capture replay for firewall policy validation
+
+Streams a pcap or pcapng file through a read-only memory map (the capture
+is never loaded whole), extracts IPv4 5-tuples and tracks connections in a
+bounded LRU flow table. Each new flow is oriented client -> server and
+queued; queued flows are classified by source and destination zone (VLAN
+name or internet) and evaluated against the site's firewall policy, and
+optionally a proposed policy, in NumPy batches.
+
+Memory use is bounded by the flow table size and the batch size; the
+mapped capture pages are file-backed and reclaimable.
+
+``iter_connection_events`` extracts timestamped connection attempts the
+same way, for the mock IDS's scan and brute-force detector.
+"""
+
+import argparse
+import ipaddress
+import json
+import mmap
+import struct
+import sys
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+import yaml
+
+from .flows import FlowSimulator
+from .policy import FirewallPolicy, policy_from_config
+from .topology import INTERNET, Topology
+
+# Link-layer header types (https://www.tcpdump.org/linktypes.html)
+LINKTYPE_NULL = 0
+LINKTYPE_ETHERNET = 1
+LINKTYPE_RAW = 101
+LINKTYPE_LINUX_SLL = 113
+LINKTYPE_IPV4 = 228
+LINKTYPE_IPV6 = 229
+LINKTYPE_LINUX_SLL2 = 276
+RAW_LINKTYPES = (LINKTYPE_RAW, 12, 14, LINKTYPE_IPV4, LINKTYPE_IPV6)
+
+ETHERTYPE_IPV4 = 0x0800
+ETHERTYPE_IPV6 = 0x86DD
+VLAN_ETHERTYPES = (0x8100, 0x88A8, 0x9100)
+
+TCP, UDP = 6, 17
+SYN, ACK = 0x02, 0x10
+
+PCAP_MAGIC = {0xA1B2C3D4: '<', 0xD4C3B2A1: '>', 0xA1B23C4D: '<', 0x4D3CB2A1: '>'}
+PCAP_NANOSECOND = (0xA1B23C4D, 0x4D3CB2A1)
+PCAPNG_SHB = 0x0A0D0D0A
+PCAPNG_BYTE_ORDER = 0x1A2B3C4D
+
+SKIP_REASONS = ('non_ip', 'ipv6', 'fragment', 'truncated', 'unsupported_link')
+
+class CaptureError(ValueError):
+    """Raised for files that are not readable pcap or pcapng captures"""
+
+# Connection attempts extracted from a capture, for behavioural detection
+EVENT_DTYPE = np.dtype([
+    ('ts', np.float64),
+    ('src', np.uint32),
+    ('dst', np.uint32),
+    ('protocol', np.uint8),
+    ('port', np.uint16),
+])
+
+def _pcap_records(data, byte_order: str, resolution: float) -> Iterator[Tuple[int, int, int, float]]:
+    header = struct.Struct(byte_order + 'IIII')
+    linktype = struct.unpack_from(byte_order + 'I', data, 20)[0] & 0xFFFF
+    offset, end = 24, len(data)
+    while offset + 16 <= end:
+        seconds, fraction, caplen, _ = header.unpack_from(data, offset)
+        offset += 16
+        if offset + caplen > end:
+            yield linktype, offset, -1, seconds + fraction * resolution
+            return
+        yield linktype, offset, caplen, seconds + fraction * resolution
+        offset += caplen
+
+def _interface_resolution(data, byte_order: str, offset: int, end: int) -> float:
+    """Timestamp units of an Interface Description Block (if_tsresol, default microseconds)"""
+    while offset + 4 <= end:
+        code, length = struct.unpack_from(byte_order + 'HH', data, offset)
+        if code == 0:
+            break
+        if code == 9 and length >= 1:
+            value = data[offset + 4]
+            return 2.0 ** -(value & 0x7F) if value & 0x80 else 10.0 ** -value
+        offset += 4 + length + (-length % 4)
+    return 1e-6
+
+def _pcapng_records(data) -> Iterator[Tuple[int, int, int, Optional[float]]]:
+    offset, end = 0, len(data)
+    byte_order = '<'
+    interfaces: List[Tuple[int, float]] = []
+    while offset + 12 <= end:
+        block_type = struct.unpack_from('<I', data, offset)[0]
+        if block_type == PCAPNG_SHB:
+            magic = struct.unpack_from('<I', data, offset + 8)[0]
+            byte_order = '<' if magic == PCAPNG_BYTE_ORDER else '>'
+            interfaces = []
+        else:
+            block_type = struct.unpack_from(byte_order + 'I', data, offset)[0]
+        length = struct.unpack_from(byte_order + 'I', data, offset + 4)[0]
+        if length < 12 or offset + length > end:
+            yield -1, offset, -1, None
+            return
+
+        if block_type == 1:             # Interface Description Block
+            interfaces.append((struct.unpack_from(byte_order + 'H', data, offset + 8)[0],
+                               _interface_resolution(data, byte_order, offset + 16, offset + length - 4)))
+        elif block_type in (6, 2):      # Enhanced Packet Block, obsolete Packet Block
+            if block_type == 6:
+                interface = struct.unpack_from(byte_order + 'I', data, offset + 8)[0]
+            else:
+                interface = struct.unpack_from(byte_order + 'H', data, offset + 8)[0]
+            high, low, caplen = struct.unpack_from(byte_order + 'III', data, offset + 12)
+            linktype, resolution = interfaces[interface] if interface < len(interfaces) else (-1, 1e-6)
+            yield linktype, offset + 28, min(caplen, length - 32), ((high << 32) | low) * resolution
+        elif block_type == 3:           # Simple Packet Block, which carries no timestamp
+            original = struct.unpack_from(byte_order + 'I', data, offset + 8)[0]
+            yield (interfaces[0][0] if interfaces else -1), offset + 12, min(original, length - 16), None
+        offset += length
+
+def iter_timed_packets(data) -> Iterator[Tuple[int, int, int, Optional[float]]]:
+    """(link type, offset, captured length, timestamp) of each packet in a pcap or pcapng buffer
+
+    A captured length of -1 marks a truncated final record. The timestamp is
+    in seconds since the epoch, or None for pcapng simple packet blocks.
+    """
+    if len(data) < 24:
+        raise CaptureError("file is too short to be a capture")
+    magic = struct.unpack_from('<I', data, 0)[0]
+    if magic in PCAP_MAGIC:
+        return _pcap_records(data, PCAP_MAGIC[magic], 1e-9 if magic in PCAP_NANOSECOND else 1e-6)
+    if magic == PCAPNG_SHB:
+        return _pcapng_records(data)
+    raise CaptureError(f"unrecognised capture magic {magic:#010x}")
+
+def iter_packets(data) -> Iterator[Tuple[int, int, int]]:
+    """(link type, offset, captured length) of each packet in a pcap or pcapng buffer
+
+    A captured length of -1 marks a truncated final record.
+    """
+    return (record[:3] for record in iter_timed_packets(data))
+
+@contextmanager
+def _mapped(path: str):
+    """Read-only, sequentially-advised memory map of a capture file"""
+    with open(path, 'rb') as f:
+        try:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            raise CaptureError(f"{path} is empty")
+        try:
+            if hasattr(data, 'madvise') and hasattr(mmap, 'MADV_SEQUENTIAL'):
+                data.madvise(mmap.MADV_SEQUENTIAL)
+            yield data
+        finally:
+            data.close()
+
+def parse_packet(data, linktype: int, offset: int, caplen: int):
+    """(protocol, src, sport, dst, dport, tcp flags) for an IPv4 packet, or a skip reason string"""
+    end = offset + caplen
+    if linktype == LINKTYPE_ETHERNET:
+        if caplen < 14:
+            return 'truncated'
+        ethertype = struct.unpack_from('!H', data, offset + 12)[0]
+        offset += 14
+        while ethertype in VLAN_ETHERTYPES and offset + 4 <= end:
+            ethertype = struct.unpack_from('!H', data, offset + 2)[0]
+            offset += 4
+    elif linktype == LINKTYPE_LINUX_SLL:
+        if caplen < 16:
+            return 'truncated'
+        ethertype = struct.unpack_from('!H', data, offset + 14)[0]
+        offset += 16
+    elif linktype == LINKTYPE_LINUX_SLL2:
+        if caplen < 20:
+            return 'truncated'
+        ethertype = struct.unpack_from('!H', data, offset)[0]
+        offset += 20
+    elif linktype in RAW_LINKTYPES:
+        if caplen < 1:
+            return 'truncated'
+        ethertype = ETHERTYPE_IPV4 if data[offset] >> 4 == 4 else ETHERTYPE_IPV6
+    elif linktype == LINKTYPE_NULL:
+        if caplen < 4:
+            return 'truncated'
+        family = struct.unpack_from('<I', data, offset)[0]
+        if family > 0xFFFF:
+            family = struct.unpack_from('>I', data, offset)[0]
+        ethertype = ETHERTYPE_IPV4 if family == 2 else ETHERTYPE_IPV6 if family in (10, 24, 28, 30) else 0
+        offset += 4
+    else:
+        return 'unsupported_link'
+
+    if ethertype == ETHERTYPE_IPV6:
+        return 'ipv6'
+    if ethertype != ETHERTYPE_IPV4:
+        return 'non_ip'
+    if offset + 20 > end:
+        return 'truncated'
+
+    header_length = (data[offset] & 0x0F) * 4
+    fragment, protocol, src, dst = struct.unpack_from('!2xHxB2xII', data, offset + 4)
+    if fragment & 0x1FFF:
+        return 'fragment'
+    transport = offset + header_length
+    if protocol in (TCP, UDP):
+        if transport + 4 > end:
+            return 'truncated'
+        sport, dport = struct.unpack_from('!HH', data, transport)
+        flags = data[transport + 13] if protocol == TCP and transport + 14 <= end else 0
+        return protocol, src, sport, dst, dport, flags
+    return protocol, src, 0, dst, 0, 0
+
+def _orient(protocol, src, sport, dst, dport, flags):
+    """Client -> server orientation of a new flow's first packet"""
+    if protocol == TCP and flags & SYN:
+        reverse = bool(flags & ACK)
+    elif protocol in (TCP, UDP):
+        # Mid-stream or connectionless: the lower port is the service
+        reverse = sport < dport
+    else:
+        reverse = False
+    return (dst, dport, src, sport) if reverse else (src, sport, dst, dport)
+
+def _format_flow(protocol, src, sport, dst, dport):
+    name = {TCP: 'tcp', UDP: 'udp', 1: 'icmp'}.get(protocol, str(protocol))
+    if protocol in (TCP, UDP):
+        return f"{ipaddress.IPv4Address(src)}:{sport} -> {ipaddress.IPv4Address(dst)}:{dport}/{name}"
+    return f"{ipaddress.IPv4Address(src)} -> {ipaddress.IPv4Address(dst)}/{name}"
+
+class PcapReplay:
+    """Replays captures against a topology's firewall policy and an optional proposed policy"""
+
+    def __init__(self, topology: Topology, policy: FirewallPolicy, proposed: Optional[FirewallPolicy] = None,
+                 max_flows: int = 262144, batch_size: int = 8192, examples: int = 5):
+        self.topology = topology
+        self.policy = policy
+        self.proposed = proposed
+        self.max_flows = max_flows
+        self.batch_size = batch_size
+        self.examples = examples
+        self._simulator = FlowSimulator(topology, policy)
+        self._table: 'OrderedDict[Tuple[int, int, int, int, int], None]' = OrderedDict()
+        self._pending: List[Tuple[int, int, int, int, int]] = []
+        self._zones = [self._zone_name(domain) for domain in topology.domains]
+        self.classes: Dict[str, Dict[str, Any]] = {}
+        self.packets = 0
+        self.flows = 0
+        self.evicted = 0
+        self.skipped = dict.fromkeys(SKIP_REASONS, 0)
+        self.seconds = 0.0
+
+    def _zone_name(self, domain) -> str:
+        if domain.name == INTERNET:
+            return INTERNET
+        vlan = self.topology.vlans.get(domain.vlan) if domain.vlan is not None else None
+        return vlan['name'] if vlan and vlan.get('name') else domain.name
+
+    def replay(self, path: str) -> 'PcapReplay':
+        """Stream one capture file through the flow table"""
+        start = time.perf_counter()
+        with _mapped(path) as data:
+            self._replay(data)
+        self.flush()
+        self.seconds += time.perf_counter() - start
+        return self
+
+    def _replay(self, data):
+        table, pending, skipped = self._table, self._pending, self.skipped
+        for linktype, offset, caplen, _ in iter_timed_packets(data):
+            self.packets += 1
+            if caplen < 0:
+                skipped['truncated'] += 1
+                break
+            parsed = parse_packet(data, linktype, offset, caplen)
+            if parsed.__class__ is str:
+                skipped[parsed] += 1
+                continue
+
+            protocol, src, sport, dst, dport, flags = parsed
+            key = (protocol, src, sport, dst, dport) if (src, sport) <= (dst, dport) else \
+                (protocol, dst, dport, src, sport)
+            if key in table:
+                table.move_to_end(key)
+                continue
+            table[key] = None
+            if len(table) > self.max_flows:
+                table.popitem(last=False)
+                self.evicted += 1
+
+            pending.append((protocol,) + _orient(protocol, src, sport, dst, dport, flags))
+            if len(pending) >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        """Classify and evaluate queued new flows"""
+        if not self._pending:
+            return
+        batch = np.array(self._pending, dtype=np.int64)
+        self._pending.clear()
+        self.flows += len(batch)
+
+        protocol = batch[:, 0].astype(np.uint8)
+        src, sport = batch[:, 1].astype(np.uint32), batch[:, 2].astype(np.uint16)
+        dst, dport = batch[:, 3].astype(np.uint32), batch[:, 4].astype(np.uint16)
+
+        simulator = self._simulator
+        src_domain, dst_domain = simulator.lookup(src), simulator.lookup(dst)
+        count = len(self.topology.domains)
+        pairs, inverse = np.unique(src_domain * count + dst_domain, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        routes = [simulator.route(int(pair) // count, int(pair) % count) for pair in pairs]
+        reachable = np.array([route is not None for route in routes])[inverse]
+        crosses = np.array([route is not None and route[1] for route in routes])[inverse]
+
+        rules = np.full(len(batch), -1, dtype=np.int64)
+        rules[crosses] = self.policy.match(src[crosses], dst[crosses], protocol[crosses], dport[crosses])
+        allowed = reachable.copy()
+        allowed[crosses] = self.policy.evaluate(src[crosses], dst[crosses], protocol[crosses], dport[crosses])
+        changed = np.zeros(len(batch), dtype=bool)
+        if self.proposed is not None:
+            proposed = reachable.copy()
+            proposed[crosses] = self.proposed.evaluate(src[crosses], dst[crosses], protocol[crosses],
+                                                       dport[crosses])
+            changed = proposed != allowed
+
+        columns = {
+            'flows': np.bincount(inverse, minlength=len(pairs)),
+            'allowed': np.bincount(inverse, weights=crosses & allowed, minlength=len(pairs)),
+            'blocked': np.bincount(inverse, weights=crosses & ~allowed, minlength=len(pairs)),
+            'switched': np.bincount(inverse, weights=reachable & ~crosses, minlength=len(pairs)),
+            'unreachable': np.bincount(inverse, weights=~reachable, minlength=len(pairs)),
+            'newly_allowed': np.bincount(inverse, weights=changed & ~allowed, minlength=len(pairs)),
+            'newly_blocked': np.bincount(inverse, weights=changed & allowed, minlength=len(pairs)),
+        }
+        # Rule hits among flows the firewall sees; column 0 is the default policy
+        width = len(self.policy) + 1
+        rule_hits = np.bincount(inverse[crosses] * width + rules[crosses] + 1,
+                                minlength=len(pairs) * width).reshape(-1, width)
+
+        for index, pair in enumerate(pairs):
+            entry = self.classes.setdefault(self._class_of(int(pair) // count, int(pair) % count), {
+                'flows': 0, 'allowed': 0, 'blocked': 0, 'switched': 0, 'unreachable': 0,
+                'newly_allowed': 0, 'newly_blocked': 0, 'rules': {}, 'changed_examples': []})
+            for column, values in columns.items():
+                entry[column] += int(values[index])
+            for rule in np.flatnonzero(rule_hits[index]):
+                rule_name = self.policy.rule_name(int(rule) - 1)
+                entry['rules'][rule_name] = entry['rules'].get(rule_name, 0) + int(rule_hits[index][rule])
+
+        if changed.any():
+            for position in np.flatnonzero(changed):
+                entry = self.classes[self._class_of(src_domain[position], dst_domain[position])]
+                if len(entry['changed_examples']) < self.examples:
+                    verdict = 'blocked' if allowed[position] else 'allowed'
+                    entry['changed_examples'].append(
+                        f"{_format_flow(*map(int, batch[position]))} now {verdict}")
+
+    def _class_of(self, src_domain, dst_domain) -> str:
+        return f"{self._zones[int(src_domain)]}->{self._zones[int(dst_domain)]}"
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'packets': self.packets,
+            'flows': self.flows,
+            'evicted': self.evicted,
+            'skipped': dict(self.skipped),
+            'classes': dict(sorted(self.classes.items())),
+            'proposed': self.proposed is not None,
+            'seconds': round(self.seconds, 6),
+            'packets_per_second': round(self.packets / self.seconds) if self.seconds else None,
+        }
+
+def iter_connection_events(path: str, max_flows: int = 262144,
+                           batch_size: int = 65536) -> Iterator[np.ndarray]:
+    """Connection attempts in a capture, as EVENT_DTYPE batches in capture order
+
+    A TCP attempt is a SYN without ACK; for other protocols it is the first
+    packet of a flow. Retransmissions and repeated packets are folded with
+    a bounded LRU table of 5-tuples. Simple packet blocks, which carry no
+    timestamp, take the previous packet's time.
+    """
+    table: 'OrderedDict[Tuple[int, int, int, int, int], None]' = OrderedDict()
+    batch = np.zeros(batch_size, dtype=EVENT_DTYPE)
+    count, last = 0, 0.0
+    with _mapped(path) as data:
+        for linktype, offset, caplen, ts in iter_timed_packets(data):
+            if caplen < 0:
+                break
+            last = ts if ts is not None else last
+            parsed = parse_packet(data, linktype, offset, caplen)
+            if parsed.__class__ is str:
+                continue
+            protocol, src, sport, dst, dport, flags = parsed
+            if protocol == TCP:
+                if flags & (SYN | ACK) != SYN:
+                    continue
+            else:
+                src, sport, dst, dport = _orient(protocol, src, sport, dst, dport, flags)
+            key = (protocol, src, sport, dst, dport)
+            if key in table:
+                table.move_to_end(key)
+                continue
+            table[key] = None
+            if len(table) > max_flows:
+                table.popitem(last=False)
+
+            batch[count] = (last, src, dst, protocol, dport)
+            count += 1
+            if count == batch_size:
+                yield batch.copy()
+                count = 0
+    if count:
+        yield batch[:count].copy()
+
+def format_report(report: Dict[str, Any]) -> str:
+    proposed = report['proposed']
+    header = f"{'class':<28} {'flows':>8} {'allowed':>8} {'blocked':>8} {'switched':>8}"
+    if proposed:
+        header += f" {'+allow':>7} {'+block':>7}"
+    lines = [header]
+    for name, entry in report['classes'].items():
+        line = (f"{name:<28} {entry['flows']:>8} {entry['allowed']:>8} {entry['blocked']:>8} "
+                f"{entry['switched']:>8}")
+        if proposed:
+            line += f" {entry['newly_allowed']:>7} {entry['newly_blocked']:>7}"
+        lines.append(line)
+        for example in entry['changed_examples']:
+            lines.append(f"    {example}")
+    skipped = ', '.join(f"{count} {reason}" for reason, count in report['skipped'].items() if count)
+    lines.append('')
+    lines.append(f"{report['packets']} packets, {report['flows']} flows in {report['seconds']}s"
+                 + (f" ({report['evicted']} evicted from the flow table)" if report['evicted'] else '')
+                 + (f"; skipped {skipped}" if skipped else ''))
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Replay captures against the site firewall policy')
+    parser.add_argument('captures', nargs='+', help='pcap or pcapng files')
+    parser.add_argument('--site', required=True, help='Site YAML configuration file')
+    parser.add_argument('--proposed', help='YAML file with a proposed rule set to compare against the site policy')
+    parser.add_argument('--max-flows', type=int, default=262144, help='Flow table size (bounds memory)')
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.site, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    proposed = None
+    if args.proposed:
+        with open(args.proposed, 'r') as f:
+            proposed = policy_from_config(yaml.safe_load(f) or {})
+
+    replay = PcapReplay(Topology.from_site(config), FirewallPolicy.from_site(config), proposed, args.max_flows)
+    try:
+        for capture in args.captures:
+            replay.replay(capture)
+    except (OSError, CaptureError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    report = replay.report()
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+
+if __name__ == "__main__":
+    main()
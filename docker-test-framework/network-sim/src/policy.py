@@ -0,0 +1,135 @@
+"""
+Firewall policy evaluation for simulated traffic
+
+Compiles the ``security.firewall`` rules of a site configuration into NumPy
+arrays of address intervals so whole batches of flows are evaluated at
+once. Rules are first-match (OPNsense "quick" rules); flows no rule matches
+get the default policy. Only IPv4 is simulated.
+"""
+
+import ipaddress
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+ANY_PROTOCOL = 0
+PROTOCOLS = {'any': ANY_PROTOCOL, 'icmp': 1, 'tcp': 6, 'udp': 17}
+MAX_ADDRESS = 2 ** 32 - 1
+
+class PolicyError(ValueError):
+    """Raised for firewall rules the simulator cannot evaluate"""
+
+def parse_address(value: Any) -> Tuple[int, int, bool]:
+    """(first, last, negated) IPv4 interval for a rule address: any, a host, a CIDR, or !CIDR"""
+    text = str(value if value is not None else 'any').strip()
+    negated = text.startswith('!')
+    text = text.lstrip('!').strip()
+    if text.lower() == 'any':
+        return 0, MAX_ADDRESS, negated
+    try:
+        network = ipaddress.ip_network(text, strict=False)
+    except ValueError:
+        raise PolicyError(f"invalid rule address: {value}")
+    if network.version != 4:
+        raise PolicyError(f"only IPv4 rules can be simulated: {value}")
+    return int(network.network_address), int(network.broadcast_address), negated
+
+def parse_ports(value: Any) -> Tuple[int, int]:
+    """(first, last) port range for a rule port: any, 443, or 8000-8100"""
+    if value is None or str(value).lower() == 'any':
+        return 0, 65535
+    text = str(value)
+    first, _, last = text.partition('-')
+    try:
+        first, last = int(first), int(last or first)
+    except ValueError:
+        raise PolicyError(f"invalid rule port: {value}")
+    if not 0 <= first <= last <= 65535:
+        raise PolicyError(f"invalid rule port range: {value}")
+    return first, last
+
+class FirewallPolicy:
+    """Compiled first-match rule set"""
+
+    def __init__(self, rules: List[Dict[str, Any]], default_policy: str = 'deny'):
+        self.rules = list(rules)
+        self.default_allow = str(default_policy).lower() in ('allow', 'pass', 'accept')
+
+        compiled = []
+        for rule in self.rules:
+            protocol = str(rule.get('protocol', 'any')).lower()
+            if protocol not in PROTOCOLS:
+                raise PolicyError(f"unsupported protocol in rule {rule.get('name')}: {protocol}")
+            action = str(rule.get('action', 'deny')).lower()
+            compiled.append(parse_address(rule.get('source')) + parse_address(rule.get('destination')) +
+                            (PROTOCOLS[protocol],) + parse_ports(rule.get('port', rule.get('destination_port'))) +
+                            (action in ('allow', 'pass', 'accept'),))
+
+        columns = list(zip(*compiled)) if compiled else [()] * 10
+        (src_first, src_last, src_negated, dst_first, dst_last, dst_negated,
+         protocol, port_first, port_last, allow) = columns
+        self.src_first = np.array(src_first, dtype=np.uint32)
+        self.src_last = np.array(src_last, dtype=np.uint32)
+        self.src_negated = np.array(src_negated, dtype=bool)
+        self.dst_first = np.array(dst_first, dtype=np.uint32)
+        self.dst_last = np.array(dst_last, dtype=np.uint32)
+        self.dst_negated = np.array(dst_negated, dtype=bool)
+        self.protocol = np.array(protocol, dtype=np.uint8)
+        self.port_first = np.array(port_first, dtype=np.uint16)
+        self.port_last = np.array(port_last, dtype=np.uint16)
+        self.allow = np.array(allow, dtype=bool)
+
+    @classmethod
+    def from_site(cls, config: Dict[str, Any]) -> 'FirewallPolicy':
+        site = config.get('site', config) if isinstance(config, dict) else {}
+        firewall = ((site or {}).get('security') or {}).get('firewall') or {}
+        return cls(firewall.get('rules') or [], firewall.get('default_policy', 'deny'))
+
+    def __len__(self) -> int:
+        return len(self.rules)
+
+    def match(self, src: np.ndarray, dst: np.ndarray, protocol: Optional[np.ndarray] = None,
+              port: Optional[np.ndarray] = None, rules: Optional[Iterable[int]] = None) -> np.ndarray:
+        """Index of the first matching rule for each flow, or -1
+
+        ``rules`` restricts matching to those rule indices (in rule order),
+        for callers that know the other rules cannot match.
+        """
+        matched = np.full(len(src), -1, dtype=np.intp)
+        pending = np.ones(len(src), dtype=bool)
+        for index in (range(len(self.rules)) if rules is None else rules):
+            if not pending.any():
+                break
+            hit = pending & (((src >= self.src_first[index]) & (src <= self.src_last[index]))
+                             != self.src_negated[index])
+            hit &= ((dst >= self.dst_first[index]) & (dst <= self.dst_last[index])) != self.dst_negated[index]
+            if protocol is not None and self.protocol[index] != ANY_PROTOCOL:
+                hit &= protocol == self.protocol[index]
+            if port is not None and (self.port_first[index], self.port_last[index]) != (0, 65535):
+                hit &= (port >= self.port_first[index]) & (port <= self.port_last[index])
+            matched[hit] = index
+            pending &= ~hit
+        return matched
+
+    def evaluate(self, src: np.ndarray, dst: np.ndarray, protocol: Optional[np.ndarray] = None,
+                 port: Optional[np.ndarray] = None) -> np.ndarray:
+        """Whether each flow is allowed"""
+        matched = self.match(src, dst, protocol, port)
+        allowed = np.full(len(matched), self.default_allow)
+        hit = matched >= 0
+        allowed[hit] = self.allow[matched[hit]]
+        return allowed
+
+    def rule_name(self, index: int) -> str:
+        return self.rules[index].get('name', f"rule {index}") if index >= 0 else 'default policy'
+
+def policy_from_config(config: Any) -> FirewallPolicy:
+    """Policy from a site configuration, a ``firewall`` mapping, a ``{rules, default_policy}`` mapping or a rule list"""
+    if isinstance(config, list):
+        return FirewallPolicy(config)
+    if not isinstance(config, dict):
+        raise PolicyError("firewall policy must be a mapping or a list of rules")
+    if 'site' in config or 'security' in config:
+        return FirewallPolicy.from_site(config)
+    firewall = config.get('firewall', config)
+    return FirewallPolicy(firewall.get('rules') or [], firewall.get('default_policy', 'deny'))
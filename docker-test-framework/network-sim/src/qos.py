@@ -0,0 +1,423 @@
+"""
+Traffic shaping / QoS simulation
+
+Models a shaper on one physical link of the site (a 2.5gbe WAN or a 10gbe
+trunk): each traffic class, selected by VLAN or device type, has its own
+queue behind a token bucket (`rate`, `burst`), and the link is shared
+between the backlogged queues by weighted fair queueing (`weight`), as
+OPNsense pipes and weighted queues do. The `fifo` scheduler is the
+unshaped baseline: one shared queue served in arrival order.
+
+Load is synthetic: every class has a number of on/off sources with a peak
+rate and a duty cycle (cameras are constant bit rate, guests and bulk
+transfers bursty). Time advances in fixed slots; in each slot arrivals join
+their queue, tail-dropping beyond the queue size, and the link capacity is
+water-filled across queues by weight, capped by each queue's tokens.
+Queueing delay is exact for the fluid model: bits that arrived by slot t
+leave at the first slot whose cumulative departures reach them.
+
+Which classes contend on a link comes from the topology: a class is on
+the link when its routed path from its VLAN to its destination crosses
+the interface or one of its bridges.
+"""
+
+import argparse
+import json
+import re
+import sys
+import time
+from collections import namedtuple
+from dataclasses import asdict, dataclass, field, fields
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import yaml
+
+from .flows import PROFILES, PROFILE_INDEX, Scenario, link_bps
+from .topology import INTERNET, Topology, TopologyError
+
+SCHEDULERS = ('wfq', 'fifo')
+PUBLIC_DESTINATION = '1.1.1.1'
+
+Link = namedtuple('Link', 'interface bridges speed capacity_bps')
+
+@dataclass
+class Shaper:
+    """Token bucket and fair-queue settings of one class"""
+    rate_bps: Optional[float] = None    # token bucket rate; None leaves the class unlimited
+    burst_bytes: float = 256 * 1024
+    weight: float = 1.0
+    queue_bytes: float = 1024 * 1024
+    latency_target_ms: Optional[float] = None
+
+@dataclass
+class Load:
+    """Synthetic on/off sources of one class"""
+    sources: int = 1
+    peak_bps: float = 1e6
+    duty: float = 1.0                   # fraction of time a source is sending
+    mean_on: float = 1.0                # mean seconds a source stays on
+
+    @property
+    def mean_bps(self) -> float:
+        return self.sources * self.peak_bps * self.duty
+
+@dataclass
+class TrafficClass:
+    name: str
+    vlan: Any = None                    # VLAN name or id
+    device_type: Optional[str] = None   # e.g. 'camera'; devices of this type select their VLANs
+    destination: str = INTERNET         # 'internet' or a VLAN name
+    shaper: Shaper = field(default_factory=Shaper)
+    load: Load = field(default_factory=Load)
+
+def default_classes() -> List[TrafficClass]:
+    """Camera uploads, guest browsing, IoT cloud calls and bulk transfers from the main VLAN
+
+    Source counts follow the flow simulator's Scenario; per-source rates its
+    traffic profiles. Together they offer slightly more than a 2.5gbe WAN.
+    """
+    scenario = Scenario()
+    camera = PROFILES[PROFILE_INDEX['camera_rtsp']]
+    guest = PROFILES[PROFILE_INDEX['guest_internet']]
+    iot = PROFILES[PROFILE_INDEX['iot_cloud']]
+    return [
+        TrafficClass('cameras', vlan='cameras', device_type='camera', shaper=Shaper(weight=4),
+                     load=Load(scenario.cameras, camera.bps)),
+        TrafficClass('guest', vlan='guest', shaper=Shaper(weight=1),
+                     load=Load(scenario.guest_clients * scenario.guest_sessions, guest.bps * 5, 0.2, 0.5)),
+        TrafficClass('iot', vlan='iot', shaper=Shaper(weight=1),
+                     load=Load(scenario.iot_devices * scenario.iot_sessions, iot.bps)),
+        TrafficClass('main', vlan='main', shaper=Shaper(weight=4), load=Load(4, 800e6, 0.5, 2.0)),
+    ]
+
+def _rate(value: Any) -> Optional[float]:
+    """Bits per second from a number or a string such as '400mbit' or '2.5g'"""
+    if value is None or isinstance(value, (int, float)):
+        return value
+    rate = link_bps(value)
+    if rate is None:
+        match = re.fullmatch(r'\s*([\d.]+)\s*(k?)(bit|bps)?\s*', str(value).lower())
+        if not match:
+            raise ValueError(f"invalid rate: {value}")
+        rate = float(match.group(1)) * (1e3 if match.group(2) else 1)
+    return rate
+
+def _size(value: Any) -> float:
+    """Bytes from a number or a string such as '64k', '2m' or '1.5mb'"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r'\s*([\d.]+)\s*([kmg]?)i?b?\s*', str(value).lower())
+    if not match:
+        raise ValueError(f"invalid size: {value}")
+    return float(match.group(1)) * 1024 ** ' kmg'.index(match.group(2) or ' ')
+
+def _mapping(value: Any, what: str) -> Dict[str, Any]:
+    if value is None:
+        return {}
+    if not isinstance(value, dict):
+        raise ValueError(f"{what} must be a mapping, not {type(value).__name__}")
+    return value
+
+def _update(instance, values: Dict[str, Any], converters: Dict[str, Any]):
+    names = {item.name for item in fields(instance)}
+    for key, value in values.items():
+        name = {'rate': 'rate_bps', 'burst': 'burst_bytes', 'queue': 'queue_bytes', 'peak': 'peak_bps'}.get(key, key)
+        if name not in names:
+            raise ValueError(f"unknown setting: {key}")
+        try:
+            setattr(instance, name, converters.get(name, lambda item: item)(value))
+        except TypeError:
+            raise ValueError(f"invalid {key}: {value!r}")
+
+def load_classes(config: Optional[Dict[str, Any]]) -> List[TrafficClass]:
+    """Traffic classes from a ``{classes: {name: {...}}}`` mapping, merged onto the defaults
+
+    Keys of a class are vlan, device_type, destination, the shaper settings
+    (rate, burst, weight, queue, latency_target_ms) and a ``load`` mapping
+    (sources, peak, duty, mean_on). A class set to null is removed.
+    """
+    classes = {traffic_class.name: traffic_class for traffic_class in default_classes()}
+    shaper_converters = {'rate_bps': _rate, 'burst_bytes': _size, 'queue_bytes': _size, 'weight': float}
+    load_converters = {'peak_bps': _rate, 'sources': int, 'duty': float, 'mean_on': float}
+    for name, settings in _mapping(_mapping(config, 'traffic shaping').get('classes'), 'classes').items():
+        if settings is None:
+            classes.pop(name, None)
+            continue
+        traffic_class = classes.setdefault(name, TrafficClass(name))
+        settings = dict(_mapping(settings, f"class {name}"))
+        _update(traffic_class.load, _mapping(settings.pop('load', None), f"class {name} load"), load_converters)
+        for key in ('vlan', 'device_type', 'destination'):
+            if key in settings:
+                setattr(traffic_class, key, settings.pop(key))
+        _update(traffic_class.shaper, settings, shaper_converters)
+    return list(classes.values())
+
+def site_shaping(config: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """The site's ``security.traffic_shaping`` mapping, if any"""
+    site = config.get('site', config) if isinstance(config, dict) else {}
+    security = site.get('security') if isinstance(site, dict) else None
+    return security.get('traffic_shaping') if isinstance(security, dict) else None
+
+def _vlan_ids(topology: Topology, traffic_class: TrafficClass) -> List[int]:
+    vlans = []
+    if traffic_class.vlan is not None:
+        vlans += [vlan_id for vlan_id, vlan in topology.vlans.items()
+                  if traffic_class.vlan in (vlan_id, vlan['name'])]
+    if traffic_class.device_type:
+        vlans += [node.attrs['vlan'] for node in topology.nodes
+                  if node.kind == 'device' and node.attrs.get('type') == traffic_class.device_type
+                  and node.attrs.get('vlan') is not None]
+    return sorted(set(vlans))
+
+def _host(topology: Topology, vlan: Any, offset: int) -> Optional[str]:
+    for vlan_id, entry in topology.vlans.items():
+        subnet = entry['subnet']
+        if vlan in (vlan_id, entry['name']) and subnet is not None and subnet.num_addresses > offset + 1:
+            return str(subnet.network_address + offset)
+    return None
+
+def site_link(topology: Topology, name: str) -> Link:
+    """The physical link behind an interface or bridge name, with its capacity"""
+    node = topology.node(name) if name in topology.index else None
+    if node is not None and node.kind == 'bridge':
+        node = topology.node(node.attrs['interface']) if node.attrs.get('interface') in topology.index else None
+    if node is None or node.kind != 'interface':
+        raise TopologyError(f"{name} is not an interface or a bridge with a physical interface")
+    capacity = link_bps(node.attrs.get('speed'))
+    if capacity is None:
+        raise TopologyError(f"interface {node.name} has no speed (e.g. type: 2.5gbe)")
+    bridges = tuple(other.name for other in topology.nodes
+                    if other.kind == 'bridge' and other.attrs.get('interface') == node.name)
+    return Link(node.name, bridges, node.attrs.get('speed'), capacity)
+
+def crosses(topology: Topology, traffic_class: TrafficClass, link: Link) -> bool:
+    """Whether a class's traffic is routed over the link from any of its VLANs"""
+    on_link = {link.interface, *link.bridges}
+    if traffic_class.destination == INTERNET:
+        destination = PUBLIC_DESTINATION
+    else:
+        destination = _host(topology, traffic_class.destination, 100)
+        if destination is None:
+            raise TopologyError(f"class {traffic_class.name}: unknown destination {traffic_class.destination}")
+    for vlan in _vlan_ids(topology, traffic_class):
+        source = _host(topology, vlan, 20)
+        path = topology.path(source, destination) if source is not None else None
+        if path is not None and on_link & set(path.nodes):
+            return True
+    return False
+
+def offered_load(load: Load, slots: int, slot: float, rng: np.random.Generator) -> np.ndarray:
+    """Bits offered per slot by a class's on/off sources (Markov-modulated, started in steady state)"""
+    if load.duty >= 1:
+        return np.full(slots, load.sources * load.peak_bps * slot)
+    if load.duty <= 0 or load.sources <= 0:
+        return np.zeros(slots)
+    leave_on = min(1.0, slot / load.mean_on)
+    leave_off = min(1.0, leave_on * load.duty / (1 - load.duty))
+    state = rng.random(load.sources) < load.duty
+    active = np.empty(slots)
+    draws = rng.random((slots, load.sources))
+    for index in range(slots):
+        active[index] = state.sum()
+        state = np.where(state, draws[index] >= leave_on, draws[index] < leave_off)
+    return active * load.peak_bps * slot
+
+def _water_fill(capacity: float, demand: np.ndarray, weights: np.ndarray) -> np.ndarray:
+    """Weighted max-min share of `capacity` with each queue capped at its demand"""
+    served = np.zeros(len(demand))
+    open_ = demand > 0
+    while capacity > 1e-9 and open_.any():
+        share = capacity * weights * open_ / weights[open_].sum()
+        full = open_ & (demand - served <= share)
+        if not full.any():
+            served += share
+            break
+        grant = (demand - served) * full
+        served += grant
+        capacity -= grant.sum()
+        open_ &= ~full
+    return served
+
+class ShaperSimulation:
+    """Slotted fluid simulation of the traffic classes sharing one link"""
+
+    def __init__(self, topology: Topology, link: str, classes: Optional[Sequence[TrafficClass]] = None,
+                 scheduler: str = 'wfq', slot: float = 0.001, link_buffer_bytes: float = 4 * 1024 * 1024):
+        if scheduler not in SCHEDULERS:
+            raise ValueError(f"scheduler must be one of {', '.join(SCHEDULERS)}")
+        if not slot > 0:
+            raise ValueError("slot must be positive")
+        self.topology = topology
+        self.link = site_link(topology, link)
+        self.scheduler = scheduler
+        self.slot = slot
+        self.link_buffer_bytes = link_buffer_bytes
+        classes = list(classes if classes is not None else default_classes())
+        self.classes = [traffic_class for traffic_class in classes if crosses(topology, traffic_class, self.link)]
+        self.bypassing = [traffic_class.name for traffic_class in classes if traffic_class not in self.classes]
+
+    def run(self, seconds: float = 10.0, seed: int = 0) -> Dict[str, Any]:
+        if not seconds > 0:
+            raise ValueError("seconds must be positive")
+        start_clock = time.perf_counter()
+        slots = max(1, int(round(seconds / self.slot)))
+        rng = np.random.default_rng(seed)
+        count = len(self.classes)
+        arrivals = np.array([offered_load(traffic_class.load, slots, self.slot, rng)
+                             for traffic_class in self.classes]).reshape(count, slots)
+
+        shapers = [traffic_class.shaper for traffic_class in self.classes]
+        weights = np.array([shaper.weight for shaper in shapers], dtype=float)
+        rates = np.array([shaper.rate_bps if shaper.rate_bps else np.inf for shaper in shapers])
+        bursts = np.array([shaper.burst_bytes * 8 for shaper in shapers], dtype=float)
+        buffers = np.array([shaper.queue_bytes * 8 for shaper in shapers], dtype=float)
+        shaped = self.scheduler == 'wfq'
+        capacity = self.link.capacity_bps * self.slot
+
+        # Unlimited classes never run out of tokens
+        bursts[np.isinf(rates)] = np.inf
+        tokens = bursts.copy()
+        backlog = np.zeros(count)
+        admitted = np.zeros((count, slots))
+        served = np.zeros((count, slots))
+        dropped = np.zeros(count)
+        for index in range(slots):
+            backlog += arrivals[:, index]
+            if shaped:
+                overflow = np.maximum(backlog - buffers, 0)
+            else:
+                # One shared FIFO buffer: the overflow falls on classes in proportion to their backlog
+                total = backlog.sum()
+                excess = max(total - self.link_buffer_bytes * 8, 0.0)
+                overflow = backlog * (excess / total) if excess else np.zeros(count)
+            backlog -= overflow
+            dropped += overflow
+            admitted[:, index] = arrivals[:, index] - overflow
+
+            if shaped:
+                eligible = np.minimum(backlog, tokens)
+                sent = _water_fill(capacity, eligible, weights)
+                tokens = np.minimum(tokens - sent + rates * self.slot, bursts)
+            else:
+                total = backlog.sum()
+                sent = backlog * min(1.0, capacity / total) if total else np.zeros(count)
+            backlog -= sent
+            served[:, index] = sent
+
+        report_classes = {}
+        for position, traffic_class in enumerate(self.classes):
+            delays = _fifo_delays(admitted[position], served[position]) * self.slot * 1000
+            weights_ = admitted[position][np.isfinite(delays)]
+            finite = delays[np.isfinite(delays)]
+            offered = arrivals[position].sum()
+            entry = {
+                'vlans': _vlan_ids(self.topology, traffic_class),
+                'shaper': asdict(traffic_class.shaper),
+                'offered_bps': offered / seconds,
+                'throughput_bps': served[position].sum() / seconds,
+                'dropped_bps': dropped[position] / seconds,
+                'loss': round(float(dropped[position] / offered), 6) if offered else 0.0,
+                'latency_ms': _percentiles(finite, weights_),
+                'backlog_bytes': float(backlog[position] / 8),
+            }
+            target = traffic_class.shaper.latency_target_ms
+            entry['meets_target'] = None if target is None else \
+                entry['latency_ms']['p99'] is not None and entry['latency_ms']['p99'] <= target
+            report_classes[traffic_class.name] = entry
+
+        throughput = served.sum() / seconds
+        return {
+            'site': self.topology.name,
+            'link': {'interface': self.link.interface, 'bridges': list(self.link.bridges), 'speed': self.link.speed,
+                     'capacity_bps': self.link.capacity_bps},
+            'scheduler': self.scheduler,
+            'seconds': seconds,
+            'slot': self.slot,
+            'offered_bps': float(arrivals.sum() / seconds),
+            'throughput_bps': float(throughput),
+            'utilization': round(float(throughput / self.link.capacity_bps), 4),
+            'classes': report_classes,
+            'bypassing': self.bypassing,
+            'meets_targets': all(entry['meets_target'] is not False for entry in report_classes.values()),
+            'elapsed': round(time.perf_counter() - start_clock, 6),
+        }
+
+def _fifo_delays(admitted: np.ndarray, served: np.ndarray) -> np.ndarray:
+    """Slots each slot's admitted bits wait until served (inf if still queued at the end)"""
+    arrived = np.cumsum(admitted)
+    departed = np.cumsum(served)
+    leaves = np.searchsorted(departed, arrived * (1 - 1e-9), side='left')
+    delays = (leaves - np.arange(len(admitted))).astype(float)
+    delays[leaves >= len(departed)] = np.inf
+    return np.maximum(delays, 0)
+
+def _percentiles(delays: np.ndarray, weights: np.ndarray) -> Dict[str, Optional[float]]:
+    """Bit-weighted mean, median, p99 and maximum delay"""
+    keep = weights > 0
+    delays, weights = delays[keep], weights[keep]
+    if not len(delays):
+        return {'mean': None, 'p50': None, 'p99': None, 'max': None}
+    order = np.argsort(delays, kind='stable')
+    delays, cumulative = delays[order], np.cumsum(weights[order])
+    total = cumulative[-1]
+
+    def quantile(fraction):
+        return round(float(delays[np.searchsorted(cumulative, fraction * total)]), 3)
+
+    return {'mean': round(float(np.average(delays, weights=weights)), 3), 'p50': quantile(0.5),
+            'p99': quantile(0.99), 'max': round(float(delays[-1]), 3)}
+
+def format_report(report: Dict[str, Any]) -> str:
+    link = report['link']
+    lines = [f"{link['interface']} ({link['speed']}, {link['capacity_bps'] / 1e9:g} Gbps) with {report['scheduler']}: "
+             f"{report['offered_bps'] / 1e6:.0f} Mbps offered, {report['throughput_bps'] / 1e6:.0f} Mbps carried "
+             f"({report['utilization']:.1%})", '',
+             f"{'class':<10} {'offered':>9} {'carried':>9} {'loss':>7} {'p50 ms':>8} {'p99 ms':>8} {'target':>7}"]
+    for name, entry in report['classes'].items():
+        latency = entry['latency_ms']
+        p50, p99 = (f"{value:.1f}" if value is not None else '-' for value in (latency['p50'], latency['p99']))
+        target = {None: '', True: 'ok', False: 'MISSED'}[entry['meets_target']]
+        lines.append(f"{name:<10} {entry['offered_bps'] / 1e6:>9.1f} {entry['throughput_bps'] / 1e6:>9.1f} "
+                     f"{entry['loss']:>7.2%} {p50:>8} {p99:>8} {target:>7}")
+    if report['bypassing']:
+        lines.append(f"not on this link: {', '.join(report['bypassing'])}")
+    lines.append(f"{report['seconds']:g}s simulated in {report['elapsed']}s")
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Simulate per-class traffic shaping on a site link')
+    parser.add_argument('site_config', help='Site YAML configuration file')
+    parser.add_argument('--link', default='eth0', help='Interface or bridge to simulate (default: eth0)')
+    parser.add_argument('--shaper', help="YAML file with a 'classes' mapping (default: the site's "
+                                         "security.traffic_shaping)")
+    parser.add_argument('--scheduler', choices=SCHEDULERS, default='wfq')
+    parser.add_argument('--seconds', type=float, default=10.0)
+    parser.add_argument('--slot', type=float, default=0.001, help='Slot length in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    with open(args.site_config, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    shaping = site_shaping(config)
+    try:
+        if args.shaper:
+            with open(args.shaper, 'r') as f:
+                shaping = yaml.safe_load(f) or {}
+        simulation = ShaperSimulation(Topology.from_site(config), args.link, load_classes(shaping),
+                                      args.scheduler, args.slot)
+        report = simulation.run(args.seconds, args.seed)
+    except (TopologyError, ValueError, yaml.YAMLError) as e:
+        print(f"Error: {e}")
+        sys.exit(2)
+
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+    sys.exit(0 if report['meets_targets'] else 1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,530 @@
+"""
+Network topology model built from a site YAML configuration
+
+Nodes (physical interfaces, bridges, VMs and their NICs, devices, WAN
+uplinks and the internet) are stored in an adjacency-indexed graph. Each
+link records which VLAN on one end maps to which VLAN on the other, so
+access ports, trunks and native VLANs are all expressed the same way.
+
+L2 broadcast domains are precomputed with union-find over (node, vlan)
+states. Routers (the OPNsense VM and the WAN uplinks) join domains at L3;
+shortest L3 paths between endpoints are found on the domain/router graph
+and cached.
+"""
+
+import ipaddress
+from collections import deque, namedtuple
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import yaml
+
+Node = namedtuple('Node', 'id name kind attrs')
+# One side of a link: traffic on vlan `a_vlan` at node a is vlan `b_vlan` at node b
+Link = namedtuple('Link', 'node pairs')
+Domain = namedtuple('Domain', 'id name vlan subnet gateway members')
+Path = namedtuple('Path', 'source destination nodes domains routers')
+
+NATIVE = None               # untagged traffic
+UPSTREAM = 'upstream'       # state of a WAN uplink facing the internet
+
+FIREWALL_VM = 'opnsense'
+WAN_ROLES = ('wan', 'wan_backup')
+INTERNET = 'internet'
+
+class TopologyError(ValueError):
+    """Raised for site configurations the topology model cannot represent"""
+
+class _UnionFind:
+    def __init__(self):
+        self.parent: Dict[Any, Any] = {}
+
+    def add(self, item):
+        self.parent.setdefault(item, item)
+
+    def find(self, item):
+        parent = self.parent
+        root = item
+        while parent[root] != root:
+            root = parent[root]
+        while parent[item] != root:
+            parent[item], item = root, parent[item]
+        return root
+
+    def union(self, a, b):
+        self.add(a)
+        self.add(b)
+        root_a, root_b = self.find(a), self.find(b)
+        if root_a != root_b:
+            self.parent[root_b] = root_a
+
+class Topology:
+    """Graph of one site's network, with precomputed L2 domains and cached L3 paths"""
+
+    def __init__(self, name: str = 'site'):
+        self.name = name
+        self.nodes: List[Node] = []
+        self.index: Dict[str, int] = {}
+        self.adj: List[List[Link]] = []
+        self.vlans: Dict[int, Dict[str, Any]] = {}
+        self.routers: Dict[int, List[Tuple[int, Any]]] = {}
+        self.domains: List[Domain] = []
+        self.state_domain: Dict[Tuple[int, Any], int] = {}
+        self._state_adj: Dict[Tuple[int, Any], List[Tuple[int, Any]]] = {}
+        self._addresses: Dict[int, Tuple[int, Any]] = {}
+        self._subnets: List[Tuple[Any, int]] = []
+        self._anchors: Dict[int, Tuple[int, Any]] = {}
+        self._paths: Dict[Tuple[int, int], Optional[Path]] = {}
+        self._domain_paths: Dict[Tuple[int, int], Optional[List[Any]]] = {}
+        self.disabled: set = set()
+
+    # -- construction -------------------------------------------------------------
+
+    def add_node(self, name: str, kind: str, **attrs) -> int:
+        if name in self.index:
+            raise TopologyError(f"duplicate node name: {name}")
+        node_id = len(self.nodes)
+        self.nodes.append(Node(node_id, name, kind, attrs))
+        self.index[name] = node_id
+        self.adj.append([])
+        return node_id
+
+    def add_link(self, a: int, b: int, pairs: Iterable[Tuple[Any, Any]]):
+        pairs = tuple(pairs)
+        self.adj[a].append(Link(b, pairs))
+        self.adj[b].append(Link(a, tuple((b_vlan, a_vlan) for a_vlan, b_vlan in pairs)))
+
+    def add_router(self, router: int, legs: Iterable[Tuple[int, Any]]):
+        """Mark a node as routing between the given (port node, vlan) states"""
+        self.routers.setdefault(router, []).extend(legs)
+
+    @classmethod
+    def from_site(cls, config: Dict[str, Any]) -> 'Topology':
+        """Build the topology of a parsed site file (``{'site': {...}}`` or the site mapping)"""
+        site = config.get('site', config) if isinstance(config, dict) else None
+        if not isinstance(site, dict):
+            raise TopologyError("site configuration must be a mapping")
+
+        topology = cls(site.get('name') or 'site')
+        network = (site.get('hardware') or {}).get('network') or {}
+
+        for vlan in network.get('vlans') or ():
+            try:
+                subnet = ipaddress.ip_network(str(vlan.get('subnet')), strict=False)
+            except ValueError:
+                subnet = None
+            topology.vlans[vlan['id']] = {'name': vlan.get('name'), 'subnet': subnet,
+                                          'gateway': vlan.get('gateway')}
+
+        internet = topology.add_node(INTERNET, 'internet')
+
+        interfaces = {}
+        for interface in network.get('interfaces') or ():
+            vlans = interface.get('vlan') or []
+            node = topology.add_node(interface['name'], 'interface', role=interface.get('role'),
+                                     speed=interface.get('type'), vlans=tuple(vlans))
+            interfaces[interface['name']] = node
+            if interface.get('role') in WAN_ROLES:
+                # Each WAN link has its own upstream gateway routing to the internet
+                uplink = topology.add_node(f"uplink-{interface['name']}", 'uplink', role=interface.get('role'),
+                                           interface=interface['name'])
+                topology.add_link(uplink, node, [(NATIVE, NATIVE)])
+                topology.add_link(uplink, internet, [(UPSTREAM, NATIVE)])
+                topology.add_router(uplink, [(uplink, NATIVE), (uplink, UPSTREAM)])
+
+        bridges = {}
+        for bridge in network.get('bridges') or ():
+            vlans = tuple(bridge.get('vlans') or ())
+            node = topology.add_node(bridge['name'], 'bridge', vlans=vlans, description=bridge.get('description'),
+                                     interface=bridge.get('interface'))
+            bridges[bridge['name']] = node
+            physical = interfaces.get(bridge.get('interface'))
+            if physical is not None:
+                carried = set(topology.nodes[physical].attrs['vlans']) & set(vlans)
+                topology.add_link(node, physical, [(NATIVE, NATIVE)] + [(vlan, vlan) for vlan in sorted(carried)])
+
+        for vm_name, vm in (site.get('vm_templates') or {}).items():
+            if not vm.get('enabled', True):
+                continue
+            vm_node = topology.add_node(vm_name, 'vm', cores=vm.get('cores'), memory=vm.get('memory'))
+            legs = []
+            for index, nic in enumerate(vm.get('network') or ()):
+                nic_node = topology.add_node(f"{vm_name}:net{index}", 'nic', vm=vm_name, vlan=nic.get('vlan'),
+                                             model=nic.get('model'), promiscuous=bool(nic.get('promiscuous')))
+                topology.add_link(vm_node, nic_node, ())
+                bridge = bridges.get(nic.get('bridge'))
+                if bridge is None:
+                    continue
+                if nic.get('vlan') is not None:
+                    topology.add_link(nic_node, bridge, [(NATIVE, nic['vlan'])])
+                    legs.append((nic_node, NATIVE))
+                else:
+                    # Untagged NIC on a VLAN-aware bridge is a trunk: one subinterface per VLAN
+                    trunk = topology.nodes[bridge].attrs['vlans']
+                    topology.add_link(nic_node, bridge, [(NATIVE, NATIVE)] + [(vlan, vlan) for vlan in trunk])
+                    legs.extend([(nic_node, NATIVE)] + [(nic_node, vlan) for vlan in trunk])
+            if vm_name == FIREWALL_VM:
+                topology.add_router(vm_node, legs)
+
+        devices = site.get('devices') or config.get('devices') or {}
+        for device_name, device in devices.items():
+            topology._add_device(device_name, device, bridges)
+
+        topology._compute_domains()
+        return topology
+
+    @classmethod
+    def from_networks(cls, config: Dict[str, Any]) -> 'Topology':
+        """Build a topology from the legacy ``{networks, devices}`` format of the test runner
+
+        Every network is a flat segment. Devices with more than one interface
+        (or of type ``firewall``) route between them, and networks named
+        ``wan*`` get an uplink to the internet.
+        """
+        topology = cls(config.get('name') or 'site')
+        internet = topology.add_node(INTERNET, 'internet')
+
+        segments = {}
+        for vlan_id, network in enumerate(config.get('networks') or (), start=1):
+            try:
+                subnet = ipaddress.ip_network(str(network.get('subnet')), strict=False)
+            except ValueError:
+                subnet = None
+            topology.vlans[vlan_id] = {'name': network['name'], 'subnet': subnet, 'gateway': None}
+            segment = topology.add_node(network['name'], 'segment', vlan=vlan_id)
+            segments[network['name']] = (segment, vlan_id)
+            if network['name'].startswith('wan'):
+                uplink = topology.add_node(f"uplink-{network['name']}", 'uplink', role='wan',
+                                           interface=network['name'])
+                topology.add_link(uplink, segment, [(NATIVE, vlan_id)])
+                topology.add_link(uplink, internet, [(UPSTREAM, NATIVE)])
+                topology.add_router(uplink, [(uplink, NATIVE), (uplink, UPSTREAM)])
+
+        for device in config.get('devices') or ():
+            host = topology.add_node(device['name'], 'vm', type=device.get('type'))
+            legs = []
+            for interface in device.get('interfaces') or ():
+                if interface.get('network') not in segments:
+                    continue
+                segment, vlan_id = segments[interface['network']]
+                nic = topology.add_node(f"{device['name']}:{interface['network']}", 'nic', vm=device['name'],
+                                        vlan=vlan_id, ip=interface.get('ip'))
+                topology.add_link(host, nic, ())
+                topology.add_link(nic, segment, [(NATIVE, vlan_id)])
+                legs.append((nic, NATIVE))
+                if device.get('type') == 'firewall' and interface.get('ip'):
+                    topology.vlans[vlan_id]['gateway'] = interface['ip']
+            if device.get('type') == 'firewall' or len(legs) > 1:
+                topology.add_router(host, legs)
+
+        topology._compute_domains()
+        return topology
+
+    def _add_device(self, name: str, device: Dict[str, Any], bridges: Dict[str, int]):
+        vlan = device.get('vlan_id')
+        address = device.get('ip_address')
+        if vlan is None and address is not None:
+            vlan = self._vlan_of(ipaddress.ip_address(str(address)))
+
+        node = self.add_node(name, 'device', type=device.get('type'), vlan=vlan, ip=address,
+                             mac=device.get('mac_address'))
+        if vlan is None:
+            return
+
+        trunking = [bridge for bridge in bridges.values() if vlan in self.nodes[bridge].attrs['vlans']]
+        if trunking:
+            self.add_link(node, trunking[0], [(NATIVE, vlan)])
+        else:
+            # A VLAN no bridge carries is modelled as an isolated segment
+            segment_name = f"segment-vlan{vlan}"
+            segment = self.index.get(segment_name)
+            if segment is None:
+                segment = self.add_node(segment_name, 'segment', vlan=vlan)
+            self.add_link(node, segment, [(NATIVE, vlan)])
+
+    def _vlan_of(self, address) -> Optional[int]:
+        for vlan_id, vlan in self.vlans.items():
+            if vlan['subnet'] is not None and address in vlan['subnet']:
+                return vlan_id
+        return None
+
+    # -- precomputation -----------------------------------------------------------
+
+    def _compute_domains(self):
+        """Group (node, vlan) states into L2 broadcast domains and index addresses"""
+        union = _UnionFind()
+        state_adj: Dict[Tuple[int, Any], List[Tuple[int, Any]]] = {}
+        for node_id, links in enumerate(self.adj):
+            if node_id in self.disabled:
+                continue
+            if self.nodes[node_id].kind != 'vm':
+                # VMs only reach the network through their NICs
+                union.add((node_id, NATIVE))
+            for link in links:
+                if link.node in self.disabled:
+                    continue
+                for local_vlan, remote_vlan in link.pairs:
+                    a, b = (node_id, local_vlan), (link.node, remote_vlan)
+                    union.union(a, b)
+                    state_adj.setdefault(a, []).append(b)
+        self._state_adj = state_adj
+
+        roots: Dict[Any, List[Tuple[int, Any]]] = {}
+        for state in union.parent:
+            roots.setdefault(union.find(state), []).append(state)
+
+        self.domains = []
+        self.state_domain = {}
+        self._anchors = {}
+        for states in sorted(roots.values(), key=lambda states: min(map(_state_key, states))):
+            domain_id = len(self.domains)
+            vlan = self._domain_vlan(states)
+            members = tuple(sorted(self.nodes[node].name for node, _ in states
+                                   if self.nodes[node].kind in ('device', 'nic', 'internet', 'uplink')))
+            info = self.vlans.get(vlan, {}) if vlan is not None else {}
+            self.domains.append(Domain(domain_id, self._domain_name(states, vlan), vlan,
+                                       info.get('subnet'), info.get('gateway'), members))
+            for state in states:
+                self.state_domain[state] = domain_id
+            # Addresses with no known owner attach to the domain's bridge or segment
+            switches = [state for state in states if self.nodes[state[0]].kind in ('bridge', 'segment')]
+            if switches:
+                self._anchors[domain_id] = min(switches, key=_state_key)
+
+        self._index_addresses()
+        self._paths.clear()
+        self._domain_paths.clear()
+
+    def _domain_vlan(self, states) -> Optional[int]:
+        tags = {vlan for node, vlan in states if self.nodes[node].kind == 'bridge' and isinstance(vlan, int)}
+        tags |= {vlan for node, vlan in states if self.nodes[node].kind == 'segment' and isinstance(vlan, int)}
+        return min(tags) if tags else None
+
+    def _domain_name(self, states, vlan) -> str:
+        nodes = [self.nodes[node] for node, _ in states]
+        if any(node.kind == 'internet' for node in nodes):
+            return INTERNET
+        bridges = sorted(node.name for node in nodes if node.kind == 'bridge')
+        if bridges:
+            return f"{bridges[0]}.{vlan}" if vlan is not None else bridges[0]
+        segments = sorted(node.name for node in nodes if node.kind == 'segment')
+        if segments:
+            return segments[0]
+        return min(node.name for node in nodes)
+
+    def _index_addresses(self):
+        """Map addresses to (node, vlan) states: devices, router legs on each VLAN's gateway"""
+        self._addresses = {}
+        for node in self.nodes:
+            if node.kind in ('device', 'nic') and node.attrs.get('ip'):
+                try:
+                    self._addresses[int(ipaddress.ip_address(str(node.attrs['ip'])))] = (node.id, NATIVE)
+                except ValueError:
+                    pass
+
+        for router, legs in self.routers.items():
+            for leg in legs:
+                if leg not in self.state_domain:
+                    continue
+                domain = self.domains[self.state_domain[leg]]
+                if domain.gateway:
+                    try:
+                        self._addresses.setdefault(int(ipaddress.ip_address(str(domain.gateway))), leg)
+                    except ValueError:
+                        pass
+
+        self._subnets = sorted(
+            ((domain.subnet, domain.id) for domain in self.domains if domain.subnet is not None),
+            key=lambda item: item[0].prefixlen, reverse=True)
+
+    # -- queries ------------------------------------------------------------------
+
+    def node(self, name: str) -> Node:
+        return self.nodes[self.index[name]]
+
+    def neighbors(self, name: str) -> List[str]:
+        return [self.nodes[link.node].name for link in self.adj[self.index[name]]]
+
+    def domain_of(self, name: str, vlan: Any = NATIVE) -> Domain:
+        return self.domains[self.state_domain[(self.index[name], vlan)]]
+
+    def vlan_domain(self, vlan: int) -> Optional[Domain]:
+        """L2 domain of a VLAN (the one the firewall is attached to if there are several)"""
+        candidates = [domain for domain in self.domains if domain.vlan == vlan]
+        routed = {self.state_domain[leg] for legs in self.routers.values() for leg in legs if leg in self.state_domain}
+        for domain in candidates:
+            if domain.id in routed:
+                return domain
+        return candidates[0] if candidates else None
+
+    def domain_bridges(self) -> Dict[int, List[str]]:
+        """Names of the bridges (and segments) switching each L2 domain"""
+        bridges: Dict[int, set] = {}
+        for (node, _), domain_id in self.state_domain.items():
+            if self.nodes[node].kind in ('bridge', 'segment'):
+                bridges.setdefault(domain_id, set()).add(self.nodes[node].name)
+        return {domain_id: sorted(names) for domain_id, names in bridges.items()}
+
+    def resolve(self, address: str) -> Tuple[Optional[int], int]:
+        """(endpoint state, domain id) for an IP address; unknown public addresses are the internet
+
+        Unassigned addresses inside a VLAN subnet attach to that VLAN's bridge
+        (the state is None if the VLAN has no bridge or segment).
+        """
+        ip = ipaddress.ip_address(str(address))
+        state = self._addresses.get(int(ip))
+        if state is not None:
+            return state, self.state_domain[state]
+        for subnet, domain_id in self._subnets:
+            if ip.version == subnet.version and ip in subnet:
+                return self._anchors.get(domain_id), domain_id
+        internet = (self.index[INTERNET], NATIVE)
+        return internet, self.state_domain[internet]
+
+    def l2_path(self, source: Tuple[int, Any], target: Tuple[int, Any]) -> Optional[List[int]]:
+        """Node ids on the shortest path between two states of the same L2 domain"""
+        if source == target:
+            return [source[0]]
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            state = queue.popleft()
+            for following in self._state_adj.get(state, ()):
+                if following in previous:
+                    continue
+                previous[following] = state
+                if following == target:
+                    path = []
+                    while following is not None:
+                        if not path or path[-1] != following[0]:
+                            path.append(following[0])
+                        following = previous[following]
+                    return path[::-1]
+                queue.append(following)
+        return None
+
+    def domain_path(self, source_domain: int, target_domain: int) -> Optional[List[Any]]:
+        """Alternating [domain, (router, in_leg, out_leg), domain, ...] with the fewest router hops"""
+        key = (source_domain, target_domain)
+        if key in self._domain_paths:
+            return self._domain_paths[key]
+
+        legs_by_domain: Dict[int, List[Tuple[int, Tuple[int, Any]]]] = {}
+        for router, legs in self.routers.items():
+            if router in self.disabled:
+                continue
+            for leg in legs:
+                if leg in self.state_domain:
+                    legs_by_domain.setdefault(self.state_domain[leg], []).append((router, leg))
+
+        previous = {source_domain: None}
+        queue = deque([source_domain])
+        while queue and target_domain not in previous:
+            domain = queue.popleft()
+            for router, in_leg in legs_by_domain.get(domain, ()):
+                for out_leg in self.routers[router]:
+                    following = self.state_domain.get(out_leg)
+                    if following is None or following in previous:
+                        continue
+                    previous[following] = (domain, (router, in_leg, out_leg))
+                    queue.append(following)
+
+        if target_domain not in previous:
+            result = None
+        else:
+            result = [target_domain]
+            domain = target_domain
+            while previous[domain] is not None:
+                domain, hop = previous[domain]
+                result[0:0] = [domain, hop]
+        self._domain_paths[key] = result
+        return result
+
+    def path(self, source: str, destination: str) -> Optional[Path]:
+        """Shortest L3 path between two addresses or node names, via the routers (cached)"""
+        source_state, source_domain = self._endpoint(source)
+        target_state, target_domain = self._endpoint(destination)
+        key = (source_state or (source_domain,), target_state or (target_domain,))
+        if key in self._paths:
+            return self._paths[key]
+
+        hops = self.domain_path(source_domain, target_domain)
+        if hops is None:
+            self._paths[key] = None
+            return None
+
+        nodes: List[int] = []
+        routers: List[str] = []
+        entry = source_state
+        for hop in hops[1::2]:
+            router, in_leg, out_leg = hop
+            self._extend(nodes, entry, in_leg)
+            self._extend(nodes, (router, NATIVE), None)
+            routers.append(self.nodes[router].name)
+            entry = out_leg
+        self._extend(nodes, entry, target_state)
+
+        result = Path(source, destination, tuple(self.nodes[node].name for node in nodes),
+                      tuple(self.domains[domain].name for domain in hops[0::2]), tuple(routers))
+        self._paths[key] = result
+        return result
+
+    def _endpoint(self, endpoint: str) -> Tuple[Optional[Tuple[int, Any]], int]:
+        if endpoint in self.index:
+            node = self.nodes[self.index[endpoint]]
+            if node.id in self.disabled:
+                raise TopologyError(f"{endpoint} is disabled")
+            if node.kind == 'vm':
+                # A VM is addressed through its first attached NIC
+                nics = [link.node for link in self.adj[node.id] if (link.node, NATIVE) in self.state_domain]
+                if not nics:
+                    raise TopologyError(f"VM {endpoint} has no network interface")
+                node = self.nodes[nics[0]]
+            state = (node.id, NATIVE)
+            return state, self.state_domain[state]
+        return self.resolve(endpoint)
+
+    def _extend(self, nodes: List[int], start, end):
+        if start is None or end is None:
+            segment = [state[0] for state in (start, end) if state is not None]
+        else:
+            segment = self.l2_path(start, end) or [start[0], end[0]]
+        for node in segment:
+            if not nodes or nodes[-1] != node:
+                nodes.append(node)
+
+    def set_disabled(self, names: Iterable[str]):
+        """Take nodes (e.g. a failed WAN interface) out of the topology and recompute domains"""
+        self.disabled = {self.index[name] for name in names}
+        self._compute_domains()
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'site': self.name,
+            'nodes': [{'name': node.name, 'kind': node.kind,
+                       **{key: value for key, value in node.attrs.items() if value is not None}}
+                      for node in self.nodes],
+            'links': [{'a': self.nodes[a].name, 'b': self.nodes[link.node].name,
+                       'vlans': [list(pair) for pair in link.pairs]}
+                      for a, links in enumerate(self.adj) for link in links if a < link.node],
+            'domains': [{'id': domain.id, 'name': domain.name, 'vlan': domain.vlan,
+                         'subnet': str(domain.subnet) if domain.subnet else None,
+                         'gateway': domain.gateway, 'members': list(domain.members)}
+                        for domain in self.domains],
+            'routers': {self.nodes[router].name: sorted({self.domains[self.state_domain[leg]].name for leg in legs
+                                                         if leg in self.state_domain})
+                        for router, legs in self.routers.items()},
+        }
+
+def _state_key(state):
+    node, vlan = state
+    return node, -1 if vlan is None else (vlan if isinstance(vlan, int) else 5000)
+
+def build_topology(config: Dict[str, Any]) -> Topology:
+    """Topology for either a site configuration or the legacy ``{networks, devices}`` format"""
+    if isinstance(config, dict) and 'networks' in config and 'site' not in config:
+        return Topology.from_networks(config)
+    return Topology.from_site(config)
+
+def load_site(path: str) -> Topology:
+    with open(path, 'r') as f:
+        return build_topology(yaml.safe_load(f) or {})
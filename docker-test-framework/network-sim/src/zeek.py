@@ -0,0 +1,632 @@
+"""
+Zeek log generation and streaming aggregation
+
+The generator emits conn.log, dns.log and notice.log records, in Zeek's
+JSON or tab-separated format, at configurable Poisson rates. Records are
+built per simulated second from NumPy draws, with hosts taken from the site
+topology. Output goes to files, to stdout, or to a Logstash TCP input,
+optionally paced in real time.
+
+The consumer parses either format line by line and keeps bounded aggregates:
+record and byte counts, peak per-second rates, compressed size (measured by
+streaming every line through zlib), and top talkers/queries. From those it
+sizes Zeek's local log disk, Elasticsearch storage and Logstash workers for
+a site's retention settings.
+"""
+
+import argparse
+import heapq
+import json
+import math
+import os
+import socket
+import sys
+import time
+import zlib
+from typing import Any, Dict, Iterable, List, Optional, TextIO, Tuple
+
+import numpy as np
+import yaml
+
+from .topology import Topology
+
+LOG_TYPES = ('conn', 'dns', 'notice')
+DEFAULT_RATES = {'conn': 50.0, 'dns': 20.0, 'notice': 0.02}
+
+# (service, protocol, port, weight) of generated connections
+SERVICES = [
+    ('ssl', 'tcp', 443, 0.45), ('dns', 'udp', 53, 0.2), ('http', 'tcp', 80, 0.1), ('-', 'udp', 123, 0.05),
+    ('rtsp', 'tcp', 554, 0.05), ('ssh', 'tcp', 22, 0.03), ('-', 'tcp', 8883, 0.07), ('-', 'udp', 5353, 0.05),
+]
+CONN_STATES = [('SF', 'ShADadFf', 0.7), ('S0', 'S', 0.1), ('REJ', 'Sr', 0.05), ('RSTO', 'ShADadR', 0.05),
+               ('SH', 'Sf', 0.05), ('OTH', 'Dd', 0.05)]
+DNS_NAMES = ['time.cloudflare.com', 'api.github.com', 'updates.example.net', 'mqtt.example-iot.com',
+             'www.google.com', 'push.apple.com', 'cdn.jsdelivr.net', 'tracker.example.org',
+             'firmware.example-camera.com', 'ntp.ubuntu.com']
+DNS_QTYPES = [(1, 'A', 0.6), (28, 'AAAA', 0.3), (12, 'PTR', 0.05), (16, 'TXT', 0.05)]
+DNS_RCODES = [(0, 'NOERROR', 0.9), (3, 'NXDOMAIN', 0.08), (2, 'SERVFAIL', 0.02)]
+NOTICES = [
+    ('Scan::Port_Scan', 'scanned at least 15 unique ports of host', 0.35),
+    ('Scan::Address_Scan', 'scanned at least 25 unique hosts on port 22/tcp', 0.2),
+    ('SSH::Password_Guessing', 'appears to be guessing SSH passwords (seen in 30 connections).', 0.2),
+    ('SSL::Invalid_Server_Cert', 'SSL certificate validation failed with (unable to get local issuer '
+                                 'certificate)', 0.15),
+    ('CaptureLoss::Too_Much_Loss', 'The capture loss script detected an estimated loss rate above 10%', 0.1),
+]
+
+CONN_FIELDS = ['ts', 'uid', 'id.orig_h', 'id.orig_p', 'id.resp_h', 'id.resp_p', 'proto', 'service', 'duration',
+               'orig_bytes', 'resp_bytes', 'conn_state', 'local_orig', 'local_resp', 'missed_bytes', 'history',
+               'orig_pkts', 'orig_ip_bytes', 'resp_pkts', 'resp_ip_bytes']
+CONN_TYPES = ['time', 'string', 'addr', 'port', 'addr', 'port', 'enum', 'string', 'interval', 'count', 'count',
+              'string', 'bool', 'bool', 'count', 'string', 'count', 'count', 'count', 'count']
+DNS_FIELDS = ['ts', 'uid', 'id.orig_h', 'id.orig_p', 'id.resp_h', 'id.resp_p', 'proto', 'trans_id', 'rtt',
+              'query', 'qclass', 'qclass_name', 'qtype', 'qtype_name', 'rcode', 'rcode_name', 'AA', 'TC', 'RD',
+              'RA', 'Z', 'answers', 'TTLs', 'rejected']
+DNS_TYPES = ['time', 'string', 'addr', 'port', 'addr', 'port', 'enum', 'count', 'interval', 'string', 'count',
+             'string', 'count', 'string', 'count', 'string', 'bool', 'bool', 'bool', 'bool', 'count',
+             'vector[string]', 'vector[interval]', 'bool']
+NOTICE_FIELDS = ['ts', 'uid', 'id.orig_h', 'id.orig_p', 'id.resp_h', 'id.resp_p', 'note', 'msg', 'sub', 'src',
+                 'dst', 'p', 'peer_descr', 'actions', 'suppress_for']
+NOTICE_TYPES = ['time', 'string', 'addr', 'port', 'addr', 'port', 'enum', 'string', 'string', 'addr', 'addr',
+                'port', 'string', 'set[enum]', 'interval']
+SCHEMAS = {'conn': (CONN_FIELDS, CONN_TYPES), 'dns': (DNS_FIELDS, DNS_TYPES), 'notice': (NOTICE_FIELDS, NOTICE_TYPES)}
+
+UID_ALPHABET = np.frombuffer(b'0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz', dtype=np.uint8)
+
+def _weights(table) -> np.ndarray:
+    weights = np.array([row[-1] for row in table], dtype=float)
+    return weights / weights.sum()
+
+def _ip(value: int) -> str:
+    return f"{value >> 24}.{(value >> 16) & 255}.{(value >> 8) & 255}.{value & 255}"
+
+class ZeekLogGenerator:
+    """Generates Zeek records at Poisson rates (records per second per log)"""
+
+    def __init__(self, topology: Optional[Topology] = None, rates: Optional[Dict[str, float]] = None,
+                 seed: int = 0, start: Optional[float] = None, hosts_per_vlan: int = 20):
+        self.rates = dict(DEFAULT_RATES)
+        self.rates.update(rates or {})
+        self.rng = np.random.default_rng(seed)
+        self.clock = float(start if start is not None else time.time())
+
+        local = []
+        resolvers = []
+        for vlan in (topology.vlans.values() if topology else ()):
+            subnet = vlan['subnet']
+            if subnet is not None and subnet.version == 4:
+                base = int(subnet.network_address)
+                local.extend(base + 20 + offset for offset in range(min(hosts_per_vlan, subnet.num_addresses - 22)))
+                if vlan.get('gateway'):
+                    resolvers.append(int(subnet.network_address) + 1)
+        self.local = np.array(local or [0x0A000014 + n for n in range(hosts_per_vlan)], dtype=np.int64)
+        self.resolvers = np.array(resolvers or [0x0A000001], dtype=np.int64)
+
+    def _uids(self, prefix: str, count: int) -> List[str]:
+        codes = UID_ALPHABET[self.rng.integers(0, len(UID_ALPHABET), (count, 17))]
+        return [prefix + uid.decode() for uid in codes.view('S17').reshape(-1)]
+
+    def _timestamps(self, rate: float, seconds: float) -> np.ndarray:
+        count = self.rng.poisson(rate * seconds)
+        return np.sort(self.clock + self.rng.random(count) * seconds)
+
+    def conn(self, seconds: float = 1.0) -> List[Dict[str, Any]]:
+        rng = self.rng
+        ts = self._timestamps(self.rates.get('conn', 0), seconds)
+        count = len(ts)
+        if not count:
+            return []
+        service = rng.choice(len(SERVICES), count, p=_weights(SERVICES))
+        state = rng.choice(len(CONN_STATES), count, p=_weights(CONN_STATES))
+        orig = rng.choice(self.local, count)
+        outbound = rng.random(count) < 0.7
+        resp = np.where(outbound, rng.integers(0x01000000, 0x09FFFFFF, count), rng.choice(self.local, count))
+        duration = rng.exponential(2.0, count)
+        orig_bytes = rng.lognormal(6, 1.5, count).astype(np.int64)
+        resp_bytes = rng.lognormal(8, 2.0, count).astype(np.int64)
+        orig_pkts = 1 + orig_bytes // 1200 + rng.integers(0, 4, count)
+        resp_pkts = 1 + resp_bytes // 1400 + rng.integers(0, 4, count)
+        sport = rng.integers(32768, 61000, count)
+        uids = self._uids('C', count)
+
+        records = []
+        for i in range(count):
+            name, protocol, port, _ = SERVICES[service[i]]
+            conn_state, history, _ = CONN_STATES[state[i]]
+            established = conn_state in ('SF', 'RSTO', 'OTH')
+            records.append({
+                'ts': round(float(ts[i]), 6), 'uid': uids[i], 'id.orig_h': _ip(int(orig[i])),
+                'id.orig_p': int(sport[i]), 'id.resp_h': _ip(int(resp[i])), 'id.resp_p': port, 'proto': protocol,
+                'service': name if established else '-', 'duration': round(float(duration[i]), 6),
+                'orig_bytes': int(orig_bytes[i]) if established else 0,
+                'resp_bytes': int(resp_bytes[i]) if established else 0, 'conn_state': conn_state,
+                'local_orig': True, 'local_resp': not bool(outbound[i]), 'missed_bytes': 0,
+                'history': history if protocol == 'tcp' else ('Dd' if established else 'D'),
+                'orig_pkts': int(orig_pkts[i]), 'orig_ip_bytes': int(orig_bytes[i] + 40 * orig_pkts[i]),
+                'resp_pkts': int(resp_pkts[i]) if established else 0,
+                'resp_ip_bytes': int(resp_bytes[i] + 40 * resp_pkts[i]) if established else 0,
+            })
+        return records
+
+    def dns(self, seconds: float = 1.0) -> List[Dict[str, Any]]:
+        rng = self.rng
+        ts = self._timestamps(self.rates.get('dns', 0), seconds)
+        count = len(ts)
+        if not count:
+            return []
+        qtype = rng.choice(len(DNS_QTYPES), count, p=_weights(DNS_QTYPES))
+        rcode = rng.choice(len(DNS_RCODES), count, p=_weights(DNS_RCODES))
+        name = rng.integers(0, len(DNS_NAMES), count)
+        orig = rng.choice(self.local, count)
+        resp = rng.choice(self.resolvers, count)
+        answer = rng.integers(0x01000000, 0x09FFFFFF, count)
+        rtt = rng.exponential(0.02, count)
+        sport = rng.integers(32768, 61000, count)
+        trans_id = rng.integers(0, 65536, count)
+        uids = self._uids('C', count)
+
+        records = []
+        for i in range(count):
+            code, code_name, _ = DNS_RCODES[rcode[i]]
+            qtype_code, qtype_name, _ = DNS_QTYPES[qtype[i]]
+            answered = code == 0 and qtype_code == 1
+            records.append({
+                'ts': round(float(ts[i]), 6), 'uid': uids[i], 'id.orig_h': _ip(int(orig[i])),
+                'id.orig_p': int(sport[i]), 'id.resp_h': _ip(int(resp[i])), 'id.resp_p': 53,
+                'proto': 'udp', 'trans_id': int(trans_id[i]), 'rtt': round(float(rtt[i]), 6),
+                'query': DNS_NAMES[name[i]], 'qclass': 1, 'qclass_name': 'C_INTERNET', 'qtype': qtype_code,
+                'qtype_name': qtype_name, 'rcode': code, 'rcode_name': code_name, 'AA': False, 'TC': False,
+                'RD': True, 'RA': True, 'Z': 0, 'answers': [_ip(int(answer[i]))] if answered else [],
+                'TTLs': [300.0] if answered else [], 'rejected': False,
+            })
+        return records
+
+    def notice(self, seconds: float = 1.0) -> List[Dict[str, Any]]:
+        rng = self.rng
+        ts = self._timestamps(self.rates.get('notice', 0), seconds)
+        records = []
+        for i, uid in enumerate(self._uids('C', len(ts))):
+            note, message, _ = NOTICES[rng.choice(len(NOTICES), p=_weights(NOTICES))]
+            src = _ip(int(rng.integers(0x01000000, 0x09FFFFFF)))
+            dst = _ip(int(rng.choice(self.local)))
+            records.append({
+                'ts': round(float(ts[i]), 6), 'uid': uid, 'id.orig_h': src, 'id.orig_p': int(rng.integers(1024, 65536)),
+                'id.resp_h': dst, 'id.resp_p': 22, 'note': note, 'msg': f"{src} {message}", 'sub': 'local',
+                'src': src, 'dst': dst, 'p': 22, 'peer_descr': 'zeek', 'actions': ['Notice::ACTION_LOG'],
+                'suppress_for': 3600.0,
+            })
+        return records
+
+    def advance(self, seconds: float = 1.0) -> Dict[str, List[Dict[str, Any]]]:
+        """Records of every log for the next `seconds` of simulated time"""
+        batch = {log: getattr(self, log)(seconds) for log in LOG_TYPES}
+        self.clock += seconds
+        return batch
+
+def _tsv_value(value: Any) -> str:
+    if isinstance(value, bool):
+        return 'T' if value else 'F'
+    if isinstance(value, list):
+        return ','.join(map(_tsv_value, value)) if value else '(empty)'
+    if value is None or value == '':
+        return '-'
+    if isinstance(value, float):
+        return f"{value:.6f}"
+    return str(value)
+
+def tsv_header(log: str, opened: float) -> str:
+    fields, types = SCHEMAS[log]
+    stamp = time.strftime('%Y-%m-%d-%H-%M-%S', time.gmtime(opened))
+    return ('#separator \\x09\n#set_separator\t,\n#empty_field\t(empty)\n#unset_field\t-\n'
+            f"#path\t{log}\n#open\t{stamp}\n#fields\t" + '\t'.join(fields) + '\n#types\t' + '\t'.join(types) + '\n')
+
+def format_record(log: str, record: Dict[str, Any], fmt: str = 'json', with_path: bool = False) -> str:
+    """One log line (without newline) in Zeek's JSON or tab-separated format"""
+    if fmt == 'tsv':
+        return '\t'.join(_tsv_value(record.get(field)) for field in SCHEMAS[log][0])
+    if with_path:
+        record = dict(record, _path=log)
+    return json.dumps(record, separators=(',', ':'))
+
+# -- streaming consumer -------------------------------------------------------------
+
+class TopK:
+    """Approximate heavy hitters in bounded memory
+
+    Counts exactly until `capacity * 8` keys are tracked, then prunes to the
+    `capacity` largest; `error` bounds how much any pruned key was undercounted.
+    """
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counts: Dict[str, float] = {}
+        self.error = 0.0
+
+    def add(self, key: str, weight: float = 1.0):
+        counts = self.counts
+        counts[key] = counts.get(key, 0.0) + weight
+        if len(counts) > self.capacity * 8:
+            keep = dict(heapq.nlargest(self.capacity, counts.items(), key=lambda item: item[1]))
+            self.error = max(self.error, max(value for key, value in counts.items() if key not in keep))
+            self.counts = keep
+
+    def top(self, count: int = 10) -> List[Tuple[str, float]]:
+        return heapq.nlargest(count, self.counts.items(), key=lambda item: item[1])
+
+class LogStats:
+    """Running totals for one log"""
+
+    def __init__(self):
+        self.records = 0
+        self.bytes = 0
+        self._compressor = zlib.compressobj(6)
+        self.compressed = 0
+        self.first_ts: Optional[float] = None
+        self.last_ts: Optional[float] = None
+        self.peak_per_second = 0
+        self._second: Optional[int] = None
+        self._second_count = 0
+        self.counts: Dict[str, Dict[str, int]] = {}
+        self.top: Dict[str, TopK] = {}
+
+    def add(self, line: str, ts: Optional[float]):
+        self.records += 1
+        data = line.encode() + b'\n'
+        self.bytes += len(data)
+        self.compressed += len(self._compressor.compress(data))
+        if ts is None:
+            return
+        if self.first_ts is None or ts < self.first_ts:
+            self.first_ts = ts
+        if self.last_ts is None or ts > self.last_ts:
+            self.last_ts = ts
+        second = int(ts)
+        if second == self._second:
+            self._second_count += 1
+        else:
+            self._second, self._second_count = second, 1
+        self.peak_per_second = max(self.peak_per_second, self._second_count)
+
+    def count(self, table: str, key: Any):
+        counts = self.counts.setdefault(table, {})
+        counts[str(key)] = counts.get(str(key), 0) + 1
+
+    def heavy(self, table: str, key: str, weight: float = 1.0):
+        self.top.setdefault(table, TopK()).add(key, weight)
+
+    def compressed_bytes(self) -> int:
+        """Compressed size so far, flushing a copy of the compressor state"""
+        return self.compressed + len(self._compressor.copy().flush())
+
+    def span(self) -> float:
+        if self.first_ts is None:
+            return 0.0
+        return max(1.0, self.last_ts - self.first_ts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        compressed = self.compressed_bytes()
+        return {
+            'records': self.records,
+            'bytes': self.bytes,
+            'bytes_per_record': round(self.bytes / self.records, 1) if self.records else 0,
+            'compression_ratio': round(compressed / self.bytes, 4) if self.bytes else None,
+            'seconds': round(self.span(), 3),
+            'records_per_second': round(self.records / self.span(), 3) if self.records else 0,
+            'peak_per_second': self.peak_per_second,
+            'counts': self.counts,
+            'top': {table: [[key, value] for key, value in top.top()] for table, top in self.top.items()},
+        }
+
+class ZeekLogConsumer:
+    """Parses Zeek JSON or tab-separated log lines incrementally and aggregates them"""
+
+    def __init__(self):
+        self.logs: Dict[str, LogStats] = {}
+        self.lines = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self._fields: Dict[str, List[str]] = {}
+        self._path = ''
+
+    def feed(self, line: str, log: Optional[str] = None):
+        """Consume one line; `log` names the log for JSON lines without a _path field"""
+        start = time.perf_counter()
+        line = line.rstrip('\n')
+        if not line:
+            return
+        if line.startswith('#'):
+            self._header(line, log)
+            return
+        self.lines += 1
+        try:
+            if line.startswith('{'):
+                record = json.loads(line)
+                log = record.pop('_path', None) or log
+            else:
+                log = log or self._path
+                fields = self._fields.get(log)
+                if fields is None:
+                    raise ValueError("tab-separated record before its #fields header")
+                record = dict(zip(fields, line.split('\t')))
+        except ValueError:
+            self.errors += 1
+            return
+        if log is None:
+            self.errors += 1
+            return
+
+        stats = self.logs.get(log)
+        if stats is None:
+            stats = self.logs[log] = LogStats()
+        try:
+            ts = float(record.get('ts'))
+        except (TypeError, ValueError):
+            ts = None
+        stats.add(line, ts)
+        aggregate = getattr(self, f"_aggregate_{log}", None)
+        if aggregate is not None:
+            aggregate(stats, record)
+        self.seconds += time.perf_counter() - start
+
+    def _header(self, line: str, log: Optional[str]):
+        key, _, value = line[1:].partition('\t')
+        if key == 'fields':
+            self._fields[log or self._path] = value.split('\t')
+        elif key == 'path':
+            self._path = value
+
+    @staticmethod
+    def _number(value: Any) -> float:
+        try:
+            return float(value)
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _aggregate_conn(self, stats: LogStats, record: Dict[str, Any]):
+        stats.count('service', record.get('service') or '-')
+        stats.count('conn_state', record.get('conn_state'))
+        volume = self._number(record.get('orig_bytes')) + self._number(record.get('resp_bytes'))
+        stats.heavy('talkers_bytes', str(record.get('id.orig_h')), volume)
+        stats.heavy('services', f"{record.get('id.resp_p')}/{record.get('proto')}")
+
+    def _aggregate_dns(self, stats: LogStats, record: Dict[str, Any]):
+        stats.count('qtype', record.get('qtype_name'))
+        stats.count('rcode', record.get('rcode_name'))
+        stats.heavy('queries', str(record.get('query')))
+
+    def _aggregate_notice(self, stats: LogStats, record: Dict[str, Any]):
+        stats.count('note', record.get('note'))
+        stats.heavy('sources', str(record.get('src')))
+
+    def consume(self, lines: Iterable[str], log: Optional[str] = None) -> 'ZeekLogConsumer':
+        for line in lines:
+            self.feed(line, log)
+        return self
+
+    def consume_file(self, path: str, follow: bool = False, idle_timeout: float = 5.0) -> 'ZeekLogConsumer':
+        """Consume a log file; with `follow`, keep reading appended lines until idle for `idle_timeout`"""
+        log = os.path.basename(path).split('.')[0]
+        if log not in LOG_TYPES:
+            log = None
+        with open(path, 'r') as f:
+            idle_since = time.monotonic()
+            partial = ''
+            while True:
+                line = f.readline()
+                if line.endswith('\n'):
+                    self.feed(partial + line, log)
+                    partial = ''
+                    idle_since = time.monotonic()
+                    continue
+                partial += line
+                if not follow or time.monotonic() - idle_since > idle_timeout:
+                    break
+                time.sleep(0.1)
+            if partial:
+                self.feed(partial, log)
+        return self
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            'lines': self.lines,
+            'errors': self.errors,
+            'logs': {log: stats.to_dict() for log, stats in sorted(self.logs.items())},
+            'consumer_lines_per_second': round(self.lines / self.seconds) if self.seconds else None,
+        }
+
+# -- sizing -------------------------------------------------------------------------
+
+def retention_settings(config: Dict[str, Any]) -> Dict[str, int]:
+    """Zeek log rotation days and central retention days from a site configuration"""
+    site = config.get('site', config) if isinstance(config, dict) else {}
+    site = site or {}
+    return {
+        'zeek_keep_days': int((site.get('zeek') or {}).get('logrotate_keep_days', 7)),
+        'retention_days': int((site.get('monitoring') or {}).get('retention_days', 30)),
+    }
+
+def sizing(report: Dict[str, Any], zeek_keep_days: int = 7, retention_days: int = 30,
+           index_factor: float = 1.1, replicas: int = 0, logstash_eps_per_worker: float = 4000.0,
+           headroom: float = 2.0) -> Dict[str, Any]:
+    """Storage and Logstash throughput needed for the observed log rates
+
+    Zeek's logrotate keeps the live file and the previous day uncompressed
+    (delaycompress) and the rest gzip-compressed; Elasticsearch storage is
+    raw JSON times `index_factor` per copy. The per-worker Logstash rate is
+    a planning assumption.
+    """
+    logs = {}
+    raw_day = compressed_day = 0.0
+    mean_eps = peak_eps = 0.0
+    for log, stats in report['logs'].items():
+        day = stats['records_per_second'] * 86400 * stats['bytes_per_record']
+        ratio = stats['compression_ratio'] or 1.0
+        logs[log] = {'bytes_per_day': round(day), 'compressed_bytes_per_day': round(day * ratio)}
+        raw_day += day
+        compressed_day += day * ratio
+        mean_eps += stats['records_per_second']
+        peak_eps += stats['peak_per_second']
+
+    zeek_disk = 2 * raw_day + max(0, zeek_keep_days - 1) * compressed_day
+    elasticsearch = raw_day * index_factor * retention_days * (1 + replicas)
+    return {
+        'logs': logs,
+        'bytes_per_day': round(raw_day),
+        'zeek_keep_days': zeek_keep_days,
+        'zeek_disk_bytes': round(zeek_disk),
+        'retention_days': retention_days,
+        'elasticsearch_bytes': round(elasticsearch),
+        'logstash': {
+            'mean_events_per_second': round(mean_eps, 3),
+            'peak_events_per_second': round(peak_eps, 3),
+            'events_per_second_per_worker': logstash_eps_per_worker,
+            'workers': max(1, math.ceil(peak_eps * headroom / logstash_eps_per_worker)),
+        },
+    }
+
+# -- output -------------------------------------------------------------------------
+
+class _Outputs:
+    def __init__(self, directory: Optional[str], fmt: str, tcp: Optional[str], stdout: TextIO):
+        self.fmt = fmt
+        self.files: Dict[str, TextIO] = {}
+        self.socket = None
+        self.stdout = stdout if directory is None and tcp is None else None
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            for log in LOG_TYPES:
+                self.files[log] = open(os.path.join(directory, f"{log}.log"), 'a')
+        if tcp is not None:
+            host, _, port = tcp.rpartition(':')
+            self.socket = socket.create_connection((host, int(port)))
+
+    def write(self, batch: Dict[str, List[Dict[str, Any]]], opened: float):
+        for log, records in batch.items():
+            if log in self.files:
+                f = self.files[log]
+                if self.fmt == 'tsv' and f.tell() == 0:
+                    f.write(tsv_header(log, opened))
+                f.writelines(format_record(log, record, self.fmt) + '\n' for record in records)
+            if self.socket is not None:
+                payload = ''.join(format_record(log, record, 'json', with_path=True) + '\n' for record in records)
+                self.socket.sendall(payload.encode())
+            if self.stdout is not None:
+                self.stdout.writelines(format_record(log, record, 'json', with_path=True) + '\n'
+                                       for record in records)
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+        if self.socket is not None:
+            self.socket.close()
+
+def generate(generator: ZeekLogGenerator, seconds: int, directory: Optional[str] = None, fmt: str = 'json',
+             tcp: Optional[str] = None, realtime: bool = False, stdout: TextIO = sys.stdout) -> Dict[str, int]:
+    """Write `seconds` of simulated logs; with `realtime`, pace output to the wall clock"""
+    outputs = _Outputs(directory, fmt, tcp, stdout)
+    written = dict.fromkeys(LOG_TYPES, 0)
+    start, opened = time.monotonic(), generator.clock
+    try:
+        for second in range(seconds):
+            batch = generator.advance(1.0)
+            outputs.write(batch, opened)
+            for log, records in batch.items():
+                written[log] += len(records)
+            if realtime:
+                delay = start + second + 1 - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+    finally:
+        outputs.close()
+    return written
+
+def simulate_sizing(topology: Optional[Topology], seconds: int = 60, rates: Optional[Dict[str, float]] = None,
+                    seed: int = 0, **options) -> Dict[str, Any]:
+    """Generate logs in memory, consume them and size storage from the result"""
+    generator = ZeekLogGenerator(topology, rates, seed)
+    consumer = ZeekLogConsumer()
+    for _ in range(seconds):
+        for log, records in generator.advance(1.0).items():
+            consumer.consume((format_record(log, record) for record in records), log)
+    report = consumer.report()
+    report['sizing'] = sizing(report, **options)
+    return report
+
+def _load_site(path: Optional[str]) -> Tuple[Optional[Topology], Dict[str, Any]]:
+    if not path:
+        return None, {}
+    with open(path, 'r') as f:
+        config = yaml.safe_load(f) or {}
+    return Topology.from_site(config), config
+
+def _format_bytes(value: float) -> str:
+    for unit in ('B', 'KB', 'MB', 'GB', 'TB'):
+        if value < 1024 or unit == 'TB':
+            return f"{value:.1f} {unit}"
+        value /= 1024
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [f"{'log':<8} {'records':>10} {'rec/s':>9} {'peak/s':>7} {'B/rec':>7} {'gzip':>6}"]
+    for log, stats in report['logs'].items():
+        ratio = f"{stats['compression_ratio']:.1%}" if stats['compression_ratio'] else '-'
+        lines.append(f"{log:<8} {stats['records']:>10} {stats['records_per_second']:>9.2f} "
+                     f"{stats['peak_per_second']:>7} {stats['bytes_per_record']:>7.0f} {ratio:>6}")
+    sized = report.get('sizing')
+    if sized:
+        logstash = sized['logstash']
+        lines += [
+            '',
+            f"raw logs per day:      {_format_bytes(sized['bytes_per_day'])}",
+            f"zeek disk ({sized['zeek_keep_days']} days):   {_format_bytes(sized['zeek_disk_bytes'])}",
+            f"elasticsearch ({sized['retention_days']} days): {_format_bytes(sized['elasticsearch_bytes'])}",
+            f"logstash: {logstash['peak_events_per_second']:.0f} events/s peak -> {logstash['workers']} worker(s)",
+        ]
+    lines.append(f"{report['lines']} lines, {report['errors']} errors, "
+                 f"{report['consumer_lines_per_second']} lines/s consumed")
+    return '\n'.join(lines)
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description='Generate and aggregate Zeek logs for IDS pipeline sizing')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    generate_parser = commands.add_parser('generate', help='Write synthetic conn/dns/notice logs')
+    generate_parser.add_argument('--site', help='Site YAML configuration (hosts are drawn from its VLANs)')
+    generate_parser.add_argument('--seconds', type=int, default=60, help='Simulated seconds to generate')
+    generate_parser.add_argument('--output', help='Directory for conn.log, dns.log and notice.log '
+                                                  '(default: JSON lines on stdout)')
+    generate_parser.add_argument('--format', choices=['json', 'tsv'], default='json')
+    generate_parser.add_argument('--tcp', help='Also send JSON lines to a Logstash tcp input (host:port)')
+    generate_parser.add_argument('--realtime', action='store_true', help='Pace output to the wall clock')
+    generate_parser.add_argument('--seed', type=int, default=0)
+    for log in LOG_TYPES:
+        generate_parser.add_argument(f"--{log}-rate", type=float, default=DEFAULT_RATES[log],
+                                     help=f"{log}.log records per second")
+
+    consume_parser = commands.add_parser('consume', help='Aggregate Zeek log files and size storage')
+    consume_parser.add_argument('logs', nargs='+', help='Zeek log files (JSON or tab-separated)')
+    consume_parser.add_argument('--site', help='Site YAML configuration for retention settings')
+    consume_parser.add_argument('--follow', action='store_true', help='Keep reading appended lines until idle')
+    consume_parser.add_argument('--json', action='store_true', help='Print the report as JSON')
+    args = parser.parse_args(argv)
+
+    topology, config = _load_site(args.site)
+    if args.command == 'generate':
+        generator = ZeekLogGenerator(topology, {log: getattr(args, f"{log}_rate") for log in LOG_TYPES}, args.seed)
+        written = generate(generator, args.seconds, args.output, args.format, args.tcp, args.realtime)
+        if args.output:
+            print(', '.join(f"{count} {log}" for log, count in written.items()) + f" records in {args.output}")
+        return
+
+    consumer = ZeekLogConsumer()
+    for path in args.logs:
+        consumer.consume_file(path, follow=args.follow)
+    report = consumer.report()
+    report['sizing'] = sizing(report, **retention_settings(config))
+    if args.json:
+        json.dump(report, sys.stdout, indent=2)
+        print()
+    else:
+        print(format_report(report))
+
+if __name__ == "__main__":
+    main()
@@ -10,6 +10,8 @@ import time
 import uuid
 import json
 
+from .. import behavior, ids
+
 router = APIRouter()
 security = HTTPBearer(auto_error=False)
 
@@ -162,28 +164,29 @@ async def test_ids_detection(
     authenticated: bool = Depends(verify_authentication)
 ) -> Dict[str, Any]:
     """Test IDS/IPS detection capabilities"""
-    attack_type = request_data.get("attack_type")
-    source = request_data.get("source")
-    destination = request_data.get("destination")
+    try:
+        return ids.detect_attack(request_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
-    # Map attack types to alert types for testing
-    alert_mapping = {
-        "' OR '1'='1": "SQL_INJECTION",
-        "rapid_port_scan": "PORT_SCAN",
-        "ssh_brute_force": "BRUTE_FORCE"
-    }
-
-    alert_type = alert_mapping.get(attack_type, "UNKNOWN_ATTACK")
+@router.get("/ids/stats")
+async def get_ids_stats(authenticated: bool = Depends(verify_authentication)) -> Dict[str, Any]:
+    """Signature engine ruleset size and inspection throughput"""
+    return ids.default_engine().report()
 
+@router.post("/ids/flows")
+async def post_ids_flows(
+    request_data: Dict[str, Any],
+    authenticated: bool = Depends(verify_authentication)
+) -> Dict[str, Any]:
+    """Feed connection attempts to the scan/brute-force detector"""
+    try:
+        detections = behavior.default_detector().feed_records(request_data.get("flows") or [])
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "status": "detected",
-        "alert_type": alert_type,
-        "source": source,
-        "destination": destination,
-        "severity": "high" if alert_type != "UNKNOWN_ATTACK" else "low",
-        "timestamp": int(time.time()),
-        "rule_id": f"SID:{hash(attack_type) % 100000}",
-        "message": f"IDS detected {alert_type.lower()} from {source} to {destination}"
+        "detections": [dict(detection._asdict(), severity=detection.severity) for detection in detections],
+        "report": behavior.default_detector().report()
     }
 
 # Tailscale VPN simulation endpoints
@@ -0,0 +1,375 @@
+"""
+Behavioural IDS detections for the OPNsense mock: port scans and SSH brute force
+
+Consumes a stream of connection attempts: timestamped flow records from the
+network simulator, or connection events extracted from a capture by
+``network-sim``'s ``pcap.iter_connection_events``. State is a ring of time
+buckets covering a sliding window, and its size does not depend on how many
+sources are seen:
+
+- a count-min sketch per bucket counts connection attempts per source, and
+  SSH attempts per source;
+- the distinct (source, destination port) pairs of each bucket, kept exactly
+  up to ``exact_pairs`` per bucket, count the distinct ports each source
+  touched;
+- a grid of HyperLogLog registers per bucket, with sources hashed to rows
+  (again count-min style, taking the lowest estimate across hash rows),
+  estimates distinct ports instead while any bucket in the window has more
+  pairs than that.
+
+Window totals are the sum (counts), union (pairs) or register-wise maximum
+(HyperLogLog) over the buckets, so old buckets simply drop out. Count-min
+estimates only err high, so brute force is flagged no later than exact
+counting would flag it. Exact port counts flag a scan exactly at the
+threshold; HyperLogLog estimates err both ways (about 1.04/sqrt(2**precision)
+relative), so near the threshold a scan may be flagged late or a source just
+below it flagged. The first-seen-per-window alert table is LRU-bounded.
+"""
+
+import argparse
+import ipaddress
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+PORT_SCAN = "PORT_SCAN"
+BRUTE_FORCE = "BRUTE_FORCE"
+TCP = 6
+
+_MASK64 = np.uint64(0xFFFFFFFFFFFFFFFF)
+_NO_PAIRS = np.empty(0, dtype=np.uint64)
+_SEEDS = (0x9E3779B97F4A7C15, 0xC2B2AE3D27D4EB4F, 0x165667B19E3779F9, 0xD6E8FEB86659FD93)
+
+class Detection(NamedTuple):
+    alert_type: str
+    source: str
+    ts: float
+    estimate: int
+    threshold: int
+    window: float
+
+    @property
+    def severity(self) -> str:
+        return "high" if self.alert_type == BRUTE_FORCE else "medium"
+
+def _mix(values: np.ndarray, seed: int) -> np.ndarray:
+    """64-bit finaliser (splitmix64) of ``values + seed``"""
+    with np.errstate(over="ignore"):
+        h = values.astype(np.uint64) + np.uint64(seed)
+        h = (h ^ (h >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+        h = (h ^ (h >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+        return h ^ (h >> np.uint64(31))
+
+def _hll_estimate(registers: np.ndarray) -> np.ndarray:
+    """HyperLogLog cardinality for each row of a (n, m) register array"""
+    m = registers.shape[1]
+    alpha = {16: 0.673, 32: 0.697, 64: 0.709}.get(m, 0.7213 / (1 + 1.079 / m))
+    raw = alpha * m * m / np.exp2(-registers.astype(np.float64)).sum(axis=1)
+    zeros = (registers == 0).sum(axis=1)
+    small = (raw <= 2.5 * m) & (zeros > 0)
+    raw[small] = m * np.log(m / zeros[small])
+    return raw
+
+class BehaviorDetector:
+    """Sliding-window port-scan and SSH brute-force detector with bounded memory"""
+
+    def __init__(self, window: float = 60.0, buckets: int = 6, port_scan_threshold: int = 25,
+                 brute_force_threshold: int = 20, ssh_ports: Iterable[int] = (22,), width: int = 1 << 14,
+                 depth: int = 2, rows: int = 4096, precision: int = 6, exact_pairs: int = 1 << 18,
+                 max_tracked: int = 65536, max_alerts: int = 1000):
+        if depth > len(_SEEDS):
+            raise ValueError(f"depth must be at most {len(_SEEDS)}")
+        self.window = float(window)
+        self.buckets = buckets
+        self.bucket_seconds = self.window / buckets
+        self.port_scan_threshold = port_scan_threshold
+        self.brute_force_threshold = brute_force_threshold
+        self.ssh_ports = np.array(sorted(set(ssh_ports)), dtype=np.uint16)
+        self.width = width
+        self.depth = depth
+        self.rows = rows
+        self.precision = precision
+        self.exact_pairs = exact_pairs
+        self.max_tracked = max_tracked
+
+        # [bucket, plane (attempts, ssh attempts), hash row, counter]
+        self.counts = np.zeros((buckets, 2, depth, width), dtype=np.uint32)
+        # [bucket, hash row, source row, register]
+        self.registers = np.zeros((buckets, depth, rows, 1 << precision), dtype=np.uint8)
+        # sorted (source << 16 | port) keys per bucket; None once a bucket exceeds exact_pairs
+        self.pairs: List[Optional[np.ndarray]] = [_NO_PAIRS] * buckets
+        self.current: Optional[int] = None
+
+        self.alerted: 'OrderedDict[Tuple[str, int], float]' = OrderedDict()
+        self.detections: 'deque[Detection]' = deque(maxlen=max_alerts)
+        self.totals = {PORT_SCAN: 0, BRUTE_FORCE: 0}
+        self.flows = 0
+        self.late = 0
+        self.elapsed = 0.0
+
+    @property
+    def memory_bytes(self) -> int:
+        """Sketch sizes plus the exact pair budget: the most the detector can hold"""
+        return self.counts.nbytes + self.registers.nbytes + self.buckets * self.exact_pairs * _NO_PAIRS.itemsize
+
+    def _advance(self, bucket: int) -> None:
+        """Clear ring slots for buckets between the current one and ``bucket``"""
+        if self.current is None or bucket - self.current >= self.buckets:
+            self.counts[:] = 0
+            self.registers[:] = 0
+            self.pairs = [_NO_PAIRS] * self.buckets
+        else:
+            for stale in range(self.current + 1, bucket + 1):
+                self.counts[stale % self.buckets] = 0
+                self.registers[stale % self.buckets] = 0
+                self.pairs[stale % self.buckets] = _NO_PAIRS
+        self.current = bucket
+
+    def _columns(self, src: np.ndarray) -> List[np.ndarray]:
+        return [(_mix(src, seed) % np.uint64(self.width)).astype(np.intp) for seed in _SEEDS[:self.depth]]
+
+    def _rows(self, src: np.ndarray) -> List[np.ndarray]:
+        return [((_mix(src, seed) >> np.uint64(32)) % np.uint64(self.rows)).astype(np.intp)
+                for seed in _SEEDS[:self.depth]]
+
+    def _update(self, slot: int, src: np.ndarray, port: np.ndarray, ssh: np.ndarray,
+                columns: List[np.ndarray], rows: List[np.ndarray]) -> None:
+        size = self.depth * self.width
+        offsets = [row * self.width for row in range(self.depth)]
+        flat = np.concatenate([column + offset for column, offset in zip(columns, offsets)])
+        self.counts[slot, 0] += np.bincount(flat, minlength=size).reshape(self.depth, self.width).astype(np.uint32)
+        if ssh.any():
+            flat = np.concatenate([column[ssh] + offset for column, offset in zip(columns, offsets)])
+            self.counts[slot, 1] += np.bincount(flat, minlength=size).reshape(self.depth, self.width).astype(np.uint32)
+
+        if self.pairs[slot] is not None:
+            keys = np.union1d(self.pairs[slot], (src.astype(np.uint64) << np.uint64(16)) | port.astype(np.uint64))
+            self.pairs[slot] = keys if len(keys) <= self.exact_pairs else None
+
+        # HyperLogLog of destination ports: register from the top bits, rank from the trailing zeros of the rest
+        h = _mix(port, _SEEDS[-1])
+        registers = 1 << self.precision
+        index = (h >> np.uint64(64 - self.precision)).astype(np.intp)
+        rest = h & np.uint64((1 << (64 - self.precision)) - 1)
+        with np.errstate(over="ignore"):
+            lowest = rest & (~rest + np.uint64(1))
+        rank = np.where(rest == 0, 64 - self.precision + 1,
+                        np.frexp(lowest.astype(np.float64))[1]).astype(np.uint8)
+        grid = self.registers[slot].reshape(-1)
+        for hash_row, row in enumerate(rows):
+            np.maximum.at(grid, (hash_row * self.rows + row) * registers + index, rank)
+
+    def _flag(self, alert_type: str, sources: np.ndarray, estimates: np.ndarray, threshold: int,
+              ts: float) -> List[Detection]:
+        flagged = []
+        for src, estimate in zip(sources.tolist(), estimates.tolist()):
+            key = (alert_type, src)
+            previous = self.alerted.get(key)
+            if previous is not None and ts - previous < self.window:
+                continue
+            self.alerted[key] = ts
+            self.alerted.move_to_end(key)
+            if len(self.alerted) > self.max_tracked:
+                self.alerted.popitem(last=False)
+            detection = Detection(alert_type, str(ipaddress.IPv4Address(src)), ts, int(round(estimate)),
+                                  threshold, self.window)
+            self.detections.append(detection)
+            self.totals[alert_type] += 1
+            flagged.append(detection)
+        return flagged
+
+    def _exact_ports(self, sources: np.ndarray) -> np.ndarray:
+        """Distinct ports each of the (sorted) ``sources`` touched in the window"""
+        keys = np.concatenate(self.pairs)
+        keys = np.unique(keys[np.isin(keys >> np.uint64(16), sources)])
+        seen, counts = np.unique(keys >> np.uint64(16), return_counts=True)
+        ports = np.zeros(len(sources))
+        ports[np.isin(sources, seen)] = counts
+        return ports
+
+    def _evaluate(self, src: np.ndarray, ts: float) -> List[Detection]:
+        """Flag the distinct sources of a batch whose window estimates reach a threshold"""
+        sources = np.unique(src)
+        columns, rows = self._columns(sources), self._rows(sources)
+        window = self.counts.sum(axis=0)
+        attempts = np.min([window[0, row][column] for row, column in enumerate(columns)], axis=0)
+        ssh = np.min([window[1, row][column] for row, column in enumerate(columns)], axis=0)
+
+        detections = []
+        brute = ssh >= self.brute_force_threshold
+        if brute.any():
+            detections += self._flag(BRUTE_FORCE, sources[brute], ssh[brute], self.brute_force_threshold, ts)
+
+        # a source cannot have touched more ports than it made attempts
+        candidates = np.flatnonzero(attempts >= self.port_scan_threshold)
+        if len(candidates):
+            if all(pairs is not None for pairs in self.pairs):
+                ports = self._exact_ports(sources[candidates])
+            else:
+                ports = np.min([_hll_estimate(self.registers[:, hash_row, row[candidates]].max(axis=0))
+                                for hash_row, row in enumerate(rows)], axis=0)
+            scanning = ports >= self.port_scan_threshold
+            if scanning.any():
+                detections += self._flag(PORT_SCAN, sources[candidates][scanning], ports[scanning],
+                                         self.port_scan_threshold, ts)
+        return detections
+
+    def feed(self, ts: np.ndarray, src: np.ndarray, protocol: np.ndarray, port: np.ndarray) -> List[Detection]:
+        """Add a batch of connection attempts; returns the new detections"""
+        started = time.perf_counter()
+        ts = np.asarray(ts, dtype=np.float64)
+        src = np.asarray(src, dtype=np.uint32)
+        protocol = np.asarray(protocol, dtype=np.uint8)
+        port = np.asarray(port, dtype=np.uint16)
+        self.flows += len(ts)
+
+        bucket = np.floor(ts / self.bucket_seconds).astype(np.int64)
+        if self.current is not None:
+            fresh = bucket > self.current - self.buckets
+            self.late += int(len(bucket) - fresh.sum())
+            if not fresh.all():
+                ts, src, protocol, port, bucket = ts[fresh], src[fresh], protocol[fresh], port[fresh], bucket[fresh]
+
+        detections = []
+        for value in np.unique(bucket).tolist():
+            if self.current is None or value > self.current:
+                self._advance(value)
+            selected = bucket == value
+            batch_src = src[selected]
+            ssh = (protocol[selected] == TCP) & np.isin(port[selected], self.ssh_ports)
+            self._update(value % self.buckets, batch_src, port[selected], ssh,
+                         self._columns(batch_src), self._rows(batch_src))
+            detections += self._evaluate(batch_src, float(ts[selected].max()))
+        self.elapsed += time.perf_counter() - started
+        return detections
+
+    def feed_records(self, records: Any, now: Optional[float] = None) -> List[Detection]:
+        """Add flow records: a NumPy structured array or a sequence of mappings
+
+        Fields are ``src``, ``protocol``, ``port`` (or ``dport``) and an optional
+        ``ts``; records without one are stamped ``now``. Addresses may be
+        integers or dotted quads, so network-sim flow arrays, pcap connection
+        events and JSON bodies are all accepted.
+        """
+        if isinstance(records, np.ndarray) and records.dtype.names:
+            names = records.dtype.names
+            columns = {name: records[name] for name in names}
+        else:
+            records = list(records)
+            names = set().union(*(record.keys() for record in records)) if records else set()
+            columns = {name: [record.get(name) for record in records] for name in names}
+        if not columns:
+            return []
+        if "src" not in columns or not ({"port", "dport"} & set(columns)):
+            raise ValueError("flow records need src and port (or dport) fields")
+        count = len(columns["src"])
+        stamp = time.time() if now is None else now
+        ts = columns.get("ts")
+        if ts is None:
+            ts = np.full(count, stamp)
+        elif not isinstance(ts, np.ndarray):
+            ts = [stamp if value is None else value for value in ts]
+        protocol = columns.get("protocol")
+        if protocol is None:
+            protocol = np.full(count, TCP)
+        elif not isinstance(protocol, np.ndarray):
+            protocol = [{"tcp": 6, "udp": 17, "icmp": 1}.get(str(value).lower(), value) if value is not None else TCP
+                        for value in protocol]
+        return self.feed(ts, _addresses(columns["src"]), protocol, columns.get("port", columns.get("dport")))
+
+    def report(self) -> Dict[str, Any]:
+        """Counters, throughput and recent detections"""
+        return {
+            "flows": self.flows,
+            "late": self.late,
+            "detections": dict(self.totals),
+            "recent": [dict(detection._asdict(), severity=detection.severity)
+                       for detection in list(self.detections)[-20:]],
+            "window_seconds": self.window,
+            "memory_bytes": self.memory_bytes,
+            "seconds": round(self.elapsed, 4),
+            "flows_per_second": round(self.flows / self.elapsed, 1) if self.elapsed else 0.0,
+        }
+
+def _addresses(values: Any) -> np.ndarray:
+    if isinstance(values, np.ndarray) and values.dtype.kind in "ui":
+        return values.astype(np.uint32)
+    return np.array([value if isinstance(value, int) else int(ipaddress.IPv4Address(value)) for value in values],
+                    dtype=np.uint32)
+
+_default_detector: Optional[BehaviorDetector] = None
+
+def default_detector() -> BehaviorDetector:
+    """Shared detector for flows posted to the API"""
+    global _default_detector
+    if _default_detector is None:
+        _default_detector = BehaviorDetector()
+    return _default_detector
+
+def attack_flows(name: str, source: str, destination: str, start: float = 0.0) -> np.ndarray:
+    """Connection attempts of a canned attack: ``rapid_port_scan`` or ``ssh_brute_force``"""
+    if name == "rapid_port_scan":
+        # SYN scan of the first 1000 ports in two seconds
+        count, duration, ports = 1000, 2.0, np.arange(1, 1001)
+    elif name == "ssh_brute_force":
+        # a password guess every half second for 30 seconds
+        count, duration, ports = 60, 30.0, np.full(60, 22)
+    else:
+        raise ValueError(f"unknown behavioural attack: {name}")
+    records = np.zeros(count, dtype=[("ts", np.float64), ("src", np.uint32), ("dst", np.uint32),
+                                     ("protocol", np.uint8), ("port", np.uint16)])
+    records["ts"] = start + np.linspace(0.0, duration, count, endpoint=False)
+    records["src"] = int(ipaddress.IPv4Address(source))
+    records["dst"] = int(ipaddress.IPv4Address(destination))
+    records["protocol"] = TCP
+    records["port"] = ports
+    return records
+
+def synthetic_traffic(count: int, sources: int = 50000, scanners: int = 5, brute_forcers: int = 5,
+                      duration: float = 60.0, seed: int = 0) -> np.ndarray:
+    """Background connection attempts with a few scanners and SSH brute-forcers mixed in"""
+    rng = np.random.default_rng(seed)
+    records = np.zeros(count, dtype=[("ts", np.float64), ("src", np.uint32), ("dst", np.uint32),
+                                     ("protocol", np.uint8), ("port", np.uint16)])
+    records["ts"] = np.sort(rng.uniform(0.0, duration, count))
+    # Zipf-like popularity: a few chatty clients, a long tail of quiet ones
+    records["src"] = 0x0A000000 + (rng.zipf(1.3, count) % sources)
+    records["dst"] = 0xC6336400 + rng.integers(0, 256, count)
+    records["protocol"] = np.where(rng.random(count) < 0.8, TCP, 17)
+    records["port"] = rng.choice(np.array([443, 80, 53, 123, 993, 8080], dtype=np.uint16), count)
+
+    attackers = rng.choice(count, scanners * 200 + brute_forcers * 40, replace=False)
+    scan, brute = attackers[:scanners * 200], attackers[scanners * 200:]
+    records["src"][scan] = 0xCB007100 + np.repeat(np.arange(scanners), 200)
+    records["port"][scan] = rng.integers(1, 65536, len(scan))
+    records["protocol"][scan] = TCP
+    records["src"][brute] = 0xCB007200 + np.repeat(np.arange(brute_forcers), 40)
+    records["port"][brute] = 22
+    records["protocol"][brute] = TCP
+    return records
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Port-scan and SSH brute-force detector of the OPNsense mock")
+    parser.add_argument("--flows", type=int, default=1_000_000, help="synthetic connection attempts")
+    parser.add_argument("--sources", type=int, default=50000)
+    parser.add_argument("--batch-size", type=int, default=65536)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    records = synthetic_traffic(args.flows, args.sources, seed=args.seed)
+    detector = BehaviorDetector()
+    for start in range(0, len(records), args.batch_size):
+        detector.feed_records(records[start:start + args.batch_size])
+    report = detector.report()
+    print(f"{report['flows']} flows in {report['seconds']}s ({report['flows_per_second']:.0f}/s), "
+          f"{report['memory_bytes'] / 2 ** 20:.1f} MiB of window state")
+    for detection in detector.detections:
+        print(f"[{detection.severity}] {detection.alert_type} {detection.source} "
+              f"~{detection.estimate} >= {detection.threshold} at {detection.ts:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,731 @@
+"""
+Signature IDS engine for the OPNsense mock
+
+Loads Suricata/ET-style rules and inspects payloads the way Suricata's
+multi-pattern matcher does: every ``content`` of every rule goes into one
+Aho-Corasick automaton, a payload is scanned once, and only rules whose
+contents were all found have their header (protocol, addresses, ports)
+checked. Rules without content are checked on their header alone.
+
+Supported: rule headers with variables, address/port groups, negation and
+ranges; ``content`` with ``|hex|`` bytes, ``nocase`` and ``!`` negation;
+``msg``, ``sid``, ``rev``, ``classtype``, ``priority`` and ``metadata``.
+Other options (flow, pcre, offset/depth, thresholds) are parsed and
+ignored, so a rule may match where Suricata's would not. IPv4 only.
+
+Run ``python -m src.ids bench`` to measure inspection throughput against
+ruleset size.
+"""
+
+import argparse
+import ipaddress
+import os
+import random
+import sys
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+DEFAULT_RULES = Path(__file__).parent / "rules" / "emerging-subset.rules"
+
+MAX_ADDRESS = 2 ** 32 - 1
+MAX_PORT = 65535
+
+# Suricata's default address-groups/port-groups from suricata.yaml
+DEFAULT_VARIABLES = {
+    "HOME_NET": "[192.168.0.0/16,10.0.0.0/8,172.16.0.0/12]",
+    "EXTERNAL_NET": "!$HOME_NET",
+    "HTTP_SERVERS": "$HOME_NET",
+    "SMTP_SERVERS": "$HOME_NET",
+    "SQL_SERVERS": "$HOME_NET",
+    "DNS_SERVERS": "$HOME_NET",
+    "TELNET_SERVERS": "$HOME_NET",
+    "HTTP_PORTS": "[80,81,311,591,593,901,1220,1414,1741,1830,2301,2381,2809,3128,3702,4343,4848,5250,"
+                  "6988,7000,7001,7144,7145,7510,7777,7779,8000,8008,8014,8028,8080,8081,8082,8085,"
+                  "8088,8090,8118,8123,8180,8181,8243,8280,8300,8800,8888,8899,9000,9060,9080,9090,"
+                  "9091,9443,9999,11371,34443,34444,41080,50002,55555]",
+    "SHELLCODE_PORTS": "!80",
+    "ORACLE_PORTS": "1521",
+    "SSH_PORTS": "22",
+    "DNP3_PORTS": "20000",
+    "MODBUS_PORTS": "502",
+    "FILE_DATA_PORTS": "[$HTTP_PORTS,110,143]",
+    "FTP_PORTS": "21",
+}
+
+# IP protocol numbers a rule protocol applies to; None matches any
+RULE_PROTOCOLS = {
+    "ip": None, "pkthdr": None,
+    "tcp": frozenset({6}), "udp": frozenset({17}), "icmp": frozenset({1}),
+    "http": frozenset({6}), "tls": frozenset({6}), "ssh": frozenset({6}), "smtp": frozenset({6}),
+    "ftp": frozenset({6}), "smb": frozenset({6}), "dns": frozenset({6, 17}),
+}
+PROTOCOL_NUMBERS = {"tcp": 6, "udp": 17, "icmp": 1}
+
+# priorities from Suricata's classification.config
+CLASSTYPE_PRIORITIES = {
+    "attempted-admin": 1, "attempted-user": 1, "shellcode-detect": 1, "successful-admin": 1,
+    "successful-user": 1, "trojan-activity": 1, "web-application-attack": 1, "policy-violation": 1,
+    "attempted-dos": 2, "attempted-recon": 2, "bad-unknown": 2, "misc-attack": 2,
+    "successful-recon-limited": 2, "denial-of-service": 2, "suspicious-login": 2,
+    "misc-activity": 3, "network-scan": 3, "not-suspicious": 3, "protocol-command-decode": 3,
+    "unknown": 3,
+}
+SEVERITIES = {1: "high", 2: "medium"}
+
+class RuleError(ValueError):
+    """Raised for rules the engine cannot parse"""
+
+class Content(NamedTuple):
+    pattern: bytes
+    nocase: bool
+    negated: bool
+
+class Rule(NamedTuple):
+    action: str
+    protocols: Optional[frozenset]
+    src: Tuple[Tuple[int, int], ...]
+    sport: Tuple[Tuple[int, int], ...]
+    dst: Tuple[Tuple[int, int], ...]
+    dport: Tuple[Tuple[int, int], ...]
+    bidirectional: bool
+    contents: Tuple[Content, ...]
+    sid: int
+    rev: int
+    msg: str
+    classtype: str
+    priority: int
+    metadata: Dict[str, str]
+
+    @property
+    def severity(self) -> str:
+        return SEVERITIES.get(self.priority, "low")
+
+    @property
+    def alert_type(self) -> str:
+        return self.metadata.get("alert_type") or (self.classtype or "unknown").upper().replace("-", "_")
+
+# Interval sets -----------------------------------------------------------------
+
+def _normalize(intervals: Iterable[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    merged: List[Tuple[int, int]] = []
+    for first, last in sorted(intervals):
+        if merged and first <= merged[-1][1] + 1:
+            if last > merged[-1][1]:
+                merged[-1] = (merged[-1][0], last)
+        else:
+            merged.append((first, last))
+    return merged
+
+def _complement(intervals: List[Tuple[int, int]], maximum: int) -> List[Tuple[int, int]]:
+    result, start = [], 0
+    for first, last in intervals:
+        if first > start:
+            result.append((start, first - 1))
+        start = last + 1
+    if start <= maximum:
+        result.append((start, maximum))
+    return result
+
+def _subtract(intervals: List[Tuple[int, int]], removed: List[Tuple[int, int]],
+              maximum: int) -> List[Tuple[int, int]]:
+    kept = _complement(removed, maximum)
+    result = []
+    for first, last in intervals:
+        for keep_first, keep_last in kept:
+            low, high = max(first, keep_first), min(last, keep_last)
+            if low <= high:
+                result.append((low, high))
+    return result
+
+def _contains(intervals: Tuple[Tuple[int, int], ...], value: int) -> bool:
+    for first, last in intervals:
+        if first <= value <= last:
+            return True
+    return False
+
+def _split_group(text: str) -> List[str]:
+    """Top-level comma-separated items of ``a,[b,c],d``"""
+    items, depth, current = [], 0, []
+    for char in text:
+        if char == "[":
+            depth += 1
+        elif char == "]":
+            depth -= 1
+        if char == "," and depth == 0:
+            items.append("".join(current).strip())
+            current = []
+        else:
+            current.append(char)
+    items.append("".join(current).strip())
+    return [item for item in items if item]
+
+def _parse_set(text: str, variables: Dict[str, str], maximum: int, parse_item,
+               seen: Tuple[str, ...] = ()) -> List[Tuple[int, int]]:
+    text = text.strip()
+    if text.startswith("!"):
+        return _complement(_parse_set(text[1:], variables, maximum, parse_item, seen), maximum)
+    if text.startswith("[") and text.endswith("]"):
+        included, excluded = [], []
+        for item in _split_group(text[1:-1]):
+            if item.startswith("!"):
+                excluded.extend(_parse_set(item[1:], variables, maximum, parse_item, seen))
+            else:
+                included.extend(_parse_set(item, variables, maximum, parse_item, seen))
+        if not included and excluded:
+            included = [(0, maximum)]
+        return _subtract(_normalize(included), _normalize(excluded), maximum)
+    if text.startswith("$"):
+        name = text[1:]
+        if name not in variables:
+            raise RuleError(f"undefined rule variable: {text}")
+        if name in seen:
+            raise RuleError(f"recursive rule variable: {text}")
+        return _parse_set(variables[name], variables, maximum, parse_item, seen + (name,))
+    if text.lower() == "any":
+        return [(0, maximum)]
+    item = parse_item(text)
+    return [item] if item else []
+
+def _parse_address_item(text: str) -> Optional[Tuple[int, int]]:
+    try:
+        network = ipaddress.ip_network(text, strict=False)
+    except ValueError:
+        raise RuleError(f"invalid rule address: {text}")
+    if network.version != 4:
+        return None
+    return int(network.network_address), int(network.broadcast_address)
+
+def _parse_port_item(text: str) -> Tuple[int, int]:
+    first, separator, last = text.partition(":")
+    try:
+        if not separator:
+            return int(first), int(first)
+        return int(first or 0), int(last or MAX_PORT)
+    except ValueError:
+        raise RuleError(f"invalid rule port: {text}")
+
+def parse_addresses(text: str, variables: Optional[Dict[str, str]] = None) -> Tuple[Tuple[int, int], ...]:
+    """IPv4 intervals for a rule address field such as ``[$HOME_NET,!10.0.0.0/8]``"""
+    return tuple(_parse_set(text, dict(DEFAULT_VARIABLES, **(variables or {})), MAX_ADDRESS, _parse_address_item))
+
+def parse_ports(text: str, variables: Optional[Dict[str, str]] = None) -> Tuple[Tuple[int, int], ...]:
+    """Port intervals for a rule port field such as ``[80,1024:]`` or ``!$HTTP_PORTS``"""
+    return tuple(_parse_set(text, dict(DEFAULT_VARIABLES, **(variables or {})), MAX_PORT, _parse_port_item))
+
+# Rule parsing -----------------------------------------------------------------
+
+def _split_options(text: str) -> List[Tuple[str, str]]:
+    """``key:value;`` pairs of a rule body, honouring quotes and backslash escapes"""
+    options, current, quoted, escaped = [], [], False, False
+    for char in text:
+        if escaped:
+            current.append(char)
+            escaped = False
+        elif char == "\\":
+            current.append(char)
+            escaped = True
+        elif char == '"':
+            current.append(char)
+            quoted = not quoted
+        elif char == ";" and not quoted:
+            option = "".join(current).strip()
+            if option:
+                key, _, value = option.partition(":")
+                options.append((key.strip().lower(), value.strip()))
+            current = []
+        else:
+            current.append(char)
+    if "".join(current).strip():
+        raise RuleError(f"unterminated rule option: {''.join(current).strip()}")
+    return options
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        value = value[1:-1]
+    result, escaped = [], False
+    for char in value:
+        if escaped:
+            result.append(char)
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        else:
+            result.append(char)
+    return "".join(result)
+
+def decode_content(value: str) -> bytes:
+    """Bytes of a content string, with ``|0d 0a|`` hex sections"""
+    parts = _unquote(value).split("|")
+    if len(parts) % 2 == 0:
+        raise RuleError(f"unbalanced hex section in content: {value}")
+    data = bytearray()
+    for index, part in enumerate(parts):
+        if index % 2:
+            try:
+                data.extend(bytes.fromhex(part))
+            except ValueError:
+                raise RuleError(f"invalid hex in content: {value}")
+        else:
+            data.extend(part.encode("utf-8"))
+    return bytes(data)
+
+def parse_rule(line: str, variables: Optional[Dict[str, str]] = None) -> Rule:
+    """Parse one Suricata rule"""
+    variables = dict(DEFAULT_VARIABLES, **(variables or {}))
+    line = line.strip()
+    head, paren, body = line.partition("(")
+    if not paren or not body.rstrip().endswith(")"):
+        raise RuleError(f"rule has no options: {line[:80]}")
+    fields = head.split()
+    if len(fields) != 7 or fields[4] not in ("->", "<>"):
+        raise RuleError(f"invalid rule header: {head.strip()}")
+    action, protocol, src, sport, direction, dst, dport = fields
+    if protocol.lower() not in RULE_PROTOCOLS:
+        raise RuleError(f"unsupported rule protocol: {protocol}")
+
+    contents: List[Content] = []
+    values: Dict[str, str] = {}
+    metadata: Dict[str, str] = {}
+    for key, value in _split_options(body.rstrip()[:-1]):
+        if key == "content":
+            negated = value.startswith("!")
+            pattern = decode_content(value.lstrip("!").strip())
+            if not pattern:
+                raise RuleError("empty content")
+            contents.append(Content(pattern, False, negated))
+        elif key == "nocase":
+            if not contents:
+                raise RuleError("nocase without a preceding content")
+            contents[-1] = contents[-1]._replace(nocase=True)
+        elif key == "metadata":
+            for entry in value.split(","):
+                name, _, setting = entry.strip().partition(" ")
+                if name:
+                    metadata[name] = setting.strip()
+        else:
+            values[key] = value
+
+    if "sid" not in values:
+        raise RuleError(f"rule without sid: {line[:80]}")
+    classtype = values.get("classtype", "")
+    try:
+        sid = int(values["sid"])
+        rev = int(values.get("rev", 1))
+        priority = int(values.get("priority", CLASSTYPE_PRIORITIES.get(classtype, 3)))
+    except ValueError:
+        raise RuleError(f"invalid sid, rev or priority: {line[:80]}")
+    return Rule(
+        action=action.lower(),
+        protocols=RULE_PROTOCOLS[protocol.lower()],
+        src=tuple(_parse_set(src, variables, MAX_ADDRESS, _parse_address_item)),
+        sport=tuple(_parse_set(sport, variables, MAX_PORT, _parse_port_item)),
+        dst=tuple(_parse_set(dst, variables, MAX_ADDRESS, _parse_address_item)),
+        dport=tuple(_parse_set(dport, variables, MAX_PORT, _parse_port_item)),
+        bidirectional=direction == "<>",
+        contents=tuple(contents),
+        sid=sid,
+        rev=rev,
+        msg=_unquote(values.get("msg", "")),
+        classtype=classtype,
+        priority=priority,
+        metadata=metadata,
+    )
+
+def load_rules(lines: Iterable[str], variables: Optional[Dict[str, str]] = None,
+               strict: bool = False) -> Tuple[List[Rule], List[str]]:
+    """Parse enabled rules; returns (rules, errors). Commented-out rules are skipped"""
+    rules, errors = [], []
+    for number, line in enumerate(lines, 1):
+        line = line.strip()
+        if not line or line.startswith("#"):
+            continue
+        try:
+            rules.append(parse_rule(line, variables))
+        except RuleError as e:
+            if strict:
+                raise RuleError(f"line {number}: {e}")
+            errors.append(f"line {number}: {e}")
+    return rules, errors
+
+# Multi-pattern matching -------------------------------------------------------
+
+class AhoCorasick:
+    """Aho-Corasick automaton over byte patterns
+
+    Patterns are matched case-insensitively (ASCII); ``search`` verifies the
+    case-sensitive ones against the original payload.
+    """
+
+    def __init__(self, patterns: List[Content]):
+        self.patterns = patterns
+        self.goto: List[Dict[int, int]] = [{}]
+        self.fail: List[int] = [0]
+        self.output: List[Tuple[int, ...]] = [()]
+        outputs: List[List[int]] = [[]]
+
+        for index, content in enumerate(patterns):
+            state = 0
+            for byte in content.pattern.lower():
+                following = self.goto[state].get(byte)
+                if following is None:
+                    following = len(self.goto)
+                    self.goto[state][byte] = following
+                    self.goto.append({})
+                    self.fail.append(0)
+                    outputs.append([])
+                state = following
+            outputs[state].append(index)
+
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for byte, following in self.goto[state].items():
+                queue.append(following)
+                fallback = self.fail[state]
+                while fallback and byte not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[following] = self.goto[fallback].get(byte, 0)
+                outputs[following].extend(outputs[self.fail[following]])
+        self.output = [tuple(found) for found in outputs]
+        self.exact = [not content.nocase and content.pattern.lower() != content.pattern.upper()
+                      for content in patterns]
+
+    def __len__(self) -> int:
+        return len(self.goto)
+
+    def search(self, data: bytes) -> Set[int]:
+        """Indices of the patterns occurring in ``data``"""
+        goto, fail, output, exact, patterns = self.goto, self.fail, self.output, self.exact, self.patterns
+        found: Set[int] = set()
+        state = 0
+        for position, byte in enumerate(data.lower()):
+            while state and byte not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(byte, 0)
+            if output[state]:
+                for index in output[state]:
+                    if exact[index]:
+                        pattern = patterns[index].pattern
+                        if data[position + 1 - len(pattern):position + 1] != pattern:
+                            continue
+                    found.add(index)
+        return found
+
+# Engine -----------------------------------------------------------------------
+
+class Alert(NamedTuple):
+    sid: int
+    rev: int
+    msg: str
+    classtype: str
+    severity: str
+    alert_type: str
+    action: str
+
+class SignatureEngine:
+    """Compiled ruleset: one automaton for all contents plus per-rule header filters"""
+
+    def __init__(self, rules: List[Rule]):
+        started = time.perf_counter()
+        self.rules = list(rules)
+        patterns: List[Content] = []
+        pattern_ids: Dict[Tuple[bytes, bool], int] = {}
+        # per rule: pattern ids that must be present and that must be absent
+        self.required: List[Tuple[int, ...]] = []
+        self.forbidden: List[Tuple[int, ...]] = []
+        self.by_pattern: Dict[int, List[int]] = {}
+        # rules with no positive content are checked on every packet
+        self.header_only: List[int] = []
+
+        for index, rule in enumerate(self.rules):
+            required, forbidden = [], []
+            for content in rule.contents:
+                key = (content.pattern.lower() if content.nocase else content.pattern, content.nocase)
+                if key not in pattern_ids:
+                    pattern_ids[key] = len(patterns)
+                    patterns.append(content._replace(negated=False))
+                (forbidden if content.negated else required).append(pattern_ids[key])
+            self.required.append(tuple(required))
+            self.forbidden.append(tuple(forbidden))
+            if required:
+                # index each rule under its longest content; the rarest in practice
+                anchor = max(required, key=lambda pattern: len(patterns[pattern].pattern))
+                self.by_pattern.setdefault(anchor, []).append(index)
+            else:
+                self.header_only.append(index)
+
+        self.automaton = AhoCorasick(patterns)
+        self.build_seconds = time.perf_counter() - started
+        self.errors: List[str] = []
+        self.reset_stats()
+
+    @classmethod
+    def from_file(cls, path: Any = None, variables: Optional[Dict[str, str]] = None) -> "SignatureEngine":
+        """Engine for a rules file, or every ``*.rules`` file of a directory"""
+        path = Path(path or DEFAULT_RULES)
+        files = sorted(path.glob("*.rules")) if path.is_dir() else [path]
+        rules, errors = [], []
+        for rules_file in files:
+            with open(rules_file, encoding="utf-8") as handle:
+                parsed, failed = load_rules(handle, variables)
+            rules.extend(parsed)
+            errors.extend(f"{rules_file.name} {error}" for error in failed)
+        engine = cls(rules)
+        engine.errors = errors
+        return engine
+
+    def reset_stats(self) -> None:
+        self.packets = 0
+        self.bytes = 0
+        self.matches = 0
+        self.elapsed = 0.0
+
+    def _header_matches(self, rule: Rule, protocol: Optional[int], src: Optional[int], sport: Optional[int],
+                        dst: Optional[int], dport: Optional[int]) -> bool:
+        """Unknown (None) packet fields match any rule value"""
+        if protocol is not None and rule.protocols is not None and protocol not in rule.protocols:
+            return False
+        forward = ((src is None or _contains(rule.src, src)) and (sport is None or _contains(rule.sport, sport))
+                   and (dst is None or _contains(rule.dst, dst)) and (dport is None or _contains(rule.dport, dport)))
+        if forward or not rule.bidirectional:
+            return forward
+        return ((dst is None or _contains(rule.src, dst)) and (dport is None or _contains(rule.sport, dport))
+                and (src is None or _contains(rule.dst, src)) and (sport is None or _contains(rule.dport, sport)))
+
+    def inspect(self, payload: bytes, protocol: Optional[int] = None, src: Optional[int] = None,
+                sport: Optional[int] = None, dst: Optional[int] = None, dport: Optional[int] = None) -> List[int]:
+        """Indices of the rules matching one packet, in ruleset order"""
+        started = time.perf_counter()
+        found = self.automaton.search(payload) if payload else set()
+        candidates = list(self.header_only)
+        for pattern in found:
+            candidates.extend(self.by_pattern.get(pattern, ()))
+        matched = []
+        for index in sorted(set(candidates)):
+            if not all(pattern in found for pattern in self.required[index]):
+                continue
+            if any(pattern in found for pattern in self.forbidden[index]):
+                continue
+            if self._header_matches(self.rules[index], protocol, src, sport, dst, dport):
+                matched.append(index)
+        self.packets += 1
+        self.bytes += len(payload)
+        self.matches += len(matched)
+        self.elapsed += time.perf_counter() - started
+        return matched
+
+    def alerts(self, payload: bytes, protocol: Any = None, src: Any = None, sport: Optional[int] = None,
+               dst: Any = None, dport: Optional[int] = None) -> List[Alert]:
+        """Alerts for one packet, highest severity first; accepts protocol names and dotted addresses"""
+        if isinstance(protocol, str):
+            protocol = PROTOCOL_NUMBERS.get(protocol.lower())
+        matched = self.inspect(payload, protocol, _address(src), sport, _address(dst), dport)
+        rules = sorted((self.rules[index] for index in matched), key=lambda rule: rule.priority)
+        return [Alert(rule.sid, rule.rev, rule.msg, rule.classtype, rule.severity, rule.alert_type, rule.action)
+                for rule in rules]
+
+    def report(self) -> Dict[str, Any]:
+        """Ruleset size and inspection throughput so far"""
+        elapsed = self.elapsed or float("nan")
+        return {
+            "rules": len(self.rules),
+            "patterns": len(self.automaton.patterns),
+            "automaton_states": len(self.automaton),
+            "header_only_rules": len(self.header_only),
+            "build_seconds": round(self.build_seconds, 4),
+            "packets": self.packets,
+            "bytes": self.bytes,
+            "matches": self.matches,
+            "seconds": round(self.elapsed, 4),
+            "packets_per_second": round(self.packets / elapsed, 1) if self.packets else 0.0,
+            "matches_per_second": round(self.matches / elapsed, 1) if self.packets else 0.0,
+            "mbps": round(self.bytes * 8 / elapsed / 1e6, 3) if self.packets else 0.0,
+        }
+
+def _address(value: Any) -> Optional[int]:
+    if value is None or isinstance(value, int):
+        return value
+    try:
+        address = ipaddress.ip_address(str(value))
+    except ValueError:
+        return None
+    return int(address) if address.version == 4 else None
+
+def _port(value: Any, field: str) -> Optional[int]:
+    """Port number from a JSON body field; ``"80"`` and ``80`` are both accepted"""
+    if value is None:
+        return None
+    try:
+        port = int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a port number, not {value!r}")
+    if isinstance(value, (bool, float)) or not 0 <= port <= MAX_PORT:
+        raise ValueError(f"{field} must be a port number, not {value!r}")
+    return port
+
+def _protocol(value: Any) -> Optional[int]:
+    """Protocol number from a name (tcp, udp, icmp) or a number"""
+    if value is None or isinstance(value, str):
+        return PROTOCOL_NUMBERS.get(value.lower()) if value is not None else None
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise ValueError(f"protocol must be a name or number, not {value!r}")
+
+def _payload(value: Any) -> bytes:
+    if isinstance(value, str):
+        return value.encode("utf-8")
+    if isinstance(value, bytes):
+        return value
+    raise ValueError(f"payload must be a string, not {type(value).__name__}")
+
+_default_engine: Optional[SignatureEngine] = None
+
+# Canned attacks with no payload, replayed by ``behavior.attack_flows``
+BEHAVIOURAL_ATTACKS = ("rapid_port_scan", "ssh_brute_force")
+
+def default_engine() -> SignatureEngine:
+    """Shared engine for the API, from ``OPNSENSE_MOCK_IDS_RULES`` or the bundled ET subset"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = SignatureEngine.from_file(os.getenv("OPNSENSE_MOCK_IDS_RULES") or DEFAULT_RULES)
+    return _default_engine
+
+def detect_attack(request_data: Dict[str, Any], engine: Optional[SignatureEngine] = None) -> Dict[str, Any]:
+    """Response for the ``ids/test-detection`` endpoints
+
+    ``attack_type`` (or ``payload``) is inspected as a packet. The behavioural
+    attacks in ``BEHAVIOURAL_ATTACKS`` have no payload; their connection attempts
+    are replayed through a fresh scan/brute-force detector instead, when both
+    endpoints are IPv4 addresses. A payload that is not text, or a protocol
+    or port that is not a number (or numeric string), raises ValueError.
+    """
+    engine = engine or default_engine()
+    attack_type = request_data.get("attack_type")
+    source = request_data.get("source")
+    destination = request_data.get("destination")
+    payload = _payload(request_data.get("payload", attack_type) or "")
+    protocol = _protocol(request_data.get("protocol", "tcp"))
+    src_port = _port(request_data.get("src_port"), "src_port")
+    dst_port = _port(request_data.get("dst_port"), "dst_port")
+
+    alerts = engine.alerts(payload, protocol, source, src_port, destination, dst_port)
+    detections = []
+    if (not alerts and attack_type in BEHAVIOURAL_ATTACKS
+            and _address(source) is not None and _address(destination) is not None):
+        # numpy-backed, so only imported when a behavioural attack is replayed
+        from . import behavior
+        detections = behavior.BehaviorDetector().feed_records(
+            behavior.attack_flows(attack_type, source, destination, time.time()))
+    if alerts:
+        top = alerts[0]
+        alert_type, severity, rule_id, status = top.alert_type, top.severity, f"SID:{top.sid}", "detected"
+    elif detections:
+        alert_type, severity, rule_id, status = detections[0].alert_type, detections[0].severity, None, "detected"
+    else:
+        alert_type, severity, rule_id, status = "UNKNOWN_ATTACK", "low", None, "clean"
+
+    return {
+        "status": status,
+        "alert_type": alert_type,
+        "source": source,
+        "destination": destination,
+        "severity": severity,
+        "timestamp": int(time.time()),
+        "rule_id": rule_id,
+        "alerts": [alert._asdict() for alert in alerts],
+        "detections": [dict(detection._asdict(), severity=detection.severity) for detection in detections],
+        "message": f"IDS detected {alert_type.lower()} from {source} to {destination}" if status == "detected"
+                   else f"IDS found no signature match from {source} to {destination}"
+    }
+
+# Benchmark --------------------------------------------------------------------
+
+_WORDS = ["admin", "login", "cmd", "exec", "shell", "update", "config", "token", "upload", "select",
+          "passwd", "agent", "beacon", "loader", "payload", "invoke", "session", "proxy", "query", "debug"]
+
+def synthetic_rules(count: int, seed: int = 0) -> List[Rule]:
+    """``count`` ET-shaped content rules with distinct random patterns"""
+    rng = random.Random(seed)
+    lines = []
+    for index in range(count):
+        token = f"{rng.choice(_WORDS)}{rng.getrandbits(32):08x}"
+        extra = f' content:"{rng.choice(_WORDS)}="; nocase;' if rng.random() < 0.4 else ""
+        protocol, dport = rng.choice([("http", "$HTTP_PORTS"), ("tcp", "any"), ("udp", "53"), ("tcp", "$SSH_PORTS")])
+        lines.append(f'alert {protocol} $EXTERNAL_NET any -> $HOME_NET {dport} (msg:"SYNTHETIC {token}"; '
+                     f'content:"{token}"; nocase;{extra} classtype:misc-activity; sid:{9000000 + index}; rev:1;)')
+    return load_rules(lines, strict=True)[0]
+
+def synthetic_traffic(count: int, rules: List[Rule], size: int = 512, hit_rate: float = 0.01,
+                      seed: int = 0) -> List[bytes]:
+    """``count`` printable payloads of ``size`` bytes; ``hit_rate`` of them embed a rule's contents"""
+    rng = random.Random(seed)
+    alphabet = b"abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789 /=&?.-_:\r\n"
+    payloads = []
+    for _ in range(count):
+        payload = bytearray(rng.choice(alphabet) for _ in range(size))
+        if rules and rng.random() < hit_rate:
+            embedded = b" ".join(content.pattern for content in rng.choice(rules).contents if not content.negated)
+            offset = rng.randrange(max(1, size - len(embedded)))
+            payload[offset:offset + len(embedded)] = embedded
+        payloads.append(bytes(payload[:size]))
+    return payloads
+
+def benchmark(sizes: Iterable[int], packets: int = 2000, payload_size: int = 512, hit_rate: float = 0.01,
+              base: Optional[List[Rule]] = None, seed: int = 0) -> List[Dict[str, Any]]:
+    """Inspection throughput for rulesets of each size (the bundled subset plus synthetic rules)"""
+    base = list(base if base is not None else SignatureEngine.from_file().rules)
+    results = []
+    for size in sizes:
+        rules = base + synthetic_rules(max(0, size - len(base)), seed)
+        traffic = synthetic_traffic(packets, rules, payload_size, hit_rate, seed)
+        engine = SignatureEngine(rules)
+        for payload in traffic:
+            engine.inspect(payload, 6, 0xCB007164, 40000, 0x0A000164, 80)
+        results.append(engine.report())
+    return results
+
+def format_benchmark(results: List[Dict[str, Any]]) -> str:
+    lines = [f"{'rules':>7} {'states':>8} {'build s':>8} {'pkt/s':>10} {'Mbps':>8} {'matches/s':>10}"]
+    for result in results:
+        lines.append(f"{result['rules']:>7} {result['automaton_states']:>8} {result['build_seconds']:>8.3f} "
+                     f"{result['packets_per_second']:>10.0f} {result['mbps']:>8.2f} {result['matches_per_second']:>10.1f}")
+    return "\n".join(lines)
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Signature IDS engine of the OPNsense mock")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    inspect = commands.add_parser("inspect", help="match one payload against a ruleset")
+    inspect.add_argument("payload")
+    inspect.add_argument("--rules", help="rules file or directory (default: bundled ET subset)")
+    inspect.add_argument("--protocol", default="tcp")
+    inspect.add_argument("--source")
+    inspect.add_argument("--destination")
+    inspect.add_argument("--dport", type=int)
+
+    bench = commands.add_parser("bench", help="inspection throughput against ruleset size")
+    bench.add_argument("--sizes", default="25,250,1000,5000", help="comma-separated ruleset sizes")
+    bench.add_argument("--packets", type=int, default=2000)
+    bench.add_argument("--payload-size", type=int, default=512)
+    bench.add_argument("--hit-rate", type=float, default=0.01)
+    bench.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    if args.command == "inspect":
+        engine = SignatureEngine.from_file(args.rules)
+        for error in engine.errors:
+            print(f"skipped {error}", file=sys.stderr)
+        alerts = engine.alerts(args.payload.encode("utf-8"), args.protocol, args.source, None,
+                               args.destination, args.dport)
+        for alert in alerts:
+            print(f"[{alert.severity}] {alert.sid}:{alert.rev} {alert.msg} ({alert.classtype})")
+        return 0 if alerts else 1
+
+    sizes = [int(size) for size in args.sizes.split(",") if size.strip()]
+    print(format_benchmark(benchmark(sizes, args.packets, args.payload_size, args.hit_rate, seed=args.seed)))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
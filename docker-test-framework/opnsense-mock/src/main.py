@@ -22,6 +22,7 @@ from .api import (
     diagnostics_router
 )
 from .storage import MemoryStorage
+from . import behavior, ids
 
 # Configure structured logging
 structlog.configure(
@@ -143,30 +144,33 @@ import time
 @app.post("/api/ids/test-detection")
 async def ids_test_detection(request_data: Dict[str, Any]):
     """IDS test detection endpoint - Zeek/Suricata running as OPNsense plugin"""
-    attack_type = request_data.get("attack_type")
-    source = request_data.get("source")
-    destination = request_data.get("destination")
-
-    # Map attack types to alert types for testing
-    alert_mapping = {
-        "' OR '1'='1": "SQL_INJECTION",
-        "rapid_port_scan": "PORT_SCAN",
-        "ssh_brute_force": "BRUTE_FORCE"
-    }
-
-    alert_type = alert_mapping.get(attack_type, "UNKNOWN_ATTACK")
-
+    try:
+        return ids.detect_attack(request_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/ids/stats")
+async def ids_stats():
+    """Signature engine ruleset size and inspection throughput (matches per second)"""
+    return ids.default_engine().report()
+
+@app.post("/api/ids/flows")
+async def ids_flows(request_data: Dict[str, Any]):
+    """Feed connection attempts (network-sim flows or pcap events) to the scan/brute-force detector"""
+    try:
+        detections = behavior.default_detector().feed_records(request_data.get("flows") or [])
+    except (TypeError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "status": "detected",
-        "alert_type": alert_type,
-        "source": source,
-        "destination": destination,
-        "severity": "high" if alert_type != "UNKNOWN_ATTACK" else "low",
-        "timestamp": int(time.time()),
-        "rule_id": f"SID:{hash(attack_type) % 100000}",
-        "message": f"IDS detected {alert_type.lower()} from {source} to {destination}"
+        "detections": [dict(detection._asdict(), severity=detection.severity) for detection in detections],
+        "report": behavior.default_detector().report()
     }
 
+@app.get("/api/ids/behavior")
+async def ids_behavior():
+    """Scan/brute-force detector counters and recent detections"""
+    return behavior.default_detector().report()
+
 @app.post("/api/tailscale/test-connection")
 async def tailscale_test_connection(request_data: Dict[str, Any]):
     """Tailscale test connection endpoint - VPN service on OPNsense VM"""
@@ -205,6 +209,14 @@ async def startup_event():
     # Initialize default data
     await storage.initialize_defaults(settings)
 
+    # Compile the IDS ruleset up front so the first inspection is not delayed
+    engine = ids.default_engine()
+    for error in engine.errors:
+        logger.warning("Skipped IDS rule", error=error)
+    logger.info("IDS signature engine loaded",
+                rules=len(engine.rules),
+                automaton_states=len(engine.automaton))
+
     logger.info("OPNsense API Mock Service started successfully")
 
 @app.on_event("shutdown")
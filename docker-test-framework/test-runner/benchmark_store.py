@@ -0,0 +1,210 @@
+#!/usr/bin/env python3
+"""
+Benchmark History Store for Test Runner Results
+Appends per-run metrics to SQLite and flags regressions against a rolling baseline
+"""
+
+import argparse
+import os
+import sqlite3
+import statistics
+import time
+from dataclasses import dataclass, asdict
+from typing import Any, Dict, List, Optional, Tuple
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    started_at REAL NOT NULL,
+    test_suite TEXT NOT NULL,
+    profile TEXT NOT NULL,
+    git_ref TEXT,
+    success INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS metrics (
+    run_id INTEGER NOT NULL REFERENCES runs(id) ON DELETE CASCADE,
+    scope TEXT NOT NULL,
+    name TEXT NOT NULL,
+    metric TEXT NOT NULL,
+    value REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_profile ON runs(profile, id);
+CREATE INDEX IF NOT EXISTS idx_metrics_key ON metrics(scope, name, metric, run_id);
+"""
+
+# Metrics where a larger value is a regression; every other metric regresses downwards
+HIGHER_IS_WORSE = {"duration", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "error_rate"}
+
+# Smallest worsening that can count as a regression, in each metric's own unit.
+# A flat baseline has no spread, so without a floor one slow or failed request
+# out of thousands would be flagged.
+MIN_DELTA = {"duration": 1.0, "p50_ms": 5.0, "p95_ms": 5.0, "p99_ms": 5.0, "mean_ms": 5.0,
+             "error_rate": 0.01, "throughput_rps": 1.0}
+
+# Scale factor turning the median absolute deviation into a standard deviation estimate
+MAD_SCALE = 1.4826
+
+Metric = Tuple[str, str, str, float]  # (scope, name, metric, value)
+
+
+@dataclass
+class Regression:
+    """A metric that moved significantly in the bad direction"""
+    scope: str
+    name: str
+    metric: str
+    value: float
+    baseline: float
+    change: float
+    score: Optional[float]
+    samples: int
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+    def __str__(self) -> str:
+        score = f", robust z={self.score:.1f}" if self.score is not None else ""
+        return (f"{self.scope}/{self.name} {self.metric}: {self.value:.3f} vs baseline "
+                f"{self.baseline:.3f} ({self.change:+.1%}{score}, n={self.samples})")
+
+
+def extract_metrics(results: Dict[str, Any]) -> List[Metric]:
+    """Flatten a TestRunner results dict into (scope, name, metric, value) rows"""
+    metrics: List[Metric] = []
+
+    for suite, result in results.get("tests", {}).items():
+        if result.get("duration") is not None:
+            metrics.append(("suite", suite, "duration", float(result["duration"])))
+
+    performance = results.get("performance") or {}
+    for endpoint, summary in performance.get("endpoints", {}).items():
+        metrics.append(("endpoint", endpoint, "throughput_rps", float(summary["throughput_rps"])))
+        metrics.append(("endpoint", endpoint, "error_rate", float(summary["error_rate"])))
+        for key in ("mean", "p50", "p95", "p99"):
+            value = summary.get("latency_ms", {}).get(key)
+            if value is not None:
+                metrics.append(("endpoint", endpoint, f"{key}_ms", float(value)))
+
+    return metrics
+
+
+class BenchmarkStore:
+    """SQLite-backed history of benchmark metrics
+
+    Runs are grouped by a profile string (suite plus load settings) so that only
+    comparable runs form each other's baseline.
+    """
+
+    def __init__(self, path: str, window: int = 20, min_samples: int = 5,
+                 z_threshold: float = 3.5, min_change: float = 0.10,
+                 min_delta: Optional[Dict[str, float]] = None):
+        self.path = path
+        self.window = window
+        self.min_samples = min_samples
+        self.z_threshold = z_threshold
+        self.min_change = min_change
+        self.min_delta = {**MIN_DELTA, **(min_delta or {})}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA foreign_keys = ON")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def record_run(self, results: Dict[str, Any], profile: str,
+                   git_ref: Optional[str] = None) -> int:
+        """Append a run and its metrics, returning the run id"""
+        success = bool(results.get("summary", {}).get("success", False))
+        with self.conn:
+            cursor = self.conn.execute(
+                "INSERT INTO runs (started_at, test_suite, profile, git_ref, success) VALUES (?, ?, ?, ?, ?)",
+                (results.get("start_time", time.time()), results.get("test_suite", "all"),
+                 profile, git_ref, int(success)),
+            )
+            run_id = cursor.lastrowid
+            self.conn.executemany(
+                "INSERT INTO metrics (run_id, scope, name, metric, value) VALUES (?, ?, ?, ?, ?)",
+                [(run_id, *metric) for metric in extract_metrics(results)],
+            )
+        return run_id
+
+    def baseline_values(self, profile: str, scope: str, name: str, metric: str,
+                        before_run: Optional[int] = None) -> List[float]:
+        """Most recent values of a metric from successful runs of the same profile"""
+        rows = self.conn.execute(
+            """
+            SELECT m.value FROM metrics m JOIN runs r ON r.id = m.run_id
+            WHERE r.profile = ? AND r.success = 1
+              AND m.scope = ? AND m.name = ? AND m.metric = ?
+              AND (? IS NULL OR r.id < ?)
+            ORDER BY r.id DESC LIMIT ?
+            """,
+            (profile, scope, name, metric, before_run, before_run, self.window),
+        ).fetchall()
+        return [row[0] for row in rows]
+
+    def check(self, results: Dict[str, Any], profile: str,
+              before_run: Optional[int] = None) -> List[Regression]:
+        """Compare a run's metrics against the rolling baseline
+
+        A metric regresses when it moves in the bad direction by at least its
+        ``min_delta`` floor, by more than ``min_change`` relative to the
+        baseline median and, when the baseline has any spread, by more than
+        ``z_threshold`` robust standard deviations (median absolute deviation
+        based).
+        """
+        regressions = []
+        for scope, name, metric, value in extract_metrics(results):
+            history = self.baseline_values(profile, scope, name, metric, before_run)
+            if len(history) < self.min_samples:
+                continue
+
+            median = statistics.median(history)
+            mad = statistics.median(abs(v - median) for v in history) * MAD_SCALE
+            delta = value - median if metric in HIGHER_IS_WORSE else median - value
+            if delta <= 0 or delta < self.min_delta.get(metric, 0.0):
+                continue
+
+            change = delta / abs(median) if median else float("inf")
+            score = delta / mad if mad else None
+            if change < self.min_change or (score is not None and score < self.z_threshold):
+                continue
+
+            regressions.append(Regression(
+                scope, name, metric, value, median,
+                change if metric in HIGHER_IS_WORSE else -change, score, len(history),
+            ))
+        return regressions
+
+    def history(self, limit: int = 20) -> List[Dict[str, Any]]:
+        rows = self.conn.execute(
+            "SELECT id, started_at, test_suite, profile, git_ref, success FROM runs ORDER BY id DESC LIMIT ?",
+            (limit,),
+        ).fetchall()
+        keys = ("id", "started_at", "test_suite", "profile", "git_ref", "success")
+        return [dict(zip(keys, row)) for row in rows]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect the test-runner benchmark history")
+    parser.add_argument("--db", default=os.getenv("BENCHMARK_DB", "/reports/benchmarks.sqlite3"))
+    parser.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args()
+
+    store = BenchmarkStore(args.db)
+    try:
+        for run in store.history(args.limit):
+            started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"]))
+            status = "pass" if run["success"] else "FAIL"
+            print(f"#{run['id']:<5} {started}  {status}  {run['test_suite']:<14} {run['profile']}"
+                  f"{'  ' + run['git_ref'] if run['git_ref'] else ''}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
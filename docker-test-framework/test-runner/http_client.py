@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Shared HTTP Client Layer for the Test Harness
+Pooled keep-alive sessions for the mock services, plus an async/HTTP2 variant
+"""
+
+import threading
+from typing import Any, Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+import requests
+import urllib3
+from requests.adapters import HTTPAdapter
+
+try:
+    import httpx
+except ImportError:  # Async client is optional
+    httpx = None
+
+try:
+    import h2  # noqa: F401 - only needed so httpx can negotiate HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+DEFAULT_TIMEOUT = 10
+DEFAULT_POOL_SIZE = 32
+
+
+class HttpClient:
+    """Keep-alive HTTP client bound to one service base URL
+
+    All requests share a single ``requests.Session`` whose connection pool is
+    sized for concurrent suites, so repeated probes against the TLS mock reuse
+    established connections instead of paying a TCP and TLS handshake each time.
+    """
+
+    def __init__(self, base_url: str, verify: bool = True, timeout: float = DEFAULT_TIMEOUT,
+                 pool_size: int = DEFAULT_POOL_SIZE, headers: Optional[Dict[str, str]] = None):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.verify = verify
+        if headers:
+            self.session.headers.update(headers)
+
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, pool_block=False)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        if not verify:
+            # The mocks use self-signed certificates
+            urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+    def url(self, path: str) -> str:
+        """Resolve a path against the base URL; absolute URLs are passed through"""
+        if path.startswith(("http://", "https://")):
+            return path
+        return f"{self.base_url}/{path.lstrip('/')}"
+
+    def request(self, method: str, path: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        return self.session.request(method, self.url(path), **kwargs)
+
+    def get(self, path: str, **kwargs) -> requests.Response:
+        return self.request("GET", path, **kwargs)
+
+    def post(self, path: str, **kwargs) -> requests.Response:
+        return self.request("POST", path, **kwargs)
+
+    def put(self, path: str, **kwargs) -> requests.Response:
+        return self.request("PUT", path, **kwargs)
+
+    def delete(self, path: str, **kwargs) -> requests.Response:
+        return self.request("DELETE", path, **kwargs)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncHttpClient:
+    """Async counterpart of HttpClient built on httpx
+
+    HTTP/2 is negotiated when the ``h2`` package is installed unless disabled
+    explicitly. Use as an async context manager so the pool is closed.
+    """
+
+    def __init__(self, base_url: str, verify: bool = True, timeout: float = DEFAULT_TIMEOUT,
+                 max_connections: int = 100, http2: Optional[bool] = None,
+                 headers: Optional[Dict[str, str]] = None):
+        if httpx is None:
+            raise RuntimeError("httpx is required for AsyncHttpClient (pip install httpx)")
+
+        if http2 is None:
+            http2 = HTTP2_AVAILABLE
+        elif http2 and not HTTP2_AVAILABLE:
+            raise RuntimeError("HTTP/2 requested but the h2 package is not installed (pip install httpx[http2])")
+
+        self.base_url = base_url.rstrip("/")
+        self.http2 = http2
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            verify=verify,
+            timeout=timeout,
+            http2=http2,
+            headers=headers,
+            limits=httpx.Limits(max_connections=max_connections,
+                                max_keepalive_connections=max_connections),
+        )
+
+    async def request(self, method: str, path: str, **kwargs) -> "httpx.Response":
+        return await self.client.request(method, path, **kwargs)
+
+    async def get(self, path: str, **kwargs) -> "httpx.Response":
+        return await self.request("GET", path, **kwargs)
+
+    async def post(self, path: str, **kwargs) -> "httpx.Response":
+        return await self.request("POST", path, **kwargs)
+
+    async def put(self, path: str, **kwargs) -> "httpx.Response":
+        return await self.request("PUT", path, **kwargs)
+
+    async def delete(self, path: str, **kwargs) -> "httpx.Response":
+        return await self.request("DELETE", path, **kwargs)
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def __aenter__(self) -> "AsyncHttpClient":
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+
+_clients: Dict[Tuple[str, bool], HttpClient] = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(base_url: str, verify: bool = True, **kwargs: Any) -> HttpClient:
+    """Return the shared client for a service, creating it on first use"""
+    key = (base_url.rstrip("/"), verify)
+    with _clients_lock:
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = HttpClient(base_url, verify=verify, **kwargs)
+        return client
+
+
+def client_for_url(url: str, verify: Optional[bool] = None) -> HttpClient:
+    """Return the shared client for the scheme and host of an absolute URL
+
+    Certificate verification defaults to off for HTTPS because every HTTPS
+    service in the test environment uses a self-signed certificate.
+    """
+    parts = urlsplit(url)
+    if verify is None:
+        verify = parts.scheme != "https"
+    return get_client(f"{parts.scheme}://{parts.netloc}", verify=verify)
+
+
+def close_all():
+    """Close every shared client"""
+    with _clients_lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
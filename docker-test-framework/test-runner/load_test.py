@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Load Testing Suite for the Mock Services
+Open-loop asyncio load generator with per-endpoint latency, throughput and error reporting
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from http_client import AsyncHttpClient
+
+PROXMOX_AUTH = {"Authorization": "Bearer proxmox-test-token"}
+OPNSENSE_AUTH = {"Authorization": "Bearer test-key"}
+
+# VM IDs for load-generated VMs start well above anything the other suites create
+_vmids = itertools.count(700000 + random.randint(0, 99) * 1000)
+
+
+@dataclass
+class RequestSpec:
+    """One endpoint in the request mix"""
+    name: str
+    service: str                      # "proxmox" or "opnsense"
+    method: str
+    path: str
+    weight: float = 1.0
+    body: Optional[Callable[[], Dict[str, Any]]] = None
+    headers: Optional[Dict[str, str]] = None
+
+
+def _firewall_rule() -> Dict[str, Any]:
+    return {"rule": {
+        "description": "load-test rule",
+        "action": "pass",
+        "interface": "lan",
+        "protocol": "tcp",
+        "source": f"10.99.{random.choice([10, 30, 40])}.0/24",
+        "destination": "any",
+        "destination_port": str(random.choice([80, 443, 8080])),
+    }}
+
+
+def _connectivity_probe() -> Dict[str, Any]:
+    return {
+        "source": f"10.0.{random.choice([10, 20, 30, 40, 50])}.{random.randint(2, 254)}",
+        "destination": random.choice(["8.8.8.8", "10.0.10.100", "10.0.50.10"]),
+        "protocol": "tcp",
+        "port": random.choice([22, 80, 443]),
+    }
+
+
+def _vm_create() -> Dict[str, Any]:
+    vmid = next(_vmids)
+    return {"vmid": vmid, "name": f"load-{vmid}", "cores": 1, "memory": 512}
+
+
+# Default request mix; weights are relative
+DEFAULT_MIX: Dict[str, RequestSpec] = {
+    spec.name: spec for spec in [
+        RequestSpec("firewall.add_rule", "opnsense", "POST", "/api/firewall/filter/addRule",
+                    weight=2, body=_firewall_rule, headers=OPNSENSE_AUTH),
+        RequestSpec("network.connectivity", "proxmox", "POST", "/api/network/test-connectivity",
+                    weight=3, body=_connectivity_probe, headers=PROXMOX_AUTH),
+        RequestSpec("vm.create", "proxmox", "POST", "/api2/json/nodes/pve/qemu",
+                    weight=1, body=_vm_create, headers=PROXMOX_AUTH),
+        RequestSpec("vm.list", "proxmox", "GET", "/api2/json/nodes/pve/qemu",
+                    weight=4, headers=PROXMOX_AUTH),
+    ]
+}
+
+
+def parse_mix(mix: Optional[str]) -> List[RequestSpec]:
+    """Parse "name=weight,name=weight" into request specs from DEFAULT_MIX"""
+    if not mix:
+        return list(DEFAULT_MIX.values())
+
+    specs = []
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in DEFAULT_MIX:
+            raise ValueError(f"Unknown endpoint in request mix: {name} "
+                             f"(known: {', '.join(sorted(DEFAULT_MIX))})")
+        spec = DEFAULT_MIX[name]
+        specs.append(RequestSpec(spec.name, spec.service, spec.method, spec.path,
+                                 float(weight or spec.weight), spec.body, spec.headers))
+    return specs
+
+
+def percentile(sorted_values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(pct / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+@dataclass
+class EndpointStats:
+    """Raw samples collected for one endpoint
+
+    Arrivals skipped because the client was saturated never get a latency
+    sample, so they are counted as requests and errors instead.
+    """
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    skipped: int = 0
+    status_codes: Dict[str, int] = field(default_factory=dict)
+
+    def summary(self, duration: float) -> Dict[str, Any]:
+        latencies = sorted(self.latencies)
+        total = len(latencies)
+        attempted = total + self.skipped
+        ms = lambda value: round(value * 1000, 3) if value is not None else None
+        return {
+            "requests": attempted,
+            "errors": self.errors,
+            "skipped": self.skipped,
+            "error_rate": self.errors / attempted if attempted else 0.0,
+            "throughput_rps": total / duration if duration else 0.0,
+            "latency_ms": {
+                "mean": ms(sum(latencies) / total) if total else None,
+                "p50": ms(percentile(latencies, 50)),
+                "p95": ms(percentile(latencies, 95)),
+                "p99": ms(percentile(latencies, 99)),
+                "max": ms(latencies[-1]) if total else None,
+            },
+            "status_codes": dict(self.status_codes),
+        }
+
+
+class LoadGenerator:
+    """Open-loop load generator
+
+    Arrivals follow a Poisson process at the target rate and are issued on
+    schedule whether or not earlier requests have completed, so a slow server
+    shows up as growing latency rather than as a lower offered load. Latency is
+    measured from the scheduled send time to avoid coordinated omission, and
+    arrivals dropped because ``max_in_flight`` requests are outstanding count
+    as errors, so a saturated run cannot pass on the requests it did send.
+    """
+
+    def __init__(self, base_urls: Dict[str, str], rps: float, duration: float,
+                 mix: Optional[List[RequestSpec]] = None, max_in_flight: int = 1000,
+                 timeout: float = 10.0, seed: Optional[int] = None):
+        self.base_urls = base_urls
+        self.rps = rps
+        self.duration = duration
+        self.mix = mix or list(DEFAULT_MIX.values())
+        self.max_in_flight = max_in_flight
+        self.timeout = timeout
+        self.random = random.Random(seed)
+        self.stats: Dict[str, EndpointStats] = {spec.name: EndpointStats() for spec in self.mix}
+        self.skipped = 0
+
+    async def _issue(self, client: AsyncHttpClient, spec: RequestSpec, scheduled: float,
+                     in_flight: asyncio.Semaphore):
+        stats = self.stats[spec.name]
+        try:
+            response = await client.request(
+                spec.method, spec.path,
+                json=spec.body() if spec.body else None,
+                headers=spec.headers,
+            )
+            code = str(response.status_code)
+            stats.status_codes[code] = stats.status_codes.get(code, 0) + 1
+            if response.status_code >= 400:
+                stats.errors += 1
+        except Exception as e:
+            key = type(e).__name__
+            stats.status_codes[key] = stats.status_codes.get(key, 0) + 1
+            stats.errors += 1
+        finally:
+            stats.latencies.append(time.perf_counter() - scheduled)
+            in_flight.release()
+
+    async def run(self) -> Dict[str, Any]:
+        clients = {
+            service: AsyncHttpClient(url, verify=not url.startswith("https"), timeout=self.timeout,
+                                     max_connections=self.max_in_flight)
+            for service, url in self.base_urls.items()
+        }
+        weights = [spec.weight for spec in self.mix]
+        in_flight = asyncio.Semaphore(self.max_in_flight)
+        tasks = []
+
+        try:
+            started = time.perf_counter()
+            next_send = started
+            end = started + self.duration
+            while True:
+                next_send += self.random.expovariate(self.rps)
+                if next_send >= end:
+                    break
+                delay = next_send - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                spec = self.random.choices(self.mix, weights=weights)[0]
+                if in_flight.locked():
+                    # Client side is saturated; record a failed arrival instead of blocking the schedule
+                    stats = self.stats[spec.name]
+                    stats.skipped += 1
+                    stats.errors += 1
+                    stats.status_codes["ClientSaturated"] = stats.status_codes.get("ClientSaturated", 0) + 1
+                    self.skipped += 1
+                    continue
+                await in_flight.acquire()
+
+                tasks.append(asyncio.ensure_future(
+                    self._issue(clients[spec.service], spec, next_send, in_flight)))
+
+            if tasks:
+                await asyncio.gather(*tasks)
+            elapsed = time.perf_counter() - started
+        finally:
+            for client in clients.values():
+                await client.aclose()
+
+        return self.report(elapsed)
+
+    def report(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = {name: stats.summary(elapsed) for name, stats in self.stats.items()}
+        overall = EndpointStats()
+        for stats in self.stats.values():
+            overall.latencies.extend(stats.latencies)
+            overall.errors += stats.errors
+            overall.skipped += stats.skipped
+            for code, count in stats.status_codes.items():
+                overall.status_codes[code] = overall.status_codes.get(code, 0) + count
+
+        return {
+            "target_rps": self.rps,
+            "duration": elapsed,
+            "skipped_client_saturated": self.skipped,
+            "overall": overall.summary(elapsed),
+            "endpoints": endpoints,
+        }
+
+
+def run_load_test(base_urls: Dict[str, str], rps: float, duration: float,
+                  mix: Optional[str] = None, **kwargs) -> Dict[str, Any]:
+    """Synchronous entry point used by TestRunner"""
+    generator = LoadGenerator(base_urls, rps, duration, parse_mix(mix), **kwargs)
+    return asyncio.run(generator.run())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Open-loop load test against the mock services")
+    parser.add_argument("--proxmox-url", default=os.getenv("PROXMOX_MOCK_URL", "http://proxmox-mock:8006"))
+    parser.add_argument("--opnsense-url", default=os.getenv("OPNSENSE_MOCK_URL", "https://opnsense-mock:443"))
+    parser.add_argument("--rps", type=float, default=50.0, help="Target requests per second")
+    parser.add_argument("--duration", type=float, default=10.0, help="Test duration in seconds")
+    parser.add_argument("--mix", help="Request mix, e.g. 'vm.list=4,firewall.add_rule=1' "
+                        f"(endpoints: {', '.join(sorted(DEFAULT_MIX))})")
+    parser.add_argument("--max-in-flight", type=int, default=1000)
+    parser.add_argument("--json", help="Write the report to this file")
+    args = parser.parse_args()
+
+    report = run_load_test(
+        {"proxmox": args.proxmox_url, "opnsense": args.opnsense_url},
+        args.rps, args.duration, args.mix, max_in_flight=args.max_in_flight,
+    )
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
+
+    print(f"{'endpoint':24} {'reqs':>7} {'err%':>6} {'rps':>8} {'p50ms':>8} {'p95ms':>8} {'p99ms':>8}")
+    for name, summary in list(report["endpoints"].items()) + [("overall", report["overall"])]:
+        latency = summary["latency_ms"]
+        print(f"{name:24} {summary['requests']:7d} {summary['error_rate'] * 100:6.2f} "
+              f"{summary['throughput_rps']:8.1f} {latency['p50'] or 0:8.2f} "
+              f"{latency['p95'] or 0:8.2f} {latency['p99'] or 0:8.2f}")
+
+    sys.exit(0 if report["overall"]["errors"] == 0 else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+Concurrent Service Readiness Waiter
+Probes every service at once with exponential backoff and jitter
+"""
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, asdict
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from http_client import client_for_url
+
+
+@dataclass
+class ServiceReadiness:
+    """Outcome of waiting for one service"""
+    name: str
+    url: str
+    ready: bool = False
+    attempts: int = 0
+    time_to_ready: Optional[float] = None
+    last_error: Optional[str] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+def http_probe(url: str, timeout: float = 5.0) -> Tuple[bool, Optional[str]]:
+    """Return (healthy, error) for a single HTTP health check"""
+    try:
+        response = client_for_url(url).get(url, timeout=timeout)
+    except Exception as e:
+        return False, str(e)
+    if response.status_code == 200:
+        return True, None
+    return False, f"HTTP {response.status_code}"
+
+
+def backoff_delay(attempt: int, initial_delay: float, max_delay: float) -> float:
+    """Exponential backoff with full jitter for the given (0-based) attempt"""
+    return random.uniform(0, min(max_delay, initial_delay * (2 ** attempt)))
+
+
+def _wait_for_one(name: str, url: str, deadline: float, started: float,
+                  probe: Callable[[str], Tuple[bool, Optional[str]]],
+                  initial_delay: float, max_delay: float) -> ServiceReadiness:
+    status = ServiceReadiness(name=name, url=url)
+    while True:
+        healthy, error = probe(url)
+        status.attempts += 1
+        if healthy:
+            status.ready = True
+            status.time_to_ready = time.monotonic() - started
+            status.last_error = None
+            return status
+        status.last_error = error
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return status
+        time.sleep(min(remaining, backoff_delay(status.attempts - 1, initial_delay, max_delay)))
+
+
+def wait_for_services(services: Iterable[Tuple[str, str]], timeout: float = 60.0,
+                      initial_delay: float = 0.1, max_delay: float = 2.0,
+                      probe: Optional[Callable[[str], Tuple[bool, Optional[str]]]] = None
+                      ) -> Dict[str, ServiceReadiness]:
+    """Wait until every (name, url) service is healthy or the timeout expires
+
+    All services are probed concurrently; the call returns as soon as the last
+    one becomes healthy. The result maps service name to its readiness record,
+    including per-service time-to-ready.
+    """
+    services = list(services)
+    if not services:
+        return {}
+
+    probe = probe or http_probe
+    started = time.monotonic()
+    deadline = started + timeout
+
+    with ThreadPoolExecutor(max_workers=len(services), thread_name_prefix="ready") as executor:
+        futures = [
+            executor.submit(_wait_for_one, name, url, deadline, started,
+                            probe, initial_delay, max_delay)
+            for name, url in services
+        ]
+        return {status.name: status for status in (f.result() for f in futures)}
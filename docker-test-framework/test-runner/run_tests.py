@@ -9,10 +9,15 @@ import sys
 import json
 import time
 import subprocess
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 from typing import Dict, Any, List
-import requests
 import structlog
 
+from http_client import get_client, close_all
+from readiness import wait_for_services
+from load_test import run_load_test
+from benchmark_store import BenchmarkStore
+
 # Configure logging
 structlog.configure(
     processors=[
@@ -34,16 +39,67 @@ structlog.configure(
 
 logger = structlog.get_logger(__name__)
 
+# Suites that another suite builds on. Dependencies are scheduled first and
+# their results are reused by the dependent suite instead of being re-run.
+SUITE_DEPENDENCIES: Dict[str, List[str]] = {
+    "network": [],
+    "firewall": [],
+    "vm-deployment": [],
+    "integration": ["network", "firewall", "vm-deployment"],
+    "performance": [],
+}
+
+def resolve_suite_order(suites: List[str]) -> List[str]:
+    """Expand suites with their dependencies and return them in dependency order"""
+    ordered: List[str] = []
+    visiting = set()
+
+    def visit(suite: str):
+        if suite in ordered:
+            return
+        if suite in visiting:
+            raise ValueError(f"Dependency cycle detected at test suite: {suite}")
+        visiting.add(suite)
+        for dependency in SUITE_DEPENDENCIES.get(suite, []):
+            visit(dependency)
+        visiting.discard(suite)
+        ordered.append(suite)
+
+    for suite in suites:
+        visit(suite)
+    return ordered
+
 class TestRunner:
     def __init__(self):
         self.test_suite = os.getenv("TEST_SUITE", "all")
         self.parallel = os.getenv("TEST_PARALLEL", "true").lower() == "true"
+        self.workers = int(os.getenv("TEST_WORKERS", "4"))
+        self.service_timeout = float(os.getenv("TEST_SERVICE_TIMEOUT", "60"))
+
+        # Load test settings for the performance suite
+        self.load_rps = float(os.getenv("LOAD_TEST_RPS", "50"))
+        self.load_duration = float(os.getenv("LOAD_TEST_DURATION", "10"))
+        self.load_mix = os.getenv("LOAD_TEST_MIX")
+        self.load_max_error_rate = float(os.getenv("LOAD_TEST_MAX_ERROR_RATE", "0.01"))
+        self.load_max_p95_ms = float(os.getenv("LOAD_TEST_MAX_P95_MS", "1000"))
+
+        # Benchmark history and regression detection
+        self.benchmark_db = os.getenv("BENCHMARK_DB", "/reports/benchmarks.sqlite3")
+        self.benchmark_window = int(os.getenv("BENCHMARK_WINDOW", "20"))
+        self.benchmark_min_samples = int(os.getenv("BENCHMARK_MIN_SAMPLES", "5"))
+        self.benchmark_z_threshold = float(os.getenv("BENCHMARK_Z_THRESHOLD", "3.5"))
+        self.benchmark_min_change = float(os.getenv("BENCHMARK_MIN_CHANGE", "0.10"))
+        self.benchmark_fail = os.getenv("BENCHMARK_FAIL_ON_REGRESSION", "true").lower() == "true"
         self.debug = os.getenv("TEST_DEBUG", "false").lower() == "true"
         self.proxmox_host = os.getenv("PROXMOX_MOCK_HOST", "proxmox-mock")
         self.proxmox_port = os.getenv("PROXMOX_MOCK_PORT", "8006")
         self.opnsense_host = os.getenv("OPNSENSE_MOCK_HOST", "opnsense-mock")
         self.opnsense_port = os.getenv("OPNSENSE_MOCK_PORT", "443")
 
+        # Shared keep-alive clients for the mock services
+        self.proxmox = get_client(f"http://{self.proxmox_host}:{self.proxmox_port}")
+        self.opnsense = get_client(f"https://{self.opnsense_host}:{self.opnsense_port}", verify=False)
+
         self.results = {
             "start_time": time.time(),
             "test_suite": self.test_suite,
@@ -52,24 +108,6 @@ class TestRunner:
             "summary": {}
         }
 
-    def check_service_health(self, service_name: str, url: str) -> bool:
-        """Check if a service is healthy"""
-        try:
-            if "https" in url:
-                response = requests.get(url, verify=False, timeout=10)
-            else:
-                response = requests.get(url, timeout=10)
-
-            if response.status_code == 200:
-                logger.info(f"{service_name} is healthy")
-                return True
-            else:
-                logger.warning(f"{service_name} returned status {response.status_code}")
-                return False
-        except Exception as e:
-            logger.error(f"Failed to check {service_name} health", error=str(e))
-            return False
-
     def wait_for_services(self) -> bool:
         """Wait for all required services to be ready"""
         logger.info("Waiting for services to be ready...")
@@ -79,23 +117,23 @@ class TestRunner:
             ("OPNsense Mock", f"https://{self.opnsense_host}:{self.opnsense_port}/health")
         ]
 
-        max_retries = 30
-        retry_interval = 2
-
-        for service_name, url in services:
-            for attempt in range(max_retries):
-                if self.check_service_health(service_name, url):
-                    break
+        statuses = wait_for_services(services, timeout=self.service_timeout)
+        self.results["service_readiness"] = {name: status.to_dict() for name, status in statuses.items()}
 
-                if attempt < max_retries - 1:
-                    logger.info(f"Waiting for {service_name}... (attempt {attempt + 1}/{max_retries})")
-                    time.sleep(retry_interval)
-                else:
-                    logger.error(f"{service_name} is not responding after {max_retries} attempts")
-                    return False
+        all_ready = True
+        for name, status in statuses.items():
+            if status.ready:
+                logger.info(f"{name} is ready",
+                            time_to_ready=f"{status.time_to_ready:.2f}s",
+                            attempts=status.attempts)
+            else:
+                logger.error(f"{name} is not responding after {self.service_timeout:.0f}s",
+                             attempts=status.attempts, error=status.last_error)
+                all_ready = False
 
-        logger.info("All services are ready")
-        return True
+        if all_ready:
+            logger.info("All services are ready")
+        return all_ready
 
     def run_test_suite(self, suite_name: str) -> Dict[str, Any]:
         """Run a specific test suite"""
@@ -140,7 +178,7 @@ class TestRunner:
 
         # Test Proxmox API connectivity
         try:
-            response = requests.get(f"http://{self.proxmox_host}:{self.proxmox_port}/api2/json/version")
+            response = self.proxmox.get("/api2/json/version")
             if response.status_code != 200:
                 logger.error("Failed to connect to Proxmox API")
                 return False
@@ -150,7 +188,7 @@ class TestRunner:
 
         # Test OPNsense API connectivity
         try:
-            response = requests.get(f"https://{self.opnsense_host}:{self.opnsense_port}/api/core/firmware/status", verify=False)
+            response = self.opnsense.get("/api/core/firmware/status")
             if response.status_code != 200:
                 logger.error("Failed to connect to OPNsense API")
                 return False
@@ -167,13 +205,13 @@ class TestRunner:
 
         try:
             # Test firewall rules API
-            response = requests.get(f"https://{self.opnsense_host}:{self.opnsense_port}/api/firewall/filter", verify=False)
+            response = self.opnsense.get("/api/firewall/filter")
             if response.status_code != 200:
                 logger.error("Failed to retrieve firewall rules")
                 return False
 
             # Test VLAN configuration
-            response = requests.get(f"https://{self.opnsense_host}:{self.opnsense_port}/api/interfaces/vlan", verify=False)
+            response = self.opnsense.get("/api/interfaces/vlan")
             if response.status_code != 200:
                 logger.error("Failed to retrieve VLAN configuration")
                 return False
@@ -191,13 +229,13 @@ class TestRunner:
 
         try:
             # Test VM listing
-            response = requests.get(f"http://{self.proxmox_host}:{self.proxmox_port}/api2/json/nodes/pve/qemu")
+            response = self.proxmox.get("/api2/json/nodes/pve/qemu")
             if response.status_code != 200:
                 logger.error("Failed to list VMs")
                 return False
 
             # Test storage listing
-            response = requests.get(f"http://{self.proxmox_host}:{self.proxmox_port}/api2/json/storage")
+            response = self.proxmox.get("/api2/json/storage")
             if response.status_code != 200:
                 logger.error("Failed to list storage")
                 return False
@@ -213,45 +251,64 @@ class TestRunner:
         """Test end-to-end integration"""
         logger.info("Testing end-to-end integration...")
 
-        # Run all individual test suites
-        network_success = self.test_network_configuration()
-        firewall_success = self.test_firewall_configuration()
-        vm_success = self.test_vm_deployment()
+        # Reuse the results of the suites integration depends on; they are only
+        # executed here when integration is run outside of run()
+        dependency_results = {}
+        for dependency in SUITE_DEPENDENCIES["integration"]:
+            if dependency not in self.results["tests"]:
+                self.results["tests"][dependency] = self.run_test_suite(dependency)
+            dependency_results[dependency] = self.results["tests"][dependency]["success"]
 
-        success = network_success and firewall_success and vm_success
+        success = all(dependency_results.values())
 
         if success:
             logger.info("Integration tests passed")
         else:
-            logger.error("Integration tests failed")
+            failed = [name for name, passed in dependency_results.items() if not passed]
+            logger.error("Integration tests failed", failed_dependencies=failed)
 
         return success
 
     def test_performance(self) -> bool:
-        """Test performance"""
-        logger.info("Testing performance...")
+        """Test performance with an open-loop load test against the mocks"""
+        logger.info("Testing performance...",
+                    rps=self.load_rps, duration=self.load_duration, mix=self.load_mix or "default")
 
-        # Simple performance test - measure API response times
         try:
-            start_time = time.time()
-            for _ in range(10):
-                requests.get(f"http://{self.proxmox_host}:{self.proxmox_port}/api2/json/version")
-            end_time = time.time()
-
-            avg_response_time = (end_time - start_time) / 10
-            logger.info(f"Average API response time: {avg_response_time:.3f}s")
-
-            # Consider test passed if average response time is under 1 second
-            success = avg_response_time < 1.0
-
+            report = run_load_test(
+                {"proxmox": self.proxmox.base_url, "opnsense": self.opnsense.base_url},
+                self.load_rps, self.load_duration, self.load_mix,
+            )
         except Exception as e:
             logger.error("Performance test failed", error=str(e))
-            success = False
+            return False
+
+        self.results["performance"] = report
+
+        for endpoint, summary in report["endpoints"].items():
+            logger.info(f"Load test results for {endpoint}",
+                        requests=summary["requests"],
+                        throughput_rps=round(summary["throughput_rps"], 1),
+                        error_rate=round(summary["error_rate"], 4),
+                        **{k: v for k, v in summary["latency_ms"].items() if k in ("p50", "p95", "p99")})
+
+        overall = report["overall"]
+        p95 = overall["latency_ms"]["p95"]
+        if report["skipped_client_saturated"]:
+            logger.warning("Load generator was saturated; skipped arrivals count as errors",
+                           skipped=report["skipped_client_saturated"])
+        success = (
+            overall["requests"] > 0
+            and overall["error_rate"] <= self.load_max_error_rate
+            and p95 is not None and p95 <= self.load_max_p95_ms
+        )
 
         if success:
             logger.info("Performance tests passed")
         else:
-            logger.error("Performance tests failed")
+            logger.error("Performance tests failed",
+                         error_rate=overall["error_rate"], p95_ms=p95,
+                         max_error_rate=self.load_max_error_rate, max_p95_ms=self.load_max_p95_ms)
 
         return success
 
@@ -271,15 +328,11 @@ class TestRunner:
             suites = ["network", "firewall", "vm-deployment", "integration"]
         else:
             suites = [self.test_suite]
+        suites = resolve_suite_order(suites)
 
         # Run test suites
-        all_success = True
-        for suite in suites:
-            result = self.run_test_suite(suite)
-            self.results["tests"][suite] = result
-
-            if not result["success"]:
-                all_success = False
+        self.run_suites(suites)
+        all_success = all(self.results["tests"][suite]["success"] for suite in suites)
 
         # Generate summary
         self.results["end_time"] = time.time()
@@ -291,8 +344,13 @@ class TestRunner:
             "success": all_success
         }
 
+        # Compare against the benchmark history, then append this run to it
+        if self.record_benchmarks() and self.benchmark_fail:
+            all_success = False
+
         # Save results
         self.save_results()
+        close_all()
 
         # Print summary
         logger.info("Test execution completed",
@@ -303,6 +361,84 @@ class TestRunner:
 
         return 0 if all_success else 1
 
+    def run_suites(self, suites: List[str]):
+        """Run suites on a worker pool, starting each one once its dependencies finish"""
+        workers = max(1, min(self.workers, len(suites))) if self.parallel else 1
+        pending = {
+            suite: {dep for dep in SUITE_DEPENDENCIES.get(suite, []) if dep in suites}
+            for suite in suites
+        }
+
+        logger.info("Scheduling test suites", suites=suites, workers=workers)
+
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="suite") as executor:
+            running = {}
+            while pending or running:
+                ready = [suite for suite, deps in pending.items() if not deps]
+                for suite in ready:
+                    del pending[suite]
+                    running[executor.submit(self.run_test_suite, suite)] = suite
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    suite = running.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Test suite {suite} raised an exception", error=str(e))
+                        result = {"suite": suite, "success": False, "duration": 0.0,
+                                  "start_time": time.time(), "end_time": time.time(),
+                                  "error": str(e)}
+                    self.results["tests"][suite] = result
+                    for deps in pending.values():
+                        deps.discard(suite)
+
+    def benchmark_profile(self) -> str:
+        """Key that groups comparable runs in the benchmark history"""
+        profile = self.test_suite
+        if "performance" in self.results["tests"]:
+            profile += f"|rps={self.load_rps:g}|duration={self.load_duration:g}|mix={self.load_mix or 'default'}"
+        return profile
+
+    def record_benchmarks(self) -> List[str]:
+        """Check this run for regressions and record it in the benchmark store"""
+        if not self.benchmark_db:
+            return []
+
+        try:
+            store = BenchmarkStore(self.benchmark_db,
+                                   window=self.benchmark_window,
+                                   min_samples=self.benchmark_min_samples,
+                                   z_threshold=self.benchmark_z_threshold,
+                                   min_change=self.benchmark_min_change,
+                                   # error rates within the load test's own limit are not regressions
+                                   min_delta={"error_rate": self.load_max_error_rate})
+        except Exception as e:
+            logger.error("Failed to open benchmark store", db=self.benchmark_db, error=str(e))
+            return []
+
+        try:
+            profile = self.benchmark_profile()
+            regressions = store.check(self.results, profile)
+            self.results["regressions"] = [r.to_dict() for r in regressions]
+
+            for regression in regressions:
+                logger.error("Performance regression detected", detail=str(regression))
+            if regressions and self.benchmark_fail:
+                self.results["summary"]["success"] = False
+
+            # Failed runs are kept for history but excluded from future baselines
+            run_id = store.record_run(self.results, profile,
+                                      git_ref=os.getenv("GIT_COMMIT") or os.getenv("GITHUB_SHA"))
+            logger.info("Benchmark results recorded", db=self.benchmark_db, run_id=run_id,
+                        profile=profile, regressions=len(regressions))
+            return [str(r) for r in regressions]
+        except Exception as e:
+            logger.error("Failed to record benchmark results", error=str(e))
+            return []
+        finally:
+            store.close()
+
     def save_results(self):
         """Save test results to file"""
         try:
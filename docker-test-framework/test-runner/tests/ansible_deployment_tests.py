@@ -21,6 +21,10 @@ from pathlib import Path
 from typing import Dict, List, Any
 import logging
 
+# Shared HTTP client layer lives next to run_tests.py
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from http_client import get_client
+
 class AnsibleDeploymentTests:
     """Test Ansible deployment functionality"""
 
@@ -32,7 +36,9 @@ class AnsibleDeploymentTests:
 
         # Mock service endpoints
         self.proxmox_url = "http://proxmox-mock:8000"
+        self.proxmox = get_client(self.proxmox_url)
         self.opnsense_url = "https://opnsense-mock:8443"
+        self.opnsense = get_client(self.opnsense_url, verify=False)
 
     def test_playbook_syntax_validation(self):
         """Test Ansible playbook syntax validation"""
@@ -237,7 +243,7 @@ class AnsibleDeploymentTests:
 
         # Test Proxmox API connectivity
         try:
-            response = requests.get(f"{self.proxmox_url}/api2/json/version", timeout=10)
+            response = self.proxmox.get("/api2/json/version", timeout=10)
             assert response.status_code == 200, "Proxmox mock not accessible"
 
             # Test node configuration
@@ -261,14 +267,14 @@ class AnsibleDeploymentTests:
             }
 
             # Test storage configuration
-            response = requests.post(f"{self.proxmox_url}/api2/json/storage",
-                                   json=node_config['storage'])
+            response = self.proxmox.post("/api2/json/storage",
+                                         json=node_config['storage'])
             assert response.status_code in [200, 201], "Failed to configure Proxmox storage"
 
             # Test network bridge configuration
             for interface in node_config['network']['interfaces']:
-                response = requests.post(f"{self.proxmox_url}/api2/json/nodes/pve/network",
-                                       json=interface)
+                response = self.proxmox.post("/api2/json/nodes/pve/network",
+                                             json=interface)
                 assert response.status_code in [200, 201], f"Failed to configure interface {interface['name']}"
 
         except requests.RequestException as e:
@@ -282,8 +288,7 @@ class AnsibleDeploymentTests:
 
         try:
             # Test OPNsense API connectivity
-            response = requests.get(f"{self.opnsense_url}/api/core/firmware/status",
-                                  verify=False, timeout=10)
+            response = self.opnsense.get("/api/core/firmware/status", timeout=10)
             assert response.status_code == 200, "OPNsense mock not accessible"
 
             # Test interface configuration
@@ -305,8 +310,8 @@ class AnsibleDeploymentTests:
             ]
 
             for interface in interfaces:
-                response = requests.post(f"{self.opnsense_url}/api/interfaces/overview/addInterface",
-                                       json=interface, verify=False)
+                response = self.opnsense.post("/api/interfaces/overview/addInterface",
+                                              json=interface)
                 assert response.status_code in [200, 201], f"Failed to configure interface {interface['name']}"
 
             # Test VLAN configuration
@@ -318,8 +323,8 @@ class AnsibleDeploymentTests:
             ]
 
             for vlan in vlans:
-                response = requests.post(f"{self.opnsense_url}/api/interfaces/vlan/addVlan",
-                                       json=vlan, verify=False)
+                response = self.opnsense.post("/api/interfaces/vlan/addVlan",
+                                              json=vlan)
                 assert response.status_code in [200, 201], f"Failed to configure VLAN {vlan['vlan']}"
 
             # Test firewall rules
@@ -341,8 +346,8 @@ class AnsibleDeploymentTests:
             ]
 
             for rule in firewall_rules:
-                response = requests.post(f"{self.opnsense_url}/api/firewall/filter/addRule",
-                                       json=rule, verify=False)
+                response = self.opnsense.post("/api/firewall/filter/addRule",
+                                              json=rule)
                 assert response.status_code in [200, 201], f"Failed to create firewall rule: {rule['description']}"
 
         except requests.RequestException as e:
@@ -376,12 +381,12 @@ class AnsibleDeploymentTests:
             ]
 
             for template in vm_templates:
-                response = requests.post(f"{self.proxmox_url}/api2/json/nodes/pve/qemu",
-                                       json=template)
+                response = self.proxmox.post("/api2/json/nodes/pve/qemu",
+                                             json=template)
                 assert response.status_code in [200, 201], f"Failed to create template {template['name']}"
 
             # Test template validation
-            response = requests.get(f"{self.proxmox_url}/api2/json/nodes/pve/qemu")
+            response = self.proxmox.get("/api2/json/nodes/pve/qemu")
             assert response.status_code == 200, "Failed to get VM list"
 
             vms = response.json().get('data', [])
@@ -430,12 +435,12 @@ class AnsibleDeploymentTests:
                     'description': f'Static mapping for {device["name"]}'
                 }
 
-                response = requests.post(f"{self.opnsense_url}/api/dhcpv4/leases/addLease",
-                                       json=dhcp_mapping, verify=False)
+                response = self.opnsense.post("/api/dhcpv4/leases/addLease",
+                                              json=dhcp_mapping)
                 assert response.status_code in [200, 201], f"Failed to create DHCP mapping for {device['name']}"
 
             # Validate DHCP configuration
-            response = requests.get(f"{self.opnsense_url}/api/dhcpv4/leases/searchLease", verify=False)
+            response = self.opnsense.get("/api/dhcpv4/leases/searchLease")
             assert response.status_code == 200, "Failed to get DHCP leases"
 
             leases = response.json().get('rows', [])
@@ -16,7 +16,6 @@ import sys
 import json
 import yaml
 import time
-import requests
 import subprocess
 import tempfile
 import shutil
@@ -27,6 +26,10 @@ import logging
 # Add the project root to Python path
 project_root = Path(__file__).parent.parent.parent.parent
 sys.path.insert(0, str(project_root))
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from http_client import get_client, client_for_url
+from readiness import wait_for_services
 
 from test_runner import TestRunner
 
@@ -42,8 +45,11 @@ class ProxmoxFirewallIntegrationTests:
 
         # Service endpoints
         self.proxmox_url = "http://proxmox-mock:8000"
+        self.proxmox = get_client(self.proxmox_url)
         self.opnsense_url = "https://opnsense-mock:8443"
+        self.opnsense = get_client(self.opnsense_url, verify=False)
         self.network_sim_url = "http://network-sim:8080"
+        self.network_sim = get_client(self.network_sim_url)
 
         # Test data directories
         self.test_data_dir = Path(__file__).parent / "test_data"
@@ -76,18 +82,11 @@ class ProxmoxFirewallIntegrationTests:
             ("Network Simulator", self.network_sim_url + "/health")
         ]
 
-        start_time = time.time()
-        for service_name, url in services:
-            while time.time() - start_time < timeout:
-                try:
-                    response = requests.get(url, verify=False, timeout=5)
-                    if response.status_code == 200:
-                        self.logger.info(f"{service_name} is ready")
-                        break
-                except requests.RequestException:
-                    time.sleep(2)
-            else:
+        statuses = wait_for_services(services, timeout=timeout)
+        for service_name, status in statuses.items():
+            if not status.ready:
                 raise Exception(f"{service_name} not ready after {timeout}s")
+            self.logger.info(f"{service_name} is ready after {status.time_to_ready:.2f}s")
 
     def test_site_configuration_creation(self):
         """Test site configuration creation and validation"""
@@ -265,14 +264,14 @@ class ProxmoxFirewallIntegrationTests:
         self.logger.info("Testing Proxmox API connectivity...")
 
         # Test version endpoint
-        response = requests.get(f"{self.proxmox_url}/api2/json/version")
+        response = self.proxmox.get("/api2/json/version")
         assert response.status_code == 200, f"Proxmox API not accessible: {response.status_code}"
 
         version_data = response.json()
         assert 'data' in version_data, "Invalid Proxmox API response format"
 
         # Test nodes endpoint
-        response = requests.get(f"{self.proxmox_url}/api2/json/nodes")
+        response = self.proxmox.get("/api2/json/nodes")
         assert response.status_code == 200, "Proxmox nodes endpoint not accessible"
 
         nodes_data = response.json()
@@ -286,11 +285,11 @@ class ProxmoxFirewallIntegrationTests:
         self.logger.info("Testing OPNsense API connectivity...")
 
         # Test core status endpoint
-        response = requests.get(f"{self.opnsense_url}/api/core/firmware/status", verify=False)
+        response = self.opnsense.get("/api/core/firmware/status")
         assert response.status_code == 200, f"OPNsense API not accessible: {response.status_code}"
 
         # Test firewall rules endpoint
-        response = requests.get(f"{self.opnsense_url}/api/firewall/filter/searchRule", verify=False)
+        response = self.opnsense.get("/api/firewall/filter/searchRule")
         assert response.status_code == 200, "OPNsense firewall API not accessible"
 
         self.logger.info("✓ OPNsense API connectivity test passed")
@@ -373,8 +372,8 @@ class ProxmoxFirewallIntegrationTests:
         ]
 
         for vm_config in vm_configs:
-            response = requests.post(f"{self.proxmox_url}/api2/json/nodes/pve/qemu",
-                                   json=vm_config)
+            response = self.proxmox.post("/api2/json/nodes/pve/qemu",
+                                         json=vm_config)
             assert response.status_code in [200, 201], f"Failed to create VM {vm_config['name']}"
 
             vm_data = response.json()
@@ -413,8 +412,8 @@ class ProxmoxFirewallIntegrationTests:
         ]
 
         for rule in firewall_rules:
-            response = requests.post(f"{self.opnsense_url}/api/firewall/filter/addRule",
-                                   json=rule, verify=False)
+            response = self.opnsense.post("/api/firewall/filter/addRule",
+                                          json=rule)
             assert response.status_code in [200, 201], f"Failed to create firewall rule: {rule['description']}"
 
         # Test VLAN configuration
@@ -427,8 +426,8 @@ class ProxmoxFirewallIntegrationTests:
         ]
 
         for vlan in vlans:
-            response = requests.post(f"{self.opnsense_url}/api/interfaces/vlan/addVlan",
-                                   json=vlan, verify=False)
+            response = self.opnsense.post("/api/interfaces/vlan/addVlan",
+                                          json=vlan)
             assert response.status_code in [200, 201], f"Failed to create VLAN {vlan['vlan']}"
 
         self.logger.info("✓ OPNsense firewall configuration test passed")
@@ -470,7 +469,7 @@ class ProxmoxFirewallIntegrationTests:
             ]
         }
 
-        response = requests.post(f"{self.network_sim_url}/topology", json=topology)
+        response = self.network_sim.post("/topology", json=topology)
         assert response.status_code in [200, 201], "Failed to create network topology"
 
         # Test connectivity between networks
@@ -496,11 +495,11 @@ class ProxmoxFirewallIntegrationTests:
         ]
 
         for test in connectivity_tests:
-            response = requests.post(f"{self.network_sim_url}/test-connectivity",
-                                   json={
-                                       'source': test['source'],
-                                       'destination': test['destination']
-                                   })
+            response = self.network_sim.post("/test-connectivity",
+                                             json={
+                                             'source': test['source'],
+                                             'destination': test['destination']
+                                             })
 
             if response.status_code == 200:
                 result = response.json()
@@ -530,7 +529,7 @@ class ProxmoxFirewallIntegrationTests:
 
         for vm_config in vm_configs:
             # Get VM details from Proxmox mock
-            response = requests.get(f"{self.proxmox_url}/api2/json/nodes/pve/qemu")
+            response = self.proxmox.get("/api2/json/nodes/pve/qemu")
             assert response.status_code == 200, "Failed to get VM list"
 
             vms = response.json().get('data', [])
@@ -539,7 +538,7 @@ class ProxmoxFirewallIntegrationTests:
             if vm:
                 # Validate VM has cloud-init configuration
                 vm_id = vm['vmid']
-                response = requests.get(f"{self.proxmox_url}/api2/json/nodes/pve/qemu/{vm_id}/config")
+                response = self.proxmox.get(f"/api2/json/nodes/pve/qemu/{vm_id}/config")
                 assert response.status_code == 200, f"Failed to get VM config for {vm_config['name']}"
 
                 config = response.json().get('data', {})
@@ -656,7 +655,7 @@ class ProxmoxFirewallIntegrationTests:
         ]
 
         for service_name, url in service_health_checks:
-            response = requests.get(url, verify=False, timeout=10)
+            response = client_for_url(url).get(url, timeout=10)
             assert response.status_code == 200, f"Service health check failed: {service_name}"
 
         # Test deployment readiness
@@ -668,18 +667,18 @@ class ProxmoxFirewallIntegrationTests:
         }
 
         # Check Proxmox nodes
-        response = requests.get(f"{self.proxmox_url}/api2/json/nodes")
+        response = self.proxmox.get("/api2/json/nodes")
         if response.status_code == 200:
             deployment_readiness['proxmox_nodes'] = len(response.json().get('data', []))
 
         # Check VM templates
-        response = requests.get(f"{self.proxmox_url}/api2/json/nodes/pve/qemu")
+        response = self.proxmox.get("/api2/json/nodes/pve/qemu")
         if response.status_code == 200:
             vms = response.json().get('data', [])
             deployment_readiness['vm_templates'] = len([vm for vm in vms if 'template' in vm.get('name', '')])
 
         # Check firewall rules
-        response = requests.get(f"{self.opnsense_url}/api/firewall/filter/searchRule", verify=False)
+        response = self.opnsense.get("/api/firewall/filter/searchRule")
         if response.status_code == 200:
             rules = response.json().get('rows', [])
             deployment_readiness['firewall_rules'] = len(rules)
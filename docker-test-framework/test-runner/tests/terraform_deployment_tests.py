@@ -21,6 +21,10 @@ from pathlib import Path
 from typing import Dict, List, Any
 import logging
 
+# Shared HTTP client layer lives next to run_tests.py
+sys.path.insert(0, str(Path(__file__).parent.parent))
+from http_client import get_client
+
 class TerraformDeploymentTests:
     """Test Terraform deployment functionality"""
 
@@ -32,6 +36,7 @@ class TerraformDeploymentTests:
 
         # Mock service endpoints
         self.proxmox_url = "http://proxmox-mock:8000"
+        self.proxmox = get_client(self.proxmox_url)
 
         # Test environment variables
         self.test_env = {
@@ -212,7 +217,7 @@ class TerraformDeploymentTests:
 
         # Test Proxmox API connectivity
         try:
-            response = requests.get(f"{self.proxmox_url}/api2/json/version", timeout=10)
+            response = self.proxmox.get("/api2/json/version", timeout=10)
             assert response.status_code == 200, "Proxmox mock API not accessible"
 
             version_data = response.json()
@@ -223,7 +228,7 @@ class TerraformDeploymentTests:
 
         # Test nodes endpoint
         try:
-            response = requests.get(f"{self.proxmox_url}/api2/json/nodes", timeout=10)
+            response = self.proxmox.get("/api2/json/nodes", timeout=10)
             assert response.status_code == 200, "Proxmox nodes endpoint not accessible"
 
             nodes_data = response.json()
@@ -290,8 +295,8 @@ class TerraformDeploymentTests:
 
         try:
             for vm_config in vm_configs:
-                response = requests.post(f"{self.proxmox_url}/api2/json/nodes/pve/qemu",
-                                       json=vm_config, timeout=30)
+                response = self.proxmox.post("/api2/json/nodes/pve/qemu",
+                                             json=vm_config, timeout=30)
 
                 assert response.status_code in [200, 201], \
                     f"Failed to create VM {vm_config['name']}: {response.status_code}"
@@ -303,7 +308,7 @@ class TerraformDeploymentTests:
                 self.logger.info(f"✓ Created VM: {vm_config['name']}")
 
             # Validate VMs were created
-            response = requests.get(f"{self.proxmox_url}/api2/json/nodes/pve/qemu", timeout=10)
+            response = self.proxmox.get("/api2/json/nodes/pve/qemu", timeout=10)
             assert response.status_code == 200, "Failed to get VM list"
 
             vms = response.json().get('data', [])
@@ -355,8 +360,8 @@ class TerraformDeploymentTests:
 
         try:
             for bridge in network_bridges:
-                response = requests.post(f"{self.proxmox_url}/api2/json/nodes/pve/network",
-                                       json=bridge, timeout=10)
+                response = self.proxmox.post("/api2/json/nodes/pve/network",
+                                             json=bridge, timeout=10)
 
                 assert response.status_code in [200, 201], \
                     f"Failed to create network bridge {bridge['name']}"
@@ -371,8 +376,8 @@ class TerraformDeploymentTests:
             ]
 
             for vlan in vlans:
-                response = requests.post(f"{self.proxmox_url}/api2/json/nodes/pve/network/vlan",
-                                       json=vlan, timeout=10)
+                response = self.proxmox.post("/api2/json/nodes/pve/network/vlan",
+                                             json=vlan, timeout=10)
 
                 assert response.status_code in [200, 201], \
                     f"Failed to create VLAN {vlan['vlan']}"
@@ -413,7 +418,7 @@ class TerraformDeploymentTests:
                 vm_name = config.pop('vm_name')
 
                 # Get VM ID (simulate)
-                response = requests.get(f"{self.proxmox_url}/api2/json/nodes/pve/qemu", timeout=10)
+                response = self.proxmox.get("/api2/json/nodes/pve/qemu", timeout=10)
                 assert response.status_code == 200, "Failed to get VM list"
 
                 vms = response.json().get('data', [])
@@ -423,8 +428,8 @@ class TerraformDeploymentTests:
                     vm_id = vm['vmid']
 
                     # Update VM configuration with cloud-init
-                    response = requests.put(f"{self.proxmox_url}/api2/json/nodes/pve/qemu/{vm_id}/config",
-                                          json=config, timeout=10)
+                    response = self.proxmox.put(f"/api2/json/nodes/pve/qemu/{vm_id}/config",
+                                                json=config, timeout=10)
 
                     assert response.status_code in [200, 201], \
                         f"Failed to configure cloud-init for {vm_name}"
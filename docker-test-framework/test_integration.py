@@ -21,6 +21,12 @@ from unittest.mock import patch, MagicMock
 # Add project root to path for imports
 PROJECT_ROOT = Path(__file__).parent.parent
 sys.path.insert(0, str(PROJECT_ROOT))
+sys.path.insert(0, str(Path(__file__).parent / "test-runner"))
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from http_client import get_client
+from readiness import wait_for_services
+from config_loader import load_config
 
 class IntegrationTestSuite(unittest.TestCase):
     """Comprehensive integration tests for the deployment pipeline"""
@@ -32,6 +38,9 @@ class IntegrationTestSuite(unittest.TestCase):
         cls.project_root = cls.test_dir.parent
         cls.example_site_config = cls.test_dir / "example-site.yml"
         cls.mock_services_url = "http://localhost:8006"
+        cls.opnsense_url = "https://localhost:8443"
+        cls.proxmox = get_client(cls.mock_services_url)
+        cls.opnsense = get_client(cls.opnsense_url, verify=False)
         cls.test_results_dir = cls.test_dir / "test-results"
         cls.test_results_dir.mkdir(exist_ok=True)
 
@@ -41,18 +50,13 @@ class IntegrationTestSuite(unittest.TestCase):
     @classmethod
     def _wait_for_mock_services(cls, timeout=60):
         """Wait for mock services to be ready"""
-        start_time = time.time()
-        while time.time() - start_time < timeout:
-            try:
-                response = requests.get(f"{cls.mock_services_url}/health", timeout=5)
-                if response.status_code == 200:
-                    print("✓ Mock services are ready")
-                    return
-            except requests.exceptions.RequestException:
-                pass
-            time.sleep(2)
-
-        raise RuntimeError("Mock services failed to start within timeout")
+        statuses = wait_for_services(
+            [("Proxmox Mock", f"{cls.mock_services_url}/health")], timeout=timeout
+        )
+        for name, status in statuses.items():
+            if not status.ready:
+                raise RuntimeError(f"{name} failed to start within timeout: {status.last_error}")
+            print(f"✓ {name} is ready ({status.time_to_ready:.2f}s)")
 
     def setUp(self):
         """Set up for each test"""
@@ -76,19 +80,17 @@ class TestConfigurationValidation(IntegrationTestSuite):
 
     def test_example_site_yaml_syntax(self):
         """Test that example site YAML has valid syntax"""
-        with open(self.example_site_config, 'r') as f:
-            try:
-                config = yaml.safe_load(f)
-                self.assertIsInstance(config, dict)
-                self.assertIn('site', config)
-                print("✓ Example site YAML syntax is valid")
-            except yaml.YAMLError as e:
-                self.fail(f"YAML syntax error: {e}")
+        try:
+            config = load_config(self.example_site_config)
+            self.assertIsInstance(config, dict)
+            self.assertIn('site', config)
+            print("✓ Example site YAML syntax is valid")
+        except yaml.YAMLError as e:
+            self.fail(f"YAML syntax error: {e}")
 
     def test_site_config_structure(self):
         """Test that site config has required structure"""
-        with open(self.example_site_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_site_config)
 
         site = config['site']
 
@@ -111,8 +113,7 @@ class TestConfigurationValidation(IntegrationTestSuite):
 
     def test_network_configuration_consistency(self):
         """Test that network configuration is internally consistent"""
-        with open(self.example_site_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_site_config)
 
         site = config['site']
         network_prefix = site['network_prefix']
@@ -131,8 +132,7 @@ class TestConfigurationValidation(IntegrationTestSuite):
 
     def test_credentials_configuration(self):
         """Test that credentials are properly configured"""
-        with open(self.example_site_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_site_config)
 
         site = config['site']
 
@@ -272,7 +272,7 @@ class TestMockInfrastructure(IntegrationTestSuite):
     def test_proxmox_mock_health(self):
         """Test that Proxmox mock service is healthy"""
         try:
-            response = requests.get(f"{self.mock_services_url}/api2/json/version", timeout=10)
+            response = self.proxmox.get("/api2/json/version", timeout=10)
             self.assertEqual(response.status_code, 200)
 
             data = response.json()
@@ -286,8 +286,7 @@ class TestMockInfrastructure(IntegrationTestSuite):
         """Test that OPNsense mock service is healthy"""
         try:
             # OPNsense mock runs on HTTPS port 8443
-            opnsense_url = "https://localhost:8443"
-            response = requests.get(f"{opnsense_url}/api/core/firmware/status", timeout=10, verify=False)
+            response = self.opnsense.get("/api/core/firmware/status", timeout=10)
             # OPNsense might return different status codes, so just check it responds
             self.assertIn(response.status_code, [200, 401, 403])
             print("✓ OPNsense mock service is responding")
@@ -311,8 +310,8 @@ class TestMockInfrastructure(IntegrationTestSuite):
                 'Authorization': 'Bearer mock-token',
                 'Content-Type': 'application/json'
             }
-            response = requests.post(
-                f"{self.mock_services_url}/api2/json/nodes/pve/qemu",
+            response = self.proxmox.post(
+                "/api2/json/nodes/pve/qemu",
                 json=vm_config,
                 headers=headers,
                 timeout=10
@@ -333,8 +332,7 @@ class TestEndToEndDeployment(IntegrationTestSuite):
         # This test simulates the entire deployment process
 
         # 1. Validate site configuration
-        with open(self.example_site_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_site_config)
 
         site = config['site']
         self.assertIsInstance(site, dict)
@@ -369,8 +367,8 @@ class TestEndToEndDeployment(IntegrationTestSuite):
                         'Authorization': 'Bearer mock-token',
                         'Content-Type': 'application/json'
                     }
-                    response = requests.post(
-                        f"{self.mock_services_url}/api2/json/nodes/pve/qemu",
+                    response = self.proxmox.post(
+                        "/api2/json/nodes/pve/qemu",
                         json=mock_vm_data,
                         headers=headers,
                         timeout=10
@@ -428,8 +426,7 @@ class TestCICD(IntegrationTestSuite):
     def test_static_example_config_validation(self):
         """Test validation of static example config for CI/CD"""
         # This test ensures our example config is always valid for CI/CD
-        with open(self.example_site_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_site_config)
 
         # Validate it's a complete, valid configuration
         site = config['site']
@@ -500,13 +497,12 @@ class TestFirewallSecurity(IntegrationTestSuite):
         """Test OPNsense API authentication with various credentials"""
         # Test valid authentication
         try:
-            response = requests.get(
-                "https://localhost:8443/api/core/system/status",
+            response = self.opnsense.get(
+                "/api/core/system/status",
                 headers={
                     "Authorization": "Bearer test-key",
                     "Content-Type": "application/json"
                 },
-                verify=False,
                 timeout=10
             )
             self.assertEqual(response.status_code, 200)
@@ -518,13 +514,12 @@ class TestFirewallSecurity(IntegrationTestSuite):
 
         # Test invalid authentication
         try:
-            response = requests.get(
-                "https://localhost:8443/api/core/system/status",
+            response = self.opnsense.get(
+                "/api/core/system/status",
                 headers={
                     "Authorization": "Bearer invalid-key",
                     "Content-Type": "application/json"
                 },
-                verify=False,
                 timeout=10
             )
             self.assertEqual(response.status_code, 401)
@@ -566,14 +561,13 @@ class TestFirewallSecurity(IntegrationTestSuite):
 
         for rule in test_rules:
             try:
-                response = requests.post(
-                    "https://localhost:8443/api/firewall/filter/addRule",
+                response = self.opnsense.post(
+                    "/api/firewall/filter/addRule",
                     headers={
                         "Authorization": "Bearer test-key",
                         "Content-Type": "application/json"
                     },
                     json={"rule": rule},
-                    verify=False,
                     timeout=10
                 )
                 self.assertIn(response.status_code, [200, 201])
@@ -614,8 +608,8 @@ class TestFirewallSecurity(IntegrationTestSuite):
 
         for test in connectivity_tests:
             try:
-                response = requests.post(
-                    "http://localhost:8006/api/network/test-connectivity",
+                response = self.proxmox.post(
+                    "/api/network/test-connectivity",
                     headers={
                         "Authorization": "Bearer proxmox-test-token",
                         "Content-Type": "application/json"
@@ -666,8 +660,8 @@ class TestFirewallSecurity(IntegrationTestSuite):
 
         for test in vlan_tests:
             try:
-                response = requests.post(
-                    "http://localhost:8006/api/network/test-vlan-isolation",
+                response = self.proxmox.post(
+                    "/api/network/test-vlan-isolation",
                     headers={
                         "Authorization": "Bearer proxmox-test-token",
                         "Content-Type": "application/json"
@@ -713,8 +707,8 @@ class TestFirewallSecurity(IntegrationTestSuite):
 
         for test in intrusion_tests:
             try:
-                response = requests.post(
-                    "https://localhost:8443/api/ids/test-detection",
+                response = self.opnsense.post(
+                    "/api/ids/test-detection",
                     headers={
                         "Authorization": "Bearer test-key",
                         "Content-Type": "application/json"
@@ -724,7 +718,6 @@ class TestFirewallSecurity(IntegrationTestSuite):
                         "source": "203.0.113.100",
                         "destination": "10.0.1.100"
                     },
-                    verify=False,
                     timeout=10
                 )
                 self.assertEqual(response.status_code, 200)
@@ -738,8 +731,8 @@ class TestFirewallSecurity(IntegrationTestSuite):
     def test_vpn_connectivity(self):
         """Test VPN (Tailscale) connectivity simulation"""
         try:
-            response = requests.post(
-                "https://localhost:8443/api/tailscale/test-connection",
+            response = self.opnsense.post(
+                "/api/tailscale/test-connection",
                 headers={
                     "Authorization": "Bearer test-key",
                     "Content-Type": "application/json"
@@ -749,7 +742,6 @@ class TestFirewallSecurity(IntegrationTestSuite):
                     "destination": "10.0.1.100",
                     "port": 22
                 },
-                verify=False,
                 timeout=10
             )
             self.assertEqual(response.status_code, 200)
@@ -764,14 +756,13 @@ class TestFirewallSecurity(IntegrationTestSuite):
         """Test firewall configuration backup and restore"""
         try:
             # Test backup
-            backup_response = requests.post(
-                "https://localhost:8443/api/core/backup",
+            backup_response = self.opnsense.post(
+                "/api/core/backup",
                 headers={
                     "Authorization": "Bearer test-key",
                     "Content-Type": "application/json"
                 },
                 json={"include_rrd": False},
-                verify=False,
                 timeout=30
             )
             self.assertEqual(backup_response.status_code, 200)
@@ -779,14 +770,13 @@ class TestFirewallSecurity(IntegrationTestSuite):
             self.assertIn("backup_id", backup_data)
 
             # Test restore capability
-            restore_response = requests.post(
-                "https://localhost:8443/api/core/restore/test",
+            restore_response = self.opnsense.post(
+                "/api/core/restore/test",
                 headers={
                     "Authorization": "Bearer test-key",
                     "Content-Type": "application/json"
                 },
                 json={"backup_id": backup_data["backup_id"]},
-                verify=False,
                 timeout=30
             )
             self.assertEqual(restore_response.status_code, 200)
@@ -6,12 +6,15 @@ Validates that the single YAML file per site approach works correctly
 
 import os
 import sys
-import yaml
 import tempfile
 import subprocess
 from pathlib import Path
 import unittest
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "deployment" / "scripts"))
+
+from config_loader import load_config
+
 # Refactored: Use PROXMOX_FW_CONFIG_ROOT for config path, supporting submodule usage.
 PROXMOX_FW_CONFIG_ROOT = os.environ.get('PROXMOX_FW_CONFIG_ROOT')
 if not PROXMOX_FW_CONFIG_ROOT:
@@ -31,8 +34,7 @@ class TestSimplifiedConfig(unittest.TestCase):
 
     def test_example_site_has_complete_structure(self):
         """Test that example site config has all required sections"""
-        with open(self.example_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_config)
 
         # Check top-level structure
         self.assertIn('site', config)
@@ -52,8 +54,7 @@ class TestSimplifiedConfig(unittest.TestCase):
 
     def test_site_template_has_complete_structure(self):
         """Test that site template has all required sections"""
-        with open(self.site_template, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.site_template)
 
         # Check top-level structure
         self.assertIn('site', config)
@@ -95,8 +96,7 @@ class TestSimplifiedConfig(unittest.TestCase):
 
     def test_credentials_are_environment_variables(self):
         """Test that credentials reference environment variables, not hardcoded values"""
-        with open(self.example_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_config)
 
         site = config['site']
         if 'credentials' in site:
@@ -116,8 +116,7 @@ class TestSimplifiedConfig(unittest.TestCase):
 
     def test_network_configuration_consistency(self):
         """Test that network configuration is internally consistent"""
-        with open(self.example_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_config)
 
         site = config['site']
         network_prefix = site['network_prefix']
@@ -137,8 +136,7 @@ class TestSimplifiedConfig(unittest.TestCase):
 
     def test_vm_templates_are_properly_configured(self):
         """Test that VM templates have proper configuration"""
-        with open(self.example_config, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(self.example_config)
 
         site = config['site']
         vm_templates = site.get('vm_templates', {})
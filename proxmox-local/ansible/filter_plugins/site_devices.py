@@ -0,0 +1,22 @@
+# site_devices.py - Ansible filter exposing the Python device-map builder
+#
+# Usage: site_devices_map: "{{ site_config | device_map }}"
+
+import sys
+from pathlib import Path
+
+_SCRIPTS_DIR = Path(__file__).resolve().parents[3] / 'deployment' / 'scripts'
+if str(_SCRIPTS_DIR) not in sys.path:
+    sys.path.insert(0, str(_SCRIPTS_DIR))
+
+from device_map import build_device_map  # noqa: E402
+
+
+def device_map(site_config, template_dir=None):
+    """Merged device map (type default ports, override_ports, additional_ports)"""
+    return build_device_map(dict(site_config or {}), template_dir)
+
+
+class FilterModule(object):
+    def filters(self):
+        return {'device_map': device_map}
@@ -0,0 +1,29 @@
+"""
+Shared test setup.
+
+The network simulator and the OPNsense mock both ship a top-level "src"
+package, so each is registered here under its own name: ``network_sim``
+and ``opnsense_mock``.
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+NETWORK_SIM_SRC = Path(__file__).parent.parent / "docker-test-framework" / "network-sim" / "src"
+
+if "network_sim" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "network_sim", NETWORK_SIM_SRC / "__init__.py", submodule_search_locations=[str(NETWORK_SIM_SRC)])
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["network_sim"] = _module
+    _spec.loader.exec_module(_module)
+
+OPNSENSE_MOCK_SRC = Path(__file__).parent.parent / "docker-test-framework" / "opnsense-mock" / "src"
+
+if "opnsense_mock" not in sys.modules:
+    _spec = importlib.util.spec_from_file_location(
+        "opnsense_mock", OPNSENSE_MOCK_SRC / "__init__.py", submodule_search_locations=[str(OPNSENSE_MOCK_SRC)])
+    _module = importlib.util.module_from_spec(_spec)
+    sys.modules["opnsense_mock"] = _module
+    _spec.loader.exec_module(_module)
@@ -0,0 +1,45 @@
+"""
+Capture builders shared by the capture replay and behavioural IDS tests.
+"""
+
+import struct
+
+
+SYN, ACK = 0x02, 0x10
+
+
+def ip(address):
+    return bytes(int(octet) for octet in address.split('.'))
+
+
+def ethernet(src, dst, sport=0, dport=0, protocol=6, flags=SYN, vlan=None, fragment=0):
+    if protocol == 6:
+        transport = struct.pack('!HHIIBBHHH', sport, dport, 0, 0, 0x50, flags, 0, 0, 0)
+    elif protocol == 17:
+        transport = struct.pack('!HHHH', sport, dport, 8, 0)
+    else:
+        transport = b'\x08\x00\x00\x00\x00\x00\x00\x00'
+    header = struct.pack('!BBHHHBBH4s4s', 0x45, 0, 20 + len(transport), 0, fragment, 64, protocol, 0,
+                         ip(src), ip(dst))
+    tag = struct.pack('!HH', 0x8100, vlan) if vlan else b''
+    return b'\x00' * 12 + tag + b'\x08\x00' + header + transport
+
+
+def write_pcap(path, packets):
+    with open(path, 'wb') as f:
+        f.write(struct.pack('<IHHiIII', 0xA1B2C3D4, 2, 4, 0, 0, 65535, 1))
+        for index, packet in enumerate(packets):
+            f.write(struct.pack('<IIII', index, 0, len(packet), len(packet)) + packet)
+
+
+def write_pcapng(path, packets):
+    def block(block_type, body):
+        body += b'\x00' * (-len(body) % 4)
+        length = len(body) + 12
+        return struct.pack('<II', block_type, length) + body + struct.pack('<I', length)
+
+    with open(path, 'wb') as f:
+        f.write(block(0x0A0D0D0A, struct.pack('<IHHq', 0x1A2B3C4D, 1, 0, -1)))
+        f.write(block(1, struct.pack('<HHI', 1, 0, 65535)))
+        for packet in packets:
+            f.write(block(6, struct.pack('<IIIII', 0, 0, 0, len(packet), len(packet)) + packet))
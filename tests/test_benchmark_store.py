@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the test-runner benchmark history store.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "docker-test-framework" / "test-runner"))
+
+from benchmark_store import BenchmarkStore, extract_metrics  # noqa: E402
+
+ENDPOINT = "/api/core/system/status"
+
+
+def results(p95=100.0, throughput=1000.0, duration=30.0, success=True, error_rate=0.0):
+    return {
+        "test_suite": "performance",
+        "start_time": 0.0,
+        "summary": {"success": success},
+        "tests": {"performance": {"duration": duration}},
+        "performance": {"endpoints": {ENDPOINT: {
+            "throughput_rps": throughput,
+            "error_rate": error_rate,
+            "latency_ms": {"mean": p95 / 2, "p50": p95 / 2, "p95": p95, "p99": p95 * 1.5},
+        }}},
+    }
+
+
+def flagged(regressions):
+    return {(r.scope, r.metric) for r in regressions}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BenchmarkStore(str(tmp_path / "reports" / "benchmarks.sqlite3"))
+    yield store
+    store.close()
+
+
+@pytest.fixture
+def steady(store):
+    for index in range(10):
+        noise = (index % 3 - 1) * 0.01
+        store.record_run(results(100.0 * (1 + noise), 1000.0 * (1 - noise), 30.0 * (1 + noise)), "perf-c10")
+    return store
+
+
+class TestExtractMetrics:
+    """Test flattening runner results into metric rows."""
+
+    def test_rows(self):
+        rows = extract_metrics(results())
+        assert ("suite", "performance", "duration", 30.0) in rows
+        assert ("endpoint", ENDPOINT, "throughput_rps", 1000.0) in rows
+        assert ("endpoint", ENDPOINT, "p95_ms", 100.0) in rows
+        assert len(rows) == 7
+
+
+class TestRegressions:
+    """Test regression checks against the rolling baseline."""
+
+    def test_steady_history_is_clean(self, steady):
+        run_id = steady.record_run(results(101.0, 995.0), "perf-c10")
+        assert steady.check(results(101.0, 995.0), "perf-c10", before_run=run_id) == []
+
+    def test_latency_jump_is_flagged(self, steady):
+        regressions = steady.check(results(p95=200.0), "perf-c10")
+        p95 = next(r for r in regressions if r.metric == "p95_ms")
+        assert (p95.value, p95.baseline, p95.samples) == (200.0, 100.0, 10)
+        assert p95.change == pytest.approx(1.0)
+        assert p95.score > steady.z_threshold
+
+    def test_throughput_drop_is_flagged(self, steady):
+        regressions = steady.check(results(throughput=500.0), "perf-c10")
+        assert flagged(regressions) == {("endpoint", "throughput_rps")}
+        assert regressions[0].change == pytest.approx(-0.5)
+
+    def test_improvements_are_not_flagged(self, steady):
+        assert steady.check(results(p95=50.0, throughput=2000.0, duration=10.0), "perf-c10") == []
+
+    def test_too_few_samples(self, store):
+        for _ in range(store.min_samples - 1):
+            store.record_run(results(), "perf-c10")
+        assert store.check(results(p95=500.0), "perf-c10") == []
+        store.record_run(results(), "perf-c10")
+        assert ("endpoint", "p95_ms") in flagged(store.check(results(p95=500.0), "perf-c10"))
+
+    def test_failed_runs_stay_out_of_the_baseline(self, store):
+        for _ in range(5):
+            store.record_run(results(), "perf-c10")
+            store.record_run(results(p95=500.0, success=False), "perf-c10")
+        assert store.baseline_values("perf-c10", "endpoint", ENDPOINT, "p95_ms") == [100.0] * 5
+        assert ("endpoint", "p95_ms") in flagged(store.check(results(p95=500.0), "perf-c10"))
+
+    def test_profiles_are_isolated(self, steady):
+        for _ in range(5):
+            steady.record_run(results(p95=300.0), "perf-c50")
+        assert steady.check(results(p95=300.0), "perf-c50") == []
+        assert ("endpoint", "p95_ms") in flagged(steady.check(results(p95=300.0), "perf-c10"))
+
+
+class TestBaseline:
+    """Test the median/MAD baseline."""
+
+    def test_zero_spread_uses_relative_change(self, store):
+        for _ in range(5):
+            store.record_run(results(), "perf-c10")
+        assert store.check(results(p95=105.0), "perf-c10") == []
+        [p95] = [r for r in store.check(results(p95=115.0), "perf-c10") if r.metric == "p95_ms"]
+        assert p95.score is None
+        assert p95.change == pytest.approx(0.15)
+
+    def test_flat_baseline_ignores_changes_below_the_floor(self, tmp_path):
+        store = BenchmarkStore(str(tmp_path / "benchmarks.sqlite3"), min_delta={"error_rate": 0.01})
+        try:
+            for _ in range(5):
+                store.record_run(results(p95=2.0), "perf-c10")
+            # one failed request in 10,000, and a 1 ms latency wobble on a 2 ms baseline
+            assert store.check(results(p95=3.0, error_rate=0.0001), "perf-c10") == []
+            assert {("endpoint", "error_rate"), ("endpoint", "p95_ms")} <= flagged(
+                store.check(results(p95=8.0, error_rate=0.05), "perf-c10"))
+        finally:
+            store.close()
+
+    def test_outliers_do_not_move_the_baseline(self, store):
+        for p95 in (98.0, 99.0, 100.0, 101.0, 102.0, 100.0, 1000.0):
+            store.record_run(results(p95=p95), "perf-c10")
+        [p95] = [r for r in store.check(results(p95=130.0), "perf-c10") if r.metric == "p95_ms"]
+        assert p95.baseline == 100.0
+        # deviations 0 0 1 1 2 2 900: MAD 1, scaled by 1.4826
+        assert p95.score == pytest.approx(30.0 / 1.4826)
+
+    def test_window_limits_history(self, tmp_path):
+        store = BenchmarkStore(str(tmp_path / "benchmarks.sqlite3"), window=5)
+        try:
+            for p95 in range(10):
+                store.record_run(results(p95=float(p95)), "perf-c10")
+            assert store.baseline_values("perf-c10", "endpoint", ENDPOINT, "p95_ms") == [9.0, 8.0, 7.0, 6.0, 5.0]
+        finally:
+            store.close()
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the shared YAML config loader.
+"""
+
+import copy
+import os
+import pickle
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from config_loader import ConfigCache, FrozenDict, mutable_copy  # noqa: E402
+
+
+class TestConfigLoader:
+    """Test caching and read-only views of parsed YAML."""
+
+    @pytest.fixture
+    def config_file(self, tmp_path):
+        path = tmp_path / "site.yml"
+        path.write_text("site:\n  name: test\n  vlans:\n    - id: 10\n    - id: 20\n")
+        return path
+
+    def test_reuses_parse_until_file_changes(self, config_file):
+        cache = ConfigCache()
+        first = cache.load(config_file)
+        assert cache.load(config_file) is first
+        assert cache.stats() == {'entries': 1, 'hits': 1, 'misses': 1}
+
+        config_file.write_text("site:\n  name: changed\n")
+        stat = config_file.stat()
+        os.utime(config_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1))
+        assert cache.load(config_file)['site']['name'] == 'changed'
+
+    def test_loaded_data_is_read_only(self, config_file):
+        site = ConfigCache().load(config_file)['site']
+        assert isinstance(site, dict)
+        with pytest.raises(TypeError):
+            site['name'] = 'other'
+        with pytest.raises(TypeError):
+            site['vlans'].append({'id': 30})
+
+        editable = mutable_copy(site)
+        editable['vlans'].append({'id': 30})
+        assert type(editable) is dict and len(site['vlans']) == 2
+
+    def test_views_pickle_copy_and_dump(self, config_file):
+        config = ConfigCache().load(config_file)
+        assert copy.deepcopy(config) is config
+
+        restored = pickle.loads(pickle.dumps(config))
+        assert isinstance(restored, FrozenDict) and restored == config
+        assert yaml.safe_load(yaml.safe_dump(config)) == config
+
+    def test_invalid_yaml_raises(self, tmp_path):
+        path = tmp_path / "broken.yml"
+        path.write_text("site: [unclosed\n")
+        with pytest.raises(yaml.YAMLError):
+            ConfigCache().load(path)
@@ -5,10 +5,14 @@ Fast, lightweight tests that don't require Docker or external services.
 """
 
 import pytest
-import yaml
+import sys
 import os
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent.parent / "deployment" / "scripts"))
+
+from config_loader import load_config
+
 # Refactored: Use PROXMOX_FW_CONFIG_ROOT for config path, supporting submodule usage.
 PROXMOX_FW_CONFIG_ROOT = os.environ.get('PROXMOX_FW_CONFIG_ROOT')
 if not PROXMOX_FW_CONFIG_ROOT:
@@ -30,8 +34,7 @@ class TestConfigValidation:
         """Load the site template."""
         template_path = project_root / "config" / "site_template.yml"
         if template_path.exists():
-            with open(template_path, 'r') as f:
-                return yaml.safe_load(f)
+            return load_config(template_path)
         return None
 
     def test_site_template_exists(self, project_root):
@@ -39,8 +42,7 @@ class TestConfigValidation:
         template_path = project_root / "config" / "site_template.yml"
         assert template_path.exists(), "Site template should exist"
 
-        with open(template_path, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(template_path)
 
         assert config is not None, "Site template should be valid YAML"
         assert 'site' in config, "Site template should have 'site' key"
@@ -71,8 +73,7 @@ class TestConfigValidation:
         if not example_path.exists():
             pytest.skip("Example site config not found")
 
-        with open(example_path, 'r') as f:
-            config = yaml.safe_load(f)
+        config = load_config(example_path)
 
         assert config is not None, "Example site config should be valid YAML"
         assert 'site' in config, "Example site should have 'site' key"
@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compiled device-type defaults registry.
+"""
+
+import dataclasses
+import shutil
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("jinja2")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from device_defaults import DeviceTypeRegistry  # noqa: E402
+
+DEVICE_TEMPLATES = PROJECT_ROOT / "config" / "devices_templates"
+
+
+class TestDeviceTypeRegistry:
+    """Test parsing and caching of device-type defaults."""
+
+    @pytest.fixture
+    def template_dir(self, tmp_path):
+        target = tmp_path / "templates"
+        shutil.copytree(DEVICE_TEMPLATES, target, ignore=shutil.ignore_patterns("examples"))
+        return target
+
+    def test_every_template_registered(self, tmp_path):
+        """Each *.yml.j2 template yields a device type."""
+        registry = DeviceTypeRegistry(DEVICE_TEMPLATES, cache_file=tmp_path / "cache.json")
+        templates = sorted(path.name[:-len(".yml.j2")] for path in DEVICE_TEMPLATES.glob("*.yml.j2"))
+
+        assert registry.types() == templates
+
+    def test_defaults_parsed_and_frozen(self, tmp_path):
+        """Defaults are typed and immutable."""
+        camera = DeviceTypeRegistry(DEVICE_TEMPLATES, cache_file=tmp_path / "cache.json")["camera"]
+
+        assert camera.vlan == 20
+        assert (camera.ports[0].port, camera.ports[0].protocol) == (554, "tcp")
+        assert camera.allow_internet is False
+        assert camera.attributes["allow_from_ips"][0]["ip"] == "10.x.20.3"
+        with pytest.raises(dataclasses.FrozenInstanceError):
+            camera.vlan = 10
+        with pytest.raises(TypeError):
+            camera.attributes["nvr_managed"] = False
+
+    def test_disk_cache_reused_until_template_changes(self, tmp_path, template_dir):
+        """A second registry reads the cache; editing a template recompiles only it."""
+        cache_file = tmp_path / "cache.json"
+        first = DeviceTypeRegistry(template_dir, cache_file=cache_file)
+        assert first.compiled == len(first.types())
+
+        assert DeviceTypeRegistry(template_dir, cache_file=cache_file).compiled == 0
+
+        nas = template_dir / "nas.yml.j2"
+        nas.write_text(nas.read_text().replace("default(10) }}  # Main LAN", "default(11) }}  # Main LAN"))
+        registry = DeviceTypeRegistry(template_dir, cache_file=cache_file)
+
+        assert registry.compiled == 1
+        assert registry["nas"].vlan == 11
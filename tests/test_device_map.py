@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the site device map builder.
+Checks that type defaults, override_ports and additional_ports are merged.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("jinja2")
+
+sys.path.insert(0, str(Path(__file__).parent.parent / "deployment" / "scripts"))
+
+from device_map import build_device_map, merge_ports  # noqa: E402
+
+
+class TestDeviceMap:
+    """Test device map construction."""
+
+    @pytest.fixture
+    def site_config(self):
+        return {
+            "name": "test",
+            "network_prefix": "10.1",
+            "devices": {
+                "nas": {"type": "nas", "ip_address": "10.1.10.100", "vlan_id": 10,
+                        "mac_address": "00:11:22:33:44:66"},
+                "camera": {"type": "camera", "ip_address": "10.1.20.10", "vlan_id": 20,
+                           "rtsp_port": 8554, "additional_ports": [9000, {"port": 80, "protocol": "tcp"}]},
+                "printer": {"type": "nas", "ip_address": "10.1.10.50", "vlan_id": 10,
+                            "override_ports": [631]},
+                "server": {"ip_address": "10.1.10.20", "vlan_id": 10},
+            },
+        }
+
+    def ports(self, entry):
+        return [(port["port"], port["protocol"]) for port in entry["ports"]]
+
+    def test_type_defaults_used(self, site_config):
+        """Devices get their template's default ports."""
+        device_map = build_device_map(site_config)
+
+        assert self.ports(device_map["nas"]) == [(445, "tcp"), (2049, "tcp"), (443, "tcp")]
+        assert device_map["nas"]["mac_address"] == "00:11:22:33:44:66"
+
+    def test_additional_ports_appended(self, site_config):
+        """additional_ports extend the defaults, which honour device options."""
+        ports = self.ports(build_device_map(site_config)["camera"])
+
+        assert ports[0] == (8554, "tcp")
+        assert ports.count((80, "tcp")) == 1
+        assert ports[-1] == (9000, "tcp")
+
+    def test_override_ports_replace_defaults(self, site_config):
+        """override_ports replace the type defaults entirely."""
+        assert self.ports(build_device_map(site_config)["printer"]) == [(631, "tcp")]
+
+    def test_unknown_type_has_no_defaults(self, site_config):
+        """Types without a template (and the generic default type) have no ports."""
+        entry = build_device_map({"site": site_config})["server"]
+
+        assert entry["type"] == "generic_server"
+        assert entry["ports"] == []
+        assert "mac_address" not in entry
+
+    def test_merge_keeps_description(self):
+        """Re-listing a default port keeps its description."""
+        merged = merge_ports([{"port": 80, "protocol": "tcp", "description": "HTTP"}], [80])
+
+        assert merged == [{"port": 80, "protocol": "tcp", "description": "HTTP"}]
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the test runner's shared HTTP client layer.
+"""
+
+import asyncio
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "docker-test-framework" / "test-runner"))
+
+import http_client  # noqa: E402
+from http_client import AsyncHttpClient, HttpClient, client_for_url, close_all, get_client  # noqa: E402
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    """Echoes the request path and records which connection served it"""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        body = json.dumps({"path": self.path, "auth": self.headers.get("Authorization")}).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), KeepAliveHandler)
+    server.daemon_threads = True
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def base_url(server):
+    return f"http://127.0.0.1:{server.server_address[1]}"
+
+
+@pytest.fixture(autouse=True)
+def shared_clients():
+    yield
+    close_all()
+
+
+class TestHttpClient:
+    """Test the pooled synchronous client."""
+
+    def test_requests_reuse_one_connection(self, server, base_url):
+        client = HttpClient(base_url + "/", headers={"Authorization": "Bearer token"})
+        try:
+            for _ in range(5):
+                response = client.get("/health")
+                assert response.json() == {"path": "/health", "auth": "Bearer token"}
+        finally:
+            client.close()
+        assert len(server.connections) == 1
+
+    def test_url(self):
+        client = HttpClient("http://proxmox-mock:8006/")
+        assert client.url("api2/json/version") == "http://proxmox-mock:8006/api2/json/version"
+        assert client.url("https://opnsense-mock/health") == "https://opnsense-mock/health"
+        client.close()
+
+
+class TestSharedClients:
+    """Test the per-service client registry."""
+
+    def test_get_client_is_shared(self, base_url):
+        assert get_client(base_url) is get_client(base_url + "/")
+        assert get_client(base_url) is not get_client(base_url, verify=False)
+
+    def test_client_for_url(self, server, base_url):
+        client = client_for_url(base_url + "/health")
+        assert client is get_client(base_url)
+        client_for_url(base_url + "/api2/json/version").get(base_url + "/api2/json/version")
+        client.get("/health")
+        assert len(server.connections) == 1
+        assert client_for_url("https://opnsense-mock:443/health").session.verify is False
+
+    def test_close_all(self, base_url):
+        client = get_client(base_url)
+        close_all()
+        assert get_client(base_url) is not client
+
+
+class TestAsyncHttpClient:
+    """Test the httpx-based async client."""
+
+    def test_requests_reuse_one_connection(self, server, base_url):
+        pytest.importorskip("httpx")
+
+        async def fetch():
+            async with AsyncHttpClient(base_url, http2=False) as client:
+                return [(await client.get("/status")).json()["path"] for _ in range(5)]
+
+        assert asyncio.run(fetch()) == ["/status"] * 5
+        assert len(server.connections) == 1
+
+    def test_concurrent_requests_share_the_pool(self, server, base_url):
+        pytest.importorskip("httpx")
+
+        async def fetch():
+            async with AsyncHttpClient(base_url, http2=False, max_connections=2) as client:
+                return await asyncio.gather(*(client.get(f"/{n}") for n in range(10)))
+
+        assert all(response.status_code == 200 for response in asyncio.run(fetch()))
+        assert len(server.connections) <= 2
+
+    def test_missing_dependencies(self, monkeypatch):
+        monkeypatch.setattr(http_client, "HTTP2_AVAILABLE", False)
+        with pytest.raises(RuntimeError, match="h2"):
+            AsyncHttpClient("http://proxmox-mock:8006", http2=True)
+        monkeypatch.setattr(http_client, "httpx", None)
+        with pytest.raises(RuntimeError, match="httpx"):
+            AsyncHttpClient("http://proxmox-mock:8006")
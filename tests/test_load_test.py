@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the test runner's open-loop load generator.
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "docker-test-framework" / "test-runner"))
+
+import load_test  # noqa: E402
+from load_test import DEFAULT_MIX, EndpointStats, LoadGenerator, parse_mix, percentile  # noqa: E402
+
+
+class StubResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class StubClient:
+    """Stands in for AsyncHttpClient: answers every request after ``delay`` seconds"""
+
+    delay = 0.0
+    status = {}
+    requests = []
+    closed = 0
+
+    def __init__(self, base_url, **kwargs):
+        self.base_url = base_url
+
+    async def request(self, method, path, **kwargs):
+        StubClient.requests.append((self.base_url, method, path))
+        await asyncio.sleep(self.delay)
+        status = self.status.get(path, 200)
+        if isinstance(status, Exception):
+            raise status
+        return StubResponse(status)
+
+    async def aclose(self):
+        StubClient.closed += 1
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    monkeypatch.setattr(load_test, "AsyncHttpClient", StubClient)
+    monkeypatch.setattr(StubClient, "delay", 0.0)
+    monkeypatch.setattr(StubClient, "status", {})
+    monkeypatch.setattr(StubClient, "requests", [])
+    monkeypatch.setattr(StubClient, "closed", 0)
+    return StubClient
+
+
+URLS = {"proxmox": "http://proxmox-mock:8006", "opnsense": "https://opnsense-mock:443"}
+
+
+class TestPercentile:
+    """Test nearest-rank percentiles."""
+
+    def test_nearest_rank(self):
+        values = [float(v) for v in range(1, 101)]
+        assert [percentile(values, p) for p in (50, 95, 99, 100)] == [50.0, 95.0, 99.0, 100.0]
+        assert percentile([3.0], 99) == 3.0
+        assert percentile([1.0, 2.0], 0) == 1.0
+
+    def test_empty(self):
+        assert percentile([], 95) is None
+
+
+class TestParseMix:
+    """Test request mix parsing."""
+
+    def test_default(self):
+        assert [spec.name for spec in parse_mix(None)] == list(DEFAULT_MIX)
+
+    def test_weights(self):
+        specs = parse_mix("vm.list=3, firewall.add_rule")
+        assert [(spec.name, spec.weight) for spec in specs] == [("vm.list", 3.0), ("firewall.add_rule", 2.0)]
+        assert specs[0].path == DEFAULT_MIX["vm.list"].path
+
+    def test_unknown_endpoint(self):
+        with pytest.raises(ValueError, match="vm.delete"):
+            parse_mix("vm.delete=1")
+
+
+class TestEndpointStats:
+    """Test per-endpoint summaries."""
+
+    def test_summary(self):
+        stats = EndpointStats(latencies=[0.002, 0.001, 0.003, 0.004], errors=1, status_codes={"200": 3, "500": 1})
+        summary = stats.summary(2.0)
+        assert (summary["requests"], summary["error_rate"], summary["throughput_rps"]) == (4, 0.25, 2.0)
+        assert summary["latency_ms"]["p50"] == 2.0 and summary["latency_ms"]["max"] == 4.0
+
+    def test_skipped_arrivals_are_errors(self):
+        summary = EndpointStats(latencies=[0.001] * 8, errors=2, skipped=2).summary(1.0)
+        assert (summary["requests"], summary["skipped"], summary["error_rate"]) == (10, 2, 0.2)
+        assert summary["throughput_rps"] == 8.0
+
+
+class TestLoadGenerator:
+    """Test the open-loop schedule against a stub client."""
+
+    def test_requests_follow_the_mix(self, stub):
+        mix = parse_mix("vm.list=1,firewall.add_rule=1")
+        report = asyncio.run(LoadGenerator(URLS, rps=400, duration=0.5, mix=mix, seed=1).run())
+
+        overall = report["overall"]
+        assert 100 < overall["requests"] < 300
+        assert overall["errors"] == 0 and report["skipped_client_saturated"] == 0
+        assert set(report["endpoints"]) == {"vm.list", "firewall.add_rule"}
+        assert {(url, path) for url, _, path in stub.requests} == {
+            (URLS["proxmox"], "/api2/json/nodes/pve/qemu"), (URLS["opnsense"], "/api/firewall/filter/addRule")}
+        assert stub.closed == 2
+
+    def test_errors_and_exceptions(self, stub):
+        stub.status = {"/api2/json/nodes/pve/qemu": 500, "/api/firewall/filter/addRule": ConnectionError()}
+        mix = parse_mix("vm.list=1,firewall.add_rule=1")
+        report = asyncio.run(LoadGenerator(URLS, rps=200, duration=0.3, mix=mix, seed=2).run())
+
+        assert report["overall"]["error_rate"] == 1.0
+        assert set(report["endpoints"]["vm.list"]["status_codes"]) == {"500"}
+        assert set(report["endpoints"]["firewall.add_rule"]["status_codes"]) == {"ConnectionError"}
+
+    def test_latency_includes_queueing(self, stub):
+        # Each response takes 50 ms; latency is measured from the scheduled send time
+        stub.delay = 0.05
+        report = asyncio.run(LoadGenerator(URLS, rps=100, duration=0.3, mix=parse_mix("vm.list"), seed=3).run())
+        assert report["overall"]["latency_ms"]["p50"] >= 50
+
+    def test_saturated_client_counts_errors(self, stub):
+        stub.delay = 0.2
+        generator = LoadGenerator(URLS, rps=500, duration=0.3, mix=parse_mix("vm.list"), max_in_flight=5, seed=4)
+        report = asyncio.run(generator.run())
+
+        skipped = report["skipped_client_saturated"]
+        overall = report["overall"]
+        assert skipped > 0 and overall["skipped"] == skipped
+        assert overall["errors"] == skipped
+        assert overall["requests"] == len(stub.requests) + skipped
+        assert overall["status_codes"]["ClientSaturated"] == skipped
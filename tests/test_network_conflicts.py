@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the cross-site subnet and address conflict detector.
+"""
+
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from network_conflicts import check_files, find_conflicts  # noqa: E402
+
+
+def make_site(name, prefix, devices=None, host=None):
+    vlans = [
+        {'id': vlan, 'name': f"vlan{vlan}", 'subnet': f"{prefix}.{vlan}.0/24", 'gateway': f"{prefix}.{vlan}.1"}
+        for vlan in (10, 20)
+    ]
+    return {'site': {
+        'name': name,
+        'proxmox': {'host': host or f"{prefix}.50.10"},
+        'hardware': {'network': {'vlans': vlans}},
+        'devices': devices or {},
+    }}
+
+
+def kinds(conflicts):
+    return sorted(conflict.kind for conflict in conflicts)
+
+
+class TestNetworkConflicts:
+    """Test overlap and duplicate detection."""
+
+    def test_distinct_sites_have_no_conflicts(self):
+        sites = [(f"{n}.yml", make_site(f"site{n}", f"10.{n}")) for n in range(1, 50)]
+        assert find_conflicts(sites) == []
+
+    def test_overlapping_subnets_across_sites(self):
+        conflicts = find_conflicts([("a.yml", make_site("a", "10.1")), ("b.yml", make_site("b", "10.1"))])
+        assert kinds(conflicts).count('subnet-overlap') == 2
+        [overlap] = [c for c in conflicts if c.kind == 'subnet-overlap' and '10.1.10.0/24' in c.message]
+        assert {location.site for location in overlap.locations} == {'a', 'b'}
+
+    def test_nested_subnet_within_site(self):
+        site = make_site("a", "10.1")
+        site['site']['hardware']['network']['vlans'].append({'id': 30, 'name': 'x', 'subnet': '10.1.0.0/16'})
+        assert kinds(find_conflicts([("a.yml", site)])) == ['subnet-overlap', 'subnet-overlap']
+
+    def test_device_addresses(self):
+        devices = {
+            'nas': {'ip_address': '10.1.10.5', 'vlan_id': 10, 'mac_address': '52:54:00:00:00:01'},
+            'tv': {'ip_address': '10.1.10.5', 'mac_address': '52-54-00-00-00-01'},
+            'cam': {'ip_address': '10.1.10.20', 'vlan_id': 20},
+            'lost': {'ip_address': '10.1.99.1'},
+            'odd': {'ip_address': '10.1.20.9', 'vlan_id': 40},
+        }
+        conflicts = find_conflicts([("a.yml", make_site("a", "10.1", devices))])
+        assert kinds(conflicts) == ['duplicate-ip', 'duplicate-mac', 'outside-subnet', 'outside-subnet',
+                                    'unknown-vlan']
+
+        [duplicate] = [c for c in conflicts if c.kind == 'duplicate-ip']
+        assert [location.path for location in duplicate.locations] == [
+            ('site', 'devices', 'nas', 'ip_address'), ('site', 'devices', 'tv', 'ip_address'),
+        ]
+
+    def test_host_and_placeholders(self, tmp_path):
+        template = PROJECT_ROOT / "config" / "site_template.yml"
+        site_file = tmp_path / "a.yml"
+        site_file.write_text("site:\n  name: a\n  proxmox:\n    host: 10.1.10.1\n"
+                             "  hardware:\n    network:\n      vlans:\n"
+                             "        - {id: 10, name: main, subnet: 10.1.10.0/24, gateway: 10.1.10.1}\n")
+
+        [conflict] = check_files([str(template), str(site_file)])
+        assert conflict.kind == 'duplicate-ip'
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the network simulator multi-WAN failover model.
+"""
+
+import copy
+from pathlib import Path
+
+import pytest
+import yaml
+
+np = pytest.importorskip("numpy")
+
+from network_sim.failover import (  # noqa: E402
+    FailoverSimulation, GatewayMonitor, Outage, SessionLoad, monitor_gateway, sweep, wan_gateways,
+)
+from network_sim.topology import Topology, TopologyError  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+@pytest.fixture(scope="module")
+def site():
+    with open(EXAMPLE_SITE) as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture
+def topology(site):
+    return Topology.from_site(site)
+
+
+def run(topology, outages, **monitor):
+    return FailoverSimulation(topology, GatewayMonitor(**monitor), SessionLoad(seed=3)).run(outages)
+
+
+class TestGateways:
+    """Test WAN gateway discovery from the topology."""
+
+    def test_example_site(self, topology):
+        gateways = wan_gateways(topology)
+        assert [(g.name, g.interface, g.bridges, g.tier, g.usable) for g in gateways] == [
+            ("uplink-eth0", "eth0", ("vmbr0",), 0, True),
+            ("uplink-eth1", "eth1", ("vmbr3",), 1, True),
+        ]
+        assert gateways[0].capacity_bps == 2.5e9
+        assert topology.disabled == set()
+
+    def test_backup_without_firewall_nic(self, site):
+        config = copy.deepcopy(site)
+        config["site"]["vm_templates"]["opnsense"]["network"].pop()
+        assert [g.usable for g in wan_gateways(Topology.from_site(config))] == [True, False]
+
+
+class TestFailover:
+    """Test detection, switchover and dropped sessions."""
+
+    def test_primary_loss_fails_over(self, topology):
+        [outage] = run(topology, [Outage("vmbr0", 60, 360)])["outages"]
+        # 20% of a 60 s window is 12 lost probes, each known 2 s after it was sent
+        assert 12 <= outage["detected_after"] <= 15
+        assert outage["recovered_after"] == pytest.approx(outage["detected_after"] + 1.0)
+        assert outage["failed_over_to"] == "uplink-eth1"
+        assert outage["failback_after"] > 0
+        assert outage["sessions_cut"] > 0 and outage["sessions_blackholed"] > 0
+
+    def test_shorter_period_recovers_faster(self, topology):
+        rows = sweep(topology, "eth0", 60, 120, [1.0], [10.0, 60.0], SessionLoad(seed=1), runs=3)
+        fast, slow = rows
+        assert fast["recovered_after"] < slow["recovered_after"]
+        assert fast["sessions_dropped"] < slow["sessions_dropped"]
+
+    def test_short_blip_is_not_detected(self, topology):
+        [outage] = run(topology, [Outage("eth0", 60, 63)])["outages"]
+        assert outage["detected_after"] is None and outage["failed_over_to"] is None
+        assert outage["recovered_after"] == 3.0
+        assert outage["failback_after"] is None
+
+    def test_both_links_down(self, topology):
+        report = run(topology, [Outage("eth0", 60, 200), Outage("vmbr3", 50, 120)])
+        primary = report["outages"][1]
+        assert primary["gateway"] == "uplink-eth0"
+        # the backup returns at 120 s, but is only used again once its monitor marks it up
+        assert 60 < primary["recovered_after"] < 140
+        assert primary["failed_over_to"] == "uplink-eth1"
+
+    def test_kill_states_on_failback(self, topology):
+        outages = [Outage("eth0", 60, 200)]
+        kept = run(topology, outages)
+        killed = run(topology, outages, kill_states=True)
+        assert kept["sessions_killed"] == 0 and killed["sessions_killed"] > 0
+        assert killed["sessions_dropped"] > kept["sessions_dropped"]
+
+    def test_unknown_target(self, topology):
+        with pytest.raises(TopologyError):
+            run(topology, [Outage("vmbr1", 10, 20)])
+
+
+class TestMonitor:
+    """Test the probe-loss alarm model."""
+
+    def test_false_alarms_from_short_windows(self):
+        rng = np.random.default_rng(0)
+        jumpy = monitor_gateway(GatewayMonitor(interval=2.0, time_period=10.0), [], 3600, 0.03, rng)
+        steady = monitor_gateway(GatewayMonitor(), [], 3600, 0.03, rng)
+        assert any(not up for _, up in jumpy)
+        assert steady == []
+
+    def test_site_trigger_interval(self, site):
+        config = copy.deepcopy(site)
+        config["site"]["wan_trigger_interval"] = "500"
+        assert GatewayMonitor.from_site(config).interval == 0.5
+        with pytest.raises(ValueError):
+            GatewayMonitor(time_period=1.0).validate()
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the network simulator firewall policy and flow simulator.
+"""
+
+from pathlib import Path
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from network_sim.flows import FirewallModel, FlowSimulator, Scenario, generate_flows, simulate  # noqa: E402
+from network_sim.policy import FirewallPolicy, PolicyError  # noqa: E402
+from network_sim.topology import load_site  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+def ip(address):
+    a, b, c, d = (int(octet) for octet in address.split('.'))
+    return (a << 24) | (b << 16) | (c << 8) | d
+
+
+@pytest.fixture
+def topology():
+    return load_site(EXAMPLE_SITE)
+
+
+@pytest.fixture
+def policy():
+    import yaml
+    with open(EXAMPLE_SITE) as f:
+        return FirewallPolicy.from_site(yaml.safe_load(f))
+
+
+class TestFirewallPolicy:
+    """Test first-match rule evaluation."""
+
+    def test_site_rules(self, policy):
+        src = np.array([ip('10.99.10.5'), ip('10.99.30.5'), ip('10.99.40.5'), ip('10.99.40.5'), ip('10.99.30.5')],
+                       dtype=np.uint32)
+        dst = np.array([ip('8.8.8.8'), ip('10.99.10.5'), ip('8.8.8.8'), ip('10.99.10.5'), ip('8.8.8.8')],
+                       dtype=np.uint32)
+        assert policy.evaluate(src, dst).tolist() == [True, False, True, False, False]
+        assert policy.match(src, dst).tolist() == [0, 1, 2, -1, -1]
+
+    def test_protocol_and_ports(self):
+        policy = FirewallPolicy([{'source': 'any', 'destination': '10.0.0.5', 'protocol': 'tcp',
+                                  'port': '8000-8100', 'action': 'allow'}])
+        dst = np.full(3, ip('10.0.0.5'), dtype=np.uint32)
+        allowed = policy.evaluate(np.zeros(3, dtype=np.uint32), dst, np.array([6, 6, 17], dtype=np.uint8),
+                                  np.array([8080, 22, 8080], dtype=np.uint16))
+        assert allowed.tolist() == [True, False, False]
+
+    def test_large_rule_indices(self):
+        rules = [{'source': '10.0.0.1', 'destination': 'any', 'action': 'block'}] * 40000
+        policy = FirewallPolicy(rules + [{'source': 'any', 'destination': 'any', 'action': 'allow'}])
+        src = np.array([ip('10.0.0.1'), ip('10.0.0.2')], dtype=np.uint32)
+        assert policy.match(src, src, rules=[40000]).tolist() == [40000, 40000]
+
+    def test_invalid_rules(self):
+        with pytest.raises(PolicyError):
+            FirewallPolicy([{'source': '10.x.10.0/24', 'destination': 'any'}])
+        with pytest.raises(PolicyError):
+            FirewallPolicy([{'source': 'any', 'destination': 'any', 'protocol': 'sctp'}])
+        for port in ('70000', '0-70000', '-1', '443-80'):
+            with pytest.raises(PolicyError):
+                FirewallPolicy([{'source': 'any', 'destination': 'any', 'port': port}])
+
+
+class TestFlowSimulator:
+    """Test load accounting through the topology."""
+
+    def test_cameras_on_camera_vlan_stay_off_firewall(self, topology, policy):
+        report = simulate(topology, policy, Scenario(iot_devices=0, guest_clients=0))
+        assert report['bridges']['vmbr2']['bps'] == pytest.approx(20 * 16e6)
+        assert report['firewall']['bps'] == 0
+        assert report['firewall']['keeps_up']
+
+    def test_cameras_routed_to_nvr_on_main_vlan(self, topology):
+        policy = FirewallPolicy([{'source': '10.99.20.0/24', 'destination': '10.99.10.50', 'action': 'allow'}])
+        report = simulate(topology, policy, Scenario(nvr='10.99.10.50', iot_devices=0, guest_clients=0),
+                          FirewallModel(cores=4))
+        assert report['firewall']['bps'] == pytest.approx(20 * 16e6)
+        assert report['vlans']['10']['bps'] == pytest.approx(20 * 16e6)
+        assert report['firewall']['utilization'] < 0.1
+
+    def test_policy_drops(self, topology, policy):
+        report = simulate(topology, policy, Scenario(cameras=0, guest_clients=0))
+        assert report['vlans']['30']['blocked_flows'] == 30 * 4 + 30
+        assert report['classes']['iot_lateral']['blocked_flows'] == 30
+        assert report['bridges']['vmbr1']['blocked_flows'] == 150
+
+    def test_overload(self, topology, policy):
+        report = simulate(topology, policy, Scenario(cameras=0, iot_devices=0, guest_clients=40),
+                          FirewallModel(cores=1, pps_per_core=100_000))
+        assert not report['firewall']['keeps_up']
+        assert report['bridges']['vmbr0']['utilization'] > 1
+        assert report['bridges']['vmbr0']['dropped_bps'] > 0
+
+    def test_repeat_reports_per_interval(self, topology, policy):
+        flows = generate_flows(topology, Scenario())
+        single = FlowSimulator(topology, policy).run(flows).report()
+        repeated = FlowSimulator(topology, policy).run(np.tile(flows, 50), intervals=50).report()
+        assert repeated['flows'] == 50 * single['flows']
+        assert repeated['firewall']['bps'] == pytest.approx(single['firewall']['bps'])
+        assert repeated['bridges']['vmbr1']['flows'] == single['bridges']['vmbr1']['flows']
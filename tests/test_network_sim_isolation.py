@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the network simulator VLAN isolation analysis.
+"""
+
+import copy
+import random
+import time
+from pathlib import Path
+
+import pytest
+import yaml
+
+np = pytest.importorskip("numpy")
+
+from network_sim.isolation import IsolationAnalysis, IsolationError, allowed_space  # noqa: E402
+from network_sim.policy import FirewallPolicy  # noqa: E402
+from network_sim.topology import Topology  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+@pytest.fixture(scope="module")
+def site():
+    with open(EXAMPLE_SITE) as f:
+        return yaml.safe_load(f)
+
+
+def analysis_for(site, rules=None):
+    config = copy.deepcopy(site)
+    if rules is not None:
+        config["site"]["security"]["firewall"]["rules"] = rules
+    return IsolationAnalysis(Topology.from_site(config), FirewallPolicy.from_site(config))
+
+
+def subnet(vlan):
+    first = (10 << 24) | (99 << 16) | (vlan << 8)
+    return [(first, first + 255)]
+
+
+class TestIsolationAnalysis:
+    """Test proofs over the example site."""
+
+    def test_example_site_properties(self, site):
+        analysis = analysis_for(site)
+        assert analysis.check("iot !-> main").holds
+        assert analysis.check("guest -> only internet").holds
+        assert analysis.check("40 -> wan").holds
+
+        main_to_iot = analysis.check("main -> iot")
+        assert main_to_iot.holds
+        assert main_to_iot.reaches[0].via == "firewall"
+        assert main_to_iot.reaches[0].rules == ["Allow LAN to WAN"]
+
+        iot_out = analysis.check("iot -> internet")
+        assert not iot_out.holds
+        assert iot_out.reaches[0].witness is None
+
+    def test_only_reports_violations(self, site):
+        result = analysis_for(site).check("main -> only internet")
+        assert not result.holds
+        assert {reach.destination for reach in result.reaches} == {"cameras", "iot", "guest", "management"}
+
+    def test_exact_services(self, site):
+        rules = [{"name": "MQTT", "source": "10.99.30.0/24", "destination": "10.99.10.5", "protocol": "tcp",
+                  "port": "1883", "action": "allow"},
+                 {"name": "Block host", "source": "10.99.30.7", "destination": "any", "action": "deny"},
+                 {"name": "DNS", "source": "10.99.30.0/24", "destination": "10.99.10.0/24", "protocol": "udp",
+                  "port": "53", "action": "allow"}]
+        reach = analysis_for(site, rules).reach("iot", "main")
+        assert reach.services == {"tcp": ["1883"], "udp": ["53"]}
+        assert reach.witness["port"] in (1883, 53)
+        assert reach.rules == ["DNS", "MQTT"]
+
+    def test_agrees_with_sampling(self):
+        rng = random.Random(4)
+        rules = [{"name": f"r{index}", "source": f"10.99.30.{rng.randrange(0, 256, 32)}/27",
+                  "destination": f"10.99.10.{rng.randrange(0, 256, 16)}/28",
+                  "protocol": rng.choice(["tcp", "udp", "any"]), "port": str(rng.randrange(1, 2000)),
+                  "action": rng.choice(["allow", "deny"])} for index in range(40)]
+        policy = FirewallPolicy(rules)
+        space = allowed_space(policy, subnet(30), subnet(10))
+
+        generator = np.random.default_rng(4)
+        count = 200_000
+        src = generator.integers(subnet(30)[0][0], subnet(30)[0][1] + 1, count).astype(np.uint32)
+        dst = generator.integers(subnet(10)[0][0], subnet(10)[0][1] + 1, count).astype(np.uint32)
+        protocol = generator.choice([1, 6, 17], count).astype(np.uint8)
+        port = np.where(protocol == 1, 0, generator.integers(1, 2000, count)).astype(np.uint16)
+        allowed = policy.evaluate(src, dst, protocol, port)
+        sampled = {({1: "icmp", 6: "tcp", 17: "udp"}[p], int(q)) for p, q in zip(protocol[allowed], port[allowed])}
+        for name, value in sampled:
+            ranges = space["services"][name]
+            assert ranges == ["any"] or any(
+                int(text.split("-")[0]) <= value <= int(text.split("-")[-1]) for text in ranges)
+
+    def test_no_path_without_firewall(self, site):
+        analysis = analysis_for(site)
+        analysis.topology.set_disabled(["opnsense"])
+        reach = analysis.reach("main", "iot")
+        assert (reach.via, reach.allowed) == (None, False)
+
+    def test_large_ruleset_under_a_second(self, site):
+        rng = random.Random(1)
+        rules = [{"name": f"r{index}",
+                  "source": f"10.99.{rng.choice([10, 20, 30, 40, 50])}.{rng.randrange(0, 256, 16)}/28",
+                  "destination": f"10.99.{rng.choice([10, 20, 30, 40, 50])}.{rng.randrange(0, 256, 8)}/29",
+                  "protocol": rng.choice(["tcp", "udp", "any"]), "port": str(rng.randrange(1, 60000)),
+                  "action": rng.choice(["allow", "deny"])} for index in range(300)]
+        start = time.perf_counter()
+        analysis_for(site, rules).matrix()
+        assert time.perf_counter() - start < 1.0
+
+    def test_invalid_assertions(self, site):
+        analysis = analysis_for(site)
+        with pytest.raises(IsolationError):
+            analysis.check("iot !-> nowhere")
+        with pytest.raises(IsolationError):
+            analysis.check("iot !-> only main")
+        with pytest.raises(IsolationError):
+            analysis.check("iot main")
@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Unit tests for network simulator capture replay.
+"""
+
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from network_sim.pcap import CaptureError, PcapReplay, iter_packets, parse_packet  # noqa: E402
+from network_sim.policy import FirewallPolicy, policy_from_config  # noqa: E402
+from network_sim.topology import load_site  # noqa: E402
+from pcap_helpers import ACK, SYN, ethernet, write_pcap, write_pcapng  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+@pytest.fixture
+def site():
+    import yaml
+    with open(EXAMPLE_SITE) as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture
+def packets():
+    return [
+        ethernet('10.99.10.5', '93.184.216.34', 50000, 443),
+        ethernet('93.184.216.34', '10.99.10.5', 443, 50000, flags=SYN | ACK),     # same flow
+        ethernet('10.99.30.7', '10.99.10.5', 40000, 445),                          # IoT to LAN: blocked
+        ethernet('10.99.10.5', '10.99.30.7', 443, 40001, flags=ACK),               # mid-stream reply
+        ethernet('10.99.40.9', '8.8.8.8', 53000, 53, protocol=17, vlan=40),
+        ethernet('10.99.40.9', '10.99.50.2', 53001, 22),                           # guest to mgmt: default deny
+        ethernet('10.99.20.5', '10.99.20.100', 41000, 554),                        # switched on camera VLAN
+        ethernet('10.99.20.5', '10.99.10.5', 0, 0, fragment=0x10),                 # non-first fragment
+        b'\x00' * 12 + b'\x86\xdd' + b'\x00' * 40,                                 # IPv6
+    ]
+
+
+class TestCaptureParsing:
+    """Test pcap and pcapng decoding."""
+
+    @pytest.mark.parametrize('writer', [write_pcap, write_pcapng])
+    def test_formats(self, tmp_path, packets, writer):
+        path = tmp_path / 'capture'
+        writer(path, packets)
+        data = path.read_bytes()
+        parsed = [parse_packet(data, *record) for record in iter_packets(data)]
+        assert parsed[0] == (6, 0x0A630A05, 50000, 0x5DB8D822, 443, SYN)
+        assert parsed[4][:5] == (17, 0x0A632809, 53000, 0x08080808, 53)
+        assert parsed[-2:] == ['fragment', 'ipv6']
+
+    def test_not_a_capture(self, tmp_path):
+        path = tmp_path / 'bogus.pcap'
+        path.write_bytes(b'x' * 64)
+        with pytest.raises(CaptureError):
+            PcapReplay(load_site(EXAMPLE_SITE), FirewallPolicy([])).replay(str(path))
+
+
+class TestPcapReplay:
+    """Test flow tracking and policy evaluation over a capture."""
+
+    def test_report(self, tmp_path, site, packets):
+        path = tmp_path / 'capture.pcap'
+        write_pcap(path, packets)
+        report = PcapReplay(load_site(EXAMPLE_SITE), FirewallPolicy.from_site(site)).replay(str(path)).report()
+
+        assert report['packets'] == len(packets)
+        assert report['flows'] == 6
+        assert report['skipped']['fragment'] == 1 and report['skipped']['ipv6'] == 1
+        classes = report['classes']
+        assert classes['main->internet']['allowed'] == 1
+        assert classes['main->internet']['rules'] == {'Allow LAN to WAN': 1}
+        # The mid-stream reply is oriented back to the IoT client, so both flows are IoT -> LAN
+        assert classes['iot->main']['flows'] == classes['iot->main']['blocked'] == 2
+        assert classes['iot->main']['rules'] == {'Block IoT to LAN': 2}
+        assert classes['guest->internet']['allowed'] == 1
+        assert classes['guest->management']['rules'] == {'default policy': 1}
+        assert classes['cameras->cameras']['switched'] == 1
+
+    def test_proposed_policy(self, tmp_path, site, packets):
+        path = tmp_path / 'capture.pcapng'
+        write_pcapng(path, packets)
+        rules = site['site']['security']['firewall']['rules']
+        proposed = policy_from_config({'rules': [{'name': 'Guest SSH to mgmt', 'source': '10.99.40.0/24',
+                                                  'destination': '10.99.50.0/24', 'protocol': 'tcp',
+                                                  'port': 22, 'action': 'allow'}] + rules[1:]})
+        report = PcapReplay(load_site(EXAMPLE_SITE), FirewallPolicy.from_site(site), proposed) \
+            .replay(str(path)).report()
+
+        assert report['classes']['guest->management']['newly_allowed'] == 1
+        assert report['classes']['main->internet']['newly_blocked'] == 1
+        assert report['classes']['main->internet']['changed_examples'] == [
+            '10.99.10.5:50000 -> 93.184.216.34:443/tcp now blocked']
+
+    def test_bounded_flow_table(self, tmp_path, site):
+        path = tmp_path / 'many.pcap'
+        write_pcap(path, [ethernet('10.99.10.5', '1.1.1.1', 10000 + n % 100, 443) for n in range(1000)])
+        replay = PcapReplay(load_site(EXAMPLE_SITE), FirewallPolicy.from_site(site), max_flows=10, batch_size=7)
+        report = replay.replay(str(path)).report()
+        assert len(replay._table) == 10
+        assert report['flows'] == 1000 and report['evicted'] == 990
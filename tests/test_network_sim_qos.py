@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the network simulator traffic shaping model.
+"""
+
+from pathlib import Path
+
+import pytest
+import yaml
+
+np = pytest.importorskip("numpy")
+
+from network_sim.qos import (  # noqa: E402
+    Load, Shaper, ShaperSimulation, TrafficClass, _water_fill, load_classes, site_link,
+)
+from network_sim.topology import Topology, TopologyError  # noqa: E402
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+@pytest.fixture(scope="module")
+def topology():
+    with open(EXAMPLE_SITE) as f:
+        return Topology.from_site(yaml.safe_load(f))
+
+
+def constant(name, vlan, bps, **shaper):
+    return TrafficClass(name, vlan=vlan, shaper=Shaper(**shaper), load=Load(1, bps))
+
+
+class TestConfiguration:
+    """Test links and class settings."""
+
+    def test_links(self, topology):
+        assert site_link(topology, "eth0").capacity_bps == 2.5e9
+        lan = site_link(topology, "vmbr1")
+        assert (lan.interface, lan.capacity_bps) == ("eth2", 10e9)
+        with pytest.raises(TopologyError):
+            site_link(topology, "opnsense")
+
+    def test_load_classes(self):
+        classes = {c.name: c for c in load_classes({"classes": {
+            "guest": {"rate": "300mbit", "burst": "512k", "load": {"peak": "20m"}},
+            "iot": None,
+            "backup": {"vlan": "management", "weight": 2},
+        }})}
+        assert set(classes) == {"cameras", "guest", "main", "backup"}
+        assert classes["guest"].shaper.rate_bps == 300e6
+        assert classes["guest"].shaper.burst_bytes == 512 * 1024
+        assert classes["guest"].load.peak_bps == 20e6
+        assert classes["backup"].shaper.weight == 2.0
+        for config in ({"classes": {"guest": {"colour": "red"}}}, "x", {"classes": "x"}, {"classes": ["guest"]},
+                       {"classes": {"guest": "fast"}}, {"classes": {"guest": {"load": 5}}},
+                       {"classes": {"guest": {"weight": [1]}}}):
+            with pytest.raises(ValueError):
+                load_classes(config)
+
+    def test_classes_off_the_link(self, topology):
+        simulation = ShaperSimulation(topology, "vmbr1")
+        assert simulation.bypassing == ["cameras"]
+
+    def test_slot_and_duration_must_be_positive(self, topology):
+        with pytest.raises(ValueError):
+            ShaperSimulation(topology, "eth0", slot=0)
+        with pytest.raises(ValueError):
+            ShaperSimulation(topology, "eth0").run(seconds=0)
+
+
+class TestShaping:
+    """Test token buckets, fair queueing and the FIFO baseline."""
+
+    def test_water_fill(self):
+        served = _water_fill(10.0, np.array([1.0, 100.0, 100.0]), np.array([1.0, 3.0, 1.0]))
+        assert served.tolist() == pytest.approx([1.0, 6.75, 2.25])
+
+    def test_weighted_share_under_contention(self, topology):
+        classes = [constant("main", "main", 3e9, weight=3), constant("guest", "guest", 3e9, weight=1)]
+        report = ShaperSimulation(topology, "eth0", classes).run(seconds=1)
+        main, guest = report["classes"]["main"], report["classes"]["guest"]
+        assert report["utilization"] == pytest.approx(1.0, abs=1e-3)
+        assert main["throughput_bps"] / guest["throughput_bps"] == pytest.approx(3.0, rel=0.01)
+
+    def test_token_bucket_rate(self, topology):
+        classes = [constant("guest", "guest", 1e9, rate_bps=100e6, burst_bytes=125_000)]
+        report = ShaperSimulation(topology, "eth0", classes).run(seconds=2)
+        # the initial burst adds 1 Mbit over two seconds
+        assert report["classes"]["guest"]["throughput_bps"] == pytest.approx(100.5e6, rel=0.01)
+        assert report["classes"]["guest"]["loss"] > 0.8
+
+    def test_fair_queueing_protects_cameras(self, topology):
+        fifo = ShaperSimulation(topology, "eth0", scheduler="fifo").run(seconds=5, seed=1)
+        wfq = ShaperSimulation(topology, "eth0").run(seconds=5, seed=1)
+        assert fifo["classes"]["cameras"]["loss"] > 0
+        assert wfq["classes"]["cameras"]["loss"] == 0
+        assert wfq["classes"]["cameras"]["latency_ms"]["p99"] < fifo["classes"]["cameras"]["latency_ms"]["p99"]
+
+    def test_latency_targets(self, topology):
+        classes = [constant("main", "main", 3e9, latency_target_ms=1),
+                   constant("iot", "iot", 1e6, weight=10, latency_target_ms=1)]
+        report = ShaperSimulation(topology, "eth0", classes).run(seconds=1)
+        assert report["classes"]["main"]["latency_ms"]["p99"] > 1
+        assert [report["classes"][name]["meets_target"] for name in ("main", "iot")] == [False, True]
+        assert not report["meets_targets"]
+
+    def test_ten_gig_trunk_has_headroom(self, topology):
+        report = ShaperSimulation(topology, "eth2").run(seconds=2)
+        assert all(entry["loss"] == 0 for entry in report["classes"].values())
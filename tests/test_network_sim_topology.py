@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the network simulator topology model.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from network_sim.topology import TopologyError, build_topology, load_site
+
+PROJECT_ROOT = Path(__file__).parent.parent
+
+
+@pytest.fixture
+def topology():
+    return load_site(PROJECT_ROOT / "docker-test-framework" / "example-site.yml")
+
+
+class TestSiteTopology:
+    """Test graph construction, L2 domains and routed paths."""
+
+    def test_vlan_domains(self, topology):
+        domains = {domain.name: domain for domain in topology.domains}
+        assert domains['vmbr1.10'].vlan == 10
+        assert str(domains['vmbr1.10'].subnet) == '10.99.10.0/24'
+        assert 'tailscale:net0' in domains['vmbr1.50'].members
+        # The two WANs are separate segments joined only through the internet
+        assert topology.domain_of('vmbr0').id != topology.domain_of('vmbr3').id
+
+    def test_lan_to_internet(self, topology):
+        path = topology.path('10.99.10.100', '8.8.8.8')
+        assert path.domains == ('vmbr1.10', 'vmbr0', 'internet')
+        assert path.routers == ('opnsense', 'uplink-eth0')
+        assert path.nodes[-3:] == ('eth0', 'uplink-eth0', 'internet')
+
+    def test_inter_vlan_goes_through_firewall(self, topology):
+        path = topology.path('tailscale', '10.99.10.1')
+        assert path.nodes[0] == 'tailscale:net0'
+        assert path.routers == ('opnsense',)
+
+    def test_same_vlan_is_switched(self, topology):
+        path = topology.path('10.99.20.7', '10.99.20.9')
+        assert path.routers == ()
+        assert path.domains == ('vmbr2.20',)
+
+    def test_wan_failover(self, topology):
+        topology.set_disabled(['eth0'])
+        path = topology.path('10.99.10.100', '8.8.8.8')
+        assert path.routers == ('opnsense', 'uplink-eth1')
+
+        topology.set_disabled(['eth0', 'eth1'])
+        assert topology.path('10.99.10.100', '8.8.8.8') is None
+
+        topology.set_disabled([])
+        assert topology.path('10.99.10.100', '8.8.8.8').routers == ('opnsense', 'uplink-eth0')
+
+    def test_to_dict(self, topology):
+        data = topology.to_dict()
+        assert data['site'] == topology.name
+        assert 'vmbr1.50' in data['routers']['opnsense']
+        assert {node['kind'] for node in data['nodes']} >= {'interface', 'bridge', 'vm', 'nic', 'uplink', 'internet'}
+
+    def test_to_dict_with_disabled_nodes(self, topology):
+        for name in ['internet', 'uplink-eth0', 'uplink-eth1', 'vmbr1', 'vmbr2'] + [f'opnsense:net{n}' for n in range(4)]:
+            topology.set_disabled([name])
+            assert 'opnsense' in topology.to_dict()['routers']
+        topology.set_disabled(['vmbr1'])
+        assert not any(domain.startswith('vmbr1') for domain in topology.to_dict()['routers']['opnsense'])
+
+
+class TestLegacyTopology:
+    """Test the {networks, devices} format used by the integration tests."""
+
+    def test_networks_and_devices(self):
+        topology = build_topology({
+            'networks': [{'name': 'wan', 'subnet': '192.168.1.0/24'},
+                         {'name': 'lan', 'subnet': '10.1.10.0/24'},
+                         {'name': 'mgmt', 'subnet': '10.1.50.0/24'}],
+            'devices': [{'name': 'fw', 'type': 'firewall',
+                         'interfaces': [{'network': 'wan', 'ip': '192.168.1.1'},
+                                        {'network': 'lan', 'ip': '10.1.10.1'},
+                                        {'network': 'mgmt', 'ip': '10.1.50.1'}]},
+                        {'name': 'ts', 'type': 'vm', 'interfaces': [{'network': 'mgmt', 'ip': '10.1.50.5'}]}],
+        })
+        assert topology.path('10.1.10.100', '8.8.8.8').domains == ('lan', 'wan', 'internet')
+        path = topology.path('10.1.50.5', '10.1.10.1')
+        assert path.nodes == ('ts:mgmt', 'mgmt', 'fw:mgmt', 'fw', 'fw:lan')
+
+    def test_invalid_config(self):
+        with pytest.raises(TopologyError):
+            build_topology(['not', 'a', 'site'])
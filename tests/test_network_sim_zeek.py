@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the network simulator Zeek log generator and consumer.
+"""
+
+import json
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("numpy")
+
+from network_sim.topology import load_site  # noqa: E402
+from network_sim.zeek import (  # noqa: E402
+    CONN_FIELDS, TopK, ZeekLogConsumer, ZeekLogGenerator, generate, retention_settings, simulate_sizing, sizing,
+)
+
+PROJECT_ROOT = Path(__file__).parent.parent
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+@pytest.fixture
+def generator():
+    return ZeekLogGenerator(load_site(EXAMPLE_SITE), {'conn': 200, 'dns': 50, 'notice': 2}, seed=1, start=1.7e9)
+
+
+class TestZeekLogGenerator:
+    """Test record generation."""
+
+    def test_rates_and_fields(self, generator):
+        batches = [generator.advance(1.0) for _ in range(20)]
+        conn = [record for batch in batches for record in batch['conn']]
+        assert 3600 < len(conn) < 4400
+        assert list(conn[0]) == CONN_FIELDS
+        assert all(1.7e9 <= record['ts'] < 1.7e9 + 20 for record in conn)
+        assert [record['ts'] for record in batches[0]['conn']] == sorted(record['ts'] for record in batches[0]['conn'])
+        assert all(record['id.orig_h'].startswith('10.99.') for record in conn)
+        assert all(record['id.resp_h'].endswith('.1') for batch in batches for record in batch['dns'])
+
+    @pytest.mark.parametrize('fmt', ['json', 'tsv'])
+    def test_files_round_trip(self, tmp_path, generator, fmt):
+        written = generate(generator, 5, str(tmp_path), fmt)
+        consumer = ZeekLogConsumer()
+        for log in ('conn', 'dns', 'notice'):
+            consumer.consume_file(str(tmp_path / f"{log}.log"))
+        report = consumer.report()
+        assert report['errors'] == 0
+        assert {log: stats['records'] for log, stats in report['logs'].items()} == \
+            {log: count for log, count in written.items() if count}
+        if fmt == 'tsv':
+            assert (tmp_path / 'conn.log').read_text().startswith('#separator \\x09\n')
+
+
+class TestZeekLogConsumer:
+    """Test incremental aggregation and sizing."""
+
+    def test_aggregates(self):
+        lines = [json.dumps({'_path': 'dns', 'ts': 100.0 + n / 10, 'query': 'a.example' if n % 3 else 'b.example',
+                             'qtype_name': 'A', 'rcode_name': 'NOERROR'}) for n in range(30)]
+        report = ZeekLogConsumer().consume(lines + ['not json']).report()
+        dns = report['logs']['dns']
+        assert report['errors'] == 1
+        assert dns['records'] == 30 and dns['peak_per_second'] == 10
+        assert dns['counts']['rcode'] == {'NOERROR': 30}
+        assert dns['top']['queries'][0] == ['a.example', 20.0]
+        assert 0 < dns['compression_ratio'] < 1
+
+    def test_top_k_is_bounded(self):
+        top = TopK(capacity=10)
+        for n in range(10000):
+            top.add('heavy' if n % 2 else f"key{n}")
+        assert len(top.counts) <= 80
+        assert top.top(1) == [('heavy', 5000.0)]
+
+    def test_sizing(self):
+        report = {'logs': {'conn': {'records_per_second': 100.0, 'peak_per_second': 150, 'bytes_per_record': 400,
+                                    'compression_ratio': 0.1}}}
+        sized = sizing(report, zeek_keep_days=7, retention_days=30, index_factor=1.0,
+                       logstash_eps_per_worker=100.0)
+        day = 100 * 86400 * 400
+        assert sized['bytes_per_day'] == day
+        assert sized['zeek_disk_bytes'] == round(2 * day + 6 * day * 0.1)
+        assert sized['elasticsearch_bytes'] == 30 * day
+        assert sized['logstash']['workers'] == 3
+
+    def test_site_retention(self):
+        import yaml
+        with open(EXAMPLE_SITE) as f:
+            assert retention_settings(yaml.safe_load(f)) == {'zeek_keep_days': 7, 'retention_days': 30}
+        report = simulate_sizing(load_site(EXAMPLE_SITE), seconds=5, rates={'conn': 20, 'dns': 5, 'notice': 0})
+        assert report['sizing']['retention_days'] == 30
+        assert set(report['logs']) == {'conn', 'dns'}
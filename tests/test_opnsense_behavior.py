@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the OPNsense mock port-scan and brute-force detector.
+"""
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from opnsense_mock.behavior import (  # noqa: E402
+    BRUTE_FORCE, PORT_SCAN, BehaviorDetector, attack_flows, synthetic_traffic,
+)
+from network_sim.pcap import iter_connection_events  # noqa: E402
+from pcap_helpers import ACK, SYN, ethernet, write_pcap  # noqa: E402
+
+SCANNER, TARGET = "203.0.113.100", "10.0.1.100"
+
+
+def attempts(count, ports, start=0.0, spacing=0.1, src=0xCB007164):
+    return {
+        "ts": start + np.arange(count) * spacing,
+        "src": np.full(count, src, dtype=np.uint32),
+        "protocol": np.full(count, 6, dtype=np.uint8),
+        "port": np.resize(np.asarray(ports, dtype=np.uint16), count),
+    }
+
+
+class TestBehaviorDetector:
+    """Test window counting and thresholds."""
+
+    def test_port_scan(self):
+        detector = BehaviorDetector(window=60, buckets=6)
+        detections = detector.feed_records(attack_flows("rapid_port_scan", SCANNER, TARGET, start=100.0))
+        assert [(d.alert_type, d.source) for d in detections] == [(PORT_SCAN, SCANNER)]
+        assert detections[0].estimate == 1000
+
+    def test_repeated_ports_are_not_a_scan(self):
+        detector = BehaviorDetector()
+        assert detector.feed(**attempts(5000, [443, 80, 53])) == []
+
+    def test_port_scan_threshold_is_exact(self):
+        rng = np.random.default_rng(0)
+        for run in range(300):
+            detector = BehaviorDetector(port_scan_threshold=25)
+            ports = rng.choice(np.arange(1, 65536), 25, replace=False)
+            assert detector.feed(**attempts(24, ports[:24], src=0xCB007100 + run)) == []
+            detections = detector.feed(**attempts(1, ports[24:], start=3.0, src=0xCB007100 + run))
+            assert [(d.alert_type, d.estimate) for d in detections] == [(PORT_SCAN, 25)]
+
+    def test_large_windows_fall_back_to_hyperloglog(self):
+        detector = BehaviorDetector(exact_pairs=100)
+        detections = detector.feed_records(attack_flows("rapid_port_scan", SCANNER, TARGET, start=100.0))
+        assert detector.pairs[detector.current % detector.buckets] is None
+        assert [d.alert_type for d in detections] == [PORT_SCAN]
+        assert 850 < detections[0].estimate < 1150
+
+    def test_brute_force_threshold(self):
+        detector = BehaviorDetector(brute_force_threshold=20)
+        assert detector.feed(**attempts(19, [22])) == []
+        detections = detector.feed(**attempts(1, [22], start=2.0))
+        assert [d.alert_type for d in detections] == [BRUTE_FORCE]
+        # alerted once per window
+        assert detector.feed(**attempts(30, [22], start=3.0)) == []
+        assert detector.totals == {PORT_SCAN: 0, BRUTE_FORCE: 1}
+
+    def test_attempts_outside_window_expire(self):
+        detector = BehaviorDetector(window=60, buckets=6, brute_force_threshold=20)
+        # one SSH attempt every 5 s: never 20 inside a 60 s window
+        assert detector.feed(**attempts(100, [22], spacing=5.0)) == []
+        assert detector.feed(**attempts(1, [22], start=0.0)) == []
+        assert detector.late == 1
+
+    def test_memory_is_bounded(self):
+        detector = BehaviorDetector()
+        before = detector.memory_bytes
+        records = synthetic_traffic(200_000, sources=100_000, seed=2)
+        for start in range(0, len(records), 50_000):
+            detector.feed_records(records[start:start + 50_000])
+        assert detector.memory_bytes == before
+        flagged = {(d.alert_type, d.source.rsplit(".", 1)[0]) for d in detector.detections}
+        assert flagged == {(PORT_SCAN, "203.0.113"), (BRUTE_FORCE, "203.0.114")}
+
+    def test_json_records(self):
+        detector = BehaviorDetector(port_scan_threshold=10)
+        flows = [{"src": SCANNER, "dport": port, "protocol": "tcp"} for port in range(1, 40)]
+        detections = detector.feed_records(flows, now=50.0)
+        assert [(d.alert_type, d.ts) for d in detections] == [(PORT_SCAN, 50.0)]
+        with pytest.raises(ValueError):
+            detector.feed_records([{"src": SCANNER}])
+
+
+class TestCaptureEvents:
+    """Test detection over connection attempts extracted from a capture."""
+
+    def test_syn_scan_capture(self, tmp_path):
+        packets = [ethernet(SCANNER, TARGET, 40000, port, flags=SYN) for port in range(1, 41)]
+        # replies and retransmissions are not new attempts
+        packets += [ethernet(TARGET, SCANNER, 22, 40000, flags=SYN | ACK),
+                    ethernet(SCANNER, TARGET, 40000, 5, flags=SYN)]
+        capture = tmp_path / "scan.pcap"
+        write_pcap(capture, packets)
+
+        events = np.concatenate(list(iter_connection_events(str(capture), batch_size=16)))
+        assert len(events) == 40
+        assert events["ts"].tolist() == list(range(40))
+        detections = BehaviorDetector().feed_records(events)
+        assert [(d.alert_type, d.source) for d in detections] == [(PORT_SCAN, SCANNER)]
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the OPNsense mock signature IDS engine.
+"""
+
+import pytest
+
+from opnsense_mock.ids import (
+    AhoCorasick, Content, RuleError, SignatureEngine, benchmark, decode_content, detect_attack, load_rules,
+    parse_addresses, parse_ports, parse_rule, synthetic_rules,
+)
+
+EXTERNAL, INTERNAL = "203.0.113.100", "10.0.1.100"
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return SignatureEngine.from_file()
+
+
+class TestRuleParsing:
+    """Test Suricata rule syntax."""
+
+    def test_bundled_ruleset_parses(self, engine):
+        assert len(engine.rules) >= 20
+        assert engine.errors == []
+        assert len({rule.sid for rule in engine.rules}) == len(engine.rules)
+
+    def test_rule_fields(self):
+        rule = parse_rule('alert http $EXTERNAL_NET any -> $HOME_NET $HTTP_PORTS (msg:"Test \\"quoted\\" rule"; '
+                          'content:"User-Agent|3a| x"; nocase; content:!"safe"; classtype:attempted-recon; '
+                          'sid:100; rev:2; metadata:alert_type WEB_SCAN, created_at 2024_01_01;)')
+        assert rule.msg == 'Test "quoted" rule'
+        assert rule.contents == (Content(b"User-Agent: x", True, False), Content(b"safe", False, True))
+        assert (rule.sid, rule.rev, rule.severity, rule.alert_type) == (100, 2, "medium", "WEB_SCAN")
+        assert rule.protocols == frozenset({6})
+
+    def test_address_and_port_groups(self):
+        assert parse_addresses("[10.0.0.0/8,!10.1.0.0/16]") == ((0x0A000000, 0x0A00FFFF), (0x0A020000, 0x0AFFFFFF))
+        assert parse_addresses("!$HOME_NET", {"HOME_NET": "10.0.0.0/8"}) == ((0, 0x09FFFFFF), (0x0B000000, 2 ** 32 - 1))
+        assert parse_ports("[1:1024,!22]") == ((1, 21), (23, 1024))
+        assert parse_ports("8000:") == ((8000, 65535),)
+
+    def test_hex_content(self):
+        assert decode_content('"|0d 0a|GET|3b|"') == b"\r\nGET;"
+
+    def test_errors(self):
+        with pytest.raises(RuleError):
+            parse_rule('alert tcp any any -> any any (msg:"no sid";)')
+        with pytest.raises(RuleError):
+            parse_rule('alert tcp $NOPE any -> any any (sid:1;)')
+        rules, errors = load_rules(['# alert tcp any any -> any any (sid:1;)', 'garbage',
+                                    'alert tcp any any -> any any (sid:2;)'])
+        assert [rule.sid for rule in rules] == [2]
+        assert len(errors) == 1 and errors[0].startswith("line 2")
+
+
+class TestAhoCorasick:
+    """Test the multi-pattern automaton."""
+
+    def test_overlapping_patterns(self):
+        automaton = AhoCorasick([Content(b"he", True, False), Content(b"she", True, False),
+                                 Content(b"hers", True, False), Content(b"His", False, False)])
+        assert automaton.search(b"uSHErs") == {0, 1, 2}
+        assert automaton.search(b"this") == set()
+        assert automaton.search(b"His") == {3}
+
+    def test_matches_naive_search(self):
+        engine = SignatureEngine(synthetic_rules(200, seed=3))
+        for payload in [b"x" * 64, b"GET /" + engine.rules[7].contents[0].pattern.upper() + b" HTTP/1.1"]:
+            expected = {index for index, content in enumerate(engine.automaton.patterns)
+                        if content.pattern.lower() in payload.lower()}
+            assert engine.automaton.search(payload) == expected
+
+
+class TestSignatureEngine:
+    """Test inspection against the bundled ET subset."""
+
+    def test_header_filters(self, engine):
+        payload = b"GET /search?q=<script>alert(1)</script>"
+        assert [alert.alert_type for alert in engine.alerts(payload, "tcp", EXTERNAL, 40000, INTERNAL, 80)] == ["XSS"]
+        assert engine.alerts(payload, "tcp", EXTERNAL, 40000, INTERNAL, 22) == []
+        assert engine.alerts(payload, "udp", EXTERNAL, 40000, INTERNAL, 80) == []
+        assert engine.alerts(payload, "tcp", INTERNAL, 40000, "10.0.2.5", 80) == []
+
+    def test_case_and_negated_content(self, engine):
+        assert engine.alerts(b"SSH-2.0-LIBSSH", "tcp", EXTERNAL, 5000, INTERNAL, 22) == []
+        assert engine.alerts(b"SSH-2.0-libssh_0.9.6", "tcp", EXTERNAL, 5000, INTERNAL, 22)
+        assert engine.alerts(b"JOIN #bots", "tcp", INTERNAL, 5000, "198.51.100.7", 6667)
+        assert engine.alerts(b"JOIN #bots PRIVMSG", "tcp", INTERNAL, 5000, "198.51.100.7", 6667) == []
+
+    def test_report_counts_matches(self):
+        engine = SignatureEngine.from_file()
+        for _ in range(3):
+            engine.inspect(b"id=1' OR '1'='1 UNION SELECT", 6, None, None, None, None)
+        report = engine.report()
+        assert (report["packets"], report["matches"]) == (3, 6)
+        assert report["matches_per_second"] > 0
+
+    def test_benchmark_scales_ruleset(self):
+        results = benchmark([30, 300], packets=50, payload_size=128)
+        assert [result["rules"] for result in results] == [30, 300]
+        assert results[1]["automaton_states"] > results[0]["automaton_states"]
+
+
+class TestDetectionEndpoint:
+    """Test the ids/test-detection response."""
+
+    def test_sql_injection(self, engine):
+        response = detect_attack({"attack_type": "' OR '1'='1", "source": EXTERNAL, "destination": INTERNAL}, engine)
+        assert response["status"] == "detected"
+        assert response["alert_type"] == "SQL_INJECTION"
+        assert response["severity"] == "high"
+        assert response["rule_id"] == "SID:2010963"
+
+    def test_clean_payload(self, engine):
+        response = detect_attack({"attack_type": "hello world", "source": EXTERNAL, "destination": INTERNAL}, engine)
+        assert (response["status"], response["alert_type"], response["alerts"]) == ("clean", "UNKNOWN_ATTACK", [])
+
+    @pytest.mark.parametrize("attack_type, expected", [("rapid_port_scan", "PORT_SCAN"),
+                                                       ("ssh_brute_force", "BRUTE_FORCE")])
+    def test_behavioural_attacks(self, engine, attack_type, expected):
+        pytest.importorskip("numpy")
+        response = detect_attack({"attack_type": attack_type, "source": EXTERNAL, "destination": INTERNAL}, engine)
+        assert (response["status"], response["alert_type"], response["alerts"]) == ("detected", expected, [])
+        assert response["detections"][0]["source"] == EXTERNAL
+
+    def test_non_ipv4_endpoints_skip_replay(self, engine):
+        for source in ("attacker", "2001:db8::1"):
+            response = detect_attack({"attack_type": "rapid_port_scan", "source": source, "destination": INTERNAL},
+                                     engine)
+            assert (response["status"], response["detections"]) == ("clean", [])
+
+    def test_invalid_fields(self, engine):
+        for field, value in [("payload", 123), ("dst_port", "http"), ("dst_port", 70000), ("src_port", [80]),
+                             ("protocol", ["tcp"])]:
+            with pytest.raises(ValueError):
+                detect_attack({"payload": "x", field: value, "source": EXTERNAL, "destination": INTERNAL}, engine)
+
+    def test_string_ports(self, engine):
+        request = {"payload": "' OR '1'='1", "source": EXTERNAL, "destination": INTERNAL, "dst_port": "80",
+                   "protocol": 6}
+        assert detect_attack(request, engine)["alert_type"] == "SQL_INJECTION"
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the test runner's concurrent service readiness waiter.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "docker-test-framework" / "test-runner"))
+
+import readiness  # noqa: E402
+from readiness import backoff_delay, wait_for_services  # noqa: E402
+
+
+class FakeClock:
+    """Stands in for the time module: sleeping only advances the clock"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+def healthy_after(attempts):
+    """Probe that fails until its ``attempts``-th call for each URL"""
+    counts = {}
+    lock = threading.Lock()
+
+    def probe(url):
+        with lock:
+            counts[url] = counts.get(url, 0) + 1
+            ready = counts[url] >= attempts.get(url, 1)
+        return (True, None) if ready else (False, "connection refused")
+    return probe
+
+
+class TestBackoff:
+    """Test exponential backoff with full jitter."""
+
+    def test_delay_is_capped_and_jittered(self):
+        for attempt, cap in [(0, 0.1), (2, 0.4), (4, 1.6), (10, 2.0)]:
+            delays = [backoff_delay(attempt, 0.1, 2.0) for _ in range(200)]
+            assert all(0 <= delay <= cap for delay in delays)
+            assert len(set(delays)) > 1
+
+    def test_sleeps_grow_until_max_delay(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(readiness, "time", clock)
+        monkeypatch.setattr(readiness.random, "uniform", lambda low, high: high)
+
+        probe = healthy_after({"http://proxmox/health": 6})
+        statuses = wait_for_services([("proxmox", "http://proxmox/health")], timeout=60,
+                                     initial_delay=0.5, max_delay=4.0, probe=probe)
+
+        assert clock.sleeps == [0.5, 1.0, 2.0, 4.0, 4.0]
+        assert statuses["proxmox"].time_to_ready == pytest.approx(11.5)
+
+
+class TestWaitForServices:
+    """Test waiting on several services at once."""
+
+    def test_ready_services(self, monkeypatch):
+        monkeypatch.setattr(readiness, "time", FakeClock())
+        statuses = wait_for_services([("proxmox", "http://proxmox/health")],
+                                     probe=healthy_after({"http://proxmox/health": 3}))
+
+        status = statuses["proxmox"]
+        assert (status.ready, status.attempts, status.last_error) == (True, 3, None)
+        assert status.to_dict()["url"] == "http://proxmox/health"
+
+    def test_timeout_keeps_last_error(self, monkeypatch):
+        clock = FakeClock()
+        monkeypatch.setattr(readiness, "time", clock)
+        statuses = wait_for_services([("opnsense", "https://opnsense/health")], timeout=5,
+                                     probe=lambda url: (False, "HTTP 503"))
+
+        status = statuses["opnsense"]
+        assert (status.ready, status.time_to_ready, status.last_error) == (False, None, "HTTP 503")
+        assert status.attempts > 1
+        # the last sleep is cut short at the deadline
+        assert sum(clock.sleeps) == pytest.approx(5.0)
+
+    def test_services_are_probed_concurrently(self):
+        def slow_probe(url):
+            time.sleep(0.2)
+            return True, None
+
+        started = time.monotonic()
+        statuses = wait_for_services([("proxmox", "http://proxmox/health"),
+                                      ("opnsense", "https://opnsense/health")], probe=slow_probe)
+
+        assert time.monotonic() - started < 0.35
+        assert all(status.ready for status in statuses.values())
+
+    def test_no_services(self):
+        assert wait_for_services([]) == {}
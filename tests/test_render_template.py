@@ -0,0 +1,218 @@
+#!/usr/bin/env python3
+"""
+Unit tests for device template rendering.
+Covers batch rendering, the site artifact pipeline, incremental rendering
+and the persistent bytecode cache.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+jinja2 = pytest.importorskip("jinja2")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from incremental import Manifest  # noqa: E402
+from render_template import (  # noqa: E402
+    RenderJob, TemplateRenderer, directory_device_jobs, outdated_jobs, render_batch, render_jobs,
+    site_artifact_jobs, site_device_jobs,
+)
+from template_cache import TemplateBytecodeCache  # noqa: E402
+
+DEVICE_TEMPLATES = PROJECT_ROOT / "config" / "devices_templates"
+
+
+class TestBatchRendering:
+    """Test rendering a whole site's devices in one process."""
+
+    def test_site_devices_rendered(self, tmp_path):
+        """Each device in the site map gets its own output file."""
+        site_config = {"site": {
+            "name": "test",
+            "network_prefix": "10.1",
+            "domain": "test.local",
+            "devices": {
+                "front_camera": {"type": "camera", "ip_address": "10.1.50.10", "vlan_id": 50,
+                                 "mac_address": "00:11:22:33:44:55"},
+                "nas": {"type": "nas", "ip_address": "10.1.10.100", "vlan_id": 10,
+                        "mac_address": "00:11:22:33:44:66"},
+            },
+        }}
+
+        rendered, failures = render_batch(TemplateRenderer(str(DEVICE_TEMPLATES)),
+                                          site_device_jobs(site_config), tmp_path)
+
+        assert failures == []
+        assert rendered == 2
+        camera = (tmp_path / "front_camera.yml").read_text()
+        assert "type: camera" in camera
+        assert "ip_suffix: 10" in camera
+
+    def test_failures_do_not_stop_batch(self, tmp_path):
+        """A missing template is reported while other devices still render."""
+        site_config = {"site": {"name": "test", "devices": {
+            "camera": {"type": "camera", "vlan_id": 50, "ip_address": "10.1.50.10",
+                       "mac_address": "00:11:22:33:44:55"},
+            "mystery": {"type": "does_not_exist"},
+        }}}
+
+        rendered, failures = render_batch(TemplateRenderer(str(DEVICE_TEMPLATES)),
+                                          site_device_jobs(site_config), tmp_path)
+
+        assert rendered == 1
+        assert [name for name, _ in failures] == ["mystery"]
+
+    def test_write_errors_do_not_stop_batch(self, tmp_path):
+        """A device whose output cannot be written is reported like a render failure."""
+        site_config = {"site": {"name": "test", "devices": {
+            "camera": {"type": "camera", "vlan_id": 50, "ip_address": "10.1.50.10",
+                       "mac_address": "00:11:22:33:44:55"},
+            "nas": {"type": "nas", "vlan_id": 10, "ip_address": "10.1.10.100",
+                    "mac_address": "00:11:22:33:44:66"},
+        }}}
+        # a directory in the way makes the final rename fail
+        (tmp_path / "camera.yml").mkdir()
+
+        rendered, failures = render_batch(TemplateRenderer(str(DEVICE_TEMPLATES)),
+                                          site_device_jobs(site_config), tmp_path)
+
+        assert rendered == 1
+        assert [name for name, _ in failures] == ["camera"]
+        assert (tmp_path / "nas.yml").exists()
+        assert list(tmp_path.glob(".*.tmp")) == []
+
+    def test_devices_directory(self, tmp_path):
+        """Each device config naming a template in a directory is rendered."""
+        devices = tmp_path / "devices"
+        devices.mkdir()
+        (devices / "camera.yml").write_text(yaml.safe_dump(
+            {"template": "camera.yml.j2", "type": "camera", "vlan_id": 50, "ip_address": "10.1.50.10",
+             "mac_address": "00:11:22:33:44:55"}))
+        (devices / "notes.yml").write_text(yaml.safe_dump({"type": "camera"}))
+
+        jobs = list(directory_device_jobs(devices))
+        rendered, failures = render_batch(TemplateRenderer(str(DEVICE_TEMPLATES)), jobs, tmp_path / "out")
+
+        assert [name for name, _, _ in jobs] == ["camera"]
+        assert (rendered, failures) == (1, [])
+        assert "type: camera" in (tmp_path / "out" / "camera.yml").read_text()
+
+
+class TestSiteArtifacts:
+    """Test the multi-site artifact pipeline."""
+
+    @pytest.fixture
+    def site_file(self, tmp_path):
+        site = {"site": {
+            "name": "branch",
+            "network_prefix": "10.2",
+            "domain": "branch.local",
+            "proxmox": {"host": "10.2.50.1"},
+            "hardware": {"network": {"vlans": [
+                {"id": 10, "name": "main", "subnet": "10.2.10.0/24", "dhcp": True},
+                {"id": 99, "name": "static", "subnet": "10.2.99.0/24", "dhcp": False},
+            ]}},
+            "devices": {
+                "nas": {"type": "nas", "ip_address": "10.2.10.100", "vlan_id": 10,
+                        "mac_address": "00:11:22:33:44:66"},
+            },
+        }}
+        path = tmp_path / "branch.yml"
+        path.write_text(yaml.safe_dump(site))
+        return path
+
+    def test_site_artifacts_rendered(self, tmp_path, site_file):
+        """Devices, DHCP config and per-VLAN subnets are rendered for the site."""
+        jobs = site_artifact_jobs(site_file, tmp_path / "out", DEVICE_TEMPLATES)
+        rendered, failures, _, _ = render_jobs(jobs, workers=1, use_cache=False)
+
+        site_dir = tmp_path / "out" / "branch"
+        assert failures == []
+        assert rendered == len(jobs)
+        assert (site_dir / "devices" / "nas.yml").exists()
+        assert not (site_dir / "dhcp" / "subnets" / "subnet-99.conf").exists()
+
+        subnet = (site_dir / "dhcp" / "subnets" / "subnet-10.conf").read_text()
+        assert "subnet 10.2.10.0 netmask 255.255.255.0" in subnet
+        assert "fixed-address 10.2.10.100;" in subnet
+        assert "hardware ethernet 00:11:22:33:44:66;" in (site_dir / "dhcp" / "dhcp_reservations.conf").read_text()
+        assert list(site_dir.rglob("*.tmp")) == []
+
+    def test_incremental_rerenders_only_affected_outputs(self, tmp_path, site_file):
+        """Changing one device's MAC only re-renders the outputs that read it."""
+        out = tmp_path / "out"
+
+        def build():
+            manifest = Manifest(out)
+            jobs, _ = outdated_jobs(site_artifact_jobs(site_file, out, DEVICE_TEMPLATES), manifest)
+            render_jobs(jobs, workers=1, use_cache=False, manifest=manifest)
+            manifest.save()
+            return sorted(Path(job.output).relative_to(out / "branch").as_posix() for job in jobs)
+
+        assert len(build()) == 4
+        assert build() == []
+
+        site = yaml.safe_load(site_file.read_text())
+        site["site"]["devices"]["nas"]["mac_address"] = "00:11:22:33:44:77"
+        site_file.write_text(yaml.safe_dump(site))
+
+        assert build() == ["devices/nas.yml", "dhcp/dhcp_reservations.conf", "dhcp/subnets/subnet-10.conf"]
+        assert "00:11:22:33:44:77" in (out / "branch" / "dhcp" / "subnets" / "subnet-10.conf").read_text()
+
+    def test_unexpected_errors_are_reported_per_job(self, tmp_path):
+        """A template raising a non-Jinja error fails its own job, not the pool."""
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        (templates / "ok.j2").write_text("value: {{ value }}\n")
+        (templates / "broken.j2").write_text("value: {{ value // 0 }}\n")
+        jobs = [RenderJob(str(templates), name, str(tmp_path / "out" / f"{index}-{name}.yml"),
+                          {"value": index}, False, 0o644)
+                for index, name in enumerate(["ok.j2", "broken.j2", "ok.j2", "ok.j2"])]
+
+        rendered, failures, _, _ = render_jobs(jobs, workers=2, use_cache=False)
+
+        assert rendered == 3
+        assert failures == [(jobs[1].output, "broken.j2: ZeroDivisionError: integer division or modulo by zero")]
+
+
+class TestBytecodeCache:
+    """Test the persistent template bytecode cache."""
+
+    def render(self, template_dir, cache_dir):
+        cache = TemplateBytecodeCache(cache_dir)
+        output = TemplateRenderer(str(template_dir), cache).render("t.j2", {"name": "x"})
+        return output, cache
+
+    def test_second_run_hits_cache(self, tmp_path):
+        """Compiled templates are reused by a fresh environment."""
+        (tmp_path / "t.j2").write_text("hello {{ name }}")
+
+        first, cold = self.render(tmp_path, tmp_path / "cache")
+        second, warm = self.render(tmp_path, tmp_path / "cache")
+
+        assert first == second == "hello x"
+        assert (cold.misses, cold.stores) == (1, 1)
+        assert (warm.hits, warm.misses) == (1, 0)
+
+    def test_template_change_invalidates(self, tmp_path):
+        """Editing a template never serves stale bytecode."""
+        (tmp_path / "t.j2").write_text("hello {{ name }}")
+        self.render(tmp_path, tmp_path / "cache")
+
+        (tmp_path / "t.j2").write_text("goodbye {{ name }}")
+        output, cache = self.render(tmp_path, tmp_path / "cache")
+
+        assert output == "goodbye x"
+        assert cache.misses == 1
+
+    def test_clear(self, tmp_path):
+        """Clearing removes every entry."""
+        (tmp_path / "t.j2").write_text("hello {{ name }}")
+        _, cache = self.render(tmp_path, tmp_path / "cache")
+
+        assert cache.clear() == 1
+        assert cache.stats()["entries"] == 0
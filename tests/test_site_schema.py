@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the compiled site configuration schema.
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from site_schema import compile_schema, format_path, validate_file  # noqa: E402
+
+
+class TestSiteSchema:
+    """Test schema compilation and site file validation."""
+
+    @pytest.mark.parametrize("site_file", [
+        PROJECT_ROOT / "config" / "site_template.yml",
+        PROJECT_ROOT / "docker-test-framework" / "example-site.yml",
+    ])
+    def test_shipped_sites_are_valid(self, site_file):
+        assert validate_file(site_file) == []
+
+    def test_reports_all_errors_with_lines(self, tmp_path):
+        site_file = tmp_path / "broken.yml"
+        site_file.write_text(
+            "site:\n"
+            "  name: broken\n"
+            "  display_name: Broken\n"
+            "  network_prefix: \"10.5\"\n"
+            "  domain: broken.local\n"
+            "  hardware:\n"
+            "    network:\n"
+            "      vlans:\n"
+            "        - id: 10\n"
+            "          name: main\n"
+            "          subnet: \"10.6.10.0/24\"\n"
+            "        - id: 5000\n"
+            "          name: bad\n"
+            "          subnet: \"10.5.20.0/24\"\n"
+        )
+
+        errors = {(format_path(error.path), error.line): error.message for error in validate_file(site_file)}
+        assert set(errors) == {
+            ("site", 1),
+            ("site.hardware.network.vlans[0].subnet", 11),
+            ("site.hardware.network.vlans[1].id", 12),
+        }
+        assert "proxmox" in errors[("site", 1)]
+        assert "outside network_prefix" in errors[("site.hardware.network.vlans[0].subnet", 11)]
+
+    def test_unquoted_network_prefix_is_rejected(self, tmp_path):
+        site_file = tmp_path / "float.yml"
+        site_file.write_text(
+            "site:\n  name: f\n  display_name: F\n  network_prefix: 10.10\n"
+            "  domain: f.local\n  proxmox:\n    host: pve\n"
+        )
+        [error] = validate_file(site_file)
+        assert format_path(error.path) == "site.network_prefix" and error.line == 4
+
+    def test_compiled_keywords(self):
+        validate = compile_schema({
+            'type': 'object',
+            'required': ['a'],
+            'additionalProperties': False,
+            'properties': {'a': {'type': 'array', 'items': {'type': 'string', 'enum': ['x', 'y']}}},
+        })
+        assert validate({'a': ['x', 'y']}) == []
+        assert [path for path, _ in validate({'a': ['z', 1], 'b': 2})] == [('a', 0), ('a', 1), ('b',)]
+        assert validate([]) == [((), 'must be object, got sequence')]
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the test runner's suite dependency scheduling.
+"""
+
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("requests")
+pytest.importorskip("structlog")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "docker-test-framework" / "test-runner"))
+
+import run_tests  # noqa: E402
+
+SUITE_METHODS = {
+    "network": "test_network_configuration",
+    "firewall": "test_firewall_configuration",
+    "vm-deployment": "test_vm_deployment",
+    "performance": "test_performance",
+}
+
+
+@pytest.fixture
+def runner(monkeypatch):
+    monkeypatch.setenv("TEST_WORKERS", "4")
+    monkeypatch.setenv("TEST_PARALLEL", "true")
+    return run_tests.TestRunner()
+
+
+def fake_suites(runner, monkeypatch, failing=(), delay=0.02):
+    """Replace the suite bodies with fakes that record calls and run times"""
+    calls = []
+    lock = threading.Lock()
+
+    def fake(suite):
+        def run():
+            started = time.time()
+            time.sleep(delay)
+            with lock:
+                calls.append((suite, started, time.time()))
+            return suite not in failing
+        return run
+
+    for suite, method in SUITE_METHODS.items():
+        monkeypatch.setattr(runner, method, fake(suite))
+    return calls
+
+
+class TestResolveSuiteOrder:
+    """Test dependency expansion and ordering."""
+
+    def test_dependencies_come_first(self):
+        assert run_tests.resolve_suite_order(["integration", "performance"]) == [
+            "network", "firewall", "vm-deployment", "integration", "performance"]
+
+    def test_suites_are_not_repeated(self):
+        assert run_tests.resolve_suite_order(["firewall", "integration", "firewall"]) == [
+            "firewall", "network", "vm-deployment", "integration"]
+
+    def test_unknown_suite_has_no_dependencies(self):
+        assert run_tests.resolve_suite_order(["smoke"]) == ["smoke"]
+
+    def test_cycle(self, monkeypatch):
+        monkeypatch.setitem(run_tests.SUITE_DEPENDENCIES, "network", ["integration"])
+        with pytest.raises(ValueError, match="cycle"):
+            run_tests.resolve_suite_order(["integration"])
+
+
+class TestRunSuites:
+    """Test scheduling suites on the worker pool."""
+
+    def test_integration_reuses_dependency_results(self, runner, monkeypatch):
+        calls = fake_suites(runner, monkeypatch)
+        runner.run_suites(run_tests.resolve_suite_order(["integration"]))
+
+        assert sorted(suite for suite, _, _ in calls) == ["firewall", "network", "vm-deployment"]
+        assert set(runner.results["tests"]) == {"network", "firewall", "vm-deployment", "integration"}
+        assert runner.results["tests"]["integration"]["success"]
+
+    def test_integration_waits_for_dependencies(self, runner, monkeypatch):
+        calls = fake_suites(runner, monkeypatch)
+        runner.run_suites(run_tests.resolve_suite_order(["integration", "performance"]))
+
+        finished = max(end for suite, _, end in calls if suite != "performance")
+        assert runner.results["tests"]["integration"]["start_time"] >= finished
+        # independent suites share the pool
+        assert max(start for _, start, _ in calls) < min(end for _, _, end in calls)
+
+    def test_failed_dependency_fails_integration(self, runner, monkeypatch):
+        calls = fake_suites(runner, monkeypatch, failing={"firewall"})
+        runner.run_suites(run_tests.resolve_suite_order(["integration"]))
+
+        assert len(calls) == 3
+        assert not runner.results["tests"]["firewall"]["success"]
+        assert not runner.results["tests"]["integration"]["success"]
+
+    def test_suite_exception_is_recorded(self, runner, monkeypatch):
+        fake_suites(runner, monkeypatch)
+
+        def broken():
+            raise RuntimeError("mock unreachable")
+
+        monkeypatch.setattr(runner, "test_network_configuration", broken)
+        runner.run_suites(["network", "firewall"])
+
+        assert runner.results["tests"]["network"]["error"] == "mock unreachable"
+        assert runner.results["tests"]["firewall"]["success"]
+
+    def test_integration_alone_runs_its_dependencies(self, runner, monkeypatch):
+        calls = fake_suites(runner, monkeypatch)
+        result = runner.run_test_suite("integration")
+
+        assert result["success"]
+        assert sorted(suite for suite, _, _ in calls) == ["firewall", "network", "vm-deployment"]
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the parallel site validation driver.
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from validate_sites import (  # noqa: E402
+    build_report, collect_site_files, format_report, read_env_names, validate_sites,
+)
+
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+
+
+class TestValidateSites:
+    """Test parallel validation and report aggregation."""
+
+    def test_parallel_report(self, tmp_path, monkeypatch):
+        monkeypatch.delenv("TAILSCALE_AUTH_KEY", raising=False)
+        sites_dir = tmp_path / "sites"
+        sites_dir.mkdir()
+        shutil.copy(EXAMPLE_SITE, sites_dir / "a-good.yml")
+        (sites_dir / "b-bad.yml").write_text("site:\n  name: bad\n")
+        env_file = tmp_path / ".env"
+        env_file.write_text("# secrets\nEXAMPLE_SITE_PROXMOX_API_SECRET=x\n")
+
+        files = collect_site_files([sites_dir])
+        results = validate_sites(files, workers=2, defined_vars=read_env_names(env_file))
+        report = build_report(results, 0.1)
+
+        assert [result['site'] for result in results] == ['example-site', 'bad']
+        assert report['summary']['passed'] == 1 and report['summary']['failed'] == 1
+        assert results[0]['warnings'] == ["credential variable TAILSCALE_AUTH_KEY is not set"]
+        assert {error['line'] for error in results[1]['errors']} == {1}
+
+        text = format_report(report)
+        assert "✗ bad" in text
+        assert "2 site(s): 1 passed, 1 failed" in text
+
+    def test_missing_file_fails(self, tmp_path):
+        [result] = validate_sites([str(tmp_path / "absent.yml")], workers=1)
+        assert not result['valid']
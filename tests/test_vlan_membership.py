@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Unit tests for the bridge/VLAN trunk validator and its per-bridge membership bitmaps.
+"""
+
+import copy
+import sys
+from pathlib import Path
+
+import pytest
+import yaml
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT / "deployment" / "scripts"))
+
+from vlan_membership import (  # noqa: E402
+    bitmap_vlans, bridge_membership, check_files, find_conflicts, format_vids, has_vlan, vlan_bitmap,
+)
+
+EXAMPLE_SITE = PROJECT_ROOT / "docker-test-framework" / "example-site.yml"
+CREATE_BRIDGE = PROJECT_ROOT / "deployment" / "ansible" / "roles" / "proxmox_network" / "tasks" / "create_bridge.yml"
+
+
+@pytest.fixture(scope="module")
+def example():
+    with open(EXAMPLE_SITE) as f:
+        return yaml.safe_load(f)
+
+
+@pytest.fixture
+def site(example):
+    return copy.deepcopy(example)
+
+
+def network(site):
+    return site["site"]["hardware"]["network"]
+
+
+def bridge(site, name):
+    return next(entry for entry in network(site)["bridges"] if entry["name"] == name)
+
+
+def problems(site):
+    return sorted((conflict.kind, conflict.message) for conflict in find_conflicts([("site.yml", site)]))
+
+
+class TestBitmaps:
+    """Test the 4096-bit membership helpers."""
+
+    def test_round_trip(self):
+        bitmap = vlan_bitmap([1, 10, 4095, 0, 4096, True, "20", None])
+        assert len(bitmap) == 512
+        assert bitmap_vlans(bitmap) == [1, 10, 4095]
+        assert has_vlan(bitmap, 4095) and not has_vlan(bitmap, 11) and not has_vlan(bitmap, 5000)
+
+    def test_vids_ranges(self):
+        assert format_vids([10, 11, 12, 20, 30, 31]) == "10-12 20 30-31"
+        assert format_vids([]) == ""
+
+
+class TestTrunkValidation:
+    """Test trunk, orphan and camera checks on the example site."""
+
+    def test_example_site_is_clean(self, site):
+        assert problems(site) == []
+        assert check_files([str(EXAMPLE_SITE)]) == []
+
+    def test_vm_nic_on_untrunked_vlan(self, site):
+        site["site"]["vm_templates"]["homeassistant"]["network"][0]["vlan"] = 20
+        site["site"]["vm_templates"]["zeek"]["network"][1]["vlan"] = 10
+        assert problems(site) == [
+            ("untrunked-vlan", "VM homeassistant NIC 0 uses VLAN 20, which bridge vmbr1 does not trunk"),
+            ("untrunked-vlan", "VM zeek NIC 1 is tagged VLAN 10 on vmbr0, which is not VLAN-aware"),
+        ]
+
+    def test_unknown_bridge(self, site):
+        site["site"]["vm_templates"]["tailscale"]["network"][0]["bridge"] = "vmbr9"
+        [conflict] = find_conflicts([("site.yml", site)])
+        assert conflict.kind == "unknown-bridge"
+        assert conflict.locations[0].path == ("site", "vm_templates", "tailscale", "network", 0, "bridge")
+
+    def test_orphan_vlans(self, site):
+        network(site)["vlans"].append({"id": 60, "name": "lab", "subnet": "10.99.60.0/24"})
+        bridge(site, "vmbr1")["vlans"].append(70)
+        network(site)["interfaces"][2]["vlan"].append(70)
+        assert problems(site) == [
+            ("orphan-vlan", "VLAN 60 is not trunked by any bridge"),
+            ("orphan-vlan", "bridge vmbr1 trunks VLAN 70, which the site does not define"),
+        ]
+
+    def test_uplink_must_carry_bridge_vlans(self, site):
+        network(site)["interfaces"][2]["vlan"] = [10, 30]
+        assert [kind for kind, _ in problems(site)] == ["uplink-vlan", "uplink-vlan"]
+
+    def test_camera_leaks(self, site):
+        bridge(site, "vmbr1")["vlans"].append(20)
+        network(site)["interfaces"][2]["vlan"].append(20)
+        bridge(site, "vmbr2")["vlans"].append(30)
+        network(site)["interfaces"][3]["vlan"].append(30)
+        assert problems(site) == [
+            ("camera-leak", "bridge vmbr1 trunks camera VLAN 20 outside the camera bridge"),
+            ("camera-leak", "camera bridge vmbr2 also trunks non-camera VLAN 30"),
+        ]
+
+    def test_many_nics(self, site):
+        templates = site["site"]["vm_templates"]
+        for index in range(5000):
+            templates[f"vm{index}"] = {"network": [{"bridge": "vmbr1", "vlan": 10 + 10 * (index % 5)}]}
+        # every fifth VM is tagged VLAN 20, which only the camera bridge trunks
+        assert len(problems(site)) == 1000
+
+
+class TestBridgeRole:
+    """Test the membership structure consumed by the proxmox_network role."""
+
+    def test_membership(self, example):
+        membership = bridge_membership(example)
+        assert membership["vmbr1"] == {"ports": "eth2", "vlans": [10, 30, 40, 50], "vlan_aware": True,
+                                       "vids": "10 30 40 50", "camera": False}
+        assert membership["vmbr2"]["camera"] and not membership["vmbr0"]["vlan_aware"]
+        # site_config may also be the inner site mapping
+        assert bridge_membership(example["site"]) == membership
+
+    def test_create_bridge_block(self, example):
+        jinja2 = pytest.importorskip("jinja2")
+        with open(CREATE_BRIDGE) as f:
+            [task] = yaml.safe_load(f)
+        assert "bridge_membership[bridge_name]" in task["vars"]["membership"]
+        template = jinja2.Environment().from_string(task["blockinfile"]["block"])
+        membership = bridge_membership(example)
+
+        def render(name):
+            return template.render(bridge_name=name, bridge_address="10.99.50.10/24", membership=membership[name])
+
+        lan = render("vmbr1")
+        assert "bridge-ports eth2" in lan
+        assert "bridge-vlan-aware yes" in lan and "bridge-vids 10 30 40 50" in lan
+        assert "bridge-vlan-aware" not in render("vmbr0")
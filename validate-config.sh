@@ -42,6 +42,9 @@ usage() {
     echo "Arguments:"
     echo "  SITE_NAME    Name of site to validate (optional, validates all if not specified)"
     echo ""
+    echo "Environment:"
+    echo "  VALIDATION_REPORT    Also write a JSON report of all sites to this file"
+    echo ""
     echo "Examples:"
     echo "  $0           # Validate all site configurations"
     echo "  $0 mysite    # Validate specific site configuration"
@@ -64,53 +67,8 @@ validate_site_structure() {
 
     log_info "Validating structure of $site_name..."
 
-    # Use Python to validate structure
-    python3 -c "
-import yaml
-import sys
-
-try:
-    with open('$file', 'r') as f:
-        config = yaml.safe_load(f)
-
-    # Check top-level structure
-    if 'site' not in config:
-        print('✗ Missing top-level \"site\" section')
-        sys.exit(1)
-
-    site = config['site']
-
-    # Check required fields
-    required_fields = ['name', 'display_name', 'network_prefix', 'domain', 'proxmox']
-    for field in required_fields:
-        if field not in site:
-            print(f'✗ Missing required field: {field}')
-            sys.exit(1)
-
-    # Check proxmox section
-    if 'host' not in site['proxmox']:
-        print('✗ Missing proxmox.host')
-        sys.exit(1)
-
-    # Check network consistency if hardware section exists
-    if 'hardware' in site and 'network' in site['hardware']:
-        network_prefix = site['network_prefix']
-        vlans = site['hardware']['network'].get('vlans', [])
-
-        for vlan in vlans:
-            subnet = vlan.get('subnet', '')
-            if subnet and not subnet.startswith(network_prefix):
-                print(f'✗ VLAN {vlan.get(\"id\")} subnet {subnet} doesn\\'t match network prefix {network_prefix}')
-                sys.exit(1)
-
-    print('✓ Site structure is valid')
-
-except Exception as e:
-    print(f'✗ Validation error: {e}')
-    sys.exit(1)
-"
-
-    if [[ $? -eq 0 ]]; then
+    # Compiled schema validator; reports every error with its YAML line number
+    if python3 deployment/scripts/site_schema.py "$file"; then
         log_success "Structure validation passed for $site_name"
         return 0
     else
@@ -335,36 +293,36 @@ main() {
             ((total_errors++))
         fi
     else
-        # Validate all sites
+        # Validate all sites, the example site and the site template in parallel
+        local site_files=()
         if [[ -d "${PROXMOX_FW_CONFIG_ROOT}/sites" ]]; then
-            local site_count=0
             while IFS= read -r -d '' site_file; do
-                if ! validate_site "$site_file"; then
-                    ((total_errors++))
-                fi
-                ((site_count++))
+                site_files+=("$site_file")
             done < <(find "${PROXMOX_FW_CONFIG_ROOT}/sites" -name "*.yml" -print0 2>/dev/null || true)
 
-            if [[ $site_count -eq 0 ]]; then
+            if [[ ${#site_files[@]} -eq 0 ]]; then
                 log_warning "No site configurations found in ${PROXMOX_FW_CONFIG_ROOT}/sites/"
             fi
         else
             log_warning "No ${PROXMOX_FW_CONFIG_ROOT}/sites directory found"
         fi
 
-        # Validate example site in test framework
         if [[ -f "docker-test-framework/example-site.yml" ]]; then
-            echo -e "\n${BLUE}=== Validating Example Site ===${NC}"
-            if ! validate_site "${PROXMOX_FW_CONFIG_ROOT}/sites/example-site.yml"; then
-                ((total_errors++))
-            fi
+            site_files+=("docker-test-framework/example-site.yml")
         fi
 
-        # Validate site template
         if [[ -f "${PROXMOX_FW_CONFIG_ROOT}/site_template.yml" ]]; then
-            echo -e "\n${BLUE}=== Validating Site Template ===${NC}"
-            if ! validate_site "${PROXMOX_FW_CONFIG_ROOT}/site_template.yml"; then
-                ((total_errors++))
+            site_files+=("${PROXMOX_FW_CONFIG_ROOT}/site_template.yml")
+        fi
+
+        if [[ ${#site_files[@]} -gt 0 ]]; then
+            echo -e "\n${BLUE}=== Validating ${#site_files[@]} Site Configurations ===${NC}"
+            local validator_args=(--env-file .env)
+            if [[ -n "${VALIDATION_REPORT:-}" ]]; then
+                validator_args+=(--report "$VALIDATION_REPORT")
+            fi
+            if ! python3 deployment/scripts/validate_sites.py "${validator_args[@]}" "${site_files[@]}"; then
+                total_errors=$((total_errors + 1))
             fi
         fi
     fi